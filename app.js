@@ -16,7 +16,7 @@ let legRankHistoryData = null; // leg_rank_history.json の内容を保持
 let legBestRecordByLeg = new Map(); // 区間最高記録のキャッシュ
 let legBestRecordTeamByLeg = new Map(); // 区間最高記録の保持チーム名
 let goalLatLng = null; // ゴール地点の座標を保持
-let coursePathData = null; // course_path.json の全ポイントデータ（座標変換用）
+let coursePathData = null; // コースの全ポイントデータ（座標変換用。course_path_lod.json の最も細かい段階）
 
 // --- 順位変動タイムライン用状態変数 ---
 let rankTimelineEvents = [];
@@ -488,9 +488,81 @@ let runnerMarkersLayer = null;
 let teamColorMap = new Map();
 let trackedTeamName = "lead_group"; // デフォルトは先頭集団を追跡
 let coursePolyline = null; // コースのポリラインをグローバルに保持
+let courseLodLevels = []; // [{minZoom, latlngs}]（minZoom 昇順）。ズームに応じて coursePolyline を差し替える
 let shouldAutoFollowMap = true; // ユーザーが地図を触るまでは追跡を維持する
 let startLatLng = null; // スタート地点の緯度経度
 
+/**
+ * encoded polyline（Google 形式）を [[lat, lon], ...] に戻す。
+ * @param {string} encoded
+ * @param {number} precision - 小数点以下の桁数（course_path_lod.json は 6）
+ */
+function decodePolyline(encoded, precision = 5) {
+    const factor = 10 ** precision;
+    const points = [];
+    let index = 0, lat = 0, lon = 0;
+    while (index < encoded.length) {
+        const deltas = [];
+        for (let k = 0; k < 2; k++) {
+            let shift = 0, result = 0, byte;
+            do {
+                byte = encoded.charCodeAt(index++) - 63;
+                result |= (byte & 0x1f) << shift;
+                shift += 5;
+            } while (byte >= 0x20);
+            deltas.push(result & 1 ? ~(result >> 1) : result >> 1);
+        }
+        lat += deltas[0];
+        lon += deltas[1];
+        points.push([lat / factor, lon / factor]);
+    }
+    return points;
+}
+
+/**
+ * コース形状を取得する。course_path_lod.json（多段階解像度, 約20KB）を優先し、
+ * 無ければ従来の course_path.json（約110KB）を使う。
+ * @returns {Promise<{levels: Array<{minZoom: number, latlngs: Array}>, fullPath: Array<{lat: number, lon: number}>}>}
+ */
+async function fetchCourseGeometry() {
+    try {
+        const res = await fetch(`config/course_path_lod.json?_=${new Date().getTime()}`);
+        if (res.ok) {
+            const lod = await res.json();
+            const levels = (lod.levels || [])
+                .map(level => ({ minZoom: level.minZoom || 0, latlngs: decodePolyline(level.polyline, lod.precision) }))
+                .sort((a, b) => a.minZoom - b.minZoom);
+            if (levels.length > 0) {
+                const finest = levels[levels.length - 1].latlngs;
+                return { levels, fullPath: finest.map(([lat, lon]) => ({ lat, lon })) };
+            }
+        }
+    } catch (e) {
+        console.warn('course_path_lod.json の読み込みに失敗したため course_path.json を使用します:', e);
+    }
+    const res = await fetch(`config/course_path.json?_=${new Date().getTime()}`);
+    if (!res.ok) {
+        throw new Error('Failed to fetch map data.');
+    }
+    const coursePath = await res.json();
+    return { levels: [{ minZoom: 0, latlngs: coursePath.map(p => [p.lat, p.lon]) }], fullPath: coursePath };
+}
+
+/**
+ * 現在のズームに合う解像度のコースに差し替える。
+ */
+function updateCoursePolylineForZoom() {
+    if (!map || !coursePolyline || courseLodLevels.length === 0) return;
+    const zoom = map.getZoom();
+    let level = courseLodLevels[0];
+    for (const candidate of courseLodLevels) {
+        if (candidate.minZoom <= zoom) level = candidate;
+    }
+    if (coursePolyline.getLatLngs().length !== level.latlngs.length) {
+        coursePolyline.setLatLngs(level.latlngs);
+    }
+}
+
 /**
  * Initializes the interactive map, draws the course, and places relay point markers.
  */
@@ -529,18 +601,19 @@ async function initializeMap() {
 
     try {
         // 4. Fetch course path, relay points, and leg best records data in parallel
-        const [coursePathRes, relayPointsRes, legBestRecordsRes] = await Promise.all([
-            fetch(`config/course_path.json?_=${new Date().getTime()}`),
+        const [courseGeometry, relayPointsRes, legBestRecordsRes] = await Promise.all([
+            fetchCourseGeometry(),
             fetch(`config/relay_points.json?_=${new Date().getTime()}`),
             fetch(`history_data/leg_best_records.json?_=${new Date().getTime()}`) // 区間記録データをここで取得
         ]);
 
-        if (!coursePathRes.ok || !relayPointsRes.ok) {
+        if (!relayPointsRes.ok) {
             throw new Error('Failed to fetch map data.');
         }
 
-        const coursePath = await coursePathRes.json();
-        coursePathData = coursePath; // course_path.json をグローバルに保持
+        const coursePath = courseGeometry.fullPath;
+        coursePathData = coursePath; // 全ポイントをグローバルに保持（距離→座標変換用）
+        courseLodLevels = courseGeometry.levels;
         const relayPoints = await relayPointsRes.json();
         // 区間記録データは任意。取得できなくてもエラーにしない
         const legBestRecords = legBestRecordsRes.ok ? await legBestRecordsRes.json() : null;
@@ -548,12 +621,15 @@ async function initializeMap() {
         // 5. Draw the course path
         if (coursePath && coursePath.length > 0) {
             const latlngs = coursePath.map(p => [p.lat, p.lon]);
-            coursePolyline = L.polyline(latlngs, { color: '#007bff', weight: 5, opacity: 0.7 }).addTo(map);
+            // まず最も粗い段階を描画し、ズームに応じて細かい段階に差し替える
+            coursePolyline = L.polyline(courseLodLevels[0].latlngs, { color: '#007bff', weight: 5, opacity: 0.7 }).addTo(map);
             goalLatLng = latlngs[latlngs.length - 1] || null;
             startLatLng = latlngs[0] || null;
             if (startLatLng) {
                 map.setView(startLatLng, 6);
             }
+            updateCoursePolylineForZoom();
+            map.on('zoomend', updateCoursePolylineForZoom);
         }
 
         // 6. Draw relay point markers with leg record info
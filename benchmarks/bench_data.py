@@ -0,0 +1,268 @@
+"""ベンチマーク用の作業ディレクトリ（config/ data/ history_data/）を作る。
+
+- build_current_workdir: リポジトリの実データ（現行18チーム）をコピーする
+- build_synthetic_workdir: チーム数 × 区間数 × 大会日数を指定した合成データを作る
+
+どちらも大会 race_day 日目の状態（前日までの記録が入った state / individual_results /
+rank_history）になるよう outline.json の開始日を書き換え、--commit 用の
+daily_temperatures.json（当日分）と、スレッド URL をローカルサーバーに向けた outline.json を置く。
+"""
+import json
+import math
+import shutil
+from datetime import timedelta
+from pathlib import Path
+
+from fake_services import BOARD_MANAGER_NAME, BOARD_MANAGER_TRIP, max_temperature_for
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+LEG_LENGTH_KM = 100
+MAX_DAILY_KM = 40  # _daily_distance の上限（余裕込み）
+HISTORY_FILES = [
+    'ekiden_story_settings.json', 'past_results.json', 'leg_award_history.json',
+    'tournament_records.json', 'leg_best_records.json',
+]
+CURRENT_DATA_FILES = [
+    'ekiden_state.json', 'individual_results.json', 'rank_history.json',
+    'leg_rank_history.json', 'intramural_rankings.json',
+]
+CURRENT_CONFIG_FILES = [
+    'ekiden_data.json', 'shadow_team.json', 'amedas_stations.json', 'outline.json',
+    'course_path.json', 'relay_points.json',
+]
+
+
+def _write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def _read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _copy_history(workdir):
+    for name in HISTORY_FILES:
+        target = workdir / 'history_data' / name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(PROJECT_ROOT / 'history_data' / name, target)
+
+
+def _write_outline(workdir, outline, today, race_day, base_url):
+    outline = dict(outline)
+    outline['metadata'] = dict(outline.get('metadata') or {},
+                               startDate=(today - timedelta(days=race_day - 1)).strftime('%Y-%m-%d'))
+    outline['mainThreadUrl'] = f'{base_url}/thread/'
+    _write_json(workdir / 'config' / 'outline.json', outline)
+
+
+def _current_runner_codes(teams, state, stations_by_name):
+    """当日走る選手名 → 観測所コード"""
+    state_by_id = {s['id']: s for s in state}
+    codes = {}
+    for team in teams:
+        team_state = state_by_id.get(team['id'])
+        if not team_state or team_state.get('finishDay'):
+            continue
+        index = team_state['currentLeg'] - 1
+        runners = team.get('runners', [])
+        if index >= len(runners):
+            continue
+        runner = runners[index]
+        if isinstance(runner, dict):
+            codes[runner['name']] = runner.get('station_code') or stations_by_name.get(runner['name'])
+        else:
+            codes[runner] = stations_by_name.get(runner)
+    return codes
+
+
+def _write_daily_temperatures(workdir, race_day_date, runner_codes):
+    temps = {name: max_temperature_for(code) for name, code in runner_codes.items() if code}
+    _write_json(workdir / 'data' / 'daily_temperatures.json', {race_day_date: temps})
+
+
+def build_current_workdir(workdir, today, base_url):
+    """リポジトリの実データ（現行規模）で作業ディレクトリを作る。戻り値: race_day"""
+    workdir = Path(workdir)
+    for name in CURRENT_CONFIG_FILES:
+        target = workdir / 'config' / name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(PROJECT_ROOT / 'config' / name, target)
+    for name in CURRENT_DATA_FILES:
+        source = PROJECT_ROOT / 'data' / name
+        if source.exists():
+            target = workdir / 'data' / name
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(source, target)
+    _copy_history(workdir)
+
+    # 記録済みの最終日の翌日を「今日」とする
+    race_day = len(_read_json(workdir / 'data' / 'rank_history.json').get('dates', [])) + 1
+    _write_outline(workdir, _read_json(PROJECT_ROOT / 'config' / 'outline.json'), today, race_day, base_url)
+
+    ekiden_data = _read_json(workdir / 'config' / 'ekiden_data.json')
+    stations_by_name = {s['name']: s['code'] for s in _read_json(workdir / 'config' / 'amedas_stations.json')}
+    codes = _current_runner_codes(ekiden_data['teams'], _read_json(workdir / 'data' / 'ekiden_state.json'),
+                                  stations_by_name)
+    _write_daily_temperatures(workdir, today.strftime('%Y-%m-%d'), codes)
+    return race_day
+
+
+def _leg_length_km(legs, days):
+    """大会 days 日目でも全チームが走行中になる区間距離（既定 100km）"""
+    return max(LEG_LENGTH_KM, math.ceil(MAX_DAILY_KM * days / legs))
+
+
+def _course(legs, leg_km):
+    """東西に延びる合成コース（約1kmごとの頂点）と第1〜第(legs-1)中継所の座標"""
+    total_km = legs * leg_km
+    lat = 35.0
+    km_per_deg_lon = 111.32 * math.cos(math.radians(lat))
+    points = [{'lat': lat, 'lon': round(125.0 + km / km_per_deg_lon, 6)} for km in range(total_km + 1)]
+    relay_points = [
+        {'leg': leg, 'name': f'第{leg}中継所', 'target_distance_km': leg * leg_km,
+         'latitude': lat, 'longitude': points[leg * leg_km]['lon']}
+        for leg in range(1, legs)  # 最終区間の終点はゴール（中継所なし）
+    ]
+    return points, relay_points
+
+
+def _daily_distance(team_index, day):
+    return round(33.0 + ((team_index * 7 + day * 3) % 60) / 10, 1)
+
+
+def _ranks(values, reverse=True):
+    """競技順位（同値同順位）"""
+    order = sorted(range(len(values)), key=lambda i: values[i], reverse=reverse)
+    ranks = [0] * len(values)
+    last, rank = None, 0
+    for position, i in enumerate(order):
+        if values[i] != last:
+            rank, last = position + 1, values[i]
+        ranks[i] = rank
+    return ranks
+
+
+def build_synthetic_workdir(workdir, today, base_url, teams, legs, days):
+    """teams × legs × days の合成データで作業ディレクトリを作る。戻り値: race_day"""
+    workdir = Path(workdir)
+    race_day = days
+    leg_km = _leg_length_km(legs, days)
+    boundaries = [leg_km * (leg + 1) for leg in range(legs)]
+
+    stations = []
+    team_defs = []
+    for t in range(teams):
+        runners = []
+        for leg in range(legs):
+            code = f'9{t:04d}{leg:03d}'
+            name = f'T{t + 1}R{leg + 1}'
+            stations.append({'name': f'観測所{code}', 'code': code, 'pref_code': 'bench',
+                             'latitude': 35.0, 'longitude': 135.0})
+            runners.append({'name': name, 'station_code': code})
+        manager = f'■ベンチ{t + 1}大学監督' if t else f'■{BOARD_MANAGER_NAME} {BOARD_MANAGER_TRIP}'
+        team_defs.append({'id': t + 1, 'name': f'ベンチ{t + 1}大学', 'short_name': f'B{t + 1}',
+                          'manager': manager, 'color': '#0F9D58', 'runners': runners})
+    shadow = {'id': 99, 'name': '区間記録連合', 'short_name': '区間記録', 'is_shadow_confederation': True,
+              'runners': [{'leg': leg + 1, 'name': f'記録{leg + 1}', 'team_name': 'ベンチ1大学',
+                           'edition': 15, 'record': 38.0} for leg in range(legs)]}
+
+    _write_json(workdir / 'config' / 'ekiden_data.json', {'leg_boundaries': boundaries, 'teams': team_defs})
+    _write_json(workdir / 'config' / 'shadow_team.json', shadow)
+    _write_json(workdir / 'config' / 'amedas_stations.json', stations)
+    course_points, relay_points = _course(legs, leg_km)
+    _write_json(workdir / 'config' / 'course_path.json', course_points)
+    _write_json(workdir / 'config' / 'relay_points.json', relay_points)
+    _write_outline(workdir, {'title': 'ベンチマーク大会'}, today, race_day, base_url)
+    _copy_history(workdir)
+
+    # 前日（race_day - 1 日目）までを進める
+    states = []
+    individual = {}
+    totals_by_day = []
+    leg_finish_day = [[None] * legs for _ in range(teams)]
+    for t, team in enumerate(team_defs):
+        total, leg, finish_day = 0.0, 1, None
+        start_distance, start_day = 0.0, 1
+        daily_totals = []
+        for day in range(1, race_day):
+            if finish_day is None:
+                runner = team['runners'][leg - 1]['name']
+                distance = _daily_distance(t, day)
+                info = individual.setdefault(runner, {'totalDistance': 0.0, 'teamId': team['id'],
+                                                      'records': [], 'legSummaries': {}})
+                info['records'].append({'day': day, 'leg': leg, 'distance': distance})
+                info['totalDistance'] = round(info['totalDistance'] + distance, 1)
+                summary = info['legSummaries'].setdefault(str(leg), {
+                    'totalDistance': 0.0, 'days': 0, 'averageDistance': 0.0, 'rank': None,
+                    'status': 'provisional', 'finalRank': None, 'finalDay': None, 'lastUpdatedDay': None})
+                summary['totalDistance'] = round(summary['totalDistance'] + distance, 1)
+                summary['days'] += 1
+                summary['averageDistance'] = round(summary['totalDistance'] / summary['days'], 3)
+                summary['lastUpdatedDay'] = day
+                total = round(total + distance, 1)
+                if total >= boundaries[leg - 1]:
+                    summary['status'] = 'final'
+                    summary['finalDay'] = day
+                    leg_finish_day[t][leg - 1] = day
+                    leg += 1
+                    start_distance, start_day = total, day + 1
+                    if leg > legs:
+                        finish_day = day
+            daily_totals.append(total)
+        totals_by_day.append(daily_totals)
+        states.append({'id': team['id'], 'name': team['name'], 'totalDistance': total,
+                       'currentLeg': leg, 'overallRank': None, 'finishDay': finish_day,
+                       'currentRunnerStartDistance': start_distance, 'currentRunnerLegStartDay': start_day})
+
+    # 区間順位（平均距離順）
+    by_leg = {}
+    for info in individual.values():
+        for leg_key, summary in info['legSummaries'].items():
+            by_leg.setdefault(leg_key, []).append(summary)
+    for summaries in by_leg.values():
+        for summary, rank in zip(summaries, _ranks([s['averageDistance'] for s in summaries])):
+            summary['rank'] = rank
+            if summary['status'] == 'final':
+                summary['finalRank'] = rank
+
+    final_totals = [s['totalDistance'] for s in states]
+    for state, rank in zip(states, _ranks(final_totals)):
+        state['overallRank'] = rank
+    shadow_total = 0.0
+    states.append({'id': 99, 'name': shadow['name'], 'totalDistance': shadow_total, 'currentLeg': 1,
+                   'overallRank': None, 'finishDay': None,
+                   'currentRunnerStartDistance': shadow_total, 'currentRunnerLegStartDay': 1})
+
+    start_date = today - timedelta(days=race_day - 1)
+    dates = [(start_date + timedelta(days=d)).strftime('%Y-%m-%d') for d in range(race_day - 1)]
+    daily_ranks = [_ranks([totals_by_day[t][d] for t in range(teams)]) for d in range(race_day - 1)]
+    rank_history = {'dates': dates, 'teams': [
+        {'id': team['id'], 'name': team['name'],
+         'ranks': [daily_ranks[d][t] for d in range(race_day - 1)],
+         'distances': totals_by_day[t]}
+        for t, team in enumerate(team_defs)
+    ]}
+    leg_rank_history = {'teams': []}
+    for t, team in enumerate(team_defs):
+        leg_ranks = []
+        for leg in range(legs):
+            finished = [leg_finish_day[o][leg] for o in range(teams)]
+            day = finished[t]
+            leg_ranks.append(None if day is None else 1 + sum(1 for o in finished if o is not None and o < day))
+        leg_rank_history['teams'].append({'id': team['id'], 'name': team['name'], 'leg_ranks': leg_ranks})
+
+    _write_json(workdir / 'data' / 'ekiden_state.json', states)
+    _write_json(workdir / 'data' / 'individual_results.json', individual)
+    _write_json(workdir / 'data' / 'rank_history.json', rank_history)
+    _write_json(workdir / 'data' / 'leg_rank_history.json', leg_rank_history)
+
+    codes = {}
+    for team, state in zip(team_defs, states):
+        if state['finishDay'] is None and state['currentLeg'] <= legs:
+            runner = team['runners'][state['currentLeg'] - 1]
+            codes[runner['name']] = runner['station_code']
+    _write_daily_temperatures(workdir, today.strftime('%Y-%m-%d'), codes)
+    return race_day
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""realtime / commit パイプラインのベンチマーク。
+
+generate_report.py --realtime（+ push_outbox.py による通知送信）と --commit を、
+一時作業ディレクトリ上でエンドツーエンドに実行する。Yahoo!天気・5ch スレッド・Push API は
+fake_services.py のローカルサーバーが録画 HTML / 固定応答を返すためネットワークは使わない。
+
+データ規模:
+  current          リポジトリの実データ（現行18チーム）
+  TEAMSxLEGSxDAYS  合成データ（例: 100x10x30 = 100チーム × 10区間 × 大会30日目）
+
+計測値（1実行ごと）: 壁時計時間、ピーク RSS、書き込みバイト数、フェーズ別の時間と書き込みバイト数
+（generate_report.py の run_metrics 計測）。結果は benchmarks/results/ に JSON で保存し、
+--compare で過去の結果との差分を表示する。
+
+使い方:
+  python benchmarks/bench_pipeline.py                                # 既定の全規模
+  python benchmarks/bench_pipeline.py --sizes current,100x10x30 --repeat 5
+  python benchmarks/bench_pipeline.py --compare benchmarks/results/bench_20260805_101500_abc1234.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(BENCH_DIR))
+sys.path.insert(0, str(PROJECT_ROOT / 'scripts'))
+
+from bench_data import build_current_workdir, build_synthetic_workdir
+from fake_services import FakeServices
+from time_utils import now_jst
+
+RESULTS_DIR = BENCH_DIR / 'results'
+DEFAULT_SIZES = 'current,100x10x30,100x50x100,1000x10x30,1000x50x100'
+SCHEMA_VERSION = 1
+
+
+def parse_size(spec):
+    """'current' または 'TEAMSxLEGSxDAYS' を dict に変換する"""
+    if spec == 'current':
+        return {'name': spec}
+    try:
+        teams, legs, days = (int(v) for v in spec.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'データ規模の指定が不正です: {spec}（例: 100x10x30）')
+    if teams < 1 or legs < 1 or days < 2:
+        raise argparse.ArgumentTypeError(f'データ規模の指定が不正です: {spec}（日数は2以上）')
+    return {'name': spec, 'teams': teams, 'legs': legs, 'days': days}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _env(workdir, base_url):
+    env = dict(os.environ)
+    env.update({
+        'EKIDEN_YAHOO_AMEDAS_BASE_URL': f'{base_url}/amedas',
+        'PROD_PUSH_API_URL': base_url,
+        'API_SECRET_KEY': 'bench',
+        'EKIDEN_METRICS': '1',
+        'EKIDEN_METRICS_IO': '1',
+        # 本番の cron 周期（5分）ではキャッシュは期限切れ → 新着レスだけの差分取得になる
+        'EKIDEN_BOARD_CACHE_TTL': '0',
+        'VALIDATE_STATE_FILE': str(workdir / 'data' / 'ekiden_state.json'),
+        'VALIDATE_INDIVIDUAL_FILE': str(workdir / 'data' / 'individual_results.json'),
+        'VALIDATE_EKIDEN_FILE': str(workdir / 'config' / 'ekiden_data.json'),
+        'VALIDATE_SHADOW_FILE': str(workdir / 'config' / 'shadow_team.json'),
+        # 区間記録連合の非減少チェックは計測前の状態と比べる
+        'VALIDATE_PREVIOUS_STATE_FILE': str(workdir / 'data.pristine' / 'ekiden_state.json'),
+    })
+    for key in ('EKIDEN_POSTS_HTML', 'EKIDEN_TEST_MODE', 'EKIDEN_METRICS_FILE', 'EKIDEN_METRICS_PROM_DIR',
+                'EKIDEN_PUSH_OUTBOX_DIR', 'EKIDEN_BOARD_CACHE_DIR'):
+        env.pop(key, None)
+    return env
+
+
+def run_measured(cmd, workdir, env, log_file):
+    """cmd を実行し、壁時計時間・ピーク RSS・終了コードを返す"""
+    started = time.perf_counter()
+    with open(log_file, 'ab') as log:
+        proc = subprocess.Popen(cmd, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(proc.pid, 0)
+    wall = time.perf_counter() - started
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return {
+        'wallSeconds': round(wall, 4),
+        # Linux の ru_maxrss は KiB
+        'peakRssKiB': usage.ru_maxrss,
+        'exitCode': proc.returncode,
+    }
+
+
+def _last_metrics(workdir):
+    metrics_file = workdir / 'logs' / 'metrics.jsonl'
+    try:
+        lines = metrics_file.read_text(encoding='utf-8').splitlines()
+    except FileNotFoundError:
+        return {}
+    return json.loads(lines[-1]) if lines else {}
+
+
+def _restore(workdir, pristine):
+    shutil.rmtree(workdir / 'data')
+    shutil.copytree(pristine, workdir / 'data')
+    shutil.rmtree(workdir / 'logs' / 'push_outbox', ignore_errors=True)
+
+
+def _median(values):
+    values = [v for v in values if v is not None]
+    return round(statistics.median(values), 4) if values else None
+
+
+def summarize_runs(runs):
+    phases = {}
+    for run in runs:
+        for name, stats in run.get('phases', {}).items():
+            phases.setdefault(name, {'seconds': [], 'writeBytes': []})
+            phases[name]['seconds'].append(stats.get('seconds'))
+            phases[name]['writeBytes'].append(stats.get('writeBytes'))
+    return {
+        'wallSeconds': _median([r['wallSeconds'] for r in runs]),
+        'peakRssKiB': max(r['peakRssKiB'] for r in runs),
+        'writeBytes': _median([r.get('writeBytes') for r in runs]),
+        'exitCodes': sorted({r['exitCode'] for r in runs}),
+        'phases': {name: {'seconds': _median(v['seconds']), 'writeBytes': _median(v['writeBytes'])}
+                   for name, v in phases.items()},
+    }
+
+
+def bench_size(size, modes, repeat, services, keep_workdir=False, log_dir=None):
+    """1つのデータ規模について各モードを repeat 回計測する"""
+    workdir = Path(tempfile.mkdtemp(prefix=f"ekiden-bench-{size['name']}-"))
+    log_file = (log_dir or workdir) / f"bench_{size['name']}.log"
+    results = []
+    try:
+        today = now_jst()
+        if size['name'] == 'current':
+            race_day = build_current_workdir(workdir, today, services.base_url)
+        else:
+            race_day = build_synthetic_workdir(workdir, today, services.base_url,
+                                               size['teams'], size['legs'], size['days'])
+        env = _env(workdir, services.base_url)
+        python = sys.executable
+        generate_report = str(PROJECT_ROOT / 'scripts' / 'generate_report.py')
+        push_outbox = str(PROJECT_ROOT / 'scripts' / 'push_outbox.py')
+
+        # 前回レポート（realtime_report.json）とスレッドキャッシュを作るための予備実行（計測しない）
+        run_measured([python, generate_report, '--realtime'], workdir, env, log_file)
+        pristine = workdir / 'data.pristine'
+        shutil.copytree(workdir / 'data', pristine)
+
+        steps = {
+            'realtime': [('generate_report', [python, generate_report, '--realtime', '--test-notification']),
+                         ('push_outbox', [python, push_outbox])],
+            'commit': [('generate_report', [python, generate_report, '--commit', '--best-effort'])],
+        }
+        for mode in modes:
+            runs = []
+            services.reset_counts()
+            for _ in range(repeat):
+                _restore(workdir, pristine)
+                run = {'steps': {}}
+                for step_name, cmd in steps[mode]:
+                    measured = run_measured(cmd, workdir, env, log_file)
+                    if step_name == 'generate_report':
+                        metrics = _last_metrics(workdir)
+                        measured['writeBytes'] = metrics.get('writeBytes')
+                        measured['phases'] = metrics.get('phases', {})
+                    run['steps'][step_name] = measured
+                main_step = run['steps']['generate_report']
+                run.update(
+                    wallSeconds=round(sum(s['wallSeconds'] for s in run['steps'].values()), 4),
+                    peakRssKiB=max(s['peakRssKiB'] for s in run['steps'].values()),
+                    exitCode=max(s['exitCode'] for s in run['steps'].values()),
+                    writeBytes=main_step.get('writeBytes'),
+                    phases=dict(main_step.get('phases', {})),
+                )
+                for step_name, measured in run['steps'].items():
+                    if step_name != 'generate_report':
+                        run['phases'][f'step.{step_name}'] = {'seconds': measured['wallSeconds']}
+                runs.append(run)
+            results.append({
+                'size': size['name'], 'teams': size.get('teams'), 'legs': size.get('legs'),
+                'days': size.get('days'), 'raceDay': race_day, 'mode': mode,
+                'requests': {k: v // repeat for k, v in services.counts.items()},
+                'runs': runs,
+                'summary': summarize_runs(runs),
+            })
+    finally:
+        if keep_workdir:
+            print(f"作業ディレクトリ: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def _format_bytes(value):
+    if value is None:
+        return '-'
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if abs(value) < 1024 or unit == 'GiB':
+            return f'{value:.0f}{unit}' if unit == 'B' else f'{value:.1f}{unit}'
+        value /= 1024
+
+
+def print_report(results):
+    for entry in results:
+        summary = entry['summary']
+        print(f"\n== {entry['size']} / {entry['mode']}  wall={summary['wallSeconds']}s "
+              f"peakRSS={summary['peakRssKiB'] / 1024:.1f}MiB write={_format_bytes(summary['writeBytes'])} "
+              f"exit={summary['exitCodes']} requests={entry['requests']}")
+        phases = sorted(summary['phases'].items(), key=lambda item: -(item[1]['seconds'] or 0))
+        for name, stats in phases:
+            print(f"   {name:<24} {stats['seconds'] or 0:>9.3f}s {_format_bytes(stats.get('writeBytes')):>10}")
+
+
+def compare(current, baseline):
+    """(size, mode) ごとに中央値の差分を表示する"""
+    base_by_key = {(e['size'], e['mode']): e['summary'] for e in baseline.get('results', [])}
+    print(f"\n--- 比較: baseline {baseline.get('gitCommit')} ({baseline.get('createdAt')}) ---")
+    for entry in current['results']:
+        base = base_by_key.get((entry['size'], entry['mode']))
+        if not base:
+            print(f"{entry['size']} / {entry['mode']}: baseline なし")
+            continue
+        now = entry['summary']
+        print(f"{entry['size']} / {entry['mode']}: wall {base['wallSeconds']}s -> {now['wallSeconds']}s "
+              f"({_delta(now['wallSeconds'], base['wallSeconds'])}), "
+              f"peakRSS {_delta(now['peakRssKiB'], base['peakRssKiB'])}, "
+              f"write {_delta(now['writeBytes'], base['writeBytes'])}")
+        for name, stats in sorted(now['phases'].items()):
+            base_stats = base['phases'].get(name)
+            if base_stats:
+                print(f"   {name:<24} {_delta(stats['seconds'], base_stats['seconds'])}")
+
+
+def _delta(now, base):
+    if not now or not base:
+        return '-'
+    return f'{(now - base) / base * 100:+.1f}%'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='realtime / commit パイプラインのベンチマークを実行します。')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help=f'データ規模のカンマ区切り（current または TEAMSxLEGSxDAYS。既定: {DEFAULT_SIZES}）')
+    parser.add_argument('--modes', default='realtime,commit', help='計測するモード（realtime,commit）')
+    parser.add_argument('--repeat', type=int, default=3, help='各規模・モードの計測回数（中央値を採用）')
+    parser.add_argument('--thread-posts', type=int, default=300, help='スレッドのレス数')
+    parser.add_argument('--output', default=None, help='結果 JSON の保存先（既定: benchmarks/results/bench_<日時>_<commit>.json）')
+    parser.add_argument('--compare', default=None, help='比較対象の過去の結果 JSON')
+    parser.add_argument('--keep-workdir', action='store_true', help='作業ディレクトリを削除しない（調査用）')
+    args = parser.parse_args()
+
+    sizes = [parse_size(s.strip()) for s in args.sizes.split(',') if s.strip()]
+    modes = [m.strip() for m in args.modes.split(',') if m.strip()]
+    unknown = set(modes) - {'realtime', 'commit'}
+    if unknown:
+        parser.error(f'不明なモード: {sorted(unknown)}')
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    commit = _git_commit()
+    created = datetime.now().astimezone()
+    report = {
+        'schemaVersion': SCHEMA_VERSION,
+        'createdAt': created.isoformat(timespec='seconds'),
+        'gitCommit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpuCount': os.cpu_count(),
+        'repeat': args.repeat,
+        'results': [],
+    }
+    with FakeServices(now_jst, thread_posts=args.thread_posts) as services:
+        for size in sizes:
+            print(f"計測中: {size['name']} ({', '.join(modes)}) x{args.repeat}")
+            report['results'].extend(bench_size(size, modes, args.repeat, services,
+                                                keep_workdir=args.keep_workdir, log_dir=RESULTS_DIR))
+
+    output = Path(args.output) if args.output else \
+        RESULTS_DIR / f"bench_{created:%Y%m%d_%H%M%S}_{commit or 'nogit'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print_report(report['results'])
+    print(f"\n✅ 結果を保存しました: {output}")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+    failed = [e for e in report['results'] if any(code not in (0, 2) for code in e['summary']['exitCodes'])]
+    if failed:
+        print(f"警告: 異常終了した計測があります: {[(e['size'], e['mode']) for e in failed]}（ログ: {RESULTS_DIR}）")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
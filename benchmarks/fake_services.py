@@ -0,0 +1,138 @@
+"""ベンチマーク用のローカル HTTP サーバー（Yahoo!天気・5ch スレッド・Push API の代役）。
+
+- /amedas/<pref>/<code>.html[?m=temp]: fixtures/ の録画 HTML に観測所ごとの決定的な気温を埋めて返す
+- /thread/[<N>-n]: 監督コメントを含むスレッド HTML（範囲指定 URL にも応答する）
+- POST /api/send-notification: 受け付けた通知数を数えるだけ
+
+気温は観測所コードから決まるため、同じデータ規模なら毎回同じ結果になる。
+"""
+import json
+import threading
+import zlib
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+
+FIXTURES_DIR = Path(__file__).resolve().parent / 'fixtures'
+WEEKDAYS = '月火水木金土日'
+BOARD_MANAGER_NAME = 'ベンチ大学監督'
+BOARD_MANAGER_TRIP = '◆bench0001'
+
+
+def max_temperature_for(code):
+    """観測所コードから決まる最高気温（30.0〜41.9℃）"""
+    return round(30.0 + (zlib.crc32(str(code).encode('utf-8')) % 120) / 10, 1)
+
+
+def current_temperature_for(code):
+    return round(max_temperature_for(code) - 1.5, 1)
+
+
+def _table_rows(base):
+    return '\n'.join(
+        f'        <tr><td>{hour:02d}:00</td><td>{base - abs(14 - hour) * 0.4:.1f}</td><td>0.0</td><td>南</td><td>2.1</td></tr>'
+        for hour in range(24)
+    )
+
+
+def render_amedas_page(pref_code, code, current=False):
+    name = 'temp' if current else 'max'
+    template = (FIXTURES_DIR / f'yahoo_amedas_{name}.html').read_text(encoding='utf-8')
+    high = max_temperature_for(code)
+    return template.format(
+        station_name=f'観測所{code}', pref_code=pref_code,
+        max_temperature=high, min_temperature=round(high - 9.0, 1),
+        current_temperature=current_temperature_for(code), rows=_table_rows(high),
+    )
+
+
+def render_thread(now, posts=300, after_id=0):
+    """posts 件のスレッド。最後のレスは直前に投稿された監督コメント。"""
+    template = (FIXTURES_DIR / 'board_post.html').read_text(encoding='utf-8')
+    chunks = ['<html><body><div class="thread">']
+    for number in range(max(after_id, 0) + 1, posts + 1):
+        posted = now - timedelta(seconds=(posts - number) * 30 + 60)
+        date = f"{posted:%Y/%m/%d}({WEEKDAYS[posted.weekday()]}) {posted:%H:%M:%S}.00"
+        if number == posts:
+            name, trip, content = BOARD_MANAGER_NAME, f' {BOARD_MANAGER_TRIP}', 'ベンチマーク用の監督コメントです。<br>今日も暑い。'
+        else:
+            name, trip, content = '名無しさん', '', f'レス{number}<br>観戦中'
+        chunks.append(template.format(number=number, name=name, trip=trip, date=date, content=content))
+    chunks.append('</div></body></html>')
+    return '\n'.join(chunks)
+
+
+class FakeServices:
+    """with FakeServices(now_func) as services: services.base_url ..."""
+
+    def __init__(self, now_func, thread_posts=300):
+        self.now_func = now_func
+        self.thread_posts = thread_posts
+        self.counts = {'yahoo': 0, 'board': 0, 'push': 0}
+        self._lock = threading.Lock()
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body, content_type='text/html; charset=utf-8'):
+                data = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                segments = [s for s in parts.path.split('/') if s]
+                if len(segments) == 3 and segments[0] == 'amedas':
+                    services._count('yahoo')
+                    current = parse_qs(parts.query).get('m') == ['temp']
+                    code = segments[2].removesuffix('.html')
+                    self._send(200, render_amedas_page(segments[1], code, current))
+                elif segments and segments[0] == 'thread':
+                    services._count('board')
+                    after_id = 0
+                    if len(segments) > 1 and segments[-1].endswith('-n'):
+                        after_id = int(segments[-1][:-2]) - 1
+                    self._send(200, render_thread(services.now_func(), services.thread_posts, after_id))
+                else:
+                    self._send(404, 'not found', 'text/plain')
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                self.rfile.read(length)
+                if self.path == '/api/send-notification':
+                    services._count('push')
+                    self._send(202, json.dumps({'message': 'queued'}), 'application/json')
+                else:
+                    self._send(404, 'not found', 'text/plain')
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def _count(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    def reset_counts(self):
+        with self._lock:
+            for key in self.counts:
+                self.counts[key] = 0
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._server.shutdown()
+        self._server.server_close()
+        return False
@@ -104,6 +104,12 @@ echo "scripts/generate_alongroad_report.py --date $SNAPSHOT_DATE --save を実
   --add-to-manifest alongroad_report.txt \
   --manifest-dir "$SNAPSHOT_DIR"
 
+# 4.7. 残り日程のゴール日・シード権の確率予測を更新（失敗しても確定データのコミットは続ける）
+echo "scripts/finish_forecast.py を実行中..."
+if ! "$PYTHON_CMD" scripts/finish_forecast.py; then
+    echo "⚠️ finish_forecast.py に失敗しました。確率予測は前回のまま残ります。"
+fi
+
 if [[ "${EKIDEN_DISABLE_GIT_PUSH:-0}" == "1" ]]; then
     echo "テストモードのため、Git commit / push はスキップします。"
     echo "処理が正常に完了しました。"
@@ -132,6 +138,7 @@ STAGE_PATHS=(
   data/intramural_rankings.json
   data/fetch_status.json
   data/commit_status.json
+  data/finish_forecast.json
   data/daily_snapshots
 )
 for stage_path in "${STAGE_PATHS[@]}"; do
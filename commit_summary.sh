@@ -42,10 +42,10 @@ if [[ "${EKIDEN_DISABLE_GIT_PUSH:-0}" == "1" ]]; then
     exit 0
 fi
 
-# 3. daily_summary.json, article_history.json, race_narrative_state.json,
+# 3. daily_summary.json, article_history/, race_narrative_state.json,
 #    または logs/summary_ai_responses/ 下の失敗応答に変更があったか確認
 SUMMARY_FILE="data/daily_summary.json"
-HISTORY_FILE="data/article_history.json"
+HISTORY_FILE="data/article_history"
 STATE_FILE="data/race_narrative_state.json"
 AI_FAIL_DIR="logs/summary_ai_responses"
 
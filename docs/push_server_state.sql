@@ -0,0 +1,29 @@
+-- push_server.py のサーバー状態（push_state.py の SupabaseStateStore）用テーブルと関数。
+-- Supabase の SQL Editor で一度だけ実行する。
+
+create table if not exists push_counters (
+  name text primary key,
+  value bigint not null default 0
+);
+
+create table if not exists push_state (
+  key text primary key,
+  value jsonb,
+  updated_at timestamptz not null default now()
+);
+
+-- カウンタをアトミックに加算し、加算後の値を返す（複数ワーカー・インスタンスから同時に呼ばれてもよい）
+create or replace function increment_push_counter(counter_name text, amount integer default 1)
+returns bigint
+language sql
+as $$
+  insert into push_counters (name, value) values (counter_name, amount)
+  on conflict (name) do update set value = push_counters.value + excluded.value
+  returning value;
+$$;
+
+-- 購読キャッシュの差分取得（push_dispatcher.py の SupabaseSubscriptionStore）用の列。
+-- 追加したら PUSH_SUBSCRIPTION_UPDATED_COLUMN=updated_at を設定する（未設定だと各ワーカーは
+-- PUSH_CACHE_SNAPSHOT_REFRESH_SECONDS ごとに全件を読み直す）。
+alter table subscriptions add column if not exists updated_at timestamptz not null default now();
+create index if not exists subscriptions_updated_at_idx on subscriptions (updated_at);
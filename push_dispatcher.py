@@ -0,0 +1,388 @@
+"""Web Push の一斉送信（push_server.py から利用）。
+
+- 購読情報の保存先は差し替え可能（本番は Supabase、テスト・ベンチマークは SQLite）。
+- 購読一覧はプロセス内にキャッシュし（SubscriptionCache）、通知のたびに全件を読み直さない。
+  更新日時のウォーターマーク以降の差分だけを取り込み、定期的に全件を読み直す。
+  差分取得できないストア（更新日時の列が無い Supabase テーブル）は短い間隔で全件を読み直す。
+- 送信は上限付きのワーカープールで並行に行い、1件ごとに timeout を設ける。
+- 404 / 410（購読が失効）を返した endpoint は購読情報から削除する。
+- /api/send-notification はジョブIDを返してすぐ応答し、送信はバックグラウンドで行う。
+  ジョブごとの配信数・失敗数・削除数・レイテンシを記録する。ジョブ記録は job_store
+  （push_state.py）にも書き、別ワーカーが受け付けたジョブの状態も参照できるようにする。
+"""
+import json
+import os
+import sqlite3
+import statistics
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+PUSH_MAX_WORKERS = int(os.getenv('PUSH_MAX_WORKERS', '16'))
+PUSH_SEND_TIMEOUT = float(os.getenv('PUSH_SEND_TIMEOUT', '10'))
+# 保持する直近ジョブ数（状態確認 API 用）
+PUSH_JOB_HISTORY = 50
+# 購読キャッシュ: 上限件数（超えたらキャッシュせず毎回ストアを読む）と全件再読み込みの間隔
+PUSH_CACHE_MAX_SUBSCRIPTIONS = int(os.getenv('PUSH_CACHE_MAX_SUBSCRIPTIONS', '50000'))
+PUSH_CACHE_FULL_REFRESH_SECONDS = float(os.getenv('PUSH_CACHE_FULL_REFRESH_SECONDS', '3600'))
+# changed_since を持たないストアの全件再読み込み間隔（他ワーカーで増えた購読をこの秒数以内に拾う）
+PUSH_CACHE_SNAPSHOT_REFRESH_SECONDS = float(os.getenv('PUSH_CACHE_SNAPSHOT_REFRESH_SECONDS', '60'))
+
+# この HTTP ステータスを返した購読は失効扱いで削除する
+GONE_STATUS_CODES = (404, 410)
+
+
+# --- 購読情報ストア ---
+
+class SupabaseSubscriptionStore:
+    """Supabase の subscriptions テーブル（endpoint, p256dh, auth）
+
+    updated_column（PUSH_SUBSCRIPTION_UPDATED_COLUMN）を指定した場合のみ、upsert 時に
+    更新日時を書き込み、changed_since で差分取得できる（列が無いテーブルでは指定しない）。
+    列の追加は docs/push_server_state.sql を参照。
+    """
+
+    def __init__(self, client, table='subscriptions', updated_column=None):
+        self.client = client
+        self.table = table
+        self.updated_column = updated_column
+        self.supports_changed_since = bool(updated_column)
+
+    def upsert(self, sub_data):
+        if self.updated_column:
+            sub_data = dict(sub_data, **{self.updated_column: _utc_iso(time.time())})
+        self.client.table(self.table).upsert(sub_data, on_conflict='endpoint').execute()
+
+    def all(self):
+        response = self.client.table(self.table).select("endpoint, p256dh, auth").execute()
+        return response.data
+
+    def watermark(self):
+        return _utc_iso(time.time())
+
+    def changed_since(self, watermark):
+        """watermark 以降に追加・更新された購読を返す"""
+        response = (self.client.table(self.table)
+                    .select("endpoint, p256dh, auth")
+                    .gte(self.updated_column, watermark)
+                    .execute())
+        return response.data
+
+    def delete(self, endpoints):
+        if endpoints:
+            self.client.table(self.table).delete().in_('endpoint', list(endpoints)).execute()
+
+
+class SQLiteSubscriptionStore:
+    """ローカル SQLite 版（テスト・ベンチマーク用の代替）"""
+
+    supports_changed_since = True
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS subscriptions ("
+                "endpoint TEXT PRIMARY KEY, p256dh TEXT, auth TEXT, updated_at REAL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path)
+
+    def upsert(self, sub_data):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO subscriptions (endpoint, p256dh, auth, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(endpoint) DO UPDATE SET p256dh = excluded.p256dh, auth = excluded.auth, "
+                "updated_at = excluded.updated_at",
+                (sub_data['endpoint'], sub_data.get('p256dh'), sub_data.get('auth'), time.time()),
+            )
+
+    def all(self):
+        with self._lock, self._connect() as conn:
+            rows = conn.execute("SELECT endpoint, p256dh, auth FROM subscriptions").fetchall()
+        return [{'endpoint': e, 'p256dh': p, 'auth': a} for e, p, a in rows]
+
+    def delete(self, endpoints):
+        if not endpoints:
+            return
+        with self._lock, self._connect() as conn:
+            conn.executemany("DELETE FROM subscriptions WHERE endpoint = ?", [(e,) for e in endpoints])
+
+    def watermark(self):
+        return time.time()
+
+    def changed_since(self, watermark):
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                "SELECT endpoint, p256dh, auth FROM subscriptions WHERE updated_at >= ?", (watermark,)
+            ).fetchall()
+        return [{'endpoint': e, 'p256dh': p, 'auth': a} for e, p, a in rows]
+
+
+def _utc_iso(ts):
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(ts))
+
+
+class SubscriptionCache:
+    """購読一覧のプロセス内キャッシュ。ストアと同じ upsert / all / delete を持つ。
+
+    - all(): 初回と PUSH_CACHE_FULL_REFRESH_SECONDS ごとに全件を読み（miss）、それ以外は
+      キャッシュを返す（hit）。ストアが changed_since を持つ場合は、前回読み込み時の
+      ウォーターマーク以降の追加・更新分だけを取り込んでから返す。持たない場合は他ワーカーの
+      追加を拾えないため、全件の読み直しを PUSH_CACHE_SNAPSHOT_REFRESH_SECONDS ごとに早める。
+    - upsert() / delete() はストアに書いた上でキャッシュにも反映する。
+    - 件数が max_entries を超えた場合はキャッシュせず、毎回ストアを読む。
+    """
+
+    def __init__(self, store, max_entries=None, full_refresh_seconds=None, snapshot_refresh_seconds=None):
+        self.store = store
+        self.max_entries = PUSH_CACHE_MAX_SUBSCRIPTIONS if max_entries is None else max_entries
+        self.full_refresh_seconds = (PUSH_CACHE_FULL_REFRESH_SECONDS if full_refresh_seconds is None
+                                     else full_refresh_seconds)
+        if not getattr(store, 'supports_changed_since', False):
+            snapshot_refresh_seconds = (PUSH_CACHE_SNAPSHOT_REFRESH_SECONDS if snapshot_refresh_seconds is None
+                                        else snapshot_refresh_seconds)
+            self.full_refresh_seconds = min(self.full_refresh_seconds, snapshot_refresh_seconds)
+        self._rows = None  # {endpoint: row}
+        self._loaded_at = 0.0
+        self._watermark = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.incremental_refreshes = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._rows = None
+
+    def _full_load(self):
+        watermark = self.store.watermark() if getattr(self.store, 'supports_changed_since', False) else None
+        rows = self.store.all()
+        self.misses += 1
+        if len(rows) > self.max_entries:
+            self._rows = None
+            return rows
+        self._rows = {r['endpoint']: r for r in rows}
+        self._loaded_at = time.monotonic()
+        self._watermark = watermark
+        return rows
+
+    def all(self):
+        with self._lock:
+            if self._rows is None or time.monotonic() - self._loaded_at >= self.full_refresh_seconds:
+                return list(self._full_load())
+            if self._watermark is not None:
+                watermark = self.store.watermark()
+                changed = self.store.changed_since(self._watermark)
+                self._watermark = watermark
+                self.incremental_refreshes += 1
+                for row in changed:
+                    self._rows[row['endpoint']] = row
+                if len(self._rows) > self.max_entries:
+                    self._rows = None
+                    return list(self._full_load())
+            self.hits += 1
+            return list(self._rows.values())
+
+    def upsert(self, sub_data):
+        self.store.upsert(sub_data)
+        with self._lock:
+            if self._rows is not None:
+                self._rows[sub_data['endpoint']] = {
+                    'endpoint': sub_data['endpoint'],
+                    'p256dh': sub_data.get('p256dh'),
+                    'auth': sub_data.get('auth'),
+                }
+
+    def delete(self, endpoints):
+        self.store.delete(endpoints)
+        with self._lock:
+            if self._rows is not None:
+                for endpoint in endpoints:
+                    self._rows.pop(endpoint, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._rows) if self._rows is not None else 0,
+                'hits': self.hits,
+                'misses': self.misses,
+                'incrementalRefreshes': self.incremental_refreshes,
+                'hitRate': round(self.hits / lookups, 3) if lookups else None,
+            }
+
+
+def create_store(supabase_client=None):
+    """購読ストアを作成する（SubscriptionCache で包んで返す）。
+
+    PUSH_SUBSCRIPTION_STORE=sqlite:<path> なら SQLite、それ以外は Supabase（未設定なら None）。
+    """
+    spec = os.getenv('PUSH_SUBSCRIPTION_STORE', '')
+    if spec.startswith('sqlite:'):
+        store = SQLiteSubscriptionStore(spec[len('sqlite:'):])
+    elif supabase_client is not None:
+        store = SupabaseSubscriptionStore(
+            supabase_client, updated_column=os.getenv('PUSH_SUBSCRIPTION_UPDATED_COLUMN') or None)
+    else:
+        return None
+    return SubscriptionCache(store)
+
+
+# --- 送信 ---
+
+def _status_code(exc):
+    response = getattr(exc, 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+def _latency_stats(latencies_ms):
+    if not latencies_ms:
+        return {'p50': None, 'p95': None, 'max': None}
+    ordered = sorted(latencies_ms)
+    p95_index = min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))
+    return {
+        'p50': round(statistics.median(ordered), 1),
+        'p95': round(ordered[p95_index], 1),
+        'max': round(ordered[-1], 1),
+    }
+
+
+class PushDispatcher:
+    """通知ジョブを受け付け、バックグラウンドで一斉送信する。
+
+    send(subscription_info, data, timeout) は 1件送信する関数。失敗時は
+    response.status_code を持つ例外を送出する想定。send が begin_notification() を
+    持つ場合は通知ごとに呼び、その戻り値（通知単位の送信関数）で全件を送る
+    （VAPID 署名などを通知ごとに1回だけ作るため）。
+
+    job_store（put_json / get_json を持つ共有ストア）を渡すと、ジョブ記録をそこにも保存する。
+    """
+
+    def __init__(self, store, send, max_workers=None, send_timeout=None, job_store=None):
+        self.store = store
+        self.send = send
+        self.job_store = job_store
+        self.send_timeout = PUSH_SEND_TIMEOUT if send_timeout is None else send_timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or PUSH_MAX_WORKERS,
+                                        thread_name_prefix='push-send')
+        # ジョブは1件ずつ順に処理する（同時に複数の一斉送信を走らせない）
+        self._jobs_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='push-job')
+        self._jobs = OrderedDict()
+        self._jobs_lock = threading.Lock()
+
+    def submit(self, payload):
+        """通知ジョブを登録してジョブIDを返す（送信完了は待たない）"""
+        job_id = uuid.uuid4().hex
+        job = {'id': job_id, 'status': 'queued', 'createdAt': time.time()}
+        with self._jobs_lock:
+            self._jobs[job_id] = job
+            while len(self._jobs) > PUSH_JOB_HISTORY:
+                self._jobs.popitem(last=False)
+        self._save_job(job)
+        self._jobs_executor.submit(self._run_job, job, payload)
+        return job_id
+
+    def get_job(self, job_id):
+        with self._jobs_lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return dict(job)
+        if self.job_store is None:
+            return None
+        # 別ワーカー・別インスタンスが受け付けたジョブ
+        try:
+            return self.job_store.get_json(f"job:{job_id}")
+        except Exception as e:
+            print(f"Error loading notification job {job_id}: {e}")
+            return None
+
+    def _save_job(self, job):
+        if self.job_store is None:
+            return
+        try:
+            self.job_store.put_json(f"job:{job['id']}", dict(job))
+        except Exception as e:
+            print(f"Error saving notification job {job['id']}: {e}")
+
+    def wait(self, job_id, timeout=None):
+        """テスト・ベンチマーク用: ジョブ完了まで待って結果を返す"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get_job(job_id)
+            if job is None or job['status'] in ('done', 'failed'):
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(0.01)
+
+    def _send_one(self, send, sub, data):
+        started = time.monotonic()
+        try:
+            send(sub, data, self.send_timeout)
+            return sub['endpoint'], None, (time.monotonic() - started) * 1000
+        except Exception as exc:
+            return sub['endpoint'], exc, (time.monotonic() - started) * 1000
+
+    def _run_job(self, job, payload):
+        job['status'] = 'running'
+        started = time.monotonic()
+        try:
+            rows = self.store.all()
+        except Exception as e:
+            print(f"Error loading subscriptions: {e}")
+            job.update(status='failed', error=str(e))
+            self._save_job(job)
+            return
+
+        subscriptions = [
+            {"endpoint": s["endpoint"], "keys": {"p256dh": s["p256dh"], "auth": s["auth"]}}
+            for s in rows
+        ]
+        data = json.dumps(payload)
+        begin = getattr(self.send, 'begin_notification', None)
+        send = begin() if begin else self.send
+        print(f"[job {job['id'][:8]}] Sending notification to {len(subscriptions)} subscribers...")
+
+        sent = 0
+        failed = 0
+        gone = []
+        latencies = []
+        for endpoint, exc, latency_ms in self._pool.map(lambda s: self._send_one(send, s, data), subscriptions):
+            latencies.append(latency_ms)
+            if exc is None:
+                sent += 1
+                continue
+            failed += 1
+            if _status_code(exc) in GONE_STATUS_CODES:
+                gone.append(endpoint)
+            else:
+                print(f"Notification failed for {endpoint}: {exc}")
+
+        pruned = 0
+        if gone:
+            try:
+                self.store.delete(gone)
+                pruned = len(gone)
+                print(f"[job {job['id'][:8]}] Removed {pruned} expired subscriptions.")
+            except Exception as e:
+                print(f"Error removing expired subscriptions: {e}")
+
+        job.update(
+            status='done',
+            total=len(subscriptions),
+            sent=sent,
+            failed=failed,
+            pruned=pruned,
+            elapsedMs=round((time.monotonic() - started) * 1000, 1),
+            latencyMs=_latency_stats(latencies),
+        )
+        if hasattr(self.store, 'stats'):
+            job['subscriptionCache'] = self.store.stats()
+        self._save_job(job)
+        print(f"[job {job['id'][:8]}] done: sent={sent}/{len(subscriptions)} failed={failed} "
+              f"pruned={pruned} elapsed={job['elapsedMs']}ms p95={job['latencyMs']['p95']}ms")
@@ -1,11 +1,17 @@
-import json
 import os
+import threading
+import time
+from urllib.parse import urlparse
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
-from pywebpush import webpush, WebPushException
+from py_vapid import Vapid
+from pywebpush import WebPusher, WebPushException
 from supabase import create_client, Client
 
+from push_dispatcher import PushDispatcher, create_store
+from push_state import create_state_store
+
 
 # .envファイルから環境変数を読み込む
 load_dotenv()
@@ -28,6 +34,54 @@ if not VAPID_PRIVATE_KEY:
     print("警告: 環境変数 VAPID_PRIVATE_KEY が設定されていません。プッシュ通知は送信できません。")
 
 
+class VapidSender:
+    """Web Push を1件送信する（PushDispatcher のワーカーから呼ばれる）。
+
+    VAPID 鍵は起動時に1回だけ読み込み、署名ヘッダーは通知ごと・プッシュサービス（aud）
+    ごとに1回だけ作る。本文の暗号化は購読者ごとの鍵で行うため1件ずつ。
+    """
+
+    # pywebpush.webpush と同じ署名の有効期間
+    CLAIMS_TTL_SECONDS = 12 * 60 * 60
+
+    def __init__(self, private_key, claims):
+        self.vapid = Vapid.from_string(private_key=private_key) if private_key else None
+        self.claims = claims
+
+    def begin_notification(self):
+        headers_by_aud = {}
+        lock = threading.Lock()
+        exp = int(time.time()) + self.CLAIMS_TTL_SECONDS
+
+        def send(subscription_info, data, timeout):
+            endpoint = urlparse(subscription_info['endpoint'])
+            aud = f"{endpoint.scheme}://{endpoint.netloc}"
+            with lock:
+                headers = headers_by_aud.get(aud)
+                if headers is None:
+                    headers = self.vapid.sign(dict(self.claims, aud=aud, exp=exp))
+                    headers_by_aud[aud] = headers
+            response = WebPusher(subscription_info).send(data, dict(headers), ttl=0, timeout=timeout)
+            if response.status_code > 202:
+                raise WebPushException(
+                    f"Push failed: {response.status_code} {response.reason}", response=response)
+            return response
+
+        return send
+
+    def __call__(self, subscription_info, data, timeout):
+        return self.begin_notification()(subscription_info, data, timeout)
+
+
+# 購読情報ストア（プロセス内キャッシュ付き。PUSH_SUBSCRIPTION_STORE=sqlite:<path> でローカル SQLite に差し替え可能）
+subscription_store = create_store(supabase)
+# バッジカウンタ・ジョブ記録など、ワーカー間で共有するサーバー状態（PUSH_STATE_STORE で差し替え可能）
+state_store = create_state_store(supabase)
+dispatcher = (PushDispatcher(subscription_store, VapidSender(VAPID_PRIVATE_KEY, VAPID_CLAIMS),
+                             job_store=state_store)
+              if subscription_store else None)
+
+
 FLASK_ENV = os.getenv('FLASK_ENV', 'production')  # デフォルトは安全のため 'production'
 
 # 環境に応じてCORSのオリジンを選択
@@ -42,15 +96,14 @@ if allowed_origin:
 else:
     print(f"警告: CORSオリジンが設定されていません (mode: {FLASK_ENV})。APIへのアクセスがブロックされる可能性があります。")
 
-badge_counter = 0  # グローバル変数で管理
+BADGE_COUNTER_NAME = 'badge_count'
+
 def get_and_increment_badge_count():
-    global badge_counter
-    badge_counter += 1
-    return badge_counter
+    # 複数ワーカー・インスタンスで食い違わないよう共有ストアでアトミックに加算する
+    return state_store.increment(BADGE_COUNTER_NAME)
 
 def reset_badge_count():
-    global badge_counter
-    badge_counter = 0
+    state_store.reset_counter(BADGE_COUNTER_NAME)
 
 @app.route('/api/config', methods=['GET'])
 def get_config():
@@ -66,7 +119,7 @@ def get_config():
 @app.route('/api/save-subscription', methods=['POST'])
 def save_subscription():
     """フロントエンドからPOSTされた購読情報を受け取り、保存します。"""
-    if not supabase:
+    if not subscription_store:
         return jsonify({'error': 'Database not configured'}), 500
 
     subscription = request.json
@@ -83,7 +136,7 @@ def save_subscription():
     try:
         # 存在確認と挿入を一度に行う (upsert)
         # on_conflict='endpoint' は、endpointカラムが重複した場合に何もしない(無視する)という設定
-        data, count = supabase.table('subscriptions').upsert(sub_data, on_conflict='endpoint').execute()
+        subscription_store.upsert(sub_data)
         print(f"Subscription saved/updated for endpoint: {sub_data['endpoint']}")
     except Exception as e:
         print(f"Error saving subscription: {e}")
@@ -103,6 +156,15 @@ def send_notification():
     title = data.get('title', '通知')
     body = data.get('body', '')
 
+    if not dispatcher:
+        return jsonify({'error': 'Database not configured'}), 500
+
+    try:
+        badge_count = get_and_increment_badge_count()
+    except Exception as e:
+        print(f"Error updating badge count: {e}")
+        return jsonify({'error': 'Failed to update badge count'}), 500
+
     # バッジカウントを常に含める
     payload_data = {
         "notification": {
@@ -111,40 +173,35 @@ def send_notification():
             "icon": "images/icon-192x192.png",
             "badge": "images/icon-192x192.png"
         },
-        "badge_count": badge_counter  # ←サーバーのグローバルカウンタ
+        "badge_count": badge_count  # ←共有ストアのカウンタ
     }
-    notification_payload = json.dumps(payload_data)
 
+    # 送信はバックグラウンドで行い、ジョブIDを返してすぐ応答する
+    job_id = dispatcher.submit(payload_data)
+    return jsonify({'message': f'Notification job {job_id} queued.', 'jobId': job_id}), 202
+
+@app.route('/api/reset-badge', methods=['POST'])
+def reset_badge():
+    """アプリ起動時にバッジカウントを 0 に戻します（app.js から呼ばれる）。"""
     try:
-        response = supabase.table('subscriptions').select("endpoint, p256dh, auth").execute()
-        db_subscriptions = response.data
+        reset_badge_count()
     except Exception as e:
-        print(f"Error loading subscriptions: {e}")
-        return jsonify({'error': 'Failed to load subscriptions'}), 500
-
-    subscriptions = [
-        {"endpoint": s["endpoint"], "keys": {"p256dh": s["p256dh"], "auth": s["auth"]}}
-        for s in db_subscriptions
-    ]
+        print(f"Error resetting badge count: {e}")
+        return jsonify({'error': 'Failed to reset badge count'}), 500
+    return jsonify({'message': 'Badge count reset.'}), 200
 
-    if not subscriptions:
-        return jsonify({'message': 'No subscribers to notify.'}), 200
-
-    print(f"Sending notification to {len(subscriptions)} subscribers...")
-
-    for sub in subscriptions:
-        try:
-            webpush(
-                subscription_info=sub,
-                data=notification_payload,
-                vapid_private_key=VAPID_PRIVATE_KEY,
-                vapid_claims=VAPID_CLAIMS.copy(),
-            )
-        except WebPushException as ex:
-            print(f"Notification failed for {sub.get('endpoint', 'N/A')}: {ex}")
-
-    return jsonify({'message': f'Notification sent to {len(subscriptions)} subscribers.'}), 200
+@app.route('/api/notification-jobs/<job_id>', methods=['GET'])
+def get_notification_job(job_id):
+    """通知ジョブの状態と配信結果（送信数・失敗数・削除数・レイテンシ）を返します。"""
+    if request.headers.get('X-API-Secret') != os.getenv('API_SECRET_KEY'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    if not dispatcher:
+        return jsonify({'error': 'Database not configured'}), 500
 
+    job = dispatcher.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job), 200
 
 if __name__ == '__main__':
     # FLASK_ENVが'development'の場合のみデバッグモードを有効にする
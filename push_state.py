@@ -0,0 +1,134 @@
+"""push_server.py のサーバー状態（バッジカウンタ・通知ジョブ記録）の保存先。
+
+gunicorn の複数ワーカーや複数インスタンスで動かしても値が食い違わないよう、
+プロセス内のグローバル変数ではなく共有ストアに置く（再デプロイでも消えない）。
+
+- カウンタ: increment は保存先でアトミックに加算し、加算後の値を返す。
+- JSON 値: キー単位で保存・取得する（ジョブ記録など）。古い job: キーは put 時に間引く。
+
+保存先は PUSH_STATE_STORE=sqlite:<path> ならローカル SQLite、未指定なら Supabase
+（push_counters / push_state テーブルと increment_push_counter 関数。
+docs/push_server_state.sql を参照）、Supabase も未設定なら logs/push_state.db の SQLite。
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_SQLITE_PATH = 'logs/push_state.db'
+# 通知ジョブ記録の保持秒数
+PUSH_JOB_RETENTION_SECONDS = float(os.getenv('PUSH_JOB_RETENTION_SECONDS', str(24 * 3600)))
+JOB_KEY_PREFIX = 'job:'
+
+
+def _utc_iso(ts):
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(ts))
+
+
+class SQLiteStateStore:
+    """ローカル SQLite 版。同一ホストの複数ワーカーで共有できる（初回利用時にファイルを作る）。"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        if not self._initialized:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        # 複数プロセスからの同時書き込みはロック解除を待つ
+        conn = sqlite3.connect(self.path, timeout=10)
+        if not self._initialized:
+            conn.execute("CREATE TABLE IF NOT EXISTS push_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS push_state (key TEXT PRIMARY KEY, value TEXT, updated_at REAL)")
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def increment(self, name, amount=1):
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "INSERT INTO push_counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value RETURNING value",
+                (name, amount),
+            ).fetchone()
+        return row[0]
+
+    def get_counter(self, name):
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT value FROM push_counters WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def reset_counter(self, name):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO push_counters (name, value) VALUES (?, 0) "
+                "ON CONFLICT(name) DO UPDATE SET value = 0",
+                (name,),
+            )
+
+    def put_json(self, key, value):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO push_state (key, value, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+                (key, json.dumps(value, ensure_ascii=False), now),
+            )
+            if key.startswith(JOB_KEY_PREFIX):
+                conn.execute("DELETE FROM push_state WHERE key LIKE ? AND updated_at < ?",
+                             (JOB_KEY_PREFIX + '%', now - PUSH_JOB_RETENTION_SECONDS))
+
+    def get_json(self, key):
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT value FROM push_state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+class SupabaseStateStore:
+    """Supabase 版（本番）。加算は increment_push_counter 関数（RPC）でアトミックに行う。"""
+
+    def __init__(self, client, counters_table='push_counters', state_table='push_state'):
+        self.client = client
+        self.counters_table = counters_table
+        self.state_table = state_table
+
+    def increment(self, name, amount=1):
+        response = self.client.rpc('increment_push_counter',
+                                   {'counter_name': name, 'amount': amount}).execute()
+        return response.data
+
+    def get_counter(self, name):
+        response = (self.client.table(self.counters_table)
+                    .select('value').eq('name', name).execute())
+        return response.data[0]['value'] if response.data else 0
+
+    def reset_counter(self, name):
+        self.client.table(self.counters_table).upsert(
+            {'name': name, 'value': 0}, on_conflict='name').execute()
+
+    def put_json(self, key, value):
+        now = time.time()
+        self.client.table(self.state_table).upsert(
+            {'key': key, 'value': value, 'updated_at': _utc_iso(now)}, on_conflict='key').execute()
+        if key.startswith(JOB_KEY_PREFIX):
+            (self.client.table(self.state_table).delete()
+             .like('key', JOB_KEY_PREFIX + '%')
+             .lt('updated_at', _utc_iso(now - PUSH_JOB_RETENTION_SECONDS))
+             .execute())
+
+    def get_json(self, key):
+        response = self.client.table(self.state_table).select('value').eq('key', key).execute()
+        return response.data[0]['value'] if response.data else None
+
+
+def create_state_store(supabase_client=None):
+    """サーバー状態ストアを作成する（PUSH_STATE_STORE=sqlite:<path> で SQLite に差し替え可能）。"""
+    spec = os.getenv('PUSH_STATE_STORE', '')
+    if spec.startswith('sqlite:'):
+        return SQLiteStateStore(spec[len('sqlite:'):])
+    if supabase_client is not None:
+        return SupabaseStateStore(supabase_client)
+    return SQLiteStateStore(DEFAULT_SQLITE_PATH)
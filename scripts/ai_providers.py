@@ -0,0 +1,347 @@
+"""記事生成 AI 呼び出しの共通プロバイダー層。
+
+generate_daily_summary.py / synthesize_daily_summary.py から利用する。
+応答は (provider, model, system/user プロンプトのハッシュ) をキーに
+logs/ai_cache/ へ保存し、同一プロンプトの再実行では API を呼ばない。
+
+AI_RESPONSE_MODE 環境変数で動作を切り替える:
+  cache  — キャッシュがあれば再利用、なければ API を呼んで保存（既定）
+  live   — 常に API を呼ぶ（結果はキャッシュへ保存する）
+
+cache / live の新しい応答は呼び出し側が検証を通した後の commit() で初めて保存し、
+検証に落ちた応答は discard() で捨てる（キャッシュから再利用した応答なら消す）。
+こうしないと不採用の記事が再実行のたびにキャッシュから返り続ける。
+  replay — キャッシュ / 記録済み応答のみを返す。ネットワークに出ない
+  fake   — スキーマ準拠のダミー応答を返す（ベンチマーク・通し計測用）
+"""
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+AI_CACHE_DIR = Path(os.getenv("AI_CACHE_DIR", PROJECT_ROOT / "logs" / "ai_cache"))
+# generate_daily_summary._save_ai_raw_response の保存先（replay 時の第二参照先）
+RECORDED_RESPONSE_DIR = PROJECT_ROOT / "logs" / "summary_ai_responses"
+
+RESPONSE_MODES = ("cache", "live", "replay", "fake")
+DEFAULT_RESPONSE_MODE = "cache"
+
+API_KEY_ENV = {"gemini": "GEMINI_API_KEY", "openai": "OPENAI_API_KEY"}
+
+FAKE_ARTICLE = (
+    "# 高温大学駅伝 本日のダイジェスト\n\n"
+    "### 本日のレース展開\n\n"
+    "#### 首位争い\n\n"
+    "ダミー応答です。\n\n"
+    "#### 今日の総括・明日への展望\n\n"
+    "ダミー応答です。"
+)
+
+
+class ReplayMissError(LookupError):
+    """replay モードで該当する応答が見つからない。"""
+
+
+def get_response_mode():
+    """AI_RESPONSE_MODE を正規化して返す。未知の値は ValueError。"""
+    mode = os.getenv("AI_RESPONSE_MODE", DEFAULT_RESPONSE_MODE).strip().lower()
+    if mode not in RESPONSE_MODES:
+        raise ValueError(f"未対応のAI_RESPONSE_MODEです: {mode}")
+    return mode
+
+
+def mode_requires_api_key(mode):
+    """API キーが必要なモードか（replay / fake はネットワークを使わない）。"""
+    return mode in ("cache", "live")
+
+
+def prompt_hash(system_prompt, user_prompt):
+    """system / user プロンプトの組から sha256 ハッシュを返す。"""
+    payload = json.dumps([system_prompt or "", user_prompt or ""], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cache_key(provider, model, system_prompt, user_prompt, json_schema=None):
+    """provider / model / プロンプト / 出力スキーマからキャッシュキーを作る。"""
+    schema_part = json.dumps(json_schema, sort_keys=True) if json_schema else ""
+    payload = "\n".join([
+        provider, model or "", prompt_hash(system_prompt, user_prompt), schema_part,
+    ])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """応答をキーごとの JSON ファイルとして保存するディスクキャッシュ。
+
+    配置: <cache_dir>/<key 先頭2文字>/<key>.json
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = Path(cache_dir) if cache_dir else AI_CACHE_DIR
+
+    def _path(self, key):
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key):
+        """キャッシュ済み応答文字列を返す。無い・壊れている場合は None。"""
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError, OSError):
+            return None
+        response = entry.get("response")
+        return response if isinstance(response, str) else None
+
+    def put(self, key, response, **meta):
+        """応答を原子的に保存する。保存失敗は警告のみ（本体処理に影響させない）。"""
+        path = self._path(key)
+        entry = {
+            "key": key,
+            "saved_at": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+            **meta,
+            "response": response,
+        }
+        tmp_path = path.with_suffix(".tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_text(json.dumps(entry, indent=2, ensure_ascii=False), encoding="utf-8")
+            tmp_path.replace(path)
+        except OSError as e:
+            print(f"警告: AI応答キャッシュの保存に失敗しました ({path}): {e}")
+            tmp_path.unlink(missing_ok=True)
+
+    def delete(self, key):
+        """キャッシュ済み応答を削除する。削除失敗は警告のみ。"""
+        path = self._path(key)
+        try:
+            path.unlink(missing_ok=True)
+        except OSError as e:
+            print(f"警告: AI応答キャッシュの削除に失敗しました ({path}): {e}")
+
+
+def find_recorded_response(provider, model, p_hash, recorded_dir=None):
+    """_save_ai_raw_response で記録された応答から prompt_hash 一致のものを探す。"""
+    recorded_dir = Path(recorded_dir) if recorded_dir else RECORDED_RESPONSE_DIR
+    if not recorded_dir.exists():
+        return None
+    # ファイル名は時刻始まりなので逆順で新しいものを優先する
+    for path in sorted(recorded_dir.glob("*.json"), reverse=True):
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (json.JSONDecodeError, OSError):
+            continue
+        if (data.get("prompt_hash") == p_hash
+                and data.get("provider") == provider
+                and data.get("model") == model
+                and isinstance(data.get("raw_response"), str)):
+            return data["raw_response"]
+    return None
+
+
+def fake_value_from_schema(schema, field_name=""):
+    """JSON Schema から最小のスキーマ準拠値を作る。"""
+    if "anyOf" in schema:
+        return fake_value_from_schema(schema["anyOf"][0], field_name)
+    if "enum" in schema:
+        return schema["enum"][0]
+    schema_type = schema.get("type")
+    if schema_type == "object":
+        props = schema.get("properties", {})
+        return {
+            name: fake_value_from_schema(props.get(name, {}), name)
+            for name in schema.get("required", props.keys())
+        }
+    if schema_type == "array":
+        return []
+    if schema_type in ("number", "integer"):
+        return 0
+    if schema_type == "boolean":
+        return False
+    if schema_type == "null":
+        return None
+    return FAKE_ARTICLE if field_name == "article" else ""
+
+
+class LiveProvider:
+    """OpenAI / Gemini SDK を直接呼ぶプロバイダー。クライアントは生成時に1回だけ作る。"""
+
+    def __init__(self, provider, model, api_key=None, client=None, timeout=None):
+        self.provider = provider
+        self.model = model
+        self.timeout = timeout
+        self.client = client or self._create_client(api_key or os.getenv(API_KEY_ENV[provider], ""))
+
+    def _create_client(self, api_key):
+        """timeout（秒）を指定すると SDK の HTTP タイムアウトとして設定する。"""
+        if not api_key:
+            raise ValueError(f"環境変数 '{API_KEY_ENV[self.provider]}' が設定されていません。")
+        if self.provider == "gemini":
+            from google import genai
+            if self.timeout:
+                from google.genai import types
+                return genai.Client(
+                    api_key=api_key,
+                    http_options=types.HttpOptions(timeout=int(self.timeout * 1000)),
+                )
+            return genai.Client(api_key=api_key)
+        from openai import OpenAI
+        if self.timeout:
+            return OpenAI(api_key=api_key, timeout=self.timeout)
+        return OpenAI(api_key=api_key)
+
+    def generate(self, user_prompt, system_prompt=None, json_schema=None, schema_name="response"):
+        # Gemini は JSON 出力をプロンプト側の指示で行うため json_schema は渡さない
+        if self.provider == "gemini":
+            if system_prompt:
+                from google.genai import types
+                response = self.client.models.generate_content(
+                    model=self.model,
+                    contents=user_prompt,
+                    config=types.GenerateContentConfig(system_instruction=system_prompt),
+                )
+            else:
+                response = self.client.models.generate_content(model=self.model, contents=user_prompt)
+            return response.text
+
+        if system_prompt or json_schema:
+            kwargs = {"model": self.model, "input": user_prompt}
+            if system_prompt:
+                kwargs["instructions"] = system_prompt
+            if json_schema:
+                kwargs["text"] = {
+                    "format": {
+                        "type": "json_schema",
+                        "name": schema_name,
+                        "strict": True,
+                        "schema": json_schema,
+                    }
+                }
+            return self.client.responses.create(**kwargs).output_text
+
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": user_prompt}],
+        )
+        return response.choices[0].message.content
+
+
+class ReplayProvider:
+    """キャッシュ、次に記録済み応答から返す。見つからなければ ReplayMissError。"""
+
+    def __init__(self, provider, model, cache=None, recorded_dir=None):
+        self.provider = provider
+        self.model = model
+        self.cache = cache or ResponseCache()
+        self.recorded_dir = recorded_dir
+
+    def generate(self, user_prompt, system_prompt=None, json_schema=None, schema_name="response"):
+        key = cache_key(self.provider, self.model, system_prompt, user_prompt, json_schema)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        recorded = find_recorded_response(
+            self.provider, self.model, prompt_hash(system_prompt, user_prompt), self.recorded_dir
+        )
+        if recorded is not None:
+            return recorded
+        raise ReplayMissError(
+            f"replay: 応答が見つかりません (provider={self.provider}, model={self.model}, key={key[:12]})"
+        )
+
+    def commit(self):
+        """replay はキャッシュを書き換えない。"""
+
+    def discard(self):
+        """replay はキャッシュを書き換えない。"""
+
+
+class FakeProvider:
+    """ネットワークを使わず、スキーマ準拠のダミー応答を返す。"""
+
+    def __init__(self, provider, model):
+        self.provider = provider
+        self.model = model
+
+    def generate(self, user_prompt, system_prompt=None, json_schema=None, schema_name="response"):
+        if json_schema:
+            return json.dumps(fake_value_from_schema(json_schema), ensure_ascii=False)
+        return FAKE_ARTICLE
+
+    def commit(self):
+        """fake はキャッシュを使わない。"""
+
+    def discard(self):
+        """fake はキャッシュを使わない。"""
+
+
+class CachedProvider:
+    """内側のプロバイダー呼び出しをキャッシュで包む。
+
+    use_cache=False（live モード）では読み込みを行わず、書き込みのみ行う。
+    新しい応答は commit() まで保存を保留し、discard() で捨てる。
+    """
+
+    def __init__(self, inner, cache=None, use_cache=True):
+        self.inner = inner
+        self.provider = inner.provider
+        self.model = inner.model
+        self.cache = cache or ResponseCache()
+        self.use_cache = use_cache
+        self.hits = 0
+        self.misses = 0
+        # 呼び出し側の採否待ち: key -> (応答, メタ情報) / キャッシュから返した key
+        self._pending = {}
+        self._served = set()
+
+    def generate(self, user_prompt, system_prompt=None, json_schema=None, schema_name="response"):
+        key = cache_key(self.provider, self.model, system_prompt, user_prompt, json_schema)
+        if self.use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.hits += 1
+                self._served.add(key)
+                print(f"  ♻️ AI応答キャッシュを再利用: {self.provider}/{self.model} ({key[:12]})")
+                return cached
+        self.misses += 1
+        response = self.inner.generate(
+            user_prompt, system_prompt=system_prompt, json_schema=json_schema, schema_name=schema_name
+        )
+        if isinstance(response, str):
+            self._pending[key] = (response, {
+                "provider": self.provider,
+                "model": self.model,
+                "prompt_hash": prompt_hash(system_prompt, user_prompt),
+            })
+        return response
+
+    def commit(self):
+        """採用された応答（前回の commit / discard 以降のもの）をキャッシュへ保存する。"""
+        for key, (response, meta) in self._pending.items():
+            self.cache.put(key, response, **meta)
+        self._pending.clear()
+        self._served.clear()
+
+    def discard(self):
+        """不採用の応答を保存せずに捨て、キャッシュから返した応答は削除する。"""
+        for key in self._served:
+            self.cache.delete(key)
+            print(f"  🗑️ 不採用のAI応答キャッシュを削除: {self.provider}/{self.model} ({key[:12]})")
+        self._pending.clear()
+        self._served.clear()
+
+
+def get_provider(provider, model, mode=None, api_key=None, client=None, cache=None, timeout=None):
+    """モードに応じたプロバイダーを返す。
+
+    mode 省略時は AI_RESPONSE_MODE を参照する。live / cache で API キーが
+    無い場合は LiveProvider が ValueError を送出する。
+    """
+    mode = mode or get_response_mode()
+    if mode == "fake":
+        return FakeProvider(provider, model)
+    if mode == "replay":
+        return ReplayProvider(provider, model, cache=cache)
+    live = LiveProvider(provider, model, api_key=api_key, client=client, timeout=timeout)
+    return CachedProvider(live, cache=cache, use_cache=(mode == "cache"))
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""記事履歴の追記専用ストア。
+
+旧形式の data/article_history.json（新しい順の配列、全件にプロンプト全文）を置き換える。
+
+配置 (data/article_history/):
+  articles.jsonl      1行1記事。追記のみ。プロンプトは圧縮・重複排除済みの参照で持つ
+  prompt_blobs.jsonl  プロンプト本文（zlib + base64）。sha256 で重複排除し追記のみ
+  index.json          各行のバイトオフセット。最新 N 件の読み込みは N 行分のシークで済む
+
+system プロンプトは日ごとにほぼ同一のテンプレートから作られるため、
+{"system": ..., "user": ...} 形式のプロンプトは system / user を別々の blob に分けて保存する。
+
+使い方:
+  python scripts/article_history_store.py --export data/article_history.json
+  python scripts/article_history_store.py --import data/article_history.json
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import zlib
+from pathlib import Path
+
+DATA_DIR = Path('data')
+ARTICLE_HISTORY_DIR = DATA_DIR / 'article_history'
+
+INDEX_VERSION = 1
+
+
+def _compress(text):
+    return base64.b64encode(zlib.compress(text.encode('utf-8'), 9)).decode('ascii')
+
+
+def _decompress(payload):
+    return zlib.decompress(base64.b64decode(payload)).decode('utf-8')
+
+
+def _split_prompt(prompt_text):
+    """generate_daily_summary の {"system", "user"} JSON なら分解、それ以外は None"""
+    try:
+        parsed = json.loads(prompt_text)
+    except (TypeError, ValueError):
+        return None
+    if isinstance(parsed, dict) and set(parsed) == {'system', 'user'}:
+        return parsed
+    return None
+
+
+class ArticleHistoryStore:
+    """articles.jsonl / prompt_blobs.jsonl / index.json を扱う追記専用ストア。"""
+
+    def __init__(self, root=None, legacy_file=None):
+        self.root = Path(root) if root else ARTICLE_HISTORY_DIR
+        # 旧形式（<root>.json）。ストアが空のときだけ一度取り込む
+        self.legacy_file = Path(legacy_file) if legacy_file else self.root.with_suffix('.json')
+        self.articles_file = self.root / 'articles.jsonl'
+        self.blobs_file = self.root / 'prompt_blobs.jsonl'
+        self.index_file = self.root / 'index.json'
+        self._index = None
+
+    # --- index ---
+
+    def _load_index(self):
+        if self._index is not None:
+            return self._index
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('version') != INDEX_VERSION:
+                raise ValueError(f"未対応の index version: {index.get('version')}")
+        except FileNotFoundError:
+            index = {'version': INDEX_VERSION, 'articles': [], 'blobs': {}}
+        self._index = index
+        return index
+
+    def _save_index(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_file.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.index_file)
+
+    def __len__(self):
+        self._migrate_legacy_if_needed()
+        return len(self._load_index()['articles'])
+
+    # --- 追記 ---
+
+    @staticmethod
+    def _append_line(path, record):
+        """1行追記し、(offset, length) を返す"""
+        line = (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+        with open(path, 'ab') as f:
+            offset = f.seek(0, os.SEEK_END)
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        return [offset, len(line)]
+
+    def _put_blob(self, text):
+        """本文を blob として保存し sha256 を返す。既存なら追記しない"""
+        index = self._load_index()
+        sha = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        if sha not in index['blobs']:
+            index['blobs'][sha] = self._append_line(self.blobs_file, {'sha': sha, 'z': _compress(text)})
+        return sha
+
+    def _encode_prompt(self, prompt_text):
+        parts = _split_prompt(prompt_text)
+        if parts is None:
+            return {'text': self._put_blob(prompt_text or '')}
+        return {'system': self._put_blob(parts['system']), 'user': self._put_blob(parts['user'])}
+
+    def append(self, date, prompt_text, article_text):
+        """記事1件を追記する（ファイル全体の読み直し・書き直しはしない）"""
+        self._migrate_legacy_if_needed()
+        self._append_entry({'date': date, 'prompt': prompt_text, 'article': article_text})
+        self._save_index()
+
+    def _append_entry(self, entry):
+        self.root.mkdir(parents=True, exist_ok=True)
+        index = self._load_index()
+        record = {
+            'date': entry.get('date'),
+            'prompt': self._encode_prompt(entry.get('prompt')),
+            'article': entry.get('article'),
+        }
+        offset, length = self._append_line(self.articles_file, record)
+        index['articles'].append({'offset': offset, 'length': length, 'date': record['date']})
+
+    # --- 読み込み ---
+
+    @staticmethod
+    def _read_line(f, offset, length):
+        f.seek(offset)
+        return json.loads(f.read(length).decode('utf-8'))
+
+    def _decode_prompt(self, ref, blobs_f):
+        blobs = self._load_index()['blobs']
+
+        def blob(sha):
+            offset, length = blobs[sha]
+            return _decompress(self._read_line(blobs_f, offset, length)['z'])
+
+        if 'text' in ref:
+            return blob(ref['text'])
+        # 旧形式と同じ整形（generate_daily_summary の prompt_payload）で復元する
+        return json.dumps({'system': blob(ref['system']), 'user': blob(ref['user'])},
+                          ensure_ascii=False, indent=2)
+
+    def latest(self, n=2, include_prompt=True):
+        """新しい順に最大 n 件を旧形式の dict {date, prompt, article} で返す"""
+        self._migrate_legacy_if_needed()
+        entries = self._load_index()['articles']
+        if n <= 0 or not entries:
+            return []
+        selected = entries[-n:][::-1]
+        results = []
+        with open(self.articles_file, 'rb') as articles_f:
+            blobs_f = open(self.blobs_file, 'rb') if include_prompt and self.blobs_file.exists() else None
+            try:
+                for meta in selected:
+                    record = self._read_line(articles_f, meta['offset'], meta['length'])
+                    entry = {'date': record.get('date')}
+                    if blobs_f is not None:
+                        entry['prompt'] = self._decode_prompt(record['prompt'], blobs_f)
+                    entry['article'] = record.get('article')
+                    results.append(entry)
+            finally:
+                if blobs_f is not None:
+                    blobs_f.close()
+        return results
+
+    def all(self):
+        """全件を新しい順に返す"""
+        return self.latest(len(self))
+
+    # --- 旧形式との互換 ---
+
+    def import_entries(self, history):
+        """旧形式（新しい順の配列）を古い順に追記する"""
+        for entry in reversed(history):
+            self._append_entry(entry)
+        self._save_index()
+
+    def _migrate_legacy_if_needed(self):
+        """ストアが空で旧 JSON がある場合だけ一度取り込む"""
+        if self.index_file.exists() or not self.legacy_file.exists():
+            return
+        try:
+            with open(self.legacy_file, 'r', encoding='utf-8') as f:
+                history = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"警告: 旧記事履歴 '{self.legacy_file}' を読み込めないため取り込みをスキップします: {e}")
+            return
+        if isinstance(history, list):
+            print(f"旧記事履歴 {len(history)}件を '{self.root}' に取り込みます...")
+            self.import_entries(history)
+
+    def export_json(self, output_file):
+        """旧 data/article_history.json と同じ形式（新しい順・indent=2）で書き出す"""
+        output_file = Path(output_file)
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(self.all(), f, indent=2, ensure_ascii=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='記事履歴ストアの取り込み・書き出しを行います。')
+    parser.add_argument('--store', type=Path, default=ARTICLE_HISTORY_DIR, help='ストアのディレクトリ')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--export', type=Path, metavar='FILE', help='旧形式の JSON を書き出す')
+    group.add_argument('--import', dest='import_file', type=Path, metavar='FILE',
+                       help='旧形式の JSON を取り込む（ストアが空の場合のみ）')
+    args = parser.parse_args()
+
+    if args.export:
+        store = ArticleHistoryStore(args.store)
+        store.export_json(args.export)
+        print(f"✅ {len(store)}件を '{args.export}' に書き出しました。")
+        return
+
+    store = ArticleHistoryStore(args.store, legacy_file=args.import_file)
+    if store.index_file.exists():
+        raise SystemExit(f"エラー: ストア '{args.store}' は既に存在します。")
+    print(f"✅ {len(store)}件を取り込みました。")
+
+
+if __name__ == '__main__':
+    main()
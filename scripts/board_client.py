@@ -0,0 +1,262 @@
+"""5ch スレッド取得の共通クライアント。
+
+generate_report.py（日中の監督コメント）/ process_substitutions.py（選手交代）/
+fetch_manager_comments.py（監督コメント収集）が同じ mainThreadUrl を個別に取得・
+パースしていたため、取得とパースをここに集約する。
+
+- パース済みの投稿リストを取得時刻付きで logs/board_cache/ に保存し、
+  TTL 内の再要求はネットワークに出ずキャッシュから返す。
+- 取得失敗時は古いキャッシュがあればそれを返す（エラーメッセージも併せて返す）。
+- キャッシュ済みの最大レス番号を覚えておき、再取得は範囲指定 URL（/{N}-n）で
+  新着レスだけを取りに行く。受け取った HTML も既読レスの手前までは DOM を作らず
+  文字列走査で読み飛ばすため、終盤の 1000 レス近いスレでも新しいスレと同程度のコストで済む。
+
+環境変数:
+- EKIDEN_POSTS_HTML: ローカルHTMLファイルから投稿を読み込む（fetch・キャッシュをスキップ）。
+  テスト・オフライン再現用の fixture として全利用元で共通に効く。
+- EKIDEN_BOARD_CACHE_DIR: キャッシュディレクトリ上書き
+- EKIDEN_BOARD_CACHE_TTL: キャッシュ有効秒数（既定 60 秒）
+"""
+import hashlib
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+# requests / bs4 は取得・パースする時だけ読み込む（スレッドを読まない実行の起動を軽くするため）
+
+CACHE_DIR = Path(os.environ.get('EKIDEN_BOARD_CACHE_DIR', 'logs/board_cache'))
+DEFAULT_TTL_SECONDS = float(os.environ.get('EKIDEN_BOARD_CACHE_TTL', '60'))
+CACHE_VERSION = 2
+CURSOR_FILE_NAME = 'cursors.json'
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+
+# 投稿の開始タグ（レス番号付き）。DOM を作らずに既読レスを読み飛ばすために使う
+POST_START_PATTERNS = {
+    '5ch': re.compile(r'<div\b[^>]*?\bdata-id="(\d+)"'),
+    'shitaraba': re.compile(r'<dt\b[^>]*?\bid="comment_(\d+)"'),
+}
+
+
+def board_kind(url):
+    """URL から掲示板の種類（'5ch' / 'shitaraba'）を返す"""
+    return 'shitaraba' if 'shitaraba.net' in url else '5ch'
+
+
+def range_url(url, start):
+    """レス番号 start 以降だけを返す範囲指定 URL。
+
+    5ch は末尾の n で >>1 の付加を抑止する。したらばは >>1 を付けない。
+    """
+    base = url.strip().rstrip('/')
+    if board_kind(url) == 'shitaraba':
+        return f'{base}/{start}-'
+    return f'{base}/{start}-n'
+
+
+def skip_seen_posts(html, after_id, kind='5ch'):
+    """レス番号が after_id 以下の投稿を文字列走査で読み飛ばし、残りの HTML を返す。
+
+    after_id が None なら html をそのまま返す。新着が無ければ空文字列。
+    """
+    if not after_id:
+        return html
+    for m in POST_START_PATTERNS[kind].finditer(html):
+        if int(m.group(1)) > after_id:
+            return html[m.start():]
+    return ''
+
+
+def max_post_id(html, kind='5ch'):
+    """HTML 中の最大レス番号（無ければ None）"""
+    ids = [int(m.group(1)) for m in POST_START_PATTERNS[kind].finditer(html)]
+    return max(ids) if ids else None
+
+
+def _post_number(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+# --- パース ---
+
+def _text_or_none(el):
+    return el.get_text() if el else None
+
+
+def parse_thread_posts(html, after_id=None):
+    """5ch スレッド HTML から投稿リストを返す。
+
+    各投稿は JSON 化できる dict:
+      id              div.post の data-id（投稿番号）
+      anchor          div.post の id 属性
+      name            span.postusername のテキスト（無ければ None）
+      date            span.date のテキスト（無ければ None）
+      content_html    div.post-content の HTML（無ければ None）
+      content_strings div.post-content の空白除去済み文字列リスト
+                      （sep.join(...) が get_text(separator=sep, strip=True) と一致）
+
+    after_id を渡すとそれ以下のレス番号の投稿は DOM を作らずに読み飛ばす。
+    """
+    html = skip_seen_posts(html, after_id)
+    if not html:
+        return []
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    posts = []
+    for post in soup.find_all('div', class_='post'):
+        if after_id and _post_number(post.get('data-id')) <= after_id:
+            continue
+        content_div = post.find('div', class_='post-content')
+        posts.append({
+            'id': post.get('data-id'),
+            'anchor': post.get('id') or '',
+            'name': _text_or_none(post.find('span', class_='postusername')),
+            'date': _text_or_none(post.find('span', class_='date')),
+            'content_html': str(content_div) if content_div else None,
+            'content_strings': list(content_div.stripped_strings) if content_div else [],
+        })
+    return posts
+
+
+def post_text(post, separator='\n'):
+    """投稿本文をプレーンテキストで返す。"""
+    return separator.join(post.get('content_strings') or [])
+
+
+# --- キャッシュ ---
+
+def cache_path(url):
+    digest = hashlib.sha1(url.strip().encode('utf-8')).hexdigest()[:16]
+    return CACHE_DIR / f'{digest}.json'
+
+
+def read_cache(url):
+    """キャッシュ {url, fetched_at, last_post_id, posts} を返す。無い・壊れている場合は None。"""
+    try:
+        with open(cache_path(url), 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError, OSError):
+        return None
+    if cached.get('version') != CACHE_VERSION or cached.get('url') != url.strip():
+        return None
+    return cached
+
+
+def write_cache(url, posts, fetched_at):
+    path = cache_path(url)
+    tmp_path = path.with_suffix('.tmp')
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': CACHE_VERSION,
+                'url': url.strip(),
+                'fetched_at': fetched_at,
+                'last_post_id': max((_post_number(p.get('id')) for p in posts), default=0),
+                'posts': posts,
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"警告: スレッドキャッシュの保存に失敗しました ({path}): {e}")
+        tmp_path.unlink(missing_ok=True)
+
+
+# --- 取得 ---
+
+def fetch_html(url, timeout=20):
+    """スレッド HTML を取得する。失敗時は requests.RequestException を送出。"""
+    import requests
+
+    response = requests.get(url, headers=HEADERS, timeout=timeout)
+    response.raise_for_status()
+    response.encoding = response.apparent_encoding
+    return response.text
+
+
+def get_thread_posts(url, ttl=None, timeout=20, force=False):
+    """スレッドの投稿リストを返す。戻り値: (posts, error_message)
+
+    TTL 内のキャッシュがあればネットワークに出ない。キャッシュが古ければ、キャッシュ済みの
+    最大レス番号より後ろだけを範囲指定で取得して追記する（force=True なら全件取り直し）。
+    取得失敗時は古いキャッシュがあればそれを返し、error_message（例外の文字列）も
+    併せて返す。成功時は None。
+    """
+    fixture = os.environ.get('EKIDEN_POSTS_HTML')
+    if fixture:
+        with open(fixture, 'r', encoding='utf-8') as f:
+            return parse_thread_posts(f.read()), None
+
+    ttl = DEFAULT_TTL_SECONDS if ttl is None else ttl
+    cached = read_cache(url)
+    now = time.time()
+    if cached and not force and now - cached.get('fetched_at', 0) < ttl:
+        return cached['posts'], None
+
+    last_id = cached.get('last_post_id', 0) if cached and not force else 0
+    fetch_url = range_url(url, last_id + 1) if last_id else url
+    print(f"スレッドを取得中: {fetch_url}")
+    import requests
+
+    try:
+        html = fetch_html(fetch_url, timeout=timeout)
+    except requests.RequestException as e:
+        print(f"エラー: スレッドの取得に失敗しました: {e}")
+        if cached:
+            age = int(now - cached.get('fetched_at', 0))
+            print(f"  {age}秒前のキャッシュを使用します。")
+            return cached['posts'], str(e)
+        return [], str(e)
+
+    new_posts = parse_thread_posts(html, after_id=last_id)
+    posts = cached['posts'] + new_posts if last_id else new_posts
+    write_cache(url, posts, now)
+    return posts, None
+
+
+# --- 既読位置（投稿リストをキャッシュしない利用元向け） ---
+
+def _cursor_file():
+    return CACHE_DIR / CURSOR_FILE_NAME
+
+
+def read_cursor(url):
+    """url について処理済みの最大レス番号（無ければ None）"""
+    try:
+        with open(_cursor_file(), 'r', encoding='utf-8') as f:
+            cursors = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError, OSError):
+        return None
+    return (cursors.get(url.strip()) or {}).get('last_post_id')
+
+
+def write_cursors(updates):
+    """{url: 最大レス番号} を既読位置として保存する"""
+    if not updates:
+        return
+    path = _cursor_file()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cursors = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError, OSError):
+        cursors = {}
+    now = time.time()
+    for url, last_id in updates.items():
+        cursors[url.strip()] = {'last_post_id': last_id, 'updated_at': now}
+    tmp_path = path.with_suffix('.tmp')
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cursors, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"警告: 既読位置の保存に失敗しました ({path}): {e}")
+        tmp_path.unlink(missing_ok=True)
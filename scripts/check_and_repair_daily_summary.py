@@ -59,7 +59,7 @@ def resolve_manager_comments_path(target_date):
 # コミット対象ファイル（これら以外の変更は FAIL）
 COMMIT_TARGETS = [
     'data/daily_summary.json',
-    'data/article_history.json',
+    'data/article_history/',
     'data/race_narrative_state.json',
 ]
 
@@ -0,0 +1,102 @@
+"""設定 JSON の読み込み（解析済みキャッシュ付き）。
+
+config/ の JSON（amedas_stations.json 300KB・player_profiles.json 250KB・course_path.json など）は
+ほとんど変わらないのに、各スクリプトが実行のたびに解析し直している。load_json() は解析結果を
+元ファイルと同じディレクトリの .cache/<ファイル名>.pickle に保存し、次回からはそちらを読む。
+
+キャッシュの有効性は元ファイルの mtime・サイズ・SHA-256 で判定する:
+- mtime とサイズが一致すればそのまま使う（ハッシュ計算もしない）
+- mtime だけ違う場合（git checkout など）は内容のハッシュを比べ、同じなら使い続ける
+- それ以外は JSON を解析し直してキャッシュを作り直す
+
+戻り値は毎回新しいオブジェクトなので、呼び出し側で書き換えても構わない。キャッシュの読み書きに
+失敗しても JSON を直接読むだけで、処理は止めない。JSON 自体のエラー（FileNotFoundError /
+json.JSONDecodeError）は json.load と同じく呼び出し側に送出する。
+
+環境変数:
+- EKIDEN_CONFIG_CACHE=0: キャッシュを使わない（常に JSON を解析する）
+"""
+import hashlib
+import json
+import os
+import pickle
+import sys
+from pathlib import Path
+
+CACHE_DIR_NAME = '.cache'
+# pickle の形式や Python のバージョンが変わったらキャッシュを作り直す
+CACHE_VERSION = (1, pickle.HIGHEST_PROTOCOL, sys.version_info[:2])
+
+
+def cache_path_for(path):
+    path = Path(path)
+    return path.parent / CACHE_DIR_NAME / f"{path.name}.pickle"
+
+
+def _enabled():
+    return os.environ.get('EKIDEN_CONFIG_CACHE', '1') != '0'
+
+
+def _read_cache(cache_path, path, stat):
+    """有効なキャッシュがあれば (data, raw or None) を返す。無ければ (None, raw or None)。"""
+    try:
+        with open(cache_path, 'rb') as f:
+            header = pickle.load(f)
+            if header.get('version') != CACHE_VERSION or header.get('size') != stat.st_size:
+                return None, None
+            if header.get('mtime_ns') == stat.st_mtime_ns:
+                return pickle.load(f), None
+            raw = path.read_bytes()
+            if hashlib.sha256(raw).hexdigest() != header.get('sha256'):
+                return None, raw
+            return pickle.load(f), raw
+    except FileNotFoundError:
+        return None, None
+    except Exception:
+        # 壊れたキャッシュ・古い形式は作り直す
+        return None, None
+
+
+def _write_cache(cache_path, stat, raw, data):
+    header = {
+        'version': CACHE_VERSION,
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha256': hashlib.sha256(raw).hexdigest(),
+    }
+    tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # 読み取り専用の環境などではキャッシュなしで続ける
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+
+
+def load_json(path):
+    """path の JSON を返す（解析済みキャッシュがあればそれを使う）"""
+    path = Path(path)
+    if not _enabled():
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    stat = path.stat()
+    cache_path = cache_path_for(path)
+    data, raw = _read_cache(cache_path, path, stat)
+    if data is not None:
+        if raw is not None:
+            # 内容は同じで mtime だけ変わった → 次回はハッシュ計算なしで済むようにする
+            _write_cache(cache_path, stat, raw, data)
+        return data
+
+    if raw is None:
+        raw = path.read_bytes()
+    data = json.loads(raw.decode('utf-8'))
+    _write_cache(cache_path, stat, raw, data)
+    return data
@@ -0,0 +1,171 @@
+"""コース形状の多段階解像度（LOD）版を作る。
+
+config/course_path.json（{lat, lon} の配列, 約110KB）から、Douglas–Peucker で間引いた
+複数の許容誤差の段階を encoded polyline（Google 形式, 精度 1e-6 = polyline6）にして
+config/course_path_lod.json に書き出す。地図（app.js）は粗い段階をすぐ描画し、
+ズームに応じて細かい段階に差し替える。最も細かい段階（toleranceM=0）は元の全頂点なので、
+距離→座標の変換にもそのまま使える。
+
+各段階では中継所に最も近い頂点を必ず残し、legOffsets（各区間の先頭頂点の番号）で
+区間ごとに切り出せるようにする。
+
+  python scripts/process_kml.py --lod-only   # 既存の course_path.json から作り直す
+"""
+import hashlib
+import json
+import math
+
+LOD_VERSION = 1
+PRECISION = 6
+# (許容誤差 m, この段階を使い始めるズーム)。緯度35度付近で 1px あたりの距離が許容誤差と同程度になるズーム
+LOD_LEVELS = [(2000, 0), (500, 7), (100, 9), (0, 11)]
+EARTH_RADIUS_M = 6371008.8
+
+
+def encode_polyline(points, precision=PRECISION):
+    """[(lat, lon), ...] を encoded polyline 文字列にする"""
+    factor = 10 ** precision
+    chunks = []
+    prev_lat = prev_lon = 0
+    for lat, lon in points:
+        lat_i, lon_i = round(lat * factor), round(lon * factor)
+        for delta in (lat_i - prev_lat, lon_i - prev_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            chunks.append(chr(value + 63))
+        prev_lat, prev_lon = lat_i, lon_i
+    return ''.join(chunks)
+
+
+def decode_polyline(encoded, precision=PRECISION):
+    """encoded polyline 文字列を [(lat, lon), ...] に戻す"""
+    factor = 10 ** precision
+    points = []
+    index = lat = lon = 0
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        points.append((lat / factor, lon / factor))
+    return points
+
+
+def _project(lat, lon, lat0):
+    """lat0 付近の正距円筒投影（m）"""
+    return (math.radians(lon) * EARTH_RADIUS_M * math.cos(math.radians(lat0)),
+            math.radians(lat) * EARTH_RADIUS_M)
+
+
+def simplify_indices(points, tolerance_m, first=0, last=None):
+    """points[first..last] を Douglas–Peucker で間引き、残す頂点の番号（昇順）を返す
+
+    投影は区間の両端の平均緯度で一度だけ行う（1区間は数十km なので歪みは無視できる）。
+    """
+    last = len(points) - 1 if last is None else last
+    if last <= first:
+        return [first]
+    if tolerance_m <= 0:
+        return list(range(first, last + 1))
+    lat0 = (points[first][0] + points[last][0]) / 2
+    xs, ys = [], []
+    for lat, lon in points[first:last + 1]:
+        x, y = _project(lat, lon, lat0)
+        xs.append(x)
+        ys.append(y)
+    tolerance2 = tolerance_m * tolerance_m
+    keep = {0, last - first}
+    stack = [(0, last - first)]
+    while stack:
+        a, b = stack.pop()
+        if b <= a + 1:
+            continue
+        ax, ay = xs[a], ys[a]
+        dx, dy = xs[b] - ax, ys[b] - ay
+        length2 = dx * dx + dy * dy
+        worst, worst_index = -1.0, None
+        for i in range(a + 1, b):
+            px, py = xs[i] - ax, ys[i] - ay
+            dot = px * dx + py * dy
+            if dot <= 0 or length2 == 0:
+                d2 = px * px + py * py
+            elif dot >= length2:
+                ex, ey = px - dx, py - dy
+                d2 = ex * ex + ey * ey
+            else:
+                t = dot / length2
+                ex, ey = px - t * dx, py - t * dy
+                d2 = ex * ex + ey * ey
+            if d2 > worst:
+                worst, worst_index = d2, i
+        if worst > tolerance2:
+            keep.add(worst_index)
+            stack.append((a, worst_index))
+            stack.append((worst_index, b))
+    return sorted(first + i for i in keep)
+
+
+def _nearest_index(points, lat, lon):
+    scale = math.cos(math.radians(lat))
+    best, best_index = math.inf, 0
+    for i, (p_lat, p_lon) in enumerate(points):
+        d = (p_lat - lat) ** 2 + ((p_lon - lon) * scale) ** 2
+        if d < best:
+            best, best_index = d, i
+    return best_index
+
+
+def anchor_indices(points, relay_points):
+    """スタート・各中継所（最近傍頂点）・ゴールの頂点番号"""
+    anchors = [0]
+    for relay in sorted(relay_points or [], key=lambda r: r.get('leg', 0)):
+        try:
+            index = _nearest_index(points, float(relay['latitude']), float(relay['longitude']))
+        except (KeyError, TypeError, ValueError):
+            continue
+        if anchors[-1] < index < len(points) - 1:
+            anchors.append(index)
+    anchors.append(len(points) - 1)
+    return anchors
+
+
+def build_course_lod(course_path, relay_points=None, levels=LOD_LEVELS):
+    """course_path（[{lat, lon}]）から course_path_lod.json の内容を作る"""
+    points = [(float(p['lat']), float(p['lon'])) for p in course_path]
+    anchors = anchor_indices(points, relay_points) if points else []
+    source = json.dumps(course_path, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    result = {
+        'version': LOD_VERSION,
+        'precision': PRECISION,
+        'sourcePointCount': len(points),
+        'sourceSha256': hashlib.sha256(source).hexdigest(),
+        'levels': [],
+    }
+    for tolerance_m, min_zoom in levels:
+        indices = []
+        leg_offsets = []
+        for a, b in zip(anchors, anchors[1:]):
+            # 区間の先頭は前の区間の終点（中継所の頂点）と共有する
+            leg_offsets.append(max(len(indices) - 1, 0))
+            segment = simplify_indices(points, tolerance_m, a, b)
+            indices.extend(segment if not indices else segment[1:])
+        level_points = [points[i] for i in indices]
+        result['levels'].append({
+            'toleranceM': tolerance_m,
+            'minZoom': min_zoom,
+            'pointCount': len(level_points),
+            'legOffsets': leg_offsets,
+            'polyline': encode_polyline(level_points),
+        })
+    return result
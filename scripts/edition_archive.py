@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""終了した大会の成績を1つの SQLite ファイル（history_data/editions.sqlite3）にまとめて保存・検索する。
+
+これまで過去大会は '15/' のようなディレクトリに JSON とスクリプトのコピーを置いていた。
+このアーカイブには大会ごとに次を入れる:
+- runner_days: 選手・日ごとの記録（day, leg, distance）
+- runner_legs: 選手・区間ごとの集計（日数・合計・平均・区間順位）
+- runners: 選手ごとの合計
+- teams: 最終状態（ekiden_state.json の総距離・順位・ゴール日）
+- documents: 元の JSON（individual_results.json など）を zlib で圧縮したもの
+
+表には選手名・区間の索引があるので、「ある選手の全大会の記録」「全大会の3区の平均」のような
+大会をまたぐ問い合わせでも、全大会のデータをメモリに読み込まずに済む。
+
+使い方:
+  python scripts/edition_archive.py pack --edition 15 --source 15     # 既存の過去大会ディレクトリを取り込む
+  python scripts/edition_archive.py list
+  python scripts/edition_archive.py runner 梁川
+  python scripts/edition_archive.py leg 3 [--edition 15]
+
+大会終了時は scripts/reset_for_new_season.py が data/ を消す前に自動で取り込む。
+"""
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+import zlib
+from pathlib import Path
+
+from time_utils import now_jst
+
+HISTORY_DATA_DIR = Path('history_data')
+ARCHIVE_FILE = HISTORY_DATA_DIR / 'editions.sqlite3'
+
+# documents に圧縮して残す JSON（存在するものだけ）
+ARCHIVED_DOCUMENTS = [
+    'individual_results.json',
+    'ekiden_state.json',
+    'rank_history.json',
+    'leg_rank_history.json',
+    'realtime_report.json',
+    'daily_summary.json',
+    'manager_comments.json',
+    'intramural_rankings.json',
+    'ekiden_data.json',
+    'outline.json',
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS editions (
+    edition INTEGER PRIMARY KEY,
+    title TEXT,
+    start_date TEXT,
+    packed_at TEXT NOT NULL,
+    source TEXT
+);
+CREATE TABLE IF NOT EXISTS documents (
+    edition INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (edition, name)
+);
+CREATE TABLE IF NOT EXISTS teams (
+    edition INTEGER NOT NULL,
+    team_id INTEGER NOT NULL,
+    team_name TEXT,
+    total_distance REAL,
+    overall_rank INTEGER,
+    finish_day INTEGER,
+    PRIMARY KEY (edition, team_id)
+);
+CREATE TABLE IF NOT EXISTS runners (
+    edition INTEGER NOT NULL,
+    runner_name TEXT NOT NULL,
+    team_id INTEGER,
+    total_distance REAL,
+    days INTEGER,
+    PRIMARY KEY (edition, runner_name)
+);
+CREATE TABLE IF NOT EXISTS runner_legs (
+    edition INTEGER NOT NULL,
+    runner_name TEXT NOT NULL,
+    leg INTEGER NOT NULL,
+    days INTEGER NOT NULL,
+    total_distance REAL NOT NULL,
+    average_distance REAL NOT NULL,
+    leg_rank INTEGER,
+    PRIMARY KEY (edition, runner_name, leg)
+);
+CREATE TABLE IF NOT EXISTS runner_days (
+    edition INTEGER NOT NULL,
+    runner_name TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    leg INTEGER,
+    distance REAL,
+    PRIMARY KEY (edition, runner_name, day)
+);
+CREATE INDEX IF NOT EXISTS idx_runners_name ON runners (runner_name);
+CREATE INDEX IF NOT EXISTS idx_runner_legs_name ON runner_legs (runner_name);
+CREATE INDEX IF NOT EXISTS idx_runner_legs_leg ON runner_legs (leg, edition);
+CREATE INDEX IF NOT EXISTS idx_runner_days_name ON runner_days (runner_name);
+CREATE INDEX IF NOT EXISTS idx_runner_days_leg_day ON runner_days (edition, leg, day);
+"""
+
+EDITION_TABLES = ['runner_days', 'runner_legs', 'runners', 'teams', 'documents', 'editions']
+
+
+def _connect(path):
+    conn = sqlite3.connect(str(path))
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _load_documents(source_dir, extra_documents=None):
+    """source_dir（と extra_documents: 名前 -> パス）から ARCHIVED_DOCUMENTS の生データを読む"""
+    documents = {}
+    for name in ARCHIVED_DOCUMENTS:
+        path = Path(source_dir) / name
+        if path.exists():
+            documents[name] = path.read_bytes()
+    for name, path in (extra_documents or {}).items():
+        path = Path(path)
+        if name not in documents and path.exists():
+            documents[name] = path.read_bytes()
+    return documents
+
+
+def _runner_tables(individual_results):
+    """individual_results から runners / runner_legs / runner_days の行を作る"""
+    runners, legs, days = [], [], []
+    leg_totals = {}
+    for runner_name, runner_data in individual_results.items():
+        if not isinstance(runner_data, dict):
+            continue
+        records = [r for r in runner_data.get('records', []) if r.get('day') is not None]
+        if not records:
+            continue
+        runners.append((runner_name, runner_data.get('teamId'), runner_data.get('totalDistance'), len(records)))
+        for record in records:
+            leg = record.get('leg')
+            distance = record.get('distance')
+            days.append((runner_name, record['day'], leg, distance))
+            if leg and distance is not None:
+                total, count = leg_totals.get((runner_name, leg), (0.0, 0))
+                leg_totals[(runner_name, leg)] = (total + distance, count + 1)
+
+    # 区間順位は区間ごとの平均距離の順位（同記録は同順位）
+    averages = {key: total / count for key, (total, count) in leg_totals.items()}
+    by_leg = {}
+    for (runner_name, leg), average in averages.items():
+        by_leg.setdefault(leg, []).append(round(average, 3))
+    for (runner_name, leg), (total, count) in leg_totals.items():
+        average = round(averages[(runner_name, leg)], 3)
+        rank = sum(1 for other in by_leg[leg] if other > average) + 1
+        legs.append((runner_name, leg, count, round(total, 1), average, rank))
+    return runners, legs, days
+
+
+def pack_edition(edition, source_dir, archive_path=ARCHIVE_FILE, extra_documents=None):
+    """source_dir（大会終了時の data/ や '15/'）の成績を archive_path に取り込む。同じ大会は置き換える。
+
+    extra_documents は source_dir に無い場合に使う文書（例: {'ekiden_data.json': 'config/ekiden_data.json'}）。
+    戻り値は取り込んだ件数の dict。individual_results.json が無ければ FileNotFoundError。
+    """
+    documents = _load_documents(source_dir, extra_documents)
+    if 'individual_results.json' not in documents:
+        raise FileNotFoundError(Path(source_dir) / 'individual_results.json')
+    parsed = {name: json.loads(raw.decode('utf-8')) for name, raw in documents.items()}
+    runners, legs, days = _runner_tables(parsed['individual_results.json'])
+    states = parsed.get('ekiden_state.json') or []
+    outline = parsed.get('outline.json') or {}
+    metadata = outline.get('metadata', {}) if isinstance(outline, dict) else {}
+
+    archive_path = Path(archive_path)
+    archive_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = _connect(archive_path)
+    try:
+        with conn:
+            conn.executescript(SCHEMA)
+            for table in EDITION_TABLES:
+                conn.execute(f"DELETE FROM {table} WHERE edition = ?", (edition,))
+            conn.execute(
+                "INSERT INTO editions (edition, title, start_date, packed_at, source) VALUES (?, ?, ?, ?, ?)",
+                (edition, outline.get('title') if isinstance(outline, dict) else None, metadata.get('startDate'),
+                 now_jst().isoformat(timespec='seconds'), str(source_dir)),
+            )
+            conn.executemany(
+                "INSERT INTO documents (edition, name, sha256, size, data) VALUES (?, ?, ?, ?, ?)",
+                [(edition, name, hashlib.sha256(raw).hexdigest(), len(raw), zlib.compress(raw, 9))
+                 for name, raw in documents.items()],
+            )
+            conn.executemany(
+                "INSERT INTO teams (edition, team_id, team_name, total_distance, overall_rank, finish_day) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(edition, s.get('id'), s.get('name'), s.get('totalDistance'), s.get('overallRank'), s.get('finishDay'))
+                 for s in states if isinstance(s, dict) and s.get('id') is not None],
+            )
+            conn.executemany("INSERT INTO runners VALUES (?, ?, ?, ?, ?)", [(edition, *row) for row in runners])
+            conn.executemany("INSERT INTO runner_legs VALUES (?, ?, ?, ?, ?, ?, ?)", [(edition, *row) for row in legs])
+            conn.executemany("INSERT OR REPLACE INTO runner_days VALUES (?, ?, ?, ?, ?)", [(edition, *row) for row in days])
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    return {'documents': len(documents), 'teams': len(states), 'runners': len(runners), 'legs': len(legs), 'days': len(days)}
+
+
+class EditionArchive:
+    """editions.sqlite3 の読み出し。問い合わせごとに必要な行だけを読む。"""
+
+    def __init__(self, path=ARCHIVE_FILE):
+        self.path = Path(path)
+        if not self.path.exists():
+            raise FileNotFoundError(self.path)
+        self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        self._conn.row_factory = sqlite3.Row
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _rows(self, sql, params=()):
+        return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def editions(self):
+        """取り込み済みの大会番号（昇順）"""
+        return [row[0] for row in self._conn.execute("SELECT edition FROM editions ORDER BY edition")]
+
+    def edition_info(self):
+        """取り込み済みの大会の一覧（大会番号・大会名・開始日・取り込み日時）"""
+        return self._rows("SELECT edition, title, start_date, packed_at, source FROM editions ORDER BY edition")
+
+    def document_bytes(self, edition, name):
+        """元の JSON の生データ（無ければ None）"""
+        row = self._conn.execute("SELECT data FROM documents WHERE edition = ? AND name = ?", (edition, name)).fetchone()
+        return zlib.decompress(row[0]) if row else None
+
+    def document(self, edition, name):
+        """元の JSON を解析して返す（無ければ None）"""
+        raw = self.document_bytes(edition, name)
+        return json.loads(raw.decode('utf-8')) if raw is not None else None
+
+    def team_results(self, edition):
+        """大会の最終順位（overall_rank 順）"""
+        return self._rows("SELECT * FROM teams WHERE edition = ? ORDER BY overall_rank IS NULL, overall_rank, team_id",
+                          (edition,))
+
+    def runner_history(self, runner_name):
+        """選手の全大会の記録: [{edition, team_id, team_name, total_distance, days, legs: [...], records: [...]}]"""
+        history = self._rows(
+            "SELECT r.edition, r.team_id, t.team_name, r.total_distance, r.days FROM runners r "
+            "LEFT JOIN teams t ON t.edition = r.edition AND t.team_id = r.team_id "
+            "WHERE r.runner_name = ? ORDER BY r.edition", (runner_name,))
+        legs = self._rows("SELECT edition, leg, days, total_distance, average_distance, leg_rank FROM runner_legs "
+                          "WHERE runner_name = ? ORDER BY edition, leg", (runner_name,))
+        records = self._rows("SELECT edition, day, leg, distance FROM runner_days "
+                             "WHERE runner_name = ? ORDER BY edition, day", (runner_name,))
+        for entry in history:
+            entry['legs'] = [{k: v for k, v in row.items() if k != 'edition'} for row in legs if row['edition'] == entry['edition']]
+            entry['records'] = [{k: v for k, v in row.items() if k != 'edition'} for row in records if row['edition'] == entry['edition']]
+        return history
+
+    def leg_averages(self, leg, edition=None):
+        """区間 leg を走った選手の平均距離（大会指定なしなら全大会）。平均の高い順"""
+        sql = ("SELECT l.edition, l.runner_name, r.team_id, t.team_name, l.days, l.total_distance, "
+               "l.average_distance, l.leg_rank FROM runner_legs l "
+               "JOIN runners r ON r.edition = l.edition AND r.runner_name = l.runner_name "
+               "LEFT JOIN teams t ON t.edition = r.edition AND t.team_id = r.team_id WHERE l.leg = ?")
+        params = [leg]
+        if edition is not None:
+            sql += " AND l.edition = ?"
+            params.append(edition)
+        return self._rows(sql + " ORDER BY l.average_distance DESC, l.edition, l.runner_name", params)
+
+    def daily_records(self, edition, leg=None, day=None):
+        """大会の日ごとの記録（区間・日で絞り込み可）。距離の長い順"""
+        sql = "SELECT runner_name, day, leg, distance FROM runner_days WHERE edition = ?"
+        params = [edition]
+        if leg is not None:
+            sql += " AND leg = ?"
+            params.append(leg)
+        if day is not None:
+            sql += " AND day = ?"
+            params.append(day)
+        return self._rows(sql + " ORDER BY distance DESC, runner_name", params)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='過去大会アーカイブ（history_data/editions.sqlite3）の作成・照会')
+    parser.add_argument('--archive', default=str(ARCHIVE_FILE), help=f'アーカイブのパス（既定 {ARCHIVE_FILE}）')
+    sub = parser.add_subparsers(dest='command', required=True)
+    pack = sub.add_parser('pack', help='大会の成績ディレクトリを取り込む')
+    pack.add_argument('--edition', type=int, required=True)
+    pack.add_argument('--source', required=True, help="成績の JSON があるディレクトリ（data や '15' など）")
+    sub.add_parser('list', help='取り込み済みの大会を表示')
+    runner = sub.add_parser('runner', help='選手の全大会の記録を表示')
+    runner.add_argument('name')
+    leg = sub.add_parser('leg', help='区間の平均距離の一覧を表示')
+    leg.add_argument('leg', type=int)
+    leg.add_argument('--edition', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == 'pack':
+        try:
+            counts = pack_edition(args.edition, args.source, args.archive)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            print(f"エラー: 第{args.edition}回大会の取り込みに失敗しました: {e}")
+            return 1
+        print(f"✅ 第{args.edition}回大会を '{args.archive}' に取り込みました。"
+              f"（選手 {counts['runners']}人・記録 {counts['days']}件・文書 {counts['documents']}件）")
+        return 0
+
+    try:
+        archive = EditionArchive(args.archive)
+    except FileNotFoundError:
+        print(f"エラー: アーカイブ '{args.archive}' が見つかりません。")
+        return 1
+    with archive:
+        if args.command == 'list':
+            rows = archive.edition_info()
+        elif args.command == 'runner':
+            rows = archive.runner_history(args.name)
+        else:
+            rows = archive.leg_averages(args.leg, args.edition)
+    for row in rows:
+        print(json.dumps(row, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,10 +11,13 @@ import json
 import os
 import re
 import hashlib
+from time import monotonic
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 import requests
 from bs4 import BeautifulSoup, Tag
 from datetime import datetime, time, timedelta
 from pathlib import Path
+import board_client
 from time_utils import JST, now_jst, parse_jst_datetime
 
 # --- ディレクトリ定義 ---
@@ -29,11 +32,6 @@ TEST_EKIDEN_DATA_FILE = Path('15/ekiden_data.json')
 TEST_MANAGER_COMMENTS_FILE = Path('15/manager_comments.json')
 TEST_MODE = os.environ.get('EKIDEN_TEST_MODE') == '1'
 
-# HTTP リクエスト共通ヘッダー
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-}
-
 # --- 時間帯定数 ---
 # 夜間窓: 18:00 〜 翌 07:00 (JST)
 # 19時は運用上の取得開始時刻の目安であり、コメント対象日の判定には使わない。
@@ -46,6 +44,12 @@ NIGHT_END_HOUR = 7
 # 未来の投稿時刻は実在コメントとして扱わない（保持上限は現在時刻）。
 RETENTION_HOURS = 48
 
+# --- 取得の期限（秒） ---
+# ソースはすべて同時に並行取得するので、期限は取得開始からの経過時間1つで判定する。
+# 期限を超えたソースは失敗扱い（結果・既読位置とも捨てる）にして他ソースの結果で続行する。
+SOURCE_TIMEOUT_SECONDS = float(os.environ.get('EKIDEN_COMMENT_SOURCE_TIMEOUT', '20'))
+FETCH_STATUS_FILE_NAME = 'manager_comments_fetch_status.json'
+
 
 # ============================================================
 # 1. 設定読み込み
@@ -207,32 +211,29 @@ def parse_5ch_date(date_text):
         return None
 
 
-def parse_5ch_page(html, source_url):
+def comments_from_5ch_posts(posts, source_url):
     """
-    5ch kizuna.5ch.io の HTML から投稿を抽出。
+    board_client.parse_thread_posts の投稿リストからトリップ付き投稿を抽出。
     戻り値: [comment_dict, ...]
     """
-    soup = BeautifulSoup(html, 'html.parser')
-    posts = soup.find_all('div', class_='post')
     comments = []
 
     for post in posts:
-        post_id = post.get('id') or ''
-        username_span = post.find('span', class_='postusername')
-        date_span = post.find('span', class_='date')
-        content_div = post.find('div', class_='post-content')
+        post_id = post.get('anchor') or ''
+        username_text = post.get('name')
+        date_text = post.get('date')
+        content_html = post.get('content_html')
 
-        if not (username_span and date_span and content_div):
+        if username_text is None or date_text is None or content_html is None:
             continue
 
         # トリップコード抽出
-        username_text = username_span.get_text()
         tripcode = extract_tripcode_from_text(username_text)
         if not tripcode:
             continue
 
         # 日時
-        post_dt = parse_5ch_date(date_span.text)
+        post_dt = parse_5ch_date(date_text)
         if not post_dt:
             continue
 
@@ -246,12 +247,20 @@ def parse_5ch_page(html, source_url):
             'timestamp': post_dt,
             'posted_name': posted_name,
             'tripcode': tripcode,
-            'content_html': str(content_div),
+            'content_html': content_html,
         })
 
     return comments
 
 
+def parse_5ch_page(html, source_url):
+    """
+    5ch kizuna.5ch.io の HTML から投稿を抽出。
+    戻り値: [comment_dict, ...]
+    """
+    return comments_from_5ch_posts(board_client.parse_thread_posts(html), source_url)
+
+
 def parse_shitaraba_date(date_text):
     """
     したらばの日時文字列をパース。
@@ -509,32 +518,132 @@ def merge_existing_comments(existing, new_comments):
 def fetch_source(url, kind):
     """
     指定されたソースから HTML を取得し、投稿を抽出する。
-    戻り値: (comments, error_message)
+    戻り値: (comments, error_message, last_id)
     error_message はエラー時のみ文字列、成功時は None
+    last_id はしたらばで今回読んだ最後のレス番号（既読位置として保存する）。それ以外は None
+
+    したらばは既存JSONがある場合、前回保存時の既読位置より後ろだけを範囲指定で取得する
+    （既読分のコメントは既存JSON側に残っている）。
     """
     print(f"  取得中: [{kind}] {url}")
+    if kind != 'shitaraba':
+        # 5ch 本スレは generate_report / process_substitutions と共有キャッシュ経由で取得
+        try:
+            posts, err = board_client.get_thread_posts(url, timeout=SOURCE_TIMEOUT_SECONDS)
+        except Exception as e:
+            msg = f"  エラー: [{kind}] パース失敗: {e}"
+            print(msg)
+            return [], msg, None
+        if err and not posts:
+            msg = f"  エラー: [{kind}] 取得失敗: {err}"
+            print(msg)
+            return [], msg, None
+        comments = comments_from_5ch_posts(posts, url)
+        print(f"  抽出: {len(comments)}件")
+        return comments, None, None
+
+    after_id = board_client.read_cursor(url) if OUTPUT_FILE.exists() else None
+    fetch_url = board_client.range_url(url, after_id + 1) if after_id else url
     try:
-        response = requests.get(url, headers=HEADERS, timeout=20)
-        response.raise_for_status()
-        response.encoding = response.apparent_encoding
+        html = board_client.fetch_html(fetch_url, timeout=SOURCE_TIMEOUT_SECONDS)
     except requests.RequestException as e:
         msg = f"  エラー: [{kind}] 取得失敗: {e}"
         print(msg)
-        return [], msg
+        return [], msg, None
 
     try:
-        if kind == 'shitaraba':
-            comments = parse_shitaraba_page(response.text, url)
-        else:
-            # デフォルトは 5ch パーサ
-            comments = parse_5ch_page(response.text, url)
+        html = board_client.skip_seen_posts(html, after_id, kind='shitaraba')
+        comments = parse_shitaraba_page(html, url) if html else []
     except Exception as e:
         msg = f"  エラー: [{kind}] パース失敗: {e}"
         print(msg)
-        return [], msg
+        return [], msg, None
+
+    last_id = board_client.max_post_id(html, kind='shitaraba')
+    print(f"  抽出: {len(comments)}件" + (f" (レス{after_id + 1}以降)" if after_id else ""))
+    return comments, None, last_id
 
-    print(f"  抽出: {len(comments)}件")
-    return comments, None
+
+def _timed_fetch_source(url, kind):
+    started = monotonic()
+    comments, err, last_id = fetch_source(url, kind)
+    return comments, err, last_id, monotonic() - started
+
+
+def fetch_all_sources(sources, source_timeout=None):
+    """
+    全ソースを並行取得する。
+    戻り値: (all_raw, errors, statuses, cursors)
+    all_raw はソース順に連結（ソース内の後勝ち dedup を変えないため）。
+    statuses は各ソースの {url, kind, status, elapsedSeconds, posts, error}。
+    cursors は期限内に取得できたソースの {url: 最後に読んだレス番号}。
+    期限超過のソースは status='timeout' でエラー扱いにし、残りの結果で続行する。
+    期限超過のソースのスレッドは止められないが、その結果（既読位置を含む）は使わない。
+    """
+    source_timeout = SOURCE_TIMEOUT_SECONDS if source_timeout is None else source_timeout
+    results = [None] * len(sources)
+    executor = ThreadPoolExecutor(max_workers=len(sources) or 1)
+    try:
+        futures = [executor.submit(_timed_fetch_source, src['url'], src['kind']) for src in sources]
+        started = monotonic()
+        for i, (src, future) in enumerate(zip(sources, futures)):
+            # 全ソース同時に始めているので、期限は開始時刻からの経過で判定する
+            remaining = max(0.0, source_timeout - (monotonic() - started))
+            try:
+                results[i] = future.result(timeout=remaining)
+            except FuturesTimeoutError:
+                msg = f"  エラー: [{src['kind']}] {source_timeout:g}秒以内に取得できませんでした: {src['url']}"
+                print(msg)
+                results[i] = ([], msg, None, None)
+            except Exception as e:
+                msg = f"  エラー: [{src['kind']}] 取得失敗: {e}"
+                print(msg)
+                results[i] = ([], msg, None, monotonic() - started)
+    finally:
+        # 期限切れのソースの完了は待たない（requests 側の timeout で打ち切られる）
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    all_raw = []
+    errors = []
+    statuses = []
+    cursors = {}
+    for src, (comments, err, last_id, elapsed) in zip(sources, results):
+        all_raw.extend(comments)
+        if err:
+            errors.append(err)
+        elif last_id:
+            cursors[src['url']] = last_id
+        statuses.append({
+            'url': src['url'],
+            'kind': src['kind'],
+            'status': 'timeout' if elapsed is None else ('error' if err else 'ok'),
+            'elapsedSeconds': round(elapsed, 3) if elapsed is not None else None,
+            'posts': len(comments),
+            'error': err.strip() if err else None,
+        })
+    return all_raw, errors, statuses, cursors
+
+
+def write_fetch_status(statuses):
+    """ソースごとの取得状況を manager_comments.json と同じディレクトリに保存する"""
+    status_file = OUTPUT_FILE.with_name(FETCH_STATUS_FILE_NAME)
+    payload = {
+        'schemaVersion': 1,
+        'fetchedAt': now_jst().isoformat(),
+        'sources': statuses,
+    }
+    try:
+        status_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = status_file.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        os.replace(tmp_path, status_file)
+    except OSError as e:
+        print(f"警告: 取得状況ファイルの保存に失敗しました ({status_file}): {e}")
+        return
+    summary = ', '.join(f"{s['kind']}={s['status']}" for s in statuses)
+    print(f"📋 {status_file} を保存しました ({summary})")
 
 
 def fetch_and_process_comments():
@@ -567,15 +676,9 @@ def fetch_and_process_comments():
     for src in sources:
         print(f"  - [{src['kind']}] {src['url']}")
 
-    # --- 各ソースから独立取得 ---
-    all_raw = []
-    errors = []
-
-    for src in sources:
-        comments, err = fetch_source(src['url'], src['kind'])
-        all_raw.extend(comments)
-        if err:
-            errors.append(err)
+    # --- 各ソースから並行取得 ---
+    all_raw, errors, statuses, cursors = fetch_all_sources(sources)
+    write_fetch_status(statuses)
 
     if not all_raw:
         if errors:
@@ -625,6 +728,7 @@ def fetch_and_process_comments():
     with open(tmp_path, 'w', encoding='utf-8') as f:
         json.dump(manager_comments, f, indent=2, ensure_ascii=False)
     os.replace(tmp_path, OUTPUT_FILE)
+    board_client.write_cursors(cursors)
 
     print(f"処理完了: {len(manager_comments)}件の監督コメントを {OUTPUT_FILE} に保存しました。")
     if errors:
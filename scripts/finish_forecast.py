@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""残りの大会を多数回シミュレーションして、ゴール日・総合順位・シード権の確率を出す。
+
+確定済みの状態（data/ekiden_state.json）から、翌日以降の各チームの走者の最高気温を
+その地点の過去の最高気温（data/daily_temperatures.json と data/archive/realtime_log_*.jsonl）
+から無作為に取り出して足していき、全チームがゴールするか MAX_RACE_DAYS 日目まで進める。
+区間の交代・ゴール日・順位の付け方は generate_report.py の確定処理と同じ
+（1日に進む区間は1つまで、ゴール済みはゴール日→距離、走行中は距離の順、同値は同順位）。
+
+シミュレーションはチームごとに「N 回分の総距離・区間・ゴール日」を列（長さ N のリスト）で持ち、
+1日ごとに同じ区間を走っているシミュレーションをまとめて random.choices(k=件数) で引く。
+距離は 0.1km 単位の整数で扱うので、日々の round(..., 1) と同じ結果になる。
+
+  python scripts/finish_forecast.py                      # data/finish_forecast.json に書き出す
+  python scripts/finish_forecast.py -n 20000 --seed 1    # 回数・乱数シードを指定
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+
+import config_cache
+from time_utils import now_jst
+
+CONFIG_DIR = Path('config')
+DATA_DIR = Path('data')
+EKIDEN_DATA_FILE = CONFIG_DIR / 'ekiden_data.json'
+OUTLINE_FILE = CONFIG_DIR / 'outline.json'
+STATE_FILE = DATA_DIR / 'ekiden_state.json'
+DAILY_TEMPERATURES_FILE = DATA_DIR / 'daily_temperatures.json'
+REALTIME_LOG_ARCHIVE_DIR = DATA_DIR / 'archive'
+FORECAST_FILE = DATA_DIR / 'finish_forecast.json'
+
+FORECAST_VERSION = 1
+DEFAULT_SIMULATIONS = 5000
+# 大会規定に打ち切り日は無いが、シミュレーションはこの日で止め、未ゴールは距離順に並べる
+MAX_RACE_DAYS = 60
+SEED_LINE = 10
+
+_LEG_PREFIX_RE = re.compile(r'^\d+')
+
+
+def _tenths(value):
+    return int(round(value * 10))
+
+
+def _runner_name(runner):
+    return runner.get('name') if isinstance(runner, dict) else runner
+
+
+def load_temperature_history(daily_temperatures, archive_dir=REALTIME_LOG_ARCHIVE_DIR):
+    """地点名 -> 過去の最高気温（0.1℃単位の整数）のリスト
+
+    daily_temperatures.json の確定値を使い、そこに無い日だけ realtime_log のアーカイブから
+    その日の最大値を補う（アーカイブの runner_name は「区間番号+地点名」）。
+    """
+    history = defaultdict(list)
+    for temps in (daily_temperatures or {}).values():
+        for name, temp in temps.items():
+            if isinstance(temp, (int, float)) and temp > 0:
+                history[name].append(_tenths(temp))
+
+    archived = {}
+    archive_dir = Path(archive_dir) if archive_dir else None
+    if archive_dir and archive_dir.is_dir():
+        for log_file in sorted(archive_dir.glob('realtime_log_*.jsonl')):
+            with open(log_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    date = str(entry.get('timestamp', ''))[:10]
+                    distance = entry.get('distance')
+                    if not date or date in (daily_temperatures or {}):
+                        continue
+                    if not isinstance(distance, (int, float)) or distance <= 0:
+                        continue
+                    key = (date, _LEG_PREFIX_RE.sub('', str(entry.get('runner_name', ''))))
+                    archived[key] = max(archived.get(key, 0.0), distance)
+    for (_, name), temp in archived.items():
+        history[name].append(_tenths(temp))
+    return dict(history)
+
+
+def last_committed_day(daily_temperatures, start_date):
+    """確定済みの最終日（大会何日目か）。今大会の確定値がまだ無ければ 0"""
+    start = datetime.strptime(start_date, '%Y-%m-%d').date()
+    days = [(datetime.strptime(date, '%Y-%m-%d').date() - start).days + 1
+            for date in (daily_temperatures or {})]
+    return max([day for day in days if day > 0], default=0)
+
+
+def build_team_plans(ekiden_data, state, history):
+    """シミュレーションする各チームの初期状態と、区間ごとの走者の気温分布"""
+    fallback = sorted(t for temps in history.values() for t in temps)
+    if not fallback:
+        raise ValueError('気温の履歴がありません')
+    state_by_id = {team['id']: team for team in state}
+    plans = []
+    for team in ekiden_data.get('teams', []):
+        team_state = state_by_id.get(team['id'], {})
+        pools = [history.get(_runner_name(runner)) or fallback for runner in team.get('runners', [])]
+        plans.append({
+            'id': team['id'],
+            'name': team['name'],
+            'total': _tenths(team_state.get('totalDistance', 0.0)),
+            'leg': team_state.get('currentLeg', 1),
+            'finishDay': team_state.get('finishDay'),
+            'pools': pools,
+        })
+    return plans
+
+
+def simulate_team(plan, boundaries, first_day, max_day, simulations, rng):
+    """1チーム分を simulations 回シミュレーションし、(ゴール日のリスト, 総距離のリスト) を返す
+
+    ゴール日は未ゴールなら None、距離は 0.1km 単位。
+    """
+    totals = [plan['total']] * simulations
+    finish_days = [plan['finishDay']] * simulations
+    if plan['finishDay'] is not None:
+        return finish_days, totals
+
+    legs = [plan['leg']] * simulations
+    leg_count = len(boundaries)
+    running = list(range(simulations))
+    for day in range(first_day, max_day + 1):
+        if not running:
+            break
+        by_leg = defaultdict(list)
+        for i in running:
+            by_leg[legs[i]].append(i)
+        for leg, indices in by_leg.items():
+            if leg > len(plan['pools']):
+                continue  # 走者がいない区間（generate_report と同じく距離は増えない）
+            boundary = boundaries[leg - 1]
+            for i, temp in zip(indices, rng.choices(plan['pools'][leg - 1], k=len(indices))):
+                total = totals[i] + temp
+                totals[i] = total
+                if total >= boundary:
+                    legs[i] = leg + 1
+                    if leg + 1 > leg_count:
+                        finish_days[i] = day
+        running = [i for i in running if finish_days[i] is None]
+    return finish_days, totals
+
+
+def rank_simulations(results, max_day):
+    """各シミュレーションの総合順位をチームごとのリストで返す（results はチーム順の (ゴール日, 総距離)）"""
+    # ゴール済みは (ゴール日, -距離)、未ゴールはその後ろに -距離 の順。1つの整数に詰めて比べる
+    scale = 10 ** len(str(max(max(totals) for _, totals in results) + 1))
+    keys = [[(day if day is not None else max_day + 1) * scale - total for day, total in zip(finish_days, totals)]
+            for finish_days, totals in results]
+    ranks = [[] for _ in results]
+    for row in zip(*keys):
+        ordered = sorted(row)
+        for team_ranks, key in zip(ranks, row):
+            team_ranks.append(bisect_left(ordered, key) + 1)
+    return ranks
+
+
+def forecast(ekiden_data, state, history, race_day, simulations=DEFAULT_SIMULATIONS, seed=None,
+             max_day=MAX_RACE_DAYS):
+    """race_day 日目までの確定状態から、残りの大会の確率予測（finish_forecast.json の内容）を作る"""
+    rng = random.Random(seed)
+    boundaries = [_tenths(b) for b in ekiden_data['leg_boundaries']]
+    plans = build_team_plans(ekiden_data, state, history)
+    max_day = max(max_day, race_day)
+    results = [simulate_team(plan, boundaries, race_day + 1, max_day, simulations, rng) for plan in plans]
+    ranks = rank_simulations(results, max_day) if plans else []
+
+    teams = []
+    for plan, (finish_days, _), team_ranks in zip(plans, results, ranks):
+        finished = [day for day in finish_days if day is not None]
+        finish_counts = Counter(finished)
+        rank_counts = Counter(team_ranks)
+        teams.append({
+            'id': plan['id'],
+            'name': plan['name'],
+            'currentLeg': plan['leg'],
+            'totalDistance': plan['total'] / 10,
+            'finishDay': plan['finishDay'],
+            'finishDayProbabilities': {str(day): round(count / simulations, 4)
+                                       for day, count in sorted(finish_counts.items())},
+            'unfinishedProbability': round(1 - len(finished) / simulations, 4),
+            'expectedFinishDay': round(sum(finished) / len(finished), 2) if finished else None,
+            'winProbability': round(rank_counts[1] / simulations, 4),
+            'seedProbability': round(sum(c for r, c in rank_counts.items() if r <= SEED_LINE) / simulations, 4),
+            'expectedRank': round(sum(team_ranks) / simulations, 2),
+            'rankProbabilities': [round(rank_counts[r] / simulations, 4) for r in range(1, len(plans) + 1)],
+        })
+    teams.sort(key=lambda t: (t['expectedRank'], t['id']))
+    return {
+        'version': FORECAST_VERSION,
+        'generatedAt': now_jst().isoformat(timespec='seconds'),
+        'raceDay': race_day,
+        'simulations': simulations,
+        'seed': seed,
+        'maxRaceDay': max_day,
+        'seedLine': SEED_LINE,
+        'teams': teams,
+    }
+
+
+def write_forecast(result, path=FORECAST_FILE):
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='残りの大会をシミュレーションし、ゴール日・順位・シード権の確率を出します。')
+    parser.add_argument('-n', '--simulations', type=int, default=DEFAULT_SIMULATIONS,
+                        help=f'シミュレーション回数（既定 {DEFAULT_SIMULATIONS}）')
+    parser.add_argument('--seed', type=int, default=None, help='乱数シード（指定すると結果が再現できる）')
+    parser.add_argument('--day', type=int, default=None,
+                        help='確定済みの最終日（既定: daily_temperatures.json の最終日）')
+    parser.add_argument('--max-day', type=int, default=MAX_RACE_DAYS,
+                        help=f'シミュレーションを打ち切る日（既定 {MAX_RACE_DAYS}日目）')
+    parser.add_argument('--output', type=Path, default=FORECAST_FILE, help=f'出力先（既定 {FORECAST_FILE}）')
+    args = parser.parse_args(argv)
+    if args.simulations <= 0:
+        parser.error('--simulations は 1 以上を指定してください')
+
+    try:
+        ekiden_data = config_cache.load_json(EKIDEN_DATA_FILE)
+        start_date = config_cache.load_json(OUTLINE_FILE)['metadata']['startDate']
+        with open(STATE_FILE, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        with open(DAILY_TEMPERATURES_FILE, 'r', encoding='utf-8') as f:
+            daily_temperatures = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError, KeyError) as e:
+        print(f"エラー: 入力データの読み込みに失敗しました: {e}")
+        return 1
+
+    race_day = args.day if args.day is not None else last_committed_day(daily_temperatures, start_date)
+    history = load_temperature_history(daily_temperatures)
+    try:
+        result = forecast(ekiden_data, state, history, race_day, args.simulations, args.seed, args.max_day)
+    except ValueError as e:
+        print(f"エラー: {e}")
+        return 1
+    write_forecast(result, args.output)
+
+    print(f"✅ {race_day}日目までの確定状態から {args.simulations}回シミュレーションし、'{args.output}' に保存しました。")
+    for team in result['teams']:
+        print(f"  {team['name']}: 優勝 {team['winProbability']:.1%} / シード {team['seedProbability']:.1%}"
+              f" / 予想順位 {team['expectedRank']:.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,7 +9,10 @@ from pathlib import Path
 from dotenv import load_dotenv
 from bs4 import BeautifulSoup
 import unicodedata
-from openai import OpenAI
+import config_cache
+import leg_record_index
+from ai_providers import get_provider, get_response_mode, mode_requires_api_key, prompt_hash
+from article_history_store import ArticleHistoryStore
 from time_utils import JST, now_jst, parse_jst_datetime
 
 # --- ディレクトリ定義 ---
@@ -22,21 +25,23 @@ REALTIME_REPORT_FILE = DATA_DIR / 'realtime_report.json'
 MANAGER_COMMENTS_FILE = DATA_DIR / 'manager_comments.json'
 EKIDEN_DATA_FILE = CONFIG_DIR / 'ekiden_data.json'
 RANK_HISTORY_FILE = DATA_DIR / 'rank_history.json'
-ARTICLE_HISTORY_FILE = DATA_DIR / 'article_history.json'
+ARTICLE_HISTORY_DIR = DATA_DIR / 'article_history'
 OUTPUT_FILE = DATA_DIR / 'daily_summary.json'
 INDIVIDUAL_RESULTS_FILE = DATA_DIR / 'individual_results.json'
 PLAYER_STORY_CONTEXT_FILE = CONFIG_DIR / 'player_story_context.json'
 TEAM_STORY_CONTEXT_FILE = CONFIG_DIR / 'team_story_context.json'
 LEG_STORY_CONTEXT_FILE = CONFIG_DIR / 'leg_story_context.json'
 NARRATIVE_STATE_FILE = DATA_DIR / 'race_narrative_state.json'
+FINISH_FORECAST_FILE = DATA_DIR / 'finish_forecast.json'
 
 # --- AI応答保存用 ---
 AI_RESPONSE_DIR = LOGS_DIR / 'summary_ai_responses'
 
 
-def _save_ai_raw_response(raw_text, provider, model_name, race_date, output_file):
+def _save_ai_raw_response(raw_text, provider, model_name, race_date, output_file, p_hash=None):
     """
     AIの生応答をファイルに保存する。
+    p_hash を渡すと ai_providers の replay モードで同一プロンプトの応答として再利用できる。
     戻り値: (filepath, error_message)
     エラー時は warning を出力し、None を返す（本体処理に影響させない）。
     """
@@ -54,6 +59,7 @@ def _save_ai_raw_response(raw_text, provider, model_name, race_date, output_file
         "model": model_name,
         "race_date": race_date,
         "output_file": str(output_file),
+        "prompt_hash": p_hash,
         "raw_response": raw_text,
         "status": "received",
         "failure_stage": None,
@@ -188,65 +194,45 @@ class DailySummaryGenerator:
             print(f"エラー: 物語状態の保存に失敗しました: {e}")
 
     def _setup_clients(self):
-        """選択されたAIプロバイダーのクライアントを初期化します。"""
+        """選択されたAIプロバイダーのクライアントを初期化します。
+
+        AI_RESPONSE_MODE が replay / fake の場合は API キー不要で、ネットワークに出ません。
+        """
         if not self.dry_run:
+            mode = get_response_mode()
             api_key_name = "GEMINI_API_KEY" if self.provider == "gemini" else "OPENAI_API_KEY"
             api_key = os.getenv(api_key_name)
-            if not api_key:
+            if mode_requires_api_key(mode) and not api_key:
                 print(f"エラー: 環境変数 '{api_key_name}' が設定されていません。")
                 exit(1)
 
-            if self.provider == "gemini":
-                from google import genai
-                self.client = genai.Client(api_key=api_key)
-            else:
-                self.client = OpenAI(api_key=api_key)
-            print(f"✅ {self.provider}クライアントを初期化しました。model={self.model_name}")
+            self.client = get_provider(self.provider, self.model_name, mode=mode, api_key=api_key)
+            print(f"✅ {self.provider}クライアントを初期化しました。model={self.model_name} mode={mode}")
 
     def _get_article_history(self, num_articles=2):
-        """Fetches the last N articles and prompts from the local history file."""
-        if not ARTICLE_HISTORY_FILE.exists():
-            return []
-
-        print(f"ローカルファイルから過去の記事履歴を取得しています ({ARTICLE_HISTORY_FILE})...")
+        """Fetches the last N articles and prompts from the local history store."""
+        store = ArticleHistoryStore(ARTICLE_HISTORY_DIR)
+        print(f"ローカルストアから過去の記事履歴を取得しています ({ARTICLE_HISTORY_DIR})...")
         try:
-            with open(ARTICLE_HISTORY_FILE, 'r', encoding='utf-8') as f:
-                history = json.load(f)
-            print(f"✅ {len(history)}件の記事履歴を発見。最新の{num_articles}件を利用します。")
-            return history[:num_articles]
-        except (json.JSONDecodeError, IOError) as e:
+            # 最新 N 件だけをシークして読む（全件のパースはしない）
+            history = store.latest(num_articles)
+            print(f"✅ 最新の{len(history)}件の記事履歴を利用します。")
+            return history
+        except (json.JSONDecodeError, ValueError, KeyError, IOError) as e:
             print(f"❌ 記事履歴の読み込み中にエラーが発生しました: {e}")
             return []
 
     def _save_article_to_history(self, prompt_text, article_text):
-        """Saves the newly generated article and its prompt to the local history file."""
+        """Appends the newly generated article and its prompt to the local history store."""
         if not prompt_text or not article_text:
             return
 
-        print(f"ローカルファイルに新しい記事とプロンプトを保存しています ({ARTICLE_HISTORY_FILE})...")
-        history = []
-        if ARTICLE_HISTORY_FILE.exists():
-            try:
-                with open(ARTICLE_HISTORY_FILE, 'r', encoding='utf-8') as f:
-                    history = json.load(f)
-            except (json.JSONDecodeError, IOError):
-                print(f"警告: 既存の履歴ファイル '{ARTICLE_HISTORY_FILE}' が読み取れないため、上書きします。")
-                pass
-
-        new_entry = {
-            "date": self.all_data.get('realtime_report', {}).get('updateTime', datetime.now().strftime('%Y/%m/%d %H:%M')).split(' ')[0],
-            "prompt": prompt_text,
-            "article": article_text
-        }
-
-        # Add new entry to the front
-        updated_history = [new_entry] + history
-
+        print(f"ローカルストアに新しい記事とプロンプトを追記しています ({ARTICLE_HISTORY_DIR})...")
+        date = self.all_data.get('realtime_report', {}).get('updateTime', datetime.now().strftime('%Y/%m/%d %H:%M')).split(' ')[0]
         try:
-            with open(ARTICLE_HISTORY_FILE, 'w', encoding='utf-8') as f:
-                json.dump(updated_history, f, indent=2, ensure_ascii=False)
+            ArticleHistoryStore(ARTICLE_HISTORY_DIR).append(date, prompt_text, article_text)
             print("✅ 新しい記事とプロンプトを履歴に保存しました。")
-        except IOError as e:
+        except (ValueError, IOError) as e:
             print(f"❌ 記事履歴の保存中にエラーが発生しました: {e}")
 
     @staticmethod
@@ -264,8 +250,7 @@ class DailySummaryGenerator:
         """outline.jsonから大会情報を読み込む"""
         outline_file = CONFIG_DIR / 'outline.json'
         try:
-            with open(outline_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return config_cache.load_json(outline_file)
         except FileNotFoundError:
             print(f"警告: {outline_file} が見つかりません。デフォルト値を使用します。")
             return {}
@@ -304,11 +289,15 @@ class DailySummaryGenerator:
             'player_story_context': PLAYER_STORY_CONTEXT_FILE,
             'team_story_context': TEAM_STORY_CONTEXT_FILE,
             'leg_story_context': LEG_STORY_CONTEXT_FILE,
+            'finish_forecast': FINISH_FORECAST_FILE,
         }
         for key, file_path in files_to_load.items():
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data[key] = json.load(f)
+                if file_path.parent == CONFIG_DIR:
+                    data[key] = config_cache.load_json(file_path)
+                else:
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        data[key] = json.load(f)
             except FileNotFoundError:
                 if key == 'manager_comments':
                     print(f"情報: {file_path} が見つからないため、監督コメントはスキップされます。")
@@ -325,6 +314,9 @@ class DailySummaryGenerator:
                 elif key == 'leg_story_context':
                     print(f"情報: {file_path} が見つからないため、区間文脈はスキップされます。")
                     data[key] = {}
+                elif key == 'finish_forecast':
+                    print(f"情報: {file_path} が見つからないため、シード権の確率はスキップされます。")
+                    data[key] = {}
                 else:
                     print(f"エラー: 必須データファイル '{file_path}' が見つかりません。")
                     exit(1)
@@ -1736,6 +1728,13 @@ class DailySummaryGenerator:
             else:
                 reason = f"総合{min_rank}位から{max_rank}位のチーム累積距離。集団内の最大差は{gaps['max_spread_km']:.1f}km。"
 
+            seed_odds = self._get_seed_probabilities(metrics.get('race_day'))
+            boundary_odds = [(t['name'], seed_odds[t['name']]) for t in seed_boundary_teams if t['name'] in seed_odds]
+            if boundary_odds:
+                gaps["seed_probability_pct"] = {name: round(p * 100) for name, p in boundary_odds}
+                reason += "残り日程のシミュレーションでのシード権獲得確率は" + "、".join(
+                    f"{name}{p:.0%}" for name, p in boundary_odds) + "。"
+
             zones.append({
                 "zone": "シード境界状況",
                 "teams": [t['name'] for t in seed_boundary_teams],
@@ -1983,14 +1982,32 @@ class DailySummaryGenerator:
         notes.insert(0, "- 以下は当日走行区間の補助文脈（最大1区間）。区間の性格づけとして短く使うこと。")
         return notes
 
+    def _get_seed_probabilities(self, race_day):
+        """finish_forecast.json のシード権獲得確率（チーム名 -> 確率）。当日の確定分で作られたものだけ使う"""
+        forecast = self.all_data.get('finish_forecast') or {}
+        if not forecast or forecast.get('raceDay') != race_day:
+            return {}
+        return {t['name']: t['seedProbability'] for t in forecast.get('teams', [])
+                if isinstance(t.get('seedProbability'), (int, float))}
+
+    def _get_leg_record_index(self):
+        if not hasattr(self, '_leg_record_index'):
+            try:
+                self._leg_record_index = leg_record_index.load_index()
+            except (FileNotFoundError, json.JSONDecodeError) as e:
+                print(f"情報: 区間記録の索引を作成できないため、記録更新の文脈はスキップされます。 {e}")
+                self._leg_record_index = None
+        return self._leg_record_index
+
     def _build_record_break_notes(self, race_day):
         try:
             race_day_int = int(race_day)
         except (TypeError, ValueError):
             return []
 
-        leg_context_root = self.all_data.get('leg_story_context') or {}
-        leg_map = leg_context_root.get('legs', {}) if isinstance(leg_context_root, dict) else {}
+        index = self._get_leg_record_index()
+        if index is None:
+            return []
         individual_results = self.all_data.get('individual_results') or {}
         ekiden_teams = self.all_data.get('ekiden_data', {}).get('teams', [])
         team_lookup = {team.get('id'): team.get('name') for team in ekiden_teams}
@@ -2008,17 +2025,19 @@ class DailySummaryGenerator:
                     continue
                 if summary.get('finalDay') != race_day_int:
                     continue
-                leg_context = leg_map.get(str(leg_key)) or {}
-                best_record = leg_context.get('best_record') or {}
-                best_distance = best_record.get('distance')
                 average_distance = summary.get('averageDistance')
-                if not isinstance(best_distance, (int, float)) or not isinstance(average_distance, (int, float)):
+                check = index.check(leg_key, average_distance)
+                if not check:
                     continue
-                if average_distance <= best_distance:
-                    continue
-                notes.append(
-                    f"- 歴代区間記録更新: 第{leg_key}区で{team_name}の{runner_name}が{average_distance:.3f}kmを記録。従来の最高 {best_record.get('team', '不明')} {best_record.get('runner', '不明')} {best_distance:.3f}km（第{best_record.get('edition', '?')}回）を上回った。"
-                )
+                if check['beatsRecord']:
+                    best_record = index.record_holder(leg_key) or {}
+                    notes.append(
+                        f"- 歴代区間記録更新: 第{leg_key}区で{team_name}の{runner_name}が{average_distance:.3f}kmを記録。従来の最高 {best_record.get('team', '不明')} {best_record.get('runner', '不明')} {best_record.get('record', 0):.3f}km（第{best_record.get('edition', '?')}回）を上回った。"
+                    )
+                elif check['entersTop']:
+                    notes.append(
+                        f"- 歴代区間10傑入り: 第{leg_key}区で{team_name}の{runner_name}が{average_distance:.3f}kmを記録し、歴代{check['rank']}位相当。"
+                    )
 
         return notes
 
@@ -2786,35 +2805,18 @@ class DailySummaryGenerator:
             return
 
         try:
-            if self.provider == "gemini":
-                from google.genai import types
-                response = self.client.models.generate_content(
-                    model=self.model_name,
-                    contents=user_prompt,
-                    config=types.GenerateContentConfig(system_instruction=system_prompt)
-                )
-                raw_article_text = response.text.strip()
-            else:
-                response = self.client.responses.create(
-                    model=self.model_name,
-                    instructions=system_prompt,
-                    input=user_prompt,
-                    text={
-                        "format": {
-                            "type": "json_schema",
-                            "name": "daily_summary",
-                            "strict": True,
-                            "schema": self.DAILY_SUMMARY_JSON_SCHEMA
-                        }
-                    }
-                )
-                raw_article_text = response.output_text.strip()
+            raw_article_text = self.client.generate(
+                user_prompt,
+                system_prompt=system_prompt,
+                json_schema=self.DAILY_SUMMARY_JSON_SCHEMA,
+                schema_name="daily_summary",
+            ).strip()
 
             # --- AI生応答を即時保存（後続のどの段階で失敗しても残る） ---
             race_date = self.all_data.get('realtime_report', {}).get('updateTime', '').split(' ')[0]
             ai_response_file, save_err = _save_ai_raw_response(
                 raw_article_text, self.provider, self.model_name,
-                race_date, str(OUTPUT_FILE)
+                race_date, str(OUTPUT_FILE), prompt_hash(system_prompt, user_prompt)
             )
             if ai_response_file:
                 print(f"  📝 AI応答を保存: {ai_response_file}")
@@ -2835,6 +2837,7 @@ class DailySummaryGenerator:
             except ValueError as e:
                 print(f"❌ 構造化応答のパースに失敗しました: {e}")
                 _update_ai_response_status(ai_response_file, 'failed', 'parse', str(e))
+                self.client.discard()
                 print("   本日はJSON出力指示に応答しなかったため記事を保存せず終了します。")
                 return
 
@@ -2846,6 +2849,7 @@ class DailySummaryGenerator:
                 except ValueError as e:
                     print(f"❌ claims検証失敗: {e}")
                     _update_ai_response_status(ai_response_file, 'failed', 'claims', str(e))
+                    self.client.discard()
                     print("   記事を保存せず終了します。")
                     return
 
@@ -2865,6 +2869,7 @@ class DailySummaryGenerator:
             except ValueError as e:
                 print(f"❌ トークン展開エラー: {e}")
                 _update_ai_response_status(ai_response_file, 'failed', 'token', str(e))
+                self.client.discard()
                 print("   記事を保存せず終了します。")
                 return
 
@@ -2892,6 +2897,8 @@ class DailySummaryGenerator:
                 # 成功: AI応答ファイルは削除（ディスク肥大防止: 失敗時のみ残す設計）
                 _update_ai_response_status(ai_response_file, 'succeeded')
                 _delete_ai_response_file(ai_response_file)
+                # 検証を通った応答だけをキャッシュへ保存する（不採用の記事を再実行で再利用しない）
+                self.client.commit()
 
                 print("物語状態を更新しています...")
                 selected_themes = self.select_today_themes(metrics)
@@ -2915,7 +2922,9 @@ class DailySummaryGenerator:
                 print("❌ 致命的エラーのため、ファイル保存、履歴保存および物語状態の更新をすべてスキップします。")
                 _update_ai_response_status(ai_response_file, 'failed', 'article_validation',
                     '; '.join(validation_fatal_errors) if validation_fatal_errors else '致命的エラー')
+                self.client.discard()
         except Exception as e:
+            self.client.discard()
             print(f"❌ {self.provider} API呼び出し中にエラーが発生しました: {e}")
             print("⚠️ APIエラーのため、ファイル保存および物語状態の更新をスキップします。")
 
@@ -2929,4 +2938,7 @@ def main():
     generator.run()
 
 if __name__ == '__main__':
-    main()
+    import script_profiler
+
+    with script_profiler.from_argv('generate_daily_summary'):
+        main()
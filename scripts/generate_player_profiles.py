@@ -1,9 +1,18 @@
+import argparse
+import hashlib
 import json
 import os
 import glob
+import pickle
+from bisect import bisect_right
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import re
 
+import config_cache
+import edition_archive
+
 # --- ディレクトリ定義 ---
 CONFIG_DIR = Path('config')
 DATA_DIR = Path('data')
@@ -13,11 +22,16 @@ HISTORY_DATA_DIR = Path('history_data')
 EKIDEN_DATA_FILE = CONFIG_DIR / 'ekiden_data.json'
 AMEDAS_STATIONS_FILE = CONFIG_DIR / 'amedas_stations.json'
 LEG_AWARD_HISTORY_FILE = HISTORY_DATA_DIR / 'leg_award_history.json'
+EDITION_ARCHIVE_FILE = HISTORY_DATA_DIR / 'editions.sqlite3'
 OUTLINE_FILE = CONFIG_DIR / 'outline.json'
 
 OUTPUT_FILE = CONFIG_DIR / 'player_profiles.json'
 PLAYER_COMMENTS_FILE = CONFIG_DIR / 'player_comments.json'
 
+# 大会ごとの集計結果のキャッシュ（過去大会の individual_results.json は変わらないので毎回の再計算を省く）
+PERFORMANCE_CACHE_DIR = CONFIG_DIR / '.cache' / 'player_performance'
+PERFORMANCE_CACHE_VERSION = 1
+
 CURRENT_EDITION = 16
 
 # 都道府県コードと都道府県名のマッピング
@@ -35,10 +49,9 @@ PREFECTURE_MAP = {
 }
 
 def load_json(file_path, default=None):
-    """JSONファイルを読み込む。ファイルがない場合はデフォルト値を返す。"""
+    """JSONファイルを読み込む（解析済みキャッシュを使う）。ファイルがない場合はデフォルト値を返す。"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return config_cache.load_json(file_path)
     except (FileNotFoundError, json.JSONDecodeError):
         print(f"情報: '{file_path}' が見つからないか、形式が不正です。スキップします。")
         return default
@@ -60,8 +73,236 @@ def get_prefecture_name(pref_code):
     code = re.sub(r'[a-zA-Z]', '', str(pref_code))
     return PREFECTURE_MAP.get(code, '不明')
 
-def main():
+def _competition_rank(ascending, value):
+    """昇順リスト ascending の中での value の順位（大きい方が上位、同記録は同順位）"""
+    return len(ascending) - bisect_right(ascending, value) + 1
+
+
+def _runner_fingerprint(runner_data):
+    return hashlib.sha256(json.dumps(runner_data, sort_keys=True, ensure_ascii=False).encode('utf-8')).digest()
+
+
+def aggregate_edition(results):
+    """1大会分の individual_results を1回走査し、順位計算用の表を作る。
+
+    戻り値の各表は昇順のタプル:
+      legs[leg]: 区間の全記録（区間順位 legRank 用）
+      days[(leg, day)]: 同日・同区間の全記録（日別順位 dailyRank 用）
+      averages[leg]: 選手ごとの区間平均（サマリーの区間順位 best_leg_rank 用）
+    runner_averages[(runner_name, leg)] は選手の区間平均。
+    """
+    legs = defaultdict(list)
+    days = defaultdict(list)
+    runner_leg_distances = defaultdict(list)
+    for runner_name, runner_data in results.items():
+        for record in runner_data.get('records', []):
+            leg = record.get('leg')
+            distance = record.get('distance')
+            if not leg or distance is None:
+                continue
+            legs[leg].append(distance)
+            runner_leg_distances[(runner_name, leg)].append(distance)
+            day = record.get('day')
+            if day is not None:
+                days[(leg, day)].append(distance)
+
+    runner_averages = {key: sum(distances) / len(distances) for key, distances in runner_leg_distances.items()}
+    averages = defaultdict(list)
+    for (_, leg), avg_dist in runner_averages.items():
+        averages[leg].append(avg_dist)
+    return {
+        'legs': {leg: tuple(sorted(v)) for leg, v in legs.items()},
+        'days': {key: tuple(sorted(v)) for key, v in days.items()},
+        'averages': {leg: tuple(sorted(v)) for leg, v in averages.items()},
+        'runner_averages': runner_averages,
+    }
+
+
+def build_runner_performance(runner_name, runner_perf, tables):
+    """1選手・1大会分の performance（summary と順位付きの records）を作る。records はその場で更新する。"""
+    records = runner_perf.get('records', [])
+    for record in records:
+        leg = record.get('leg')
+        distance = record.get('distance')
+        if leg and distance is not None and leg in tables['legs']:
+            record['legRank'] = _competition_rank(tables['legs'][leg], distance)
+
+        # 日別順位 (dailyRank): 同日・同一区間内の距離順位
+        day = record.get('day')
+        if leg and day is not None and distance is not None and (leg, day) in tables['days']:
+            record['dailyRank'] = _competition_rank(tables['days'][(leg, day)], distance)
+
+    total_distance = runner_perf.get('totalDistance', 0)
+    average_distance = total_distance / len(records) if records else 0
+    legs_run = sorted(list(set([r.get('leg') for r in records if r.get('leg') is not None])))
+
+    # サマリー用の区間順位は、区間ごとの選手別平均距離での順位
+    summary_leg_ranks = []
+    for leg in legs_run:
+        my_avg_dist = tables['runner_averages'].get((runner_name, leg))
+        if my_avg_dist is not None:
+            summary_leg_ranks.append(_competition_rank(tables['averages'][leg], my_avg_dist))
+    best_leg_rank = min(summary_leg_ranks) if summary_leg_ranks else None
+
+    return {
+        "summary": {
+            "total_distance": round(total_distance, 1),
+            "average_distance": round(average_distance, 3),
+            "best_leg_rank": best_leg_rank,
+            "legs_run": legs_run
+        },
+        "records": records
+    }
+
+
+def _runner_table_keys(runner_perf):
+    keys = set()
+    for record in runner_perf.get('records', []):
+        leg = record.get('leg')
+        if leg:
+            keys.add(('legs', leg))
+            keys.add(('averages', leg))
+            keys.add(('days', (leg, record.get('day'))))
+    return keys
+
+
+def compute_edition_performance(raw, previous=None):
+    """individual_results.json の中身 raw（bytes）から {選手名: performance} とキャッシュ内容を作る（不正な JSON なら None）。
+
+    previous（同じ大会の前回のキャッシュ）があれば、記録が変わった選手と、順位の表が変わった
+    区間・日に記録がある選手だけを計算し直し、それ以外は前回の結果を使う。
+    """
+    try:
+        results = json.loads(raw.decode('utf-8'))
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return None
+    results = results or {}
+    fingerprints = {name: _runner_fingerprint(data) for name, data in results.items()}
+    tables = aggregate_edition(results)
+
+    changed_tables = None
+    if previous and previous.get('version') == PERFORMANCE_CACHE_VERSION:
+        old_tables = previous['tables']
+        changed_tables = {(kind, key) for kind in ('legs', 'days', 'averages')
+                          for key in tables[kind].keys() | old_tables[kind].keys()
+                          if tables[kind].get(key) != old_tables[kind].get(key)}
+
+    performance = {}
+    recomputed = 0
+    for runner_name, runner_perf in results.items():
+        if not (runner_perf and runner_perf.get('records')):
+            continue
+        reusable = (changed_tables is not None
+                    and previous['fingerprints'].get(runner_name) == fingerprints[runner_name]
+                    and runner_name in previous['performance']
+                    and not (_runner_table_keys(runner_perf) & changed_tables))
+        if reusable:
+            performance[runner_name] = previous['performance'][runner_name]
+        else:
+            performance[runner_name] = build_runner_performance(runner_name, runner_perf, tables)
+            recomputed += 1
+
+    return {
+        'version': PERFORMANCE_CACHE_VERSION,
+        'sha256': hashlib.sha256(raw).hexdigest(),
+        'fingerprints': fingerprints,
+        'tables': {kind: tables[kind] for kind in ('legs', 'days', 'averages')},
+        'performance': performance,
+        'recomputed': recomputed,
+    }
+
+
+def _performance_cache_path(edition):
+    return PERFORMANCE_CACHE_DIR / f"{edition}.pickle"
+
+
+def _read_performance_cache(edition):
+    try:
+        with open(_performance_cache_path(edition), 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        # 無い・壊れている・古い形式のキャッシュは作り直す
+        return None
+
+
+def _write_performance_cache(edition, entry):
+    path = _performance_cache_path(edition)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+
+
+def load_edition_performances(jobs=1, use_cache=True):
+    """過去大会ごとの {大会: {選手名: performance}} を返す。
+
+    過去大会は history_data/editions.sqlite3（scripts/edition_archive.py）と、従来の '15/' のような
+    ディレクトリから探す（同じ大会が両方にあればディレクトリを優先する）。
+
+    入力（individual_results.json）の SHA-256 が前回と同じ大会はキャッシュをそのまま使う。
+    変わった大会だけを集計し、jobs > 1 なら大会ごとに別プロセスで並列に集計する。
+    """
+    sources = {}
+    for dir_path in glob.glob('[0-9]*/'):  # '15/' のようなディレクトリを探す
+        edition = Path(dir_path).name.replace('/', '')
+        past_results_file = Path(dir_path) / 'individual_results.json'
+        try:
+            sources[edition] = past_results_file.read_bytes()
+        except OSError:
+            print(f"情報: '{past_results_file}' が見つからないか、形式が不正です。スキップします。")
+    if EDITION_ARCHIVE_FILE.exists():
+        with edition_archive.EditionArchive(EDITION_ARCHIVE_FILE) as archive:
+            for edition in archive.editions():
+                if str(edition) not in sources:
+                    raw = archive.document_bytes(edition, 'individual_results.json')
+                    if raw is not None:
+                        sources[str(edition)] = raw
+
+    entries = {}
+    pending = {}
+    for edition, raw in sources.items():
+        cached = _read_performance_cache(edition) if use_cache else None
+        if (cached and cached.get('version') == PERFORMANCE_CACHE_VERSION
+                and cached.get('sha256') == hashlib.sha256(raw).hexdigest()):
+            entries[edition] = cached
+        else:
+            pending[edition] = cached
+
+    if pending:
+        editions = list(pending)
+        arguments = ([sources[edition] for edition in editions], [pending[edition] for edition in editions])
+        if jobs > 1 and len(editions) > 1:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(editions))) as executor:
+                computed = list(executor.map(compute_edition_performance, *arguments))
+        else:
+            computed = list(map(compute_edition_performance, *arguments))
+        for edition, entry in zip(editions, computed):
+            if entry is None:
+                print(f"情報: '{edition}/individual_results.json' が見つからないか、形式が不正です。スキップします。")
+                continue
+            print(f"   第{edition}回: {entry['recomputed']}/{len(entry['performance'])}人を集計")
+            entries[edition] = entry
+            if use_cache:
+                _write_performance_cache(edition, entry)
+
+    return {edition: entries[edition]['performance'] for edition in sorted(entries, key=int)}
+
+
+def main(argv=None):
     """選手名鑑用のJSONデータを生成するメイン関数"""
+    parser = argparse.ArgumentParser(description='選手名鑑用の player_profiles.json を生成します。')
+    parser.add_argument('--jobs', type=int, default=1, help='集計し直す過去大会が複数ある場合の並列プロセス数（既定 1）')
+    parser.add_argument('--no-cache', action='store_true', help='大会ごとの集計キャッシュを使わずに集計し直します。')
+    args = parser.parse_args(argv)
+    jobs, use_cache = args.jobs, not args.no_cache
+
     print("選手名鑑データ (player_profiles.json) の生成を開始します...")
     current_edition = load_current_edition()
 
@@ -106,86 +347,8 @@ def main():
                     "notes": award.get('notes', [])
                 })
 
-    # 大会ごとの個人記録データを読み込む
-    performance_data = {}
-    # 過去大会の記録 (例: '15/individual_results.json')
-    past_edition_dirs = glob.glob('[0-9]*/') # '15/' のようなディレクトリを探す
-    for dir_path in past_edition_dirs:
-        edition = Path(dir_path).name.replace('/', '')
-        past_results_file = Path(dir_path) / 'individual_results.json'
-        past_results = load_json(past_results_file)
-        if past_results:
-            performance_data[edition] = past_results
-
-    # --- 3. 大会ごと・区間ごとの全記録を収集し、順位計算の準備 ---
-    all_leg_performances = {} # {edition: {leg: [dist1, dist2, ...]}}
-    for edition, results in performance_data.items():
-        all_leg_performances[edition] = {}
-        for runner_name, runner_data in results.items():
-            for record in runner_data.get('records', []):
-                leg = record.get('leg')
-                distance = record.get('distance')
-                if leg and distance is not None:
-                    if leg not in all_leg_performances[edition]:
-                        all_leg_performances[edition][leg] = []
-                    all_leg_performances[edition][leg].append(distance)
-
-    # 各区間の記録を降順（距離が大きい方が上位）にソート
-    for edition, legs in all_leg_performances.items():
-        for leg, distances in legs.items():
-            distances.sort(reverse=True)
-
-    # --- 3.2. 大会ごと・区間ごと・日ごとの全記録を収集し、日別順位計算の準備 ---
-    all_daily_performances = {}  # {edition: {leg: {day: [dist1, dist2, ...]}}}
-    for edition, results in performance_data.items():
-        all_daily_performances[edition] = {}
-        for runner_name, runner_data in results.items():
-            for record in runner_data.get('records', []):
-                leg = record.get('leg')
-                day = record.get('day')
-                distance = record.get('distance')
-                if leg and day is not None and distance is not None:
-                    if leg not in all_daily_performances[edition]:
-                        all_daily_performances[edition][leg] = {}
-                    if day not in all_daily_performances[edition][leg]:
-                        all_daily_performances[edition][leg][day] = []
-                    all_daily_performances[edition][leg][day].append(distance)
-
-    # 各区間・各日の記録を降順にソート
-    for edition, legs in all_daily_performances.items():
-        for leg, days in legs.items():
-            for day, distances in days.items():
-                distances.sort(reverse=True)
-
-    # --- 3.5. 大会ごと・区間ごとの「選手別平均走行距離」ランキングを作成 ---
-    leg_average_rankings = {} # {edition: {leg: [{'runner_name': str, 'avg_dist': float}, ...]}}
-    for edition, results in performance_data.items():
-        leg_average_rankings[edition] = {}
-        # まず、選手ごと・区間ごとに走行距離を集計
-        runner_leg_stats = {} # {runner_name: {leg: [dist1, dist2, ...]}}
-        for runner_name, runner_data in results.items():
-            runner_leg_stats[runner_name] = {}
-            for record in runner_data.get('records', []):
-                leg = record.get('leg')
-                distance = record.get('distance')
-                if leg and distance is not None:
-                    if leg not in runner_leg_stats[runner_name]:
-                        runner_leg_stats[runner_name][leg] = []
-                    runner_leg_stats[runner_name][leg].append(distance)
-
-        # 次に、区間ごとに選手とその平均距離をリスト化
-        leg_performances_for_ranking = {}
-        for runner_name, leg_data in runner_leg_stats.items():
-            for leg, distances in leg_data.items():
-                if not distances: continue
-                avg_dist = sum(distances) / len(distances)
-                if leg not in leg_performances_for_ranking:
-                    leg_performances_for_ranking[leg] = []
-                leg_performances_for_ranking[leg].append({'runner_name': runner_name, 'avg_dist': avg_dist})
-        
-        for leg, performances in leg_performances_for_ranking.items():
-            performances.sort(key=lambda x: x['avg_dist'], reverse=True)
-            leg_average_rankings[edition][leg] = performances
+    # --- 3. 大会ごとの個人記録を集計（大会ごとに1回の走査。結果は入力のハッシュでキャッシュ） ---
+    performance_data = load_edition_performances(jobs=jobs, use_cache=use_cache)
 
     # --- 4. 選手プロファイルの生成 ---
     player_profiles = {}
@@ -254,62 +417,9 @@ def main():
 
             # 大会ごとのパフォーマンス情報の構築
             profile['performance'] = {}
-            for edition, results in performance_data.items():
-                runner_perf = results.get(runner_name)
-                if runner_perf and runner_perf.get('records'):
-                    records = runner_perf.get('records', []) # オリジナルのrecordsをコピーして変更
-
-                    # --- 区間順位を計算して records に追加 ---
-                    for record in records:
-                        leg = record.get('leg')
-                        distance = record.get('distance')
-                        if leg and distance is not None and edition in all_leg_performances and leg in all_leg_performances[edition]:
-                            leg_distances = all_leg_performances[edition][leg]
-                            # 同順位を考慮した順位計算 (list.indexは最初に見つかったインデックスを返す)
-                            try:
-                                rank = leg_distances.index(distance) + 1
-                                record['legRank'] = rank
-                            except ValueError:
-                                record['legRank'] = None # 万が一見つからない場合
-
-                        # 日別順位 (dailyRank): 同日・同一区間内の距離順位
-                        day = record.get('day')
-                        if leg and day is not None and distance is not None:
-                            if (edition in all_daily_performances and leg in all_daily_performances[edition]
-                                    and day in all_daily_performances[edition][leg]):
-                                day_distances = all_daily_performances[edition][leg][day]
-                                try:
-                                    day_rank = day_distances.index(distance) + 1
-                                    record['dailyRank'] = day_rank
-                                except ValueError:
-                                    record['dailyRank'] = None
-
-                    total_distance = runner_perf.get('totalDistance', 0)
-                    average_distance = total_distance / len(records) if records else 0
-                    legs_run = sorted(list(set([r.get('leg') for r in records if r.get('leg') is not None])))
-                    
-                    # 新しいロジックでサマリー用の区間順位を計算
-                    summary_leg_ranks = []
-                    for leg in legs_run:
-                        if edition in leg_average_rankings and leg in leg_average_rankings[edition]:
-                            ranking_list = leg_average_rankings[edition][leg]
-                            try:
-                                my_avg_dist = next(p['avg_dist'] for p in ranking_list if p['runner_name'] == runner_name)
-                                rank = next(i for i, p in enumerate(ranking_list) if p['avg_dist'] == my_avg_dist) + 1
-                                summary_leg_ranks.append(rank)
-                            except StopIteration:
-                                pass # 自分の記録が見つからない場合は何もしない
-                    best_leg_rank = min(summary_leg_ranks) if summary_leg_ranks else None
-
-                    profile['performance'][edition] = {
-                        "summary": {
-                            "total_distance": round(total_distance, 1),
-                            "average_distance": round(average_distance, 3),
-                            "best_leg_rank": best_leg_rank,
-                            "legs_run": legs_run
-                        },
-                        "records": records
-                    }
+            for edition, edition_performance in performance_data.items():
+                if runner_name in edition_performance:
+                    profile['performance'][edition] = edition_performance[runner_name]
 
             # 保持区間記録（自己ベスト）の構築
             profile['personal_best'] = personal_best_map.get(runner_name, [])
@@ -328,4 +438,7 @@ def main():
         print(f"エラー: ファイルへの書き込みに失敗しました: {e}")
 
 if __name__ == '__main__':
-    main()
+    import script_profiler
+
+    with script_profiler.from_argv('generate_player_profiles'):
+        main()
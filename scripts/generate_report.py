@@ -5,15 +5,19 @@ import bisect
 import math
 from pathlib import Path
 from datetime import datetime, timedelta, time
-import requests
 import shutil
 import sys
 import argparse
 import re
 import unicodedata
 from collections import defaultdict
-from bs4 import BeautifulSoup
-from geopy.distance import geodesic
+# requests / bs4 / geopy / dotenv は使う関数の中で import する（--commit や早期終了する実行の起動を軽くするため）
+import board_client
+import config_cache
+import leg_record_index
+import push_outbox
+import run_metrics
+import station_index
 from time_utils import JST, now_jst, format_jst_iso
 
 # --- ディレクトリ定義 ---
@@ -54,6 +58,7 @@ PAST_RESULTS_FILE = HISTORY_DATA_DIR / 'past_results.json'
 LEG_AWARD_HISTORY_FILE = HISTORY_DATA_DIR / 'leg_award_history.json'
 TOURNAMENT_RECORDS_FILE = HISTORY_DATA_DIR / 'tournament_records.json'
 LEG_BEST_RECORDS_FILE = HISTORY_DATA_DIR / 'leg_best_records.json'
+LEG_RECORD_INDEX_FILE = HISTORY_DATA_DIR / 'leg_record_index.json'
 REALTIME_REPORT_FILE = DATA_DIR / 'realtime_report.json'
 INDIVIDUAL_STATE_FILE = DATA_DIR / 'individual_results.json'
 RANK_HISTORY_FILE = DATA_DIR / 'rank_history.json'
@@ -66,30 +71,25 @@ REALTIME_LOG_FILE = DATA_DIR / 'realtime_log.jsonl'
 # --- 定数 ---
 # outline.json が読めない場合の最終フォールバック
 EKIDEN_START_DATE = '2026-07-23'
+# Yahoo!天気 アメダスのベースURL（ベンチマークでは録画HTMLを返すローカルサーバーに向ける）
+YAHOO_AMEDAS_BASE_URL = os.environ.get('EKIDEN_YAHOO_AMEDAS_BASE_URL', 'https://weather.yahoo.co.jp/weather/amedas')
 HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
 
 # --- グローバル変数 ---
-stations_data = []
-stations_by_code = {}  # code -> station
 all_teams_data = [] # 正規チームとシャドーチームを結合したデータ
 ekiden_data = {}
-story_settings = {}
-past_results = []
-leg_award_history = []
-tournament_records = []
-leg_best_records = {}
-intramural_rankings = {}
 # 通常チームの現行登録選手名 → teamId のマップ (shadow とは別管理)。
 # generate_report.py は選手名をキーに individual_results を管理するため、
 # shadow_team.json と同名の通常選手が teamId=99 に混入するのを防ぐ。
 current_runner_team_map = {}
+# 今回の実行で歴代区間記録・歴代10傑の圏内に入った走者（速報コメント・プッシュ通知用）
+leg_record_alerts = []
 
 def load_start_date_from_outline():
     """outline.json の metadata.startDate を正本として大会開始日を取得する"""
     global EKIDEN_START_DATE
     try:
-        with open(OUTLINE_FILE, 'r', encoding='utf-8') as f:
-            outline = json.load(f)
+        outline = config_cache.load_json(OUTLINE_FILE)
         metadata = outline.get('metadata', {})
         start_date = metadata.get('startDate')
         if start_date:
@@ -144,21 +144,123 @@ def build_current_runner_team_map(teams):
     return runner_team_map, None
 
 
+# --- 遅延読み込みするデータ ---
+# 毎回必要なのは ekiden_data / shadow_team だけなので、観測所一覧（約1,300件）や歴史データは
+# 初回アクセス時に読み込む。generate_report.past_results のようなモジュール属性としても参照できる。
+# 名前: (パスを持つモジュール定数名, 必須か)
+LAZY_DATASETS = {
+    'stations_data': ('AMEDAS_STATIONS_FILE', True),
+    'story_settings': ('STORY_SETTINGS_FILE', True),
+    'past_results': ('PAST_RESULTS_FILE', True),
+    'leg_award_history': ('LEG_AWARD_HISTORY_FILE', True),
+    'tournament_records': ('TOURNAMENT_RECORDS_FILE', True),
+    'leg_best_records': ('LEG_BEST_RECORDS_FILE', True),
+    'intramural_rankings': ('INTRAMURAL_RANKINGS_FILE', False),
+}
+_loaded_datasets = {}
+
+
+def get_dataset(name):
+    """LAZY_DATASETS の name を（初回のみ）読み込んで返す。必須ファイルが無い・壊れている場合は終了する。"""
+    if name in _loaded_datasets:
+        return _loaded_datasets[name]
+    path_name, required = LAZY_DATASETS[name]
+    path = globals()[path_name]
+    try:
+        if path.parent == DATA_DIR:
+            # data/ は毎日更新されるので解析済みキャッシュは使わない
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        else:
+            data = config_cache.load_json(path)
+    except FileNotFoundError as e:
+        if required:
+            print(f"エラー: 必須データファイルが見つかりません。 {e.filename}")
+            sys.exit(1)
+        print(f"情報: '{path}' が見つからないため、関連する機能はスキップされます。")
+        data = {}
+    except json.JSONDecodeError as e:
+        if required:
+            print(f"エラー: JSONファイルの形式が正しくありません: {e}")
+            sys.exit(1)
+        print(f"情報: '{path}' が不正なため、関連する機能はスキップされます。")
+        data = {}
+    _loaded_datasets[name] = data
+    return data
+
+
+def get_station_index():
+    """観測所の索引（名前・コード・座標。scripts/station_index.py）"""
+    if 'station_index' not in _loaded_datasets:
+        _loaded_datasets['station_index'] = station_index.StationIndex(get_dataset('stations_data'))
+    return _loaded_datasets['station_index']
+
+
+def get_leg_record_index():
+    """区間ごとの歴代記録のしきい値索引（scripts/leg_record_index.py）。歴史データが無ければ None"""
+    if 'leg_record_index' not in _loaded_datasets:
+        try:
+            index = leg_record_index.load_index(LEG_RECORD_INDEX_FILE, LEG_BEST_RECORDS_FILE, LEG_AWARD_HISTORY_FILE)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            print(f"情報: 区間記録の索引を作成できないため、記録更新の判定はスキップされます。 {e}")
+            index = None
+        _loaded_datasets['leg_record_index'] = index
+    return _loaded_datasets['leg_record_index']
+
+
+def collect_leg_record_alert(leg, runner_name, team_name, previous_average, average, leg_summary=None):
+    """平均距離が今回の更新で歴代区間記録・歴代10傑の圏内に入った場合に leg_record_alerts へ追加する
+
+    leg_summary（individual_results の legSummaries[区間]）を渡すと、通知済みの種類を
+    recordAlerts に記録し、同じ走者・区間・種類は2回目以降通知しない。日をまたぐと朝の時点では
+    当日の気温が低く平均が一旦しきい値を下回るため、前回値との比較だけでは毎日通知されてしまう。
+    """
+    index = get_leg_record_index()
+    if index is None or leg not in index:
+        return None
+    announced = (leg_summary or {}).get('recordAlerts') or []
+    current = index.check(leg, average)
+    previous = index.check(leg, previous_average) if previous_average else None
+    if current['beatsRecord'] and not (previous and previous['beatsRecord']) and 'record' not in announced:
+        kind = 'record'
+    elif current['entersTop'] and not (previous and previous['entersTop']) and 'top' not in announced:
+        kind = 'top'
+    else:
+        return None
+    if leg_summary is not None:
+        # 区間記録の通知は歴代10傑入りも兼ねる
+        leg_summary['recordAlerts'] = sorted(set(announced) | ({'record', 'top'} if kind == 'record' else {'top'}))
+    alert = {'kind': kind, 'leg': leg, 'runner': runner_name, 'team': team_name,
+             'average': average, 'check': current, 'recordHolder': index.record_holder(leg)}
+    leg_record_alerts.append(alert)
+    return alert
+
+
+def get_station_by_code(code):
+    """観測所コードから観測所情報を返す（無ければ None）"""
+    return get_station_index().by_code(code)
+
+
+def __getattr__(name):
+    """generate_report.story_settings などの参照時に遅延データを読み込む"""
+    if name in LAZY_DATASETS:
+        return get_dataset(name)
+    if name == 'stations_by_code':
+        return get_station_index().codes
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def load_all_data():
-    """必要なJSONファイルをすべて読み込む"""
-    global stations_data, stations_by_code, all_teams_data, ekiden_data, story_settings, past_results, leg_award_history, tournament_records, leg_best_records, intramural_rankings, current_runner_team_map
+    """毎回必要な大会設定（ekiden_data / shadow_team）を読み込む。その他は get_dataset() で遅延読み込み。"""
+    global all_teams_data, ekiden_data, current_runner_team_map
+    _loaded_datasets.clear()
     try:
-        with open(AMEDAS_STATIONS_FILE, 'r', encoding='utf-8') as f:
-            stations_data = json.load(f)
-        stations_by_code = {s['code']: s for s in stations_data}
-        with open(EKIDEN_DATA_FILE, 'r', encoding='utf-8') as f:
-            ekiden_data = json.load(f)
+        ekiden_data = config_cache.load_json(EKIDEN_DATA_FILE)
         if TEST_MODE:
             has_runners = any(team.get('runners') for team in ekiden_data.get('teams', []))
             if not has_runners and TEST_EKIDEN_DATA_FILE.exists():
                 print(f"情報: テストモードのため {TEST_EKIDEN_DATA_FILE} を選手データとして使用します。")
-                with open(TEST_EKIDEN_DATA_FILE, 'r', encoding='utf-8') as tf:
-                    ekiden_data = json.load(tf)
+                ekiden_data = config_cache.load_json(TEST_EKIDEN_DATA_FILE)
         ekiden_data['teams'] = [normalize_runner_entries(team) for team in ekiden_data.get('teams', [])]
 
         # 通常チームの現行登録選手 (runners/substitutes/substituted_out) から runner_name → teamId を構築。
@@ -170,8 +272,7 @@ def load_all_data():
         
         # シャドーチームの定義を読み込む
         try:
-            with open(SHADOW_TEAM_FILE, 'r', encoding='utf-8') as f:
-                shadow_team_data = json.load(f)
+            shadow_team_data = config_cache.load_json(SHADOW_TEAM_FILE)
             shadow_team_data = normalize_runner_entries(shadow_team_data)
             # 正規チームとシャドーチームの情報を結合
             all_teams_data = ekiden_data.get('teams', []) + [shadow_team_data]
@@ -179,18 +280,6 @@ def load_all_data():
             print(f"情報: '{SHADOW_TEAM_FILE}' が見つかりません。シャドーチームなしで処理を続行します。")
             all_teams_data = ekiden_data.get('teams', [])
 
-        # --- 歴史データを読み込む ---
-        with open(STORY_SETTINGS_FILE, 'r', encoding='utf-8') as f:
-            story_settings = json.load(f)
-        with open(PAST_RESULTS_FILE, 'r', encoding='utf-8') as f:
-            past_results = json.load(f)
-        with open(LEG_AWARD_HISTORY_FILE, 'r', encoding='utf-8') as f:
-            leg_award_history = json.load(f)
-        with open(TOURNAMENT_RECORDS_FILE, 'r', encoding='utf-8') as f:
-            tournament_records = json.load(f)
-        with open(LEG_BEST_RECORDS_FILE, 'r', encoding='utf-8') as f:
-            leg_best_records = json.load(f)
-
     except FileNotFoundError as e:
         print(f"エラー: 必須データファイルが見つかりません。 {e.filename}")
         sys.exit(1)
@@ -198,21 +287,17 @@ def load_all_data():
         print(f"エラー: JSONファイルの形式が正しくありません: {e}")
         sys.exit(1)
 
-    # 学内ランキングは任意ファイルとして読み込む
-    try:
-        with open(INTRAMURAL_RANKINGS_FILE, 'r', encoding='utf-8') as f:
-            intramural_rankings = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        print(f"情報: '{INTRAMURAL_RANKINGS_FILE}' が見つからないか不正なため、学内ランキング関連の機能はスキップされます。")
-        intramural_rankings = {}
-
 def find_station_by_name(name):
     """地点名から観測所情報を検索"""
-    return next((s for s in stations_data if s['name'] == name), None)
+    return get_station_index().by_name(name)
 
+@run_metrics.timed('yahoo_fetch')
 def fetch_max_temperature(pref_code, station_code):
     """Yahoo天気から最高気温を取得"""
-    url = f"https://weather.yahoo.co.jp/weather/amedas/{pref_code}/{station_code}.html"
+    import requests
+    from bs4 import BeautifulSoup
+
+    url = f"{YAHOO_AMEDAS_BASE_URL}/{pref_code}/{station_code}.html"
     try:
         response = requests.get(url, timeout=10)
         response.raise_for_status()
@@ -233,9 +318,13 @@ def fetch_max_temperature(pref_code, station_code):
     except Exception:
         return {'temperature': None, 'error': '不明な解析エラー'}
 
+@run_metrics.timed('yahoo_fetch')
 def fetch_current_temperature(pref_code, station_code):
     """Yahoo天気から現在の気温を取得"""
-    url = f"https://weather.yahoo.co.jp/weather/amedas/{pref_code}/{station_code}.html?m=temp"
+    import requests
+    from bs4 import BeautifulSoup
+
+    url = f"{YAHOO_AMEDAS_BASE_URL}/{pref_code}/{station_code}.html?m=temp"
     try:
         response = requests.get(url, timeout=10)
         response.raise_for_status()
@@ -272,13 +361,13 @@ def get_manager_tripcodes(ekiden_data):
 def get_thread_url():
     """outline.jsonからスレッドのURLを取得する"""
     try:
-        with open(OUTLINE_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = config_cache.load_json(OUTLINE_FILE)
         return data.get('mainThreadUrl')
     except (FileNotFoundError, json.JSONDecodeError) as e:
         print(f"エラー: {OUTLINE_FILE} の読み込みに失敗しました: {e}")
         return None
 
+@run_metrics.timed('board')
 def fetch_daytime_manager_comment(ekiden_data):
     """日中（7:00-18:59）に投稿された最新の監督コメントを1件取得する。"""
     now = now_jst()
@@ -289,30 +378,21 @@ def fetch_daytime_manager_comment(ekiden_data):
     if not manager_tripcodes or not thread_url:
         return None
 
-    try:
-        response = requests.get(thread_url, headers=HEADERS, timeout=20)
-        response.raise_for_status()
-        response.encoding = response.apparent_encoding
-    except requests.RequestException:
-        return None
-
-    soup = BeautifulSoup(response.text, 'html.parser')
-    posts = soup.find_all('div', class_='post')
+    # process_substitutions / fetch_manager_comments と共有のスレッドキャッシュを使う
+    posts, _ = board_client.get_thread_posts(thread_url)
     trip_pattern = re.compile(r'(◆[a-zA-Z0-9./]+)')
 
     for post in reversed(posts):
-        username_span = post.find('span', class_='postusername')
-        date_span = post.find('span', class_='date')
-        content_div = post.find('div', class_='post-content')
-
-        if not (username_span and date_span and content_div):
+        username = post['name']
+        date_text = post['date']
+        if username is None or date_text is None or post['content_html'] is None:
             continue
 
-        trip_match = trip_pattern.search(username_span.get_text())
+        trip_match = trip_pattern.search(username)
         if not trip_match or trip_match.group(1) not in manager_tripcodes:
             continue
 
-        date_match = re.search(r'(\d{4}/\d{2}/\d{2})\(.\)\s*(\d{2}:\d{2}:\d{2})', date_span.text.strip())
+        date_match = re.search(r'(\d{4}/\d{2}/\d{2})\(.\)\s*(\d{2}:\d{2}:\d{2})', date_text.strip())
         if not date_match:
             continue
 
@@ -321,8 +401,8 @@ def fetch_daytime_manager_comment(ekiden_data):
             f"{date_match.group(1)} {date_match.group(2)}", '%Y/%m/%d %H:%M:%S'
         ).replace(tzinfo=JST)
         if time(7, 0) <= post_datetime.time() < time(19, 0) and (now - post_datetime) < timedelta(minutes=10):
-            posted_name = username_span.get_text().split('◆')[0].strip()
-            content_text = content_div.get_text(separator=' ', strip=True)
+            posted_name = username.split('◆')[0].strip()
+            content_text = board_client.post_text(post, ' ')
             return {'name': posted_name, 'content': content_text}
 
     return None
@@ -367,6 +447,23 @@ def _generate_leg_finish_comment(current_results, previous_report_data):
         return "【区間走破】" + " ".join(comments)
     return None
 
+def _generate_leg_record_comment(current_results, previous_report_data):
+    """平均距離が歴代区間記録・歴代10傑の圏内に入った走者のコメントを生成"""
+    record_alerts = [a for a in leg_record_alerts if a['kind'] == 'record']
+    if record_alerts:
+        comments = []
+        for alert in sorted(record_alerts, key=lambda a: a['leg']):
+            holder = alert['recordHolder'] or {}
+            comments.append(f"{alert['leg']}区の{alert['team']}・{alert['runner']}選手が平均{alert['average']:.3f}kmで"
+                            f"歴代区間記録（{holder.get('record', 0):.3f}km）を上回るペース！")
+        return "【区間記録】" + " ".join(comments)
+    top_alerts = [a for a in leg_record_alerts if a['kind'] == 'top']
+    if top_alerts:
+        comments = [f"{a['leg']}区の{a['team']}・{a['runner']}選手が平均{a['average']:.3f}kmで歴代{a['check']['rank']}位相当！"
+                    for a in sorted(top_alerts, key=lambda a: (a['leg'], a['check']['rank']))]
+        return "【歴代10傑】" + " ".join(comments)
+    return None
+
 def _comment_contains_shadow_team(comment):
     """コメント文字列にシャドーチーム（区間記録連合）の表示名が含まれるか判定する。
 
@@ -501,6 +598,7 @@ def generate_breaking_news_comment(current_results, previous_report_data):
 
     comment_generators = [
         _generate_lead_change_comment,
+        _generate_leg_record_comment,
         _generate_leg_finish_comment,
         _generate_heat_wave_comment,
         _generate_rank_change_comment,
@@ -597,6 +695,7 @@ def load_individual_results(file_path):
 
     return runners_state
 
+@run_metrics.timed('file_write')
 def save_ekiden_state(state, file_path, race_day=None):
     """駅伝の現在の状態を保存する"""
     data_to_save = []
@@ -616,6 +715,7 @@ def save_ekiden_state(state, file_path, race_day=None):
     with open(file_path, 'w', encoding='utf-8') as f:
         json.dump(data_to_save, f, indent=2, ensure_ascii=False)
 
+@run_metrics.timed('file_write')
 def save_individual_results(runners_state, file_path):
     """選手個人の結果を保存する"""
     DATA_DIR.mkdir(parents=True, exist_ok=True)
@@ -788,6 +888,7 @@ def pad_str(text, length, char='＿'):
     """指定した文字幅になるように文字列をパディング"""
     return text + char * (length - get_east_asian_width_count(text))
 
+@run_metrics.timed('file_write')
 def save_realtime_report(results, race_day, breaking_news_comment, breaking_news_timestamp, breaking_news_full_text=""):
     """速報用のJSONデータを生成して保存する"""
     from time_utils import format_jst_datetime
@@ -839,6 +940,7 @@ def save_realtime_report(results, race_day, breaking_news_comment, breaking_news
     with open(REALTIME_REPORT_FILE, 'w', encoding='utf-8') as f:
         json.dump(report_data, f, indent=2, ensure_ascii=False)
 
+@run_metrics.timed('file_write')
 def update_rank_history(results, race_day, rank_history_file_path):
     """日々の総合順位と距離の履歴を更新する"""
     try:
@@ -885,8 +987,7 @@ BOUNDARY_SNAP_TOLERANCE_KM = 1e-3  # 設定境界とみなす距離許容（1m
 def _load_relay_points():
     """relay_points.json を読み込む。失敗時は None を返す。"""
     try:
-        with open(RELAY_POINTS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return config_cache.load_json(RELAY_POINTS_FILE)
     except (FileNotFoundError, json.JSONDecodeError):
         return None
 
@@ -937,6 +1038,7 @@ def _legacy_runner_position(target_distance_km, course_points, final_goal_km):
       例外を出さず有効な座標（先頭の有効点・最終点）で安全に扱う。
     - final_goal_km が None の場合はゴールスナップしない（save_snapshot 従来動作）。
     """
+    from geopy.distance import geodesic
     try:
         target = float(target_distance_km)
     except (TypeError, ValueError):
@@ -973,6 +1075,7 @@ def _legacy_runner_position(target_distance_km, course_points, final_goal_km):
     return (team_lat, team_lon)
 
 
+@run_metrics.timed('calibration')
 def _build_map_distance_calibration(course_path, relay_points, leg_boundaries):
     """KMLコース距離を設定距離（leg_boundaries）へ区間別に補正するアンカーを構築する。
 
@@ -986,6 +1089,7 @@ def _build_map_distance_calibration(course_path, relay_points, leg_boundaries):
     アンカー対応: 0km→スタート、leg_boundaries[i-1]→第i中継所、最終境界→ゴール。
     通常は configured_distances と anchor_coordinates がともに len(leg_boundaries)+1 要素になる。
     """
+    from geopy.distance import geodesic
     if not isinstance(course_path, list) or len(course_path) < 2:
         return None
     if not isinstance(relay_points, list) or len(relay_points) == 0:
@@ -1077,6 +1181,7 @@ def _build_map_distance_calibration(course_path, relay_points, leg_boundaries):
 
 def _find_nearest_course_vertex(lat, lon, approx_km, course_path, course_cumulative_distances):
     """中継所座標に最近傍の course_path 頂点インデックスを返す。見つからなければ None。"""
+    from geopy.distance import geodesic
     lo = bisect.bisect_left(course_cumulative_distances, max(0.0, approx_km - ANCHOR_SEARCH_WINDOW_KM))
     hi = bisect.bisect_right(course_cumulative_distances, approx_km + ANCHOR_SEARCH_WINDOW_KM)
     best_idx, best_dist = None, float('inf')
@@ -1162,11 +1267,11 @@ def _get_calibrated_runner_position(target_distance_km, course_path, calibration
     return _interpolate_on_course(actual_target, norm_course, course_cum)
 
 
+@run_metrics.timed('runner_locations')
 def calculate_and_save_runner_locations(teams_data):
     """各チームの現在位置（緯度経度）を計算して保存する"""
     try:
-        with open(COURSE_PATH_FILE, 'r', encoding='utf-8') as f:
-            all_points = json.load(f)
+        all_points = config_cache.load_json(COURSE_PATH_FILE)
     except (FileNotFoundError, json.JSONDecodeError) as e:
         print(f"エラー: {COURSE_PATH_FILE} の読み込みに失敗: {e}")
         return
@@ -1216,6 +1321,7 @@ def calculate_and_save_runner_locations(teams_data):
         json.dump(runner_locations, f, indent=2, ensure_ascii=False)
     print(f"\n計算完了: {len(runner_locations)}チームの位置を {RUNNER_LOCATIONS_OUTPUT_FILE} に保存しました。")
 
+@run_metrics.timed('file_write')
 def append_to_realtime_log(results):
     """リアルタイムログファイルに現在の走行データを追記する"""
     now_iso = now_jst().isoformat()
@@ -1268,6 +1374,7 @@ def list_snapshots():
             continue
     return sorted(snapshots, key=lambda x: x['timestamp'])
 
+@run_metrics.timed('snapshot')
 def save_snapshot(results, race_day, breaking_news_comment, breaking_news_timestamp, breaking_news_full_text="", individual_results=None):
     """速報データのスナップショットを保存する
     
@@ -1286,8 +1393,7 @@ def save_snapshot(results, race_day, breaking_news_comment, breaking_news_timest
     # 位置情報の計算
     runner_locations = []
     try:
-        with open(COURSE_PATH_FILE, 'r', encoding='utf-8') as f:
-            all_points = json.load(f)
+        all_points = config_cache.load_json(COURSE_PATH_FILE)
 
         # calculate_and_save_runner_locations() と同じ共通キャリブレーション/座標ヘルパーを使う。
         # 異常時は None となり従来の単純course_path距離変換へフォールバックする。
@@ -1389,6 +1495,7 @@ def save_snapshot(results, race_day, breaking_news_comment, breaking_news_timest
         json.dump(snapshot_index, f, indent=2, ensure_ascii=False)
     print(f"✅ スナップショット一覧を更新しました（計 {len(snapshots)} 件）")
 
+@run_metrics.timed('file_write')
 def update_leg_rank_history(results, previous_data, leg_rank_history_file_path, is_commit_mode=False):
     """区間通過順位の履歴を更新する。
     - is_commit_mode=False (リアルタイム): 前回の速報データと比較し、この瞬間に区間を通過したチームの順位を記録する。
@@ -1441,39 +1548,23 @@ def update_leg_rank_history(results, previous_data, leg_rank_history_file_path,
     with open(leg_rank_history_file_path, 'w', encoding='utf-8') as f:
         json.dump(history, f, indent=2, ensure_ascii=False)
 
-# .envファイルから環境変数を読み込む
-from dotenv import load_dotenv
-# スクリプトの場所を基準に .env ファイルのパスを解決
-dotenv_path = Path(__file__).resolve().parent.parent / '.env'
-load_dotenv(dotenv_path=dotenv_path)
-
-# Render上のAPIサーバーのURLとシークレットキーを.envから読み込む
-PUSH_API_URL = os.getenv("PROD_PUSH_API_URL")
-API_SECRET_KEY = os.getenv("API_SECRET_KEY")
-
+@run_metrics.timed('push')
 def send_push_notification(title, body):
-    """Render上のAPIサーバーに通知送信を依頼する"""
-    if not PUSH_API_URL or not API_SECRET_KEY:
+    """通知を送信待ちキュー（logs/push_outbox/）に追加する。
+
+    Push API サーバーへの送信は scripts/push_outbox.py が別プロセスで行うため、
+    速報生成は Push API の応答を待たない。
+    """
+    # Render上のAPIサーバーのURLとシークレットキー（初回呼び出し時に .env を読み込む）
+    push_api_url, api_secret_key = push_outbox.push_api_settings()
+    if not push_api_url or not api_secret_key:
         print("警告: 環境変数 PROD_PUSH_API_URL または API_SECRET_KEY が設定されていません。")
         return
 
-    api_endpoint = f"{PUSH_API_URL}/api/send-notification"
-    headers = {
-        'Content-Type': 'application/json',
-        'X-API-Secret': API_SECRET_KEY
-    }
-    # サーバー側で badge_count を付与するため、ここでは title/body のみ送る
-    payload = {
-        "title": title,
-        "body": body
-    }
-
     try:
-        response = requests.post(api_endpoint, headers=headers, json=payload, timeout=60)
-        response.raise_for_status()
-        print(f"APIサーバーへの通知リクエスト成功: {response.json().get('message')}")
-    except requests.RequestException as e:
-        print(f"APIサーバーへの通知リクエスト失敗: {e}")
+        push_outbox.enqueue(title, body)
+    except OSError as e:
+        print(f"通知キューへの追加に失敗しました: {e}")
 
 def send_hourly_ranking_notification(results):
     """9時〜18時の毎時5分に総合順位を通知する"""
@@ -1519,6 +1610,9 @@ def send_hourly_ranking_notification(results):
     notification_body = "\n".join(body_lines)
     print(f"定時順位通知を送信します:\nTitle: {notification_title}\nBody:\n{notification_body}")
     send_push_notification(notification_title, notification_body)
+    if is_test_mode and all(push_outbox.push_api_settings()):
+        # テスト通知はキューに積んだまま終わらせず、その場で送る
+        push_outbox.deliver()
 
 def main():
     """メイン処理"""
@@ -1533,8 +1627,10 @@ def main():
     parser.add_argument('--individual-state-file', default=INDIVIDUAL_STATE_FILE, help=f'個人の状態ファイルパス (デフォルト: {INDIVIDUAL_STATE_FILE})')
     parser.add_argument('--history-file', default=RANK_HISTORY_FILE, help=f'日次順位履歴ファイルパス (デフォルト: {RANK_HISTORY_FILE})')
     args = parser.parse_args()  
+    run_metrics.set_label('mode', 'commit' if args.commit else 'realtime' if args.realtime else 'preview')
 
     # --- 前回レポートの読み込み ---
+    run_metrics.phase('main.load')
     previous_report_file = DATA_DIR / 'realtime_report_previous.json'
     realtime_report_file = REALTIME_REPORT_FILE
     previous_report_data = None
@@ -1557,6 +1653,7 @@ def main():
     individual_results = load_individual_results(args.individual_state_file)
     
     today_leg_records = defaultdict(list)  # leg -> list of record dicts updated today
+    leg_record_alerts.clear()
     legs_completed_today = []  # list of (runner_name, leg_number)
 
     team_info_map = {t['id']: t for t in all_teams_data}
@@ -1585,6 +1682,7 @@ def main():
             sys.exit(1)
 
     # --- Step 1: 正規チームの結果を計算 ---
+    run_metrics.phase('main.team_results')
     regular_team_results = []
     shadow_team_states = []
     print("Step 1: 正規チームの走行結果を計算中...")
@@ -1626,9 +1724,9 @@ def main():
             should_skip = False
             if isinstance(runner_obj, dict) and runner_obj.get('station_code'):
                 code = runner_obj['station_code']
-                station = stations_by_code.get(code)
+                station = get_station_by_code(code)
                 if not station:
-                    print(f"エラー: 選手 '{runner_name}' の観測所コード {code} が stations_by_code に見つかりません")
+                    print(f"エラー: 選手 '{runner_name}' の観測所コード {code} が {AMEDAS_STATIONS_FILE} に見つかりません")
                     max_temp_result = {'temperature': 0, 'error': f'コード {code} 不明'}
                     current_temp_for_log = None
                     should_skip = True
@@ -1733,6 +1831,7 @@ def main():
             })
 
             # 前回の値を差し引いてから今日の距離を加算する
+            previous_average = summary.get('averageDistance') or 0.0
             summary_total = (summary.get("totalDistance", 0.0) or 0.0) - previous_distance + today_distance
             summary['totalDistance'] = round(summary_total, 1)
             current_days = summary.get('days', 0)
@@ -1745,6 +1844,8 @@ def main():
 
             today_leg_records[leg_to_record].append({
                 "runner_name": runner_name,
+                "team_name": team_data['name'],
+                "previous_average": previous_average,
                 "record": record_for_today,
                 "summary": summary
             })
@@ -1765,6 +1866,7 @@ def main():
         })
 
     # 区間ごとの平均距離・順位を更新
+    run_metrics.phase('main.leg_ranking')
     if individual_results:
         leg_performance_map = defaultdict(list)
         for runner_name, runner_data in individual_results.items():
@@ -1820,6 +1922,9 @@ def main():
             is_final_today = summary.get('status') == 'final' and final_day == race_day
             record['legAverageStatus'] = 'final' if is_final_today else 'provisional'
             record['legRankStatus'] = 'final' if is_final_today else 'provisional'
+            if average_distance is not None:
+                collect_leg_record_alert(leg_number, entry['runner_name'], entry.get('team_name'),
+                                         entry.get('previous_average'), average_distance, summary)
 
         # 日別順位 (dailyRank): 同日・同一区間内の距離順位 (competition ranking)
         entries.sort(key=lambda e: e['record'].get('distance', 0) or 0, reverse=True)
@@ -1834,6 +1939,7 @@ def main():
             record['dailyRankStatus'] = record.get('legRankStatus', 'provisional')
 
     # --- Step 2: 区間記録連合の結果を計算 ---
+    run_metrics.phase('main.shadow')
     shadow_team_results = []
     print("\nStep 2: 区間記録連合の走行結果を計算中...")
     if shadow_team_states:
@@ -1853,6 +1959,7 @@ def main():
         runner_index = shadow_leg_num - 1
         
         shadow_runner_name, today_distance, max_temp_result = "ゴール", 0.0, {'temperature': 0, 'error': None}
+        new_total_distance = shadow_state['totalDistance']
         
         if runner_index < len(shadow_team_data.get('runners', [])):
             shadow_runner_info = shadow_team_data['runners'][runner_index]
@@ -1898,6 +2005,7 @@ def main():
         })
 
     # --- Step 3: 結果の結合と順位計算 ---
+    run_metrics.phase('main.ranking')
     print("\nStep 3: 順位計算とレポート生成...")
     all_results = regular_team_results + shadow_team_results
 
@@ -1942,6 +2050,7 @@ def main():
     print("\n--- 速報生成完了 ---")
 
     if args.realtime:
+        run_metrics.phase('main.realtime_outputs')
         append_to_realtime_log(all_results)
 
         comment_to_save, timestamp_to_save, full_text_to_save = "", "", ""
@@ -1994,7 +2103,7 @@ def main():
                     notification_title = comment_to_save.split('】')[0] + '】' if '】' in comment_to_save else ''
                     
                     # 通知を送信する速報の種類を限定
-                    allowed_notifications = ["【首位交代】", "【首位争い】", "【酷暑】"]
+                    allowed_notifications = ["【首位交代】", "【首位争い】", "【区間記録】", "【酷暑】"]
                     if notification_title in allowed_notifications:
                         notification_body = comment_to_save.replace(notification_title, '').strip()
                         send_push_notification(notification_title, notification_body)
@@ -2020,6 +2129,7 @@ def main():
         print(f"\n--- [Realtime Mode] 各種速報ファイルを保存しました ---")
 
     if args.commit:
+        run_metrics.phase('main.commit')
         # コミットモード: 既存ファイルをバックアップ→保存→検証→不合格時復元
         commit_files = [
             args.state_file,
@@ -2058,6 +2168,7 @@ def main():
             )
 
             # 整合性検証
+            run_metrics.phase('main.validate')
             print("状態ファイルの整合性を検証中...")
             import subprocess
             result = subprocess.run(
@@ -2168,4 +2279,19 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    import script_profiler
+
+    # フェーズ別の所要時間を logs/metrics.jsonl と logs/metrics/generate_report.prom に記録する
+    run_metrics.enable('generate_report')
+    exit_code = 0
+    try:
+        with script_profiler.from_argv('generate_report'):
+            main()
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        raise
+    except BaseException:
+        exit_code = 1
+        raise
+    finally:
+        run_metrics.flush(exit_code)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""区間ごとの歴代記録のしきい値索引。
+
+history_data/leg_best_records.json（各区間の歴代10傑）と leg_award_history.json（各回の区間賞）から、
+区間ごとに記録（平均距離 km）を昇順に並べた配列を作っておき、
+「この平均距離なら歴代10傑に入るか・区間記録を超えるか・前回の区間賞を超えるか」を
+bisect（O(log n)）で判定する。
+
+歴史データは大会の合間にしか変わらないので、索引は大会ごとに1回
+  python scripts/leg_record_index.py
+で history_data/leg_record_index.json に書き出す。読み込み時に元データの SHA-256 と照合し、
+元データの方が新しければその場で作り直す（ファイルは書き換えない）。
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+
+import config_cache
+
+HISTORY_DATA_DIR = Path('history_data')
+LEG_BEST_RECORDS_FILE = HISTORY_DATA_DIR / 'leg_best_records.json'
+LEG_AWARD_HISTORY_FILE = HISTORY_DATA_DIR / 'leg_award_history.json'
+LEG_RECORD_INDEX_FILE = HISTORY_DATA_DIR / 'leg_record_index.json'
+
+INDEX_VERSION = 1
+TOP_N = 10
+
+
+def _source_sha256(leg_best_records, leg_award_history):
+    source = json.dumps([leg_best_records, leg_award_history], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+def _holder(entry):
+    return {
+        'team': entry.get('team_name'),
+        'runner': entry.get('runner_name'),
+        'record': entry.get('record'),
+        'edition': entry.get('edition'),
+    }
+
+
+def build_index(leg_best_records, leg_award_history):
+    """歴史データから索引（JSON にそのまま書ける dict）を作る"""
+    legs = {}
+    for leg_record in (leg_best_records or {}).get('leg_records', []):
+        entries = [e for e in leg_record.get('top10', []) if isinstance(e.get('record'), (int, float))]
+        entries.sort(key=lambda e: e['record'], reverse=True)
+        legs[str(leg_record['leg'])] = {
+            'top': sorted(e['record'] for e in entries),
+            'recordHolder': _holder(entries[0]) if entries else None,
+            'awards': [],
+            'lastAward': None,
+        }
+
+    last_edition = None
+    for edition_data in sorted(leg_award_history or [], key=lambda e: e.get('edition', 0)):
+        edition = edition_data.get('edition')
+        last_edition = edition
+        for award in edition_data.get('awards', []):
+            if not isinstance(award.get('record'), (int, float)):
+                continue
+            leg = legs.setdefault(str(award['leg']), {'top': [], 'recordHolder': None, 'awards': [], 'lastAward': None})
+            leg['awards'].append(award['record'])
+            leg['lastAward'] = {**_holder(award), 'edition': edition}
+    for leg in legs.values():
+        leg['awards'].sort()
+
+    return {
+        'version': INDEX_VERSION,
+        'topN': TOP_N,
+        'lastEdition': last_edition,
+        'sourceSha256': _source_sha256(leg_best_records, leg_award_history),
+        'legs': dict(sorted(legs.items(), key=lambda item: int(item[0]))),
+    }
+
+
+class LegRecordIndex:
+    """build_index() の結果に対する問い合わせ"""
+
+    def __init__(self, index):
+        self.index = index
+        self.top_n = index.get('topN', TOP_N)
+        self._legs = index.get('legs', {})
+
+    def __contains__(self, leg):
+        return str(leg) in self._legs
+
+    def record_holder(self, leg):
+        return (self._legs.get(str(leg)) or {}).get('recordHolder')
+
+    def last_award(self, leg):
+        return (self._legs.get(str(leg)) or {}).get('lastAward')
+
+    def check(self, leg, average_distance):
+        """leg 区で平均 average_distance km だった場合の歴代記録との比較結果。区間の記録が無ければ None。
+
+        - rank: 歴代10傑の中での順位（同記録は同順位、10傑圏外なら None）
+        - entersTop: 歴代10傑に入る
+        - beatsRecord: 歴代区間記録を上回る
+        - beatsLastAward: 前回大会の区間賞の記録を上回る
+        - awardsBeaten: 過去の区間賞の記録のうち上回った数（「歴代の区間賞に何回並ぶか」の目安）
+        """
+        leg_index = self._legs.get(str(leg))
+        if not leg_index or not isinstance(average_distance, (int, float)):
+            return None
+        top = leg_index['top']
+        rank = len(top) - bisect_right(top, average_distance) + 1
+        last_award = leg_index.get('lastAward')
+        return {
+            'rank': rank if rank <= self.top_n else None,
+            'entersTop': rank <= self.top_n,
+            'beatsRecord': bool(top) and average_distance > top[-1],
+            'beatsLastAward': bool(last_award) and average_distance > last_award['record'],
+            'awardsBeaten': bisect_left(leg_index['awards'], average_distance),
+        }
+
+
+def load_index(path=LEG_RECORD_INDEX_FILE, best_records_file=LEG_BEST_RECORDS_FILE,
+               award_history_file=LEG_AWARD_HISTORY_FILE):
+    """保存済みの索引を読む。無い・古い（元データと SHA-256 が違う）場合は元データから作り直す"""
+    leg_best_records = config_cache.load_json(best_records_file)
+    leg_award_history = config_cache.load_json(award_history_file)
+    try:
+        index = config_cache.load_json(path)
+    except (FileNotFoundError, json.JSONDecodeError):
+        index = None
+    if (not index or index.get('version') != INDEX_VERSION
+            or index.get('sourceSha256') != _source_sha256(leg_best_records, leg_award_history)):
+        if index is not None:
+            print(f"情報: {path} が歴史データより古いため作り直します（python scripts/leg_record_index.py で更新できます）。")
+        index = build_index(leg_best_records, leg_award_history)
+    return LegRecordIndex(index)
+
+
+def write_index(path=LEG_RECORD_INDEX_FILE):
+    index = build_index(config_cache.load_json(LEG_BEST_RECORDS_FILE), config_cache.load_json(LEG_AWARD_HISTORY_FILE))
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+    os.replace(tmp_path, path)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description='区間ごとの歴代記録のしきい値索引を作成・照会します。')
+    parser.add_argument('--check', nargs=2, metavar=('LEG', 'AVERAGE_KM'),
+                        help='索引を書き出さず、区間 LEG を平均 AVERAGE_KM km で走った場合の判定を表示')
+    args = parser.parse_args()
+
+    if args.check:
+        try:
+            leg, average = int(args.check[0]), float(args.check[1])
+        except ValueError:
+            parser.error(f'--check の形式が不正です: {args.check}')
+        result = load_index().check(leg, average)
+        if result is None:
+            print(f"エラー: 第{leg}区の歴代記録がありません。")
+            return 1
+        print(json.dumps(result, ensure_ascii=False))
+        return 0
+
+    try:
+        index = write_index()
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        print(f"エラー: 歴史データの読み込みに失敗しました: {e}")
+        return 1
+    print(f"✅ 区間記録の索引を '{LEG_RECORD_INDEX_FILE}' に保存しました。"
+          f"（{len(index['legs'])}区間, 第{index['lastEdition']}回大会まで）")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
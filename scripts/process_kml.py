@@ -1,10 +1,16 @@
+import argparse
 import json
+import os
 import xml.etree.ElementTree as ET
+from array import array
 from geopy.distance import geodesic
 import re
 import unicodedata
 from pathlib import Path
 
+from course_geometry import build_course_lod
+from station_index import haversine_km
+
 
 # --- ディレクトリ定義 ---
 CONFIG_DIR = Path('config')
@@ -15,6 +21,9 @@ KML_FILE = CONFIG_DIR / 'ekiden_map.kml'
 EKIDEN_DATA_FILE = CONFIG_DIR / 'ekiden_data.json'
 COURSE_PATH_OUTPUT_FILE = CONFIG_DIR / 'course_path.json'
 RELAY_POINTS_OUTPUT_FILE = CONFIG_DIR / 'relay_points.json'
+COURSE_LOD_OUTPUT_FILE = CONFIG_DIR / 'course_path_lod.json'
+
+KML_NS = '{http://www.opengis.net/kml/2.2}'
 
 def get_leg_number_from_name(name, pattern=r'第(\d+)'):
     """'第1区'、'第一中継所'のような名前から区間番号を抽出します。"""
@@ -35,28 +44,91 @@ def get_leg_number_from_name(name, pattern=r'第(\d+)'):
         return float('inf')
     return float('inf')
 
-def get_points_from_linestring(placemark, ns):
-    """LineStringを持つPlacemarkから座標リストを抽出します。"""
-    points = []
-    coord_tag = placemark.find('.//kml:coordinates', ns)
-    if coord_tag is not None:
-        coord_text = coord_tag.text.strip()
-        points_str = re.split(r'\s+', coord_text)
-        for p_str in points_str:
-            if p_str:
-                lon, lat, _ = map(float, p_str.split(','))
-                points.append({'lat': lat, 'lon': lon})
-    return points
-
-def get_point_from_point(placemark, ns):
-    """Pointを持つPlacemarkから単一の座標を抽出します。"""
-    coord_tag = placemark.find('.//kml:Point/kml:coordinates', ns)
-    if coord_tag is not None:
-        coord_text = coord_tag.text.strip()
-        if coord_text:
-            lon, lat, _ = map(float, coord_text.split(','))
-            return {'lat': lat, 'lon': lon}
-    return None
+def parse_coordinates(text):
+    """KML の coordinates 文字列（'経度,緯度[,高度] ...'）を緯度・経度の array('d') の組にします。
+
+    頂点ごとに dict を作らず、文字列を一度に分割して float の配列にするため、
+    10^5〜10^6 頂点の LineString でも高速に読めます。
+    """
+    tokens = (text or '').split()
+    if not tokens:
+        return array('d'), array('d')
+    if text.count(',') == 2 * len(tokens):
+        # 全頂点が高度付き（通常の KML）: まとめて分割して 3 つおきに取り出す
+        values = array('d', map(float, text.replace(',', ' ').split()))
+        return values[1::3], values[0::3]
+    lats, lons = array('d'), array('d')
+    for token in tokens:
+        lon, lat = token.split(',')[:2]
+        lats.append(float(lat))
+        lons.append(float(lon))
+    return lats, lons
+
+
+def iter_placemarks(kml_file):
+    """KML をストリーミングで読み、Placemark ごとに (名前, Point座標, LineString座標) を返します。
+
+    Point座標は {'lat', 'lon'}（無ければ None）、LineString座標は (緯度配列, 経度配列)（無ければ None）。
+    読み終えた Placemark は親から外して捨てるので、ファイル全体を木として保持しません。
+    """
+    parents = []
+    for event, elem in ET.iterparse(kml_file, events=('start', 'end')):
+        if event == 'start':
+            parents.append(elem)
+            continue
+        parents.pop()
+        if elem.tag != KML_NS + 'Placemark':
+            continue
+
+        name_tag = elem.find(KML_NS + 'name')
+        if name_tag is not None:
+            point = None
+            point_tag = elem.find(KML_NS + 'Point')
+            if point_tag is not None:
+                lats, lons = parse_coordinates(point_tag.findtext(KML_NS + 'coordinates'))
+                point = {'lat': lats[0], 'lon': lons[0]} if lats else None
+            line = None
+            line_tag = elem.find(KML_NS + 'LineString')
+            if line_tag is not None:
+                line = parse_coordinates(line_tag.findtext(KML_NS + 'coordinates'))
+            yield name_tag.text or '', point_tag is not None, point, line
+
+        elem.clear()
+        if parents:
+            parents[-1].remove(elem)
+
+
+def write_course_path(lats, lons):
+    """course_path.json を json.dump(indent=2) と同じ書式で書き出します（頂点ごとの dict を作りません）。"""
+    tmp_path = COURSE_PATH_OUTPUT_FILE.with_name(COURSE_PATH_OUTPUT_FILE.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('[')
+        f.write(','.join(f'\n  {{\n    "lat": {lat!r},\n    "lon": {lon!r}\n  }}' for lat, lon in zip(lats, lons)))
+        f.write('\n]' if lats else ']')
+    os.replace(tmp_path, COURSE_PATH_OUTPUT_FILE)
+
+
+def write_course_lod(all_points, relay_points_data):
+    """地図用の多段階解像度コース（encoded polyline）を course_path_lod.json に保存します。"""
+    lod = build_course_lod(all_points, relay_points_data)
+    with open(COURSE_LOD_OUTPUT_FILE, 'w', encoding='utf-8') as f:
+        json.dump(lod, f, indent=2, ensure_ascii=False)
+    levels = ', '.join(f"{level['toleranceM']}m:{level['pointCount']}点" for level in lod['levels'])
+    print(f"✅ 多段階コースデータを '{COURSE_LOD_OUTPUT_FILE}' に保存しました。({levels})")
+
+
+def regenerate_course_lod():
+    """既存の course_path.json / relay_points.json から course_path_lod.json だけを作り直します。"""
+    try:
+        with open(COURSE_PATH_OUTPUT_FILE, 'r', encoding='utf-8') as f:
+            all_points = json.load(f)
+        with open(RELAY_POINTS_OUTPUT_FILE, 'r', encoding='utf-8') as f:
+            relay_points_data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        print(f"エラー: コースデータの読み込みに失敗しました: {e}")
+        return
+    write_course_lod(all_points, relay_points_data)
+
 
 def process_kml_data():
     """
@@ -76,40 +148,27 @@ def process_kml_data():
         print(f"エラー: {EKIDEN_DATA_FILE} の読み込みに失敗しました: {e}")
         return
 
-    # 1. KMLファイルを解析
+    # 1-2. KMLファイルをストリーミングで解析し、中継所（Point）とコース区間（LineString）を分離して抽出
+    point_placemarks = {}
+    linestring_placemarks = {}
     try:
-        tree = ET.parse(KML_FILE)
-        root = tree.getroot()
-        ns = {'kml': 'http://www.opengis.net/kml/2.2'}
+        for name, has_point, point, line in iter_placemarks(KML_FILE):
+            # 中継所、スタート、ゴールを抽出
+            if has_point:
+                if '中継所' in name or 'スタート' in name or 'ゴール' in name:
+                    point_placemarks[name] = point
+
+            # コース区間を抽出
+            if line is not None:
+                if '区' in name:
+                    leg_num = get_leg_number_from_name(name)
+                    # Only add the leg if it hasn't been added before (deduplication)
+                    if leg_num != float('inf') and leg_num not in linestring_placemarks:
+                        linestring_placemarks[leg_num] = (name, line)
     except (FileNotFoundError, ET.ParseError) as e:
         print(f"エラー: {KML_FILE} の解析に失敗しました: {e}")
         return
 
-    all_placemarks = root.findall('.//kml:Placemark', ns)
-    
-    # 2. 中継所（Point）とコース区間（LineString）を分離して抽出
-    point_placemarks = {}
-    linestring_placemarks = {}
-
-    for pm in all_placemarks:
-        name_tag = pm.find('kml:name', ns)
-        if name_tag is None:
-            continue
-        name = name_tag.text
-        
-        # 中継所、スタート、ゴールを抽出
-        if pm.find('kml:Point', ns) is not None:
-            if '中継所' in name or 'スタート' in name or 'ゴール' in name:
-                point_placemarks[name] = pm
-        
-        # コース区間を抽出
-        if pm.find('kml:LineString', ns) is not None:
-            if '区' in name:
-                leg_num = get_leg_number_from_name(name)
-                # Only add the leg if it hasn't been added before (deduplication)
-                if leg_num != float('inf') and leg_num not in linestring_placemarks:
-                    linestring_placemarks[leg_num] = pm
-
     # 3. 中継所の座標を直接抽出し、relay_points.json を生成
     relay_points_data = []
     sorted_point_names = sorted(point_placemarks.keys(), key=get_leg_number_from_name)
@@ -120,8 +179,7 @@ def process_kml_data():
 
     print("中継所の座標をKMLから直接抽出中...")
     for name in sorted_point_names:
-        pm = point_placemarks[name]
-        point_coord = get_point_from_point(pm, ns)
+        point_coord = point_placemarks[name]
         if not point_coord:
             continue
             
@@ -159,7 +217,7 @@ def process_kml_data():
     print(f"✅ 中継所データを '{RELAY_POINTS_OUTPUT_FILE}' に保存しました。")
 
     # 4. Combine course lines into course_path.json using the extracted stations as anchors
-    all_points = []
+    course_lats, course_lons = array('d'), array('d')
     anchor_points = [start_point] + relay_points_coords + [goal_point]
     sorted_linestring_keys = sorted(linestring_placemarks.keys())
 
@@ -175,54 +233,51 @@ def process_kml_data():
     # --- End Check ---
 
     print("\n中継所を基準にコースの向きを判定し、結合中...")
+    # 向きの判定・結合の判定は区間ごとに端点だけを見る（頂点数に依存しない）。
+    # 頂点は配列のまま反転・連結し、dict への変換は書き出し時の1回だけにする
     for i, leg_num in enumerate(sorted_linestring_keys):
-        pm = linestring_placemarks[leg_num]
-        name = pm.find('kml:name', ns).text
-        leg_points = get_points_from_linestring(pm, ns)
-        if not leg_points:
+        name, (leg_lats, leg_lons) = linestring_placemarks[leg_num]
+        if not leg_lats:
             continue
 
         # 区間の始点と終点を定義
-        leg_start, leg_end = leg_points[0], leg_points[-1]
-        
+        leg_start, leg_end = (leg_lats[0], leg_lons[0]), (leg_lats[-1], leg_lons[-1])
+
         # この区間が接続すべきアンカーポイント（例: 2区なら第1中継所と第2中継所）
-        anchor_start = anchor_points[i]
-        anchor_end = anchor_points[i+1]
+        anchor_start = (anchor_points[i]['lat'], anchor_points[i]['lon'])
+        anchor_end = (anchor_points[i+1]['lat'], anchor_points[i+1]['lon'])
 
         # 距離を比較して向きを判定
         # (leg_start -> anchor_start) + (leg_end -> anchor_end) vs (leg_start -> anchor_end) + (leg_end -> anchor_start)
-        dist_forward = geodesic((leg_start['lat'], leg_start['lon']), (anchor_start['lat'], anchor_start['lon'])).m + \
-                       geodesic((leg_end['lat'], leg_end['lon']), (anchor_end['lat'], anchor_end['lon'])).m
-        dist_backward = geodesic((leg_start['lat'], leg_start['lon']), (anchor_end['lat'], anchor_end['lon'])).m + \
-                        geodesic((leg_end['lat'], leg_end['lon']), (anchor_start['lat'], anchor_start['lon'])).m
+        dist_forward = geodesic(leg_start, anchor_start).m + geodesic(leg_end, anchor_end).m
+        dist_backward = geodesic(leg_start, anchor_end).m + geodesic(leg_end, anchor_start).m
 
         if dist_backward < dist_forward:
             print(f"  {name} の向きが逆と判断し、反転します。")
-            leg_points.reverse()
-
-        # 最初の区間はそのまま追加
-        if not all_points:
-            all_points.extend(leg_points)
-        else:
-            # 結合する際、重複する始点を削除
-            if geodesic((all_points[-1]['lat'], all_points[-1]['lon']), (leg_points[0]['lat'], leg_points[0]['lon'])).m < 1:
-                all_points.extend(leg_points[1:])
-            else:
-                all_points.extend(leg_points)
+            leg_lats.reverse()
+            leg_lons.reverse()
 
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-    with open(COURSE_PATH_OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(all_points, f, indent=2, ensure_ascii=False)
-    print(f"✅ コースパス情報を '{COURSE_PATH_OUTPUT_FILE}' に保存しました。")
-
-    # 5. 距離の再計算（確認用）
-    cumulative_distance_km = 0.0
-    for i in range(1, len(all_points)):
-        p1 = (all_points[i-1]['lat'], all_points[i-1]['lon'])
-        p2 = (all_points[i]['lat'], all_points[i]['lon'])
-        cumulative_distance_km += geodesic(p1, p2).kilometers
-    print(f"\n再計算した総コース距離: {cumulative_distance_km:.2f} km")
+        # 結合する際、重複する始点を削除（最初の区間はそのまま追加）
+        skip = 0
+        if course_lats and geodesic((course_lats[-1], course_lons[-1]), (leg_lats[0], leg_lons[0])).m < 1:
+            skip = 1
+        course_lats.extend(leg_lats[skip:])
+        course_lons.extend(leg_lons[skip:])
 
+    write_course_path(course_lats, course_lons)
+    print(f"✅ コースパス情報を '{COURSE_PATH_OUTPUT_FILE}' に保存しました。（{len(course_lats)}点）")
+    write_course_lod([{'lat': lat, 'lon': lon} for lat, lon in zip(course_lats, course_lons)], relay_points_data)
+
+    # 5. 距離の再計算（確認用）。頂点数が多いので geodesic ではなく haversine で合計する
+    cumulative_distance_km = sum(map(haversine_km, course_lats[:-1], course_lons[:-1], course_lats[1:], course_lons[1:]))
+    print(f"\n再計算した総コース距離: {cumulative_distance_km:.2f} km")
 
 if __name__ == '__main__':
-    process_kml_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='KML からコースパスと中継所データを生成します。')
+    parser.add_argument('--lod-only', action='store_true',
+                        help='KML を読まず、既存の course_path.json から course_path_lod.json だけを作り直します。')
+    args = parser.parse_args()
+    if args.lod_only:
+        regenerate_course_lod()
+    else:
+        process_kml_data()
\ No newline at end of file
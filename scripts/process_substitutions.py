@@ -15,23 +15,28 @@
   logs/substitution_audit.jsonl（post_id/source/trip/team/leg/out/in/status/reason/timestamp）。
 - 冪等性: post_id 単位。同一投稿内の全ブロックが検証成功した場合のみ一括適用し、
   不正/未確認ブロックが1つでもあれば投稿全体を適用せず review へ回す。
+- 事前チェック（--precheck）: ロックを取る前に、未処理の【選手交代】投稿が無いか、
+  前回処理時と入力（未処理投稿・各大学の currentLeg・ekiden_data.json）が同じなら
+  exit 3 で終了する。update_substitutions.sh はこの場合ロックを取らない。
 
 テスト用の環境変数:
 - EKIDEN_DATA_FILE / EKIDEN_STATE_FILE / EKIDEN_OUTLINE_FILE: パス上書き
 - EKIDEN_LOGS_DIR: ログディレクトリ上書き
 - EKIDEN_THREAD_URL: スレッドURL上書き
-- EKIDEN_POSTS_HTML: ローカルHTMLファイルから投稿を読み込む（fetchをスキップ）
+- EKIDEN_POSTS_HTML: ローカルHTMLファイルから投稿を読み込む（fetchをスキップ。board_client 共通）
 """
 
+import argparse
+import hashlib
 import json
 import os
 import re
+import sys
 import tempfile
 from datetime import datetime, timezone
 from pathlib import Path
 
-import requests
-from bs4 import BeautifulSoup
+import board_client
 
 # --- ファイル定義（環境変数で上書き可能） ---
 CONFIG_DIR = Path(os.environ.get('EKIDEN_CONFIG_DIR', 'config'))
@@ -44,10 +49,10 @@ STATE_FILE = Path(os.environ.get('EKIDEN_STATE_FILE', DATA_DIR / 'ekiden_state.j
 PROCESSED_LOG_FILE = LOGS_DIR / 'substitution_log.txt'
 REVIEW_LOG_FILE = LOGS_DIR / 'substitution_review.jsonl'
 AUDIT_LOG_FILE = LOGS_DIR / 'substitution_audit.jsonl'
+FINGERPRINT_FILE = LOGS_DIR / 'substitution_fingerprint.json'
 
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-}
+# --precheck で処理不要と判定したときの終了コード
+PRECHECK_UNCHANGED_EXIT = 3
 
 # --- 明示 alias ---
 # 投稿側の表記 → config 上の選手名。括弧除去などの曖昧判定は禁止。
@@ -195,33 +200,18 @@ def get_thread_url():
 def fetch_posts(thread_url):
     """スレッドから投稿一覧 [{id, name, content}] を取得する。
 
+    取得・パースは board_client に委譲し、TTL 内は他スクリプトと共有キャッシュを使う。
     EKIDEN_POSTS_HTML が設定されていればネットワークを使わずローカルHTMLから読む。
     """
-    if os.environ.get('EKIDEN_POSTS_HTML'):
-        with open(os.environ['EKIDEN_POSTS_HTML'], 'r', encoding='utf-8') as f:
-            html = f.read()
-    else:
-        print(f"コメントを取得中: {thread_url}")
-        try:
-            response = requests.get(thread_url, headers=HEADERS, timeout=20)
-            response.raise_for_status()
-            response.encoding = response.apparent_encoding
-            html = response.text
-        except requests.RequestException as e:
-            print(f"エラー: スレッドの取得に失敗しました: {e}")
-            return []
-
-    soup = BeautifulSoup(html, 'html.parser')
+    board_posts, _ = board_client.get_thread_posts(thread_url)
     posts = []
-    for post in soup.find_all('div', class_='post'):
-        pid = post.get('data-id')
-        name_el = post.find('span', class_='postusername')
-        content_el = post.find('div', class_='post-content')
-        if pid and content_el:
+    for post in board_posts:
+        pid = post['id']
+        if pid and post['content_html'] is not None:
             posts.append({
                 'id': pid,
-                'name': name_el.get_text(strip=True) if name_el else '',
-                'content': content_el.get_text(separator='\n', strip=True),
+                'name': (post['name'] or '').strip(),
+                'content': board_client.post_text(post, '\n'),
             })
     return posts
 
@@ -274,33 +264,110 @@ def log_entry_key(entry):
     )
 
 
-def append_jsonl(path, entry):
-    LOGS_DIR.mkdir(parents=True, exist_ok=True)
-    with open(path, 'a', encoding='utf-8') as f:
-        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
-
+class JsonlLog:
+    """review / audit 用の追記専用 JSONL ログ（1行1エントリの形式は従来どおり）。
 
-def append_jsonl_dedup(path, entry):
-    """既存 JSONL を読み、post_id+block_index+status+reason が既にあれば追記しない。
+    post_id+block_index+status+reason が既にあるエントリは追記しない。既存キーは
+    実行ごとに初回の add() で1回だけ読み込み、追記はバッファして flush() でまとめて
+    書く（fsync 1回）。エントリごとにファイル全体を読み直すことはしない。
 
     同じ投稿が将来適用可能になった場合（例: past_leg → 後に currentLeg が進む）は
     status/reason が変わるため別キーとなり、既存 review を残したまま成功 audit と
     processed へ進めることができる。
     """
-    key = log_entry_key(entry)
-    for existing in read_jsonl(path):
-        if log_entry_key(existing) == key:
+
+    def __init__(self, path):
+        self.path = path
+        self._keys = None
+        self._pending = []
+
+    def add(self, entry):
+        """未記録なら追記予約して True、記録済みなら False。"""
+        if self._keys is None:
+            self._keys = {log_entry_key(e) for e in read_jsonl(self.path)}
+        key = log_entry_key(entry)
+        if key in self._keys:
             return False
-    append_jsonl(path, entry)
-    return True
+        self._keys.add(key)
+        self._pending.append(entry)
+        return True
 
+    def flush(self):
+        if not self._pending:
+            return
+        LOGS_DIR.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(e, ensure_ascii=False) + '\n' for e in self._pending))
+            f.flush()
+            os.fsync(f.fileno())
+        self._pending = []
 
-def log_review(entry):
-    return append_jsonl_dedup(REVIEW_LOG_FILE, entry)
 
+# --- 事前チェック用の指紋 ---
 
-def log_audit(entry):
-    return append_jsonl_dedup(AUDIT_LOG_FILE, entry)
+def scan_fingerprint(posts, processed_posts):
+    """交代処理の入力の指紋を返す。読めないファイルがあれば None（常に処理する）。
+
+    ETag / Content-Length はスレッドの広告やヘッダで変わるため使わず、処理結果を左右する
+    入力だけを見る: 未処理の【選手交代】投稿 id、各大学の currentLeg（過去区間 review が
+    区間の進行で適用可能になる）、ekiden_data.json の内容（トリップ・補欠の手修正）。
+    """
+    pending = sorted((p['id'] for p in posts
+                      if p['id'] not in processed_posts and extract_blocks(p['content'])),
+                     key=lambda pid: (len(pid), pid))
+    try:
+        config_sha = hashlib.sha256(EKIDEN_DATA_FILE.read_bytes()).hexdigest()
+        with open(STATE_FILE, 'r', encoding='utf-8') as f:
+            state_data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    return {
+        'pending_posts': pending,
+        'current_legs': {str(s['id']): s.get('currentLeg') for s in state_data},
+        'config_sha256': config_sha,
+    }
+
+
+def read_fingerprint():
+    try:
+        with open(FINGERPRINT_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError, OSError):
+        return None
+
+
+def write_fingerprint(fingerprint):
+    if fingerprint is None:
+        return
+    LOGS_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = FINGERPRINT_FILE.with_suffix('.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(fingerprint, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, FINGERPRINT_FILE)
+
+
+def needs_processing():
+    """ロック前の事前チェック。交代処理を実行する必要があれば True。
+
+    未処理の【選手交代】投稿が無い、または前回処理時と指紋が同じなら False。
+    判定できない場合は True（処理側に任せる）。
+    """
+    thread_url = get_thread_url()
+    if not thread_url:
+        return False
+    posts = fetch_posts(thread_url)
+    if not posts:
+        return False
+    fingerprint = scan_fingerprint(posts, get_processed_posts())
+    if fingerprint is None:
+        return True
+    if not fingerprint['pending_posts']:
+        print("未処理の【選手交代】投稿はありません。")
+        return False
+    if fingerprint == read_fingerprint():
+        print(f"未処理の【選手交代】投稿 {len(fingerprint['pending_posts'])}件は前回処理時から変化していません。")
+        return False
+    return True
 
 
 # --- 原子書き込み ---
@@ -423,89 +490,96 @@ def process_substitutions():
 
     processed_posts = get_processed_posts()
     substitution_made = False
+    review_log = JsonlLog(REVIEW_LOG_FILE)
+    audit_log = JsonlLog(AUDIT_LOG_FILE)
 
-    for post in posts:
-        post_id = post['id']
-        if post_id in processed_posts:
-            continue
-
-        blocks = extract_blocks(post['content'])
-        if not blocks:
-            continue
-
-        print(f"\n投稿#{post_id} に【選手交代】ブロックを {len(blocks)} 個検出しました。")
-
-        posted_trip = extract_trip(post['name'])
-        results = []
-        for block_index, block in enumerate(blocks):
-            parsed = parse_block(block)
-            status, reason, team, details = validate_block(parsed, teams_map, None, state_map, posted_trip)
-            results.append({
-                'block': parsed,
-                'block_index': block_index,
-                'status': status,
-                'reason': reason,
-                'team': team,
-            })
-            print(f"  - ブロック[{block_index}]: {parsed.get('university')} {parsed.get('leg')}区 "
-                  f"{parsed.get('runner_out')}→{parsed.get('runner_in')} => {status} ({reason})")
-
-        # 冪等性: 全ブロック成功時のみ一括適用（方針B）
-        all_ok = all(r['status'] == 'ok' for r in results)
-        if all_ok:
-            for r in results:
-                team = r['team']
-                apply_block(team, r['block'])
-                substitution_made = True
-                print(f"  - 適用: {team['name']} {r['block']['leg']}区 "
-                      f"{r['block']['runner_out']}→{r['block']['runner_in']}")
-            log_processed_post(post_id)
-            # 監査ログ（既存 review があっても status='applied' は別キーのため追記される）
-            for r in results:
-                b = r['block']
-                log_audit({
-                    'post_id': post_id,
-                    'block_index': r['block_index'],
-                    'source': thread_url,
-                    'trip': posted_trip,
-                    'team': r['team']['name'],
-                    'leg': b.get('leg'),
-                    'out': b.get('runner_out'),
-                    'in': b.get('runner_in'),
-                    'status': 'applied',
-                    'reason': '',
-                    'timestamp': now_iso(),
-                })
-        else:
-            # 1つでも不正/未確認があれば投稿全体を適用せず review へ
-            for r in results:
-                b = r['block']
-                log_review({
-                    'post_id': post_id,
-                    'block_index': r['block_index'],
-                    'source': thread_url,
-                    'trip': posted_trip,
-                    'team': r['team']['name'] if r['team'] else b.get('university'),
-                    'leg': b.get('leg'),
-                    'out': b.get('runner_out'),
-                    'in': b.get('runner_in'),
-                    'status': r['status'],
-                    'reason': r['reason'],
-                    'timestamp': now_iso(),
-                })
-                log_audit({
-                    'post_id': post_id,
-                    'block_index': r['block_index'],
-                    'source': thread_url,
-                    'trip': posted_trip,
-                    'team': r['team']['name'] if r['team'] else b.get('university'),
-                    'leg': b.get('leg'),
-                    'out': b.get('runner_out'),
-                    'in': b.get('runner_in'),
-                    'status': r['status'],
-                    'reason': r['reason'],
-                    'timestamp': now_iso(),
+    try:
+        for post in posts:
+            post_id = post['id']
+            if post_id in processed_posts:
+                continue
+
+            blocks = extract_blocks(post['content'])
+            if not blocks:
+                continue
+
+            print(f"\n投稿#{post_id} に【選手交代】ブロックを {len(blocks)} 個検出しました。")
+
+            posted_trip = extract_trip(post['name'])
+            results = []
+            for block_index, block in enumerate(blocks):
+                parsed = parse_block(block)
+                status, reason, team, details = validate_block(parsed, teams_map, None, state_map, posted_trip)
+                results.append({
+                    'block': parsed,
+                    'block_index': block_index,
+                    'status': status,
+                    'reason': reason,
+                    'team': team,
                 })
+                print(f"  - ブロック[{block_index}]: {parsed.get('university')} {parsed.get('leg')}区 "
+                      f"{parsed.get('runner_out')}→{parsed.get('runner_in')} => {status} ({reason})")
+
+            # 冪等性: 全ブロック成功時のみ一括適用（方針B）
+            all_ok = all(r['status'] == 'ok' for r in results)
+            if all_ok:
+                for r in results:
+                    team = r['team']
+                    apply_block(team, r['block'])
+                    substitution_made = True
+                    print(f"  - 適用: {team['name']} {r['block']['leg']}区 "
+                          f"{r['block']['runner_out']}→{r['block']['runner_in']}")
+                log_processed_post(post_id)
+                # 監査ログ（既存 review があっても status='applied' は別キーのため追記される）
+                for r in results:
+                    b = r['block']
+                    audit_log.add({
+                        'post_id': post_id,
+                        'block_index': r['block_index'],
+                        'source': thread_url,
+                        'trip': posted_trip,
+                        'team': r['team']['name'],
+                        'leg': b.get('leg'),
+                        'out': b.get('runner_out'),
+                        'in': b.get('runner_in'),
+                        'status': 'applied',
+                        'reason': '',
+                        'timestamp': now_iso(),
+                    })
+            else:
+                # 1つでも不正/未確認があれば投稿全体を適用せず review へ
+                for r in results:
+                    b = r['block']
+                    review_log.add({
+                        'post_id': post_id,
+                        'block_index': r['block_index'],
+                        'source': thread_url,
+                        'trip': posted_trip,
+                        'team': r['team']['name'] if r['team'] else b.get('university'),
+                        'leg': b.get('leg'),
+                        'out': b.get('runner_out'),
+                        'in': b.get('runner_in'),
+                        'status': r['status'],
+                        'reason': r['reason'],
+                        'timestamp': now_iso(),
+                    })
+                    audit_log.add({
+                        'post_id': post_id,
+                        'block_index': r['block_index'],
+                        'source': thread_url,
+                        'trip': posted_trip,
+                        'team': r['team']['name'] if r['team'] else b.get('university'),
+                        'leg': b.get('leg'),
+                        'out': b.get('runner_out'),
+                        'in': b.get('runner_in'),
+                        'status': r['status'],
+                        'reason': r['reason'],
+                        'timestamp': now_iso(),
+                    })
+    finally:
+        # review / audit の追記は実行の最後にまとめて書く
+        review_log.flush()
+        audit_log.flush()
 
     if substitution_made:
         print(f"\n交代処理が完了しました。更新されたデータを {EKIDEN_DATA_FILE} に保存します。")
@@ -513,6 +587,21 @@ def process_substitutions():
     else:
         print("\n新規の有効な交代宣言は見つかりませんでした。")
 
+    # 適用後の processed / ekiden_data.json で指紋を取り、次回の事前チェックに使う
+    write_fingerprint(scan_fingerprint(posts, get_processed_posts()))
 
-if __name__ == '__main__':
+
+def main():
+    parser = argparse.ArgumentParser(description='5chスレッドの【選手交代】投稿を検証・適用します。')
+    parser.add_argument('--precheck', action='store_true',
+                        help=f'ロック前の事前チェックのみ行う（処理不要なら exit {PRECHECK_UNCHANGED_EXIT}）')
+    args = parser.parse_args()
+
+    if args.precheck:
+        return 0 if needs_processing() else PRECHECK_UNCHANGED_EXIT
     process_substitutions()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
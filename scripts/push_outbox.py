@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""プッシュ通知の送信待ちキュー（outbox）。
+
+generate_report.py は通知を Push API サーバーへ直接 POST せず、logs/push_outbox/ に
+1通知1ファイルで書き出すだけにする（速報生成・git push が Push API の応答を待たない）。
+送信はこのスクリプトを別プロセスとして実行して行う（update_realtime.sh /
+update_substitutions.sh がロック解放後に実行する）。
+
+- 合流: 未送信の通知と同じタイトルの通知が来たら、本文を新しいものに置き換える
+- 重複除去: 直近 DEDUP_WINDOW_SECONDS 以内に送信済みの同一タイトル・本文は送らない
+- 再試行: 失敗時は指数バックオフで再送し、MAX_ATTEMPTS 回失敗するか
+  MAX_AGE_SECONDS を過ぎた通知は failed/ に移す（古い速報は送らない）
+- 排他: update_realtime.sh / update_substitutions.sh の実行は重なりうるので、キューの読み書きは
+  .lock、送信処理全体は .deliver.lock で直列化する（送信中はキューのロックを持たないため、
+  enqueue は Push API の応答を待たない。送信中に本文が置き換えられた通知は消さずに次回送る）
+
+使い方:
+  python scripts/push_outbox.py            # 送信期限が来た通知を送る
+  python scripts/push_outbox.py --status   # キューの状態を表示
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import with_lock
+
+# requests / dotenv は送信時だけ読み込む（generate_report.py の起動を軽くするため）
+
+OUTBOX_DIR = Path(os.environ.get('EKIDEN_PUSH_OUTBOX_DIR', 'logs/push_outbox'))
+DOTENV_PATH = Path(__file__).resolve().parent.parent / '.env'
+
+SEND_TIMEOUT_SECONDS = 10
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 30
+MAX_AGE_SECONDS = 30 * 60
+DEDUP_WINDOW_SECONDS = 10 * 60
+
+
+def _pending_dir(outbox_dir):
+    return Path(outbox_dir) / 'pending'
+
+
+def _failed_dir(outbox_dir):
+    return Path(outbox_dir) / 'failed'
+
+
+def _sent_file(outbox_dir):
+    return Path(outbox_dir) / 'sent.json'
+
+
+@contextmanager
+def _locked(outbox_dir, name):
+    """outbox_dir/<name> の排他ロックを取得している間だけ処理する"""
+    Path(outbox_dir).mkdir(parents=True, exist_ok=True)
+    lock = with_lock.acquire(Path(outbox_dir) / name)
+    try:
+        yield
+    finally:
+        with_lock.release(lock)
+
+
+def _queue_lock(outbox_dir):
+    return _locked(outbox_dir, '.lock')
+
+
+def _deliver_lock(outbox_dir):
+    return _locked(outbox_dir, '.deliver.lock')
+
+
+def _message_key(title, body):
+    return hashlib.sha256(f"{title}\n{body}".encode('utf-8')).hexdigest()[:16]
+
+
+def _write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path, default):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError, OSError):
+        return default
+
+
+def pending_messages(outbox_dir=None):
+    """未送信の通知を作成順に [(path, message)] で返す"""
+    pending = _pending_dir(outbox_dir or OUTBOX_DIR)
+    messages = []
+    for path in sorted(pending.glob('*.json')):
+        message = _read_json(path, None)
+        if message is not None:
+            messages.append((path, message))
+    return messages
+
+
+def enqueue(title, body, outbox_dir=None, now=None):
+    """通知をキューに追加する。同じタイトルの未送信通知があれば本文を置き換える。"""
+    outbox_dir = outbox_dir or OUTBOX_DIR
+    now = time.time() if now is None else now
+    with _queue_lock(outbox_dir):
+        return _enqueue_locked(title, body, outbox_dir, now)
+
+
+def _enqueue_locked(title, body, outbox_dir, now):
+    for path, message in pending_messages(outbox_dir):
+        if message.get('title') == title:
+            message['body'] = body
+            message['updatedAt'] = now
+            _write_json(path, message)
+            print(f"通知キュー: 未送信の「{title}」を最新の本文で置き換えました。")
+            return path
+
+    message = {
+        'id': uuid.uuid4().hex,
+        'title': title,
+        'body': body,
+        'createdAt': now,
+        'updatedAt': now,
+        'attempts': 0,
+        'nextAttemptAt': now,
+    }
+    # ファイル名は作成時刻順に並ぶようにする
+    path = _pending_dir(outbox_dir) / f"{int(now * 1000):015d}_{message['id'][:8]}.json"
+    _write_json(path, message)
+    print(f"通知キュー: 「{title}」を追加しました。")
+    return path
+
+
+_dotenv_loaded = False
+
+
+def push_api_settings():
+    """(PROD_PUSH_API_URL, API_SECRET_KEY) を返す。初回はリポジトリの .env も読み込む（既存の環境変数が優先）。"""
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        from dotenv import load_dotenv
+        load_dotenv(dotenv_path=DOTENV_PATH)
+        _dotenv_loaded = True
+    return os.getenv("PROD_PUSH_API_URL"), os.getenv("API_SECRET_KEY")
+
+
+def post_notification(title, body, timeout=SEND_TIMEOUT_SECONDS):
+    """Push API サーバーに通知送信を依頼する。失敗時は requests.RequestException。"""
+    import requests
+
+    push_api_url, api_secret_key = push_api_settings()
+    response = requests.post(
+        f"{push_api_url}/api/send-notification",
+        headers={'Content-Type': 'application/json', 'X-API-Secret': api_secret_key},
+        # サーバー側で badge_count を付与するため、ここでは title/body のみ送る
+        json={"title": title, "body": body},
+        timeout=timeout,
+    )
+    response.raise_for_status()
+    return response
+
+
+def _move_to_failed(outbox_dir, path, message, reason):
+    message['failedReason'] = reason
+    _write_json(_failed_dir(outbox_dir) / path.name, message)
+    path.unlink(missing_ok=True)
+
+
+def deliver(outbox_dir=None, now=None, post=None):
+    """送信期限が来た通知を送る。戻り値: {sent, deduped, retried, failed}"""
+    outbox_dir = outbox_dir or OUTBOX_DIR
+    now = time.time() if now is None else now
+    post = post or post_notification
+    stats = {'sent': 0, 'deduped': 0, 'retried': 0, 'failed': 0}
+
+    with _deliver_lock(outbox_dir):
+        sent_log = {k: t for k, t in _read_json(_sent_file(outbox_dir), {}).items()
+                    if now - t < DEDUP_WINDOW_SECONDS}
+        for path in sorted(_pending_dir(outbox_dir).glob('*.json')):
+            _deliver_one(outbox_dir, path, now, post, sent_log, stats)
+        _write_json(_sent_file(outbox_dir), sent_log)
+    return stats
+
+
+def _deliver_one(outbox_dir, path, now, post, sent_log, stats):
+    import requests
+
+    with _queue_lock(outbox_dir):
+        message = _read_json(path, None)
+        if message is None:
+            return
+        title, body = message.get('title', ''), message.get('body', '')
+        if now - message.get('createdAt', now) > MAX_AGE_SECONDS:
+            print(f"通知キュー: 「{title}」は古くなったため送信しません。")
+            _move_to_failed(outbox_dir, path, message, 'expired')
+            stats['failed'] += 1
+            return
+        key = _message_key(title, body)
+        if key in sent_log:
+            print(f"通知キュー: 「{title}」は送信済みの通知と同一のためスキップします。")
+            path.unlink(missing_ok=True)
+            stats['deduped'] += 1
+            return
+        if message.get('nextAttemptAt', 0) > now:
+            return
+
+    # 送信中はキューのロックを持たない（enqueue を Push API の応答待ちにしない）
+    try:
+        response = post(title, body)
+    except requests.RequestException as e:
+        with _queue_lock(outbox_dir):
+            # 送信中に本文が置き換えられていても、試行回数は現在のファイルに引き継ぐ
+            current = _read_json(path, None) or message
+            current['attempts'] = message.get('attempts', 0) + 1
+            current['lastError'] = str(e)
+            if current['attempts'] >= MAX_ATTEMPTS:
+                print(f"APIサーバーへの通知リクエスト失敗（{current['attempts']}回目・断念）: {e}")
+                _move_to_failed(outbox_dir, path, current, 'max_attempts')
+                stats['failed'] += 1
+            else:
+                delay = RETRY_BASE_SECONDS * (2 ** (current['attempts'] - 1))
+                current['nextAttemptAt'] = now + delay
+                _write_json(path, current)
+                print(f"APIサーバーへの通知リクエスト失敗（{current['attempts']}回目・{delay}秒後に再送）: {e}")
+                stats['retried'] += 1
+        return
+
+    try:
+        result = response.json().get('message')
+    except ValueError:
+        result = None
+    print(f"APIサーバーへの通知リクエスト成功: {result}")
+    sent_log[key] = now
+    stats['sent'] += 1
+    with _queue_lock(outbox_dir):
+        current = _read_json(path, None)
+        if current is not None and current.get('updatedAt') != message.get('updatedAt'):
+            print(f"通知キュー: 送信中に「{title}」の本文が置き換えられたため、次回送信します。")
+            return
+        path.unlink(missing_ok=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='プッシュ通知の送信待ちキューを処理します。')
+    parser.add_argument('--status', action='store_true', help='キューの状態を表示して終了します。')
+    args = parser.parse_args()
+
+    if args.status:
+        pending = pending_messages()
+        failed = list(_failed_dir(OUTBOX_DIR).glob('*.json'))
+        print(f"未送信: {len(pending)}件 / 失敗: {len(failed)}件")
+        for _, message in pending:
+            print(f"  - {message.get('title')} (試行 {message.get('attempts', 0)}回)")
+        return 0
+
+    if not pending_messages():
+        return 0
+    push_api_url, api_secret_key = push_api_settings()
+    if not push_api_url or not api_secret_key:
+        print("警告: 環境変数 PROD_PUSH_API_URL または API_SECRET_KEY が設定されていません。")
+        return 0
+
+    stats = deliver()
+    print(f"通知キュー: 送信 {stats['sent']}件 / 重複 {stats['deduped']}件 / "
+          f"再送待ち {stats['retried']}件 / 失敗 {stats['failed']}件")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -400,4 +400,7 @@ def rebuild_history():
     print("\nすべての処理が正常に完了しました。")
 
 if __name__ == '__main__':
-    rebuild_history()
+    import script_profiler
+
+    with script_profiler.from_argv('rebuild_history'):
+        rebuild_history()
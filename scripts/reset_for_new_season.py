@@ -2,6 +2,9 @@
 """
 次の大会に備えてシーズン依存データを初期化するスクリプト。
 
+削除の前に、終了した大会の成績（data/ の individual_results.json・ekiden_state.json など）を
+history_data/editions.sqlite3 に取り込む（scripts/edition_archive.py。--no-archive で省略）。
+
 削除対象:
   - data ディレクトリ内の結果ファイル・記事・ログ類
   - logs 配下のファイル／サブディレクトリ
@@ -12,13 +15,19 @@
 
 import argparse
 from datetime import datetime
+import json
+import sqlite3
 import sys
 from pathlib import Path
 from typing import Iterable
 
+import edition_archive
+
 
 DATA_DIR = Path("data")
 LOGS_DIR = Path("logs")
+CONFIG_DIR = Path("config")
+OUTLINE_FILE = CONFIG_DIR / "outline.json"
 DAILY_TEMPS_FILE = DATA_DIR / "daily_temperatures.json"
 ARCHIVE_DIR = DATA_DIR / "archive"
 
@@ -32,6 +41,7 @@ DATA_FILES_TO_REMOVE = [
     "realtime_report_previous.json",
     "daily_summary.json",
     "article_history.json",
+    "article_history",
     "manager_comments.json",
     "intramural_rankings.json",
     "realtime_log.jsonl",
@@ -92,6 +102,30 @@ def print_targets(targets: Iterable[Path]) -> None:
         print("  （削除対象はありません）")
 
 
+def archive_finished_edition() -> bool:
+    """終了した大会（config/outline.json の metadata.edition）の成績をアーカイブに取り込む。失敗したら False。"""
+    try:
+        with open(OUTLINE_FILE, "r", encoding="utf-8") as f:
+            edition = int(json.load(f).get("metadata", {}).get("edition"))
+    except (FileNotFoundError, json.JSONDecodeError, TypeError, ValueError) as e:
+        print(f"⚠️ 大会回数を {OUTLINE_FILE} から取得できないため、アーカイブに取り込めません: {e}")
+        return False
+    if not (DATA_DIR / "individual_results.json").exists():
+        print(f"情報: {DATA_DIR / 'individual_results.json'} が無いため、第{edition}回大会のアーカイブは作成しません。")
+        return True
+    try:
+        counts = edition_archive.pack_edition(
+            edition, DATA_DIR, edition_archive.ARCHIVE_FILE,
+            extra_documents={"ekiden_data.json": CONFIG_DIR / "ekiden_data.json", "outline.json": OUTLINE_FILE},
+        )
+    except (OSError, json.JSONDecodeError, UnicodeDecodeError, sqlite3.Error) as e:
+        print(f"⚠️ 第{edition}回大会のアーカイブ作成に失敗しました: {e}")
+        return False
+    print(f"✅ 第{edition}回大会の成績を '{edition_archive.ARCHIVE_FILE}' に取り込みました。"
+          f"（選手 {counts['runners']}人・記録 {counts['days']}件）")
+    return True
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="次大会用に data/ と logs/ の成果物を初期化します。")
     parser.add_argument(
@@ -101,6 +135,12 @@ def main() -> int:
         action="store_true",
         help="確認プロンプトをスキップして削除を実行します。",
     )
+    parser.add_argument(
+        "--no-archive",
+        dest="archive",
+        action="store_false",
+        help="削除前に終了した大会の成績をアーカイブ（history_data/editions.sqlite3）に取り込みません。",
+    )
     args = parser.parse_args()
 
     targets = collect_targets()
@@ -123,6 +163,11 @@ def main() -> int:
     if not confirmed:
         return 0
 
+    # 削除する前に、終了した大会の成績をアーカイブに残す
+    if args.archive and not archive_finished_edition():
+        print("成績を残せないため、削除を中止しました（--no-archive で取り込みを省略できます）。")
+        return 1
+
     # 成果物の削除
     for path in targets:
         if path == DAILY_TEMPS_FILE:
@@ -134,11 +179,10 @@ def main() -> int:
         LOGS_DIR.mkdir(parents=True, exist_ok=True)
 
     # config/outline.json の大会開始日を更新
-    outline_file = Path("config/outline.json")
+    outline_file = OUTLINE_FILE
     if outline_file.exists():
         print("\n大会開始日を更新しています...")
         try:
-            import json
             with open(outline_file, 'r', encoding='utf-8') as f:
                 outline_data = json.load(f)
             
@@ -29,7 +29,7 @@ def main():
         temp_path = Path(temp_dir)
         summary.REALTIME_REPORT_FILE = realtime_report
         summary.OUTPUT_FILE = args.output
-        summary.ARTICLE_HISTORY_FILE = temp_path / "article_history.json"
+        summary.ARTICLE_HISTORY_DIR = temp_path / "article_history"
         summary.NARRATIVE_STATE_FILE = temp_path / "race_narrative_state.json"
         for constant_name, filename in {
             "MANAGER_COMMENTS_FILE": "manager_comments.json",
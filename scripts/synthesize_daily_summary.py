@@ -12,11 +12,19 @@ import os
 import re
 import sys
 import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from datetime import datetime
 from pathlib import Path
 
 from dotenv import load_dotenv
 
+import config_cache
+from ai_providers import get_provider, get_response_mode, mode_requires_api_key
+from article_history_store import ArticleHistoryStore
+
 # プロジェクトルートのパス
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 CONFIG_DIR = PROJECT_ROOT / "config"
@@ -33,6 +41,12 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-3.1-flash-lite")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+# 記事案生成のプロバイダー別タイムアウト（秒）
+DRAFT_TIMEOUTS = {
+    "gemini": float(os.getenv("GEMINI_DRAFT_TIMEOUT", "180")),
+    "openai": float(os.getenv("OPENAI_DRAFT_TIMEOUT", "180")),
+}
+DRAFT_PROVIDERS = ("gemini", "openai")
 
 # --- ファイルパス ---
 REALTIME_REPORT_FILE = DATA_DIR / "realtime_report.json"
@@ -44,14 +58,17 @@ PLAYER_STORY_CONTEXT_FILE = CONFIG_DIR / "player_story_context.json"
 TEAM_STORY_CONTEXT_FILE = CONFIG_DIR / "team_story_context.json"
 LEG_STORY_CONTEXT_FILE = CONFIG_DIR / "leg_story_context.json"
 DAILY_SUMMARY_FILE = DATA_DIR / "daily_summary.json"
-ARTICLE_HISTORY_FILE = HISTORY_DATA_DIR / "article_history.json"
+ARTICLE_HISTORY_DIR = DATA_DIR / "article_history"
 NARRATIVE_STATE_FILE = DATA_DIR / "race_narrative_state.json"
 
 SYNTHESIS_PROMPT_FILE = CONFIG_DIR / "summary_synthesis_prompt_template.txt"
 
 
-def load_json(file_path, default=None):
+def load_json(file_path, default=None, cached=False):
+    """cached=True なら config_cache の解析済みキャッシュを使う（config/ のファイル向け）"""
     try:
+        if cached:
+            return config_cache.load_json(file_path)
         with open(file_path, "r", encoding="utf-8") as f:
             return json.load(f)
     except (FileNotFoundError, json.JSONDecodeError):
@@ -78,7 +95,7 @@ def load_all_data():
         "leg_story_context": LEG_STORY_CONTEXT_FILE,
     }
     for key, file_path in files_to_load.items():
-        loaded = load_json(file_path)
+        loaded = load_json(file_path, cached=file_path.parent == CONFIG_DIR)
         if loaded is None:
             if key in (
                 "manager_comments",
@@ -193,40 +210,96 @@ def _calc_rank_changes(all_data):
     return changes
 
 
-def _call_ai(prompt_text, provider, model="", dry_run=False):
-    """AIプロバイダーを呼び出して記事を生成"""
+_AI_PROVIDERS = {}
+_AI_PROVIDERS_LOCK = threading.Lock()
+
+
+def _get_ai(provider, model, mode, api_key, timeout=None):
+    """(provider, model, mode) ごとに SDK クライアントを1回だけ作って使い回す"""
+    key = (provider, model, mode)
+    with _AI_PROVIDERS_LOCK:
+        if key not in _AI_PROVIDERS:
+            _AI_PROVIDERS[key] = get_provider(
+                provider, model, mode=mode, api_key=api_key, timeout=timeout
+            )
+        return _AI_PROVIDERS[key]
+
+
+def _call_ai(prompt_text, provider, model="", dry_run=False, timeout=None, commit=True):
+    """AIプロバイダーを呼び出して記事を生成
+
+    応答は ai_providers のキャッシュを経由するため、同一プロンプトの再実行では
+    API を呼ばない（AI_RESPONSE_MODE=replay/fake ならネットワーク不要）。
+    commit=False なら応答のキャッシュ保存を保留し、検証後に _settle_ai で確定する。
+    """
     if dry_run:
         return f"[{provider} dry-run] 生成された記事"
 
+    mode = get_response_mode()
     api_key = GEMINI_API_KEY if provider == "gemini" else OPENAI_API_KEY
-    if not api_key:
+    if mode_requires_api_key(mode) and not api_key:
         print(f"エラー: 環境変数が未設定です (provider={provider})")
         return None
     selected_model = model or (GEMINI_MODEL if provider == "gemini" else OPENAI_MODEL)
 
     try:
-        if provider == "gemini":
-            from google import genai
-
-            client = genai.Client(api_key=api_key)
-            response = client.models.generate_content(
-                model=selected_model, contents=prompt_text
-            )
-            return response.text
-        else:
-            from openai import OpenAI
-
-            client = OpenAI(api_key=api_key)
-            response = client.chat.completions.create(
-                model=selected_model,
-                messages=[{"role": "user", "content": prompt_text}],
-            )
-            return response.choices[0].message.content
+        ai = _get_ai(provider, selected_model, mode, api_key, timeout=timeout)
+        response = ai.generate(prompt_text)
+        if commit:
+            ai.commit()
+        return response
     except Exception as e:
         print(f"エラー: {provider} API呼び出し失敗: {e}")
         return None
 
 
+def _settle_ai(provider, model="", accepted=True):
+    """_call_ai(commit=False) の応答を、採用ならキャッシュへ保存し、不採用なら捨てる"""
+    selected_model = model or (GEMINI_MODEL if provider == "gemini" else OPENAI_MODEL)
+    with _AI_PROVIDERS_LOCK:
+        ai = _AI_PROVIDERS.get((provider, selected_model, get_response_mode()))
+    if ai is None:
+        return
+    if accepted:
+        ai.commit()
+    else:
+        ai.discard()
+
+
+def generate_drafts(prompts, dry_run=False, timeouts=None):
+    """各プロバイダーの記事案を並行生成する。
+
+    prompts: {provider: prompt_text}
+    timeouts: {provider: 秒}。超過したプロバイダーは None（生成失敗）扱い。
+    戻り値: {provider: article_text or None}
+    """
+    timeouts = timeouts or DRAFT_TIMEOUTS
+    drafts = {}
+    executor = ThreadPoolExecutor(max_workers=len(prompts) or 1)
+    try:
+        futures = {
+            provider: executor.submit(
+                _call_ai, prompt, provider, dry_run=dry_run, timeout=timeouts.get(provider)
+            )
+            for provider, prompt in prompts.items()
+        }
+        started = time.monotonic()
+        for provider, future in futures.items():
+            # 並行実行なので、各プロバイダーの期限は開始時刻からの経過で判定する
+            remaining = timeouts.get(provider)
+            if remaining is not None:
+                remaining = max(0.0, remaining - (time.monotonic() - started))
+            try:
+                drafts[provider] = future.result(timeout=remaining)
+            except FuturesTimeoutError:
+                print(f"⚠️ {provider} 記事案が {timeouts.get(provider)}秒以内に返りませんでした。")
+                drafts[provider] = None
+    finally:
+        # タイムアウトした呼び出しの完了は待たない（SDK 側の timeout で打ち切られる）
+        executor.shutdown(wait=False, cancel_futures=True)
+    return drafts
+
+
 def format_article_with_markdown(article_text):
     """generate_daily_summary.py の format_article_with_markdown と同等"""
     text = re.sub(
@@ -289,30 +362,31 @@ def run_synthesis(dry_run=False, no_write=False, save_drafts_dir=None):
     print("2. レース事実データを準備中...")
     race_facts = format_race_facts(all_data)
 
-    # 3. Gemini 記事案を生成
-    print(f"\n3. Gemini 記事案を生成中...")
-    gemini_prompt = _build_draft_prompt(all_data, "gemini", dry_run=dry_run)
-    gemini_article = _call_ai(gemini_prompt, "gemini", dry_run=dry_run)
-    if gemini_article is None and not dry_run:
-        print("❌ Gemini 記事案の生成に失敗しました。終了します。")
-        return False
+    # 3. Gemini / OpenAI 記事案を並行生成
+    print(f"\n3. Gemini / OpenAI 記事案を並行生成中...")
+    prompts = {
+        provider: _build_draft_prompt(all_data, provider, dry_run=dry_run)
+        for provider in DRAFT_PROVIDERS
+    }
+    drafts = generate_drafts(prompts, dry_run=dry_run)
+    gemini_article = drafts.get("gemini")
+    openai_article = drafts.get("openai")
+
     if save_drafts_dir:
         Path(save_drafts_dir).mkdir(parents=True, exist_ok=True)
-        with open(Path(save_drafts_dir) / "gemini_draft.md", "w") as f:
-            f.write(gemini_article or "")
+        for provider in DRAFT_PROVIDERS:
+            with open(Path(save_drafts_dir) / f"{provider}_draft.md", "w") as f:
+                f.write(drafts.get(provider) or "")
     print(f"   Gemini 記事案: {len(gemini_article or '')}文字")
+    print(f"   OpenAI 記事案: {len(openai_article or '')}文字")
 
-    # 4. OpenAI 記事案を生成
-    print(f"\n4. OpenAI 記事案を生成中...")
-    openai_prompt = _build_draft_prompt(all_data, "openai", dry_run=dry_run)
-    openai_article = _call_ai(openai_prompt, "openai", dry_run=dry_run)
-    if openai_article is None and not dry_run:
-        print("❌ OpenAI 記事案の生成に失敗しました。終了します。")
+    # 4. 片方だけ失敗した場合は残った案で統合を続行する
+    failed = [p for p in DRAFT_PROVIDERS if drafts.get(p) is None]
+    if len(failed) == len(DRAFT_PROVIDERS) and not dry_run:
+        print("❌ すべての記事案の生成に失敗しました。終了します。")
         return False
-    if save_drafts_dir:
-        with open(Path(save_drafts_dir) / "openai_draft.md", "w") as f:
-            f.write(openai_article or "")
-    print(f"   OpenAI 記事案: {len(openai_article or '')}文字")
+    if failed and not dry_run:
+        print(f"\n4. ⚠️ {', '.join(failed)} の記事案なしで統合編集を続行します。")
 
     # 5. 統合編集
     print(f"\n5. 統合編集 AI を呼び出し中...")
@@ -334,7 +408,7 @@ def run_synthesis(dry_run=False, no_write=False, save_drafts_dir=None):
     synthesis_provider = SYNTHESIS_PROVIDER
     synthesis_model = SYNTHESIS_MODEL or ""
     final_article = _call_ai(
-        synthesis_prompt, synthesis_provider, model=synthesis_model
+        synthesis_prompt, synthesis_provider, model=synthesis_model, commit=False
     )
     if final_article is None:
         print("❌ 統合記事の生成に失敗しました。")
@@ -350,7 +424,10 @@ def run_synthesis(dry_run=False, no_write=False, save_drafts_dir=None):
     # 6. 検証・保存
     print(f"\n6. 最終記事を検証・保存中...")
     print(f"   統合記事: {len(final_article)}文字")
-    return save_article_if_valid(final_article, all_data, synthesis_prompt, no_write)
+    saved = save_article_if_valid(final_article, all_data, synthesis_prompt, no_write)
+    # 検証に落ちた統合記事はキャッシュに残さない（再実行で同じ記事が返らないように）
+    _settle_ai(synthesis_provider, synthesis_model, accepted=saved)
+    return saved
 
 
 def _build_draft_prompt(all_data, provider, dry_run=False):
@@ -443,15 +520,11 @@ def save_article_if_valid(article_text, all_data, prompt_text, no_write=False):
     _safe_save_json(DAILY_SUMMARY_FILE, summary_data)
     print(f"✅ daily_summary.json を更新しました。")
 
-    # article_history.json
-    history = load_json(ARTICLE_HISTORY_FILE, [])
-    new_entry = {
-        "date": summary_data["updateTime"].split(" ")[0],
-        "prompt": prompt_text,
-        "article": article_text,
-    }
-    _safe_save_json(ARTICLE_HISTORY_FILE, [new_entry] + history)
-    print(f"✅ article_history.json を更新しました。")
+    # article_history（追記専用ストア）
+    ArticleHistoryStore(ARTICLE_HISTORY_DIR).append(
+        summary_data["updateTime"].split(" ")[0], prompt_text, article_text
+    )
+    print(f"✅ article_history に追記しました。")
 
     # race_narrative_state.json（簡易更新: updated_day を進める）
     narrative = load_json(NARRATIVE_STATE_FILE, {"updated_day": 0})
@@ -5,6 +5,8 @@ import requests
 from bs4 import BeautifulSoup
 import time
 from pathlib import Path
+import config_cache
+import station_index
 
 # --- 定数 ---
 # --- ディレクトリ定義 ---
@@ -26,14 +28,14 @@ EKIDEN_START_DATE = '2026-03-08'
 
 # --- グローバル変数 ---
 stations_data = []
+stations = station_index.StationIndex([])  # load_base_data() で作り直す
 ekiden_data = {}
 
 def load_start_date_from_outline():
     """outline.json の metadata.startDate を正本として大会開始日を取得する"""
     global EKIDEN_START_DATE
     try:
-        with open(OUTLINE_FILE, 'r', encoding='utf-8') as f:
-            outline = json.load(f)
+        outline = config_cache.load_json(OUTLINE_FILE)
         metadata = outline.get('metadata', {})
         start_date = metadata.get('startDate')
         if start_date:
@@ -64,18 +66,16 @@ def load_base_data():
     """
     このスクリプトに必要な基本データ（アメダス地点、駅伝チーム情報）を読み込む。
     """
-    global stations_data, ekiden_data
+    global stations_data, stations, ekiden_data
     try:
-        with open(AMEDAS_STATIONS_FILE, 'r', encoding='utf-8') as f:
-            stations_data = json.load(f)
-        with open(EKIDEN_DATA_FILE, 'r', encoding='utf-8') as f:
-            ekiden_data = json.load(f)
+        stations_data = config_cache.load_json(AMEDAS_STATIONS_FILE)
+        stations = station_index.StationIndex(stations_data)
+        ekiden_data = config_cache.load_json(EKIDEN_DATA_FILE)
         if TEST_MODE:
             has_runners = any(team.get('runners') for team in ekiden_data.get('teams', []))
             if not has_runners and TEST_EKIDEN_DATA_FILE.exists():
                 print(f"情報: テストモードのため {TEST_EKIDEN_DATA_FILE} を選手データとして使用します。")
-                with open(TEST_EKIDEN_DATA_FILE, 'r', encoding='utf-8') as tf:
-                    ekiden_data = json.load(tf)
+                ekiden_data = config_cache.load_json(TEST_EKIDEN_DATA_FILE)
         ekiden_data['teams'] = [normalize_runner_entries(team) for team in ekiden_data.get('teams', [])]
     except FileNotFoundError as e:
         print(f"エラー: データファイルが見つかりません。 {e.filename}")
@@ -86,7 +86,7 @@ def load_base_data():
 
 def find_station_by_name(name):
     """地点名から観測所情報を検索"""
-    return next((s for s in stations_data if s['name'] == name), None)
+    return stations.by_name(name)
 
 def fetch_max_temperature(pref_code, station_code):
     """Yahoo天気から最高気温を取得"""
@@ -124,7 +124,6 @@ def update_all_records():
 
     today_str = datetime.now().strftime('%Y-%m-%d')
     runner_fetch_list = []  # [(team_id, runner_name, station_code_or_None)]
-    stations_by_code = {s['code']: s for s in stations_data}
     seen_entries = set()
     for team in ekiden_data['teams']:
         team_id = team.get('id')
@@ -161,7 +160,7 @@ def update_all_records():
     for i, (team_id, runner_name, station_code) in enumerate(runner_fetch_list):
         station = None
         if station_code:
-            station = stations_by_code.get(station_code)
+            station = stations.by_code(station_code)
             if not station:
                 print(f"エラー: 選手 '{runner_name}' の観測所コード {station_code} が見つかりません。スキップします。")
                 fetched_temps_cache[(team_id, runner_name)] = {'temperature': None, 'error': f'コード {station_code} 不明'}
@@ -170,7 +169,7 @@ def update_all_records():
                 continue
         else:
             # station_code なしの runner は名前で検索（ダミー対応、本来は全員にコード推奨）
-            station = next((s for s in stations_data if s['name'] == runner_name), None)
+            station = find_station_by_name(runner_name)
         if station:
             temp_result = fetch_max_temperature(station['pref_code'], station['code'])
         else:
@@ -303,5 +302,8 @@ def update_all_records():
           f"欠損={len(missing)}, アクティブ欠損={len(active_missing)})")
 
 if __name__ == '__main__':
-    update_all_records()
+    import script_profiler
+
+    with script_profiler.from_argv('update_all_records'):
+        update_all_records()
     print("\nすべての記録更新処理が完了しました。")
@@ -486,7 +486,10 @@ def print_issues(issues):
 
 
 if __name__ == '__main__':
-    exit_code = validate()
+    import script_profiler
+
+    with script_profiler.from_argv('validate_race_state'):
+        exit_code = validate()
     print_issues(LAST_ISSUES)
     # 機械可読出力 (D5): 最終行に1行JSON (validated_teams も含む)
     print(f'VALIDATION_RESULT {json.dumps({"exit_code": exit_code, "issues": LAST_ISSUES, "validated_teams": LAST_VALIDATED_TEAMS}, ensure_ascii=False)}')
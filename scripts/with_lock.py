@@ -5,74 +5,165 @@ macOS / Linux 両対応（fcntl.flock は両OSで利用可能）。
 flock(1) コマンドは macOS に存在しないため、このラッパーを使う。
 
 使い方:
-    python scripts/with_lock.py <lockfile> -- <command...>
+    python scripts/with_lock.py <lockfile> [--shared] [--try | --wait SEC] [--coalesce] -- <command...>
 
 ロックファイルは開いたまま保持され、プロセス終了時に自動解放される。
 異常終了（set -e 等）でもカーネルが解放するためロックが残らない。
 
+オプション:
+    --shared    共有ロック（読み取り専用ジョブ用）。共有ロック同士は並行実行でき、
+                排他ロック（既定）とは互いに待ち合う。
+    --try       ロックを非ブロッキングで取得できればコマンドを実行（ロック保持中）、
+                取得できなければ exit 75（コマンドは実行しない）。
+    --wait SEC  最大 SEC 秒までロックを待つ。取得できなければ exit 75。
+    --coalesce  待ち行列の深さ1。ロックが使用中なら「現在の保持者の後に1回だけ実行」として
+                待つ。既に別の待機者がいる場合はその実行で代替されるため、待たずに exit 75。
+                待機枠は <lockfile>.pending のロックで表す。
+
 --check モード（他スクリプトのガード用・ロックを保持しない）:
-    python scripts/with_lock.py <lockfile> --check
+    python scripts/with_lock.py <lockfile> [--shared] --check
     ロックを非ブロッキングで取得できれば exit 0、取得できなければ exit 1。
     取得後すぐ解放するため、処理全体を囲むのには使わないこと。
-
---try モード（ロックを取得できた場合のみコマンドを実行）:
-    python scripts/with_lock.py <lockfile> --try -- <command...>
-    ロックを非ブロッキングで取得できればコマンドを実行（ロック保持中）、
-    取得できなければ exit 75（コマンドは実行しない）。
 """
 
 import fcntl
 import os
 import subprocess
 import sys
+import time
 
 LOCK_BUSY_EXIT = 75
+POLL_INTERVAL_SECONDS = 0.1
+USAGE = ('使い方: with_lock.py <lockfile> [--shared] [--try | --wait SEC] [--coalesce] '
+         '-- <command...> | [--shared] --check')
+
 
+def acquire(lockfile, blocking=True, shared=False, timeout=None):
+    """ロックを取得し、開いたファイルを返す。
 
-def acquire(lockfile, blocking=True):
+    blocking=False は即時判定、timeout（秒）を指定するとその時間まで待つ。
+    取得できなければ BlockingIOError。
+    """
     f = open(lockfile, 'a+')
-    flags = fcntl.LOCK_EX
-    if not blocking:
-        flags |= fcntl.LOCK_NB
-    fcntl.flock(f, flags)
-    return f
+    flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+    try:
+        if blocking and timeout is None:
+            fcntl.flock(f, flags)
+            return f
+        deadline = time.monotonic() + (timeout or 0)
+        while True:
+            try:
+                fcntl.flock(f, flags | fcntl.LOCK_NB)
+                return f
+            except BlockingIOError:
+                if not blocking or time.monotonic() >= deadline:
+                    raise
+            time.sleep(POLL_INTERVAL_SECONDS)
+    except BaseException:
+        f.close()
+        raise
+
+
+def release(lock):
+    try:
+        fcntl.flock(lock, fcntl.LOCK_UN)
+    finally:
+        lock.close()
+
+
+def parse_args(argv):
+    """[--shared] [--try | --wait SEC] [--coalesce] [--check] [-- command...] を解析する。"""
+    opts = {'shared': False, 'try': False, 'wait': None, 'coalesce': False,
+            'check': False, 'command': None}
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg == '--':
+            opts['command'] = argv[i + 1:]
+            break
+        if arg == '--shared':
+            opts['shared'] = True
+        elif arg == '--try':
+            opts['try'] = True
+        elif arg == '--coalesce':
+            opts['coalesce'] = True
+        elif arg == '--check':
+            opts['check'] = True
+        elif arg == '--wait' and i + 1 < len(argv):
+            try:
+                opts['wait'] = float(argv[i + 1])
+            except ValueError:
+                return None
+            i += 1
+        else:
+            return None
+        i += 1
+
+    if opts['check']:
+        return opts if opts['command'] is None else None
+    if not opts['command'] or (opts['try'] and opts['wait'] is not None):
+        return None
+    return opts
+
+
+def _acquire_for_run(lockfile, opts):
+    """オプションに従ってロックを取得する。取得できなければ None（exit 75 相当）。"""
+    blocking = not opts['try']
+    timeout = opts['wait']
+    try:
+        return acquire(lockfile, blocking=False, shared=opts['shared'])
+    except BlockingIOError:
+        if not blocking:
+            return None
+
+    if not opts['coalesce']:
+        try:
+            return acquire(lockfile, blocking=True, shared=opts['shared'], timeout=timeout)
+        except BlockingIOError:
+            return None
+
+    # 待機枠（深さ1）を確保できた1プロセスだけが現在の保持者の後に実行する
+    try:
+        pending = acquire(f'{lockfile}.pending', blocking=False)
+    except BlockingIOError:
+        print('ロック待ちの実行が既にあるため、この回はそちらに任せます。', file=sys.stderr)
+        return None
+    try:
+        return acquire(lockfile, blocking=True, shared=opts['shared'], timeout=timeout)
+    except BlockingIOError:
+        return None
+    finally:
+        # ロック取得後（または断念後）は次の待機者のために枠を空ける
+        release(pending)
 
 
 def main():
     if len(sys.argv) < 3:
-        print('使い方: with_lock.py <lockfile> -- <command...> | '
-              '--check | --try -- <command...>', file=sys.stderr)
+        print(USAGE, file=sys.stderr)
         return 2
 
     lockfile = sys.argv[1]
+    opts = parse_args(sys.argv[2:])
+    if opts is None:
+        print(USAGE, file=sys.stderr)
+        return 2
 
     # --check モード: ロック取得可否のみ確認（取得後すぐ解放）
-    if len(sys.argv) >= 3 and sys.argv[2] == '--check':
+    if opts['check']:
         try:
-            acquire(lockfile, blocking=False)
+            release(acquire(lockfile, blocking=False, shared=opts['shared']))
             return 0
         except OSError:
             return 1
 
-    # --try モード: 取得できればコマンド実行、ビジーなら専用終了コード
-    if len(sys.argv) >= 4 and sys.argv[2] == '--try' and sys.argv[3] == '--':
-        try:
-            lock = acquire(lockfile, blocking=False)
-        except BlockingIOError:
-            return LOCK_BUSY_EXIT
-        except OSError as exc:
-            print(f'ロックファイルを開けません: {exc}', file=sys.stderr)
-            return 1
-        return _run_with_lock(lock, sys.argv[4:])
-
-    # 通常モード: ブロッキングで取得してコマンド実行
-    if len(sys.argv) >= 4 and sys.argv[2] == '--':
-        lock = acquire(lockfile, blocking=True)
-        return _run_with_lock(lock, sys.argv[3:])
-
-    print('使い方: with_lock.py <lockfile> -- <command...> | '
-          '--check | --try -- <command...>', file=sys.stderr)
-    return 2
+    try:
+        lock = _acquire_for_run(lockfile, opts)
+    except OSError as exc:
+        print(f'ロックファイルを開けません: {exc}', file=sys.stderr)
+        return 1
+    if lock is None:
+        return LOCK_BUSY_EXIT
+    return _run_with_lock(lock, opts['command'])
 
 
 def _run_with_lock(lock, command):
@@ -80,10 +171,7 @@ def _run_with_lock(lock, command):
         return subprocess.call(command)
     finally:
         # 明示解放（プロセス終了でも自動解放されるが、後続の--checkに備える）
-        try:
-            fcntl.flock(lock, fcntl.LOCK_UN)
-        finally:
-            lock.close()
+        release(lock)
 
 
 if __name__ == '__main__':
@@ -1,4 +1,4 @@
-const CACHE_NAME = 'ekiden-sokuhou-cache-v13';
+const CACHE_NAME = 'ekiden-sokuhou-cache-v14';
 // オフライン時に利用できるようにキャッシュするファイルのリスト
 const urlsToCache = [
   './', // ルートURL
@@ -9,7 +9,7 @@ const urlsToCache = [
   'config/ekiden_data.json',
   'config/amedas_stations.json',
   'config/player_profiles.json',
-  'config/course_path.json',
+  'config/course_path_lod.json',
   'config/relay_points.json',
   'https://unpkg.com/leaflet@1.9.4/dist/leaflet.css',
   'https://unpkg.com/leaflet@1.9.4/dist/leaflet.js',
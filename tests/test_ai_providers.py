@@ -0,0 +1,183 @@
+"""
+scripts/ai_providers.py のテスト。
+実API呼び出しなし、ダミークライアント/一時ディレクトリのみ。
+"""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "scripts"))
+
+from ai_providers import (
+    CachedProvider,
+    FakeProvider,
+    LiveProvider,
+    ReplayMissError,
+    ReplayProvider,
+    ResponseCache,
+    cache_key,
+    fake_value_from_schema,
+    get_provider,
+    prompt_hash,
+)
+from generate_daily_summary import DailySummaryGenerator
+
+
+class _CountingInner:
+    """呼び出し回数を数えるダミープロバイダー"""
+
+    def __init__(self, provider="openai", model="gpt-test"):
+        self.provider = provider
+        self.model = model
+        self.calls = 0
+
+    def generate(self, user_prompt, system_prompt=None, json_schema=None, schema_name="response"):
+        self.calls += 1
+        return f"応答{self.calls}: {user_prompt}"
+
+
+def test_cache_key_depends_on_provider_model_and_prompts():
+    base = cache_key("openai", "m1", "sys", "user")
+    assert base == cache_key("openai", "m1", "sys", "user")
+    assert base != cache_key("gemini", "m1", "sys", "user")
+    assert base != cache_key("openai", "m2", "sys", "user")
+    assert base != cache_key("openai", "m1", "sys2", "user")
+    assert base != cache_key("openai", "m1", "sys", "user2")
+    assert base != cache_key("openai", "m1", "sys", "user", {"type": "object"})
+
+
+def test_prompt_hash_separates_system_and_user():
+    assert prompt_hash("ab", "c") != prompt_hash("a", "bc")
+
+
+def test_cached_provider_reuses_response(tmp_path):
+    inner = _CountingInner()
+    provider = CachedProvider(inner, cache=ResponseCache(tmp_path))
+
+    first = provider.generate("プロンプト", system_prompt="sys")
+    provider.commit()
+    second = provider.generate("プロンプト", system_prompt="sys")
+
+    assert first == second
+    assert inner.calls == 1
+    assert provider.hits == 1
+    assert provider.misses == 1
+
+
+def test_live_mode_bypasses_cache_read_but_writes(tmp_path):
+    cache = ResponseCache(tmp_path)
+    inner = _CountingInner()
+    provider = CachedProvider(inner, cache=cache, use_cache=False)
+
+    provider.generate("プロンプト")
+    provider.commit()
+    provider.generate("プロンプト")
+    provider.commit()
+
+    assert inner.calls == 2
+    key = cache_key("openai", "gpt-test", None, "プロンプト")
+    assert cache.get(key) == "応答2: プロンプト"
+
+
+def test_replay_serves_cached_response(tmp_path):
+    cache = ResponseCache(tmp_path / "cache")
+    provider = CachedProvider(_CountingInner(), cache=cache)
+    provider.generate("U", system_prompt="S")
+    provider.commit()
+
+    replay = ReplayProvider("openai", "gpt-test", cache=cache, recorded_dir=tmp_path / "none")
+    assert replay.generate("U", system_prompt="S") == "応答1: U"
+
+
+def test_cached_provider_saves_only_committed_responses(tmp_path):
+    cache = ResponseCache(tmp_path)
+    provider = CachedProvider(_CountingInner(), cache=cache)
+    key = cache_key("openai", "gpt-test", "sys", "プロンプト")
+
+    provider.generate("プロンプト", system_prompt="sys")
+    assert cache.get(key) is None  # 検証前は保存しない
+
+    provider.discard()
+    assert cache.get(key) is None
+
+    assert provider.generate("プロンプト", system_prompt="sys") == "応答2: プロンプト"
+    provider.commit()
+    assert cache.get(key) == "応答2: プロンプト"
+
+
+def test_discard_evicts_rejected_cached_response(tmp_path):
+    cache = ResponseCache(tmp_path)
+    inner = _CountingInner()
+    provider = CachedProvider(inner, cache=cache)
+    provider.generate("プロンプト")
+    provider.commit()
+
+    # 再実行でキャッシュから返した応答が検証に落ちたら、次回は API を呼び直す
+    assert provider.generate("プロンプト") == "応答1: プロンプト"
+    provider.discard()
+    assert provider.generate("プロンプト") == "応答2: プロンプト"
+    assert inner.calls == 2
+
+
+def test_replay_falls_back_to_recorded_response(tmp_path):
+    recorded = tmp_path / "recorded"
+    recorded.mkdir()
+    (recorded / "20260801_000000_abcd1234_openai.json").write_text(json.dumps({
+        "provider": "openai",
+        "model": "gpt-test",
+        "prompt_hash": prompt_hash("S", "U"),
+        "raw_response": '{"article": "記録", "claims": []}',
+    }), encoding="utf-8")
+
+    replay = ReplayProvider("openai", "gpt-test", cache=ResponseCache(tmp_path / "cache"),
+                            recorded_dir=recorded)
+    assert replay.generate("U", system_prompt="S") == '{"article": "記録", "claims": []}'
+
+
+def test_replay_miss_raises(tmp_path):
+    replay = ReplayProvider("openai", "gpt-test", cache=ResponseCache(tmp_path),
+                            recorded_dir=tmp_path / "none")
+    with pytest.raises(ReplayMissError):
+        replay.generate("U")
+
+
+def test_fake_provider_returns_schema_valid_json():
+    schema = DailySummaryGenerator.DAILY_SUMMARY_JSON_SCHEMA
+    raw = FakeProvider("openai", "gpt-test").generate("U", json_schema=schema)
+    parsed = DailySummaryGenerator.parse_structured_ai_response(raw)
+    assert parsed["article"]
+    assert parsed["claims"] == []
+
+
+def test_fake_value_from_schema_handles_nested_types():
+    schema = {
+        "type": "object",
+        "required": ["n", "opt", "kind", "items"],
+        "properties": {
+            "n": {"type": "number"},
+            "opt": {"anyOf": [{"type": "string"}, {"type": "null"}]},
+            "kind": {"type": "string", "enum": ["a", "b"]},
+            "items": {"type": "array", "items": {"type": "string"}},
+        },
+    }
+    assert fake_value_from_schema(schema) == {"n": 0, "opt": "", "kind": "a", "items": []}
+
+
+def test_get_provider_modes(tmp_path):
+    assert isinstance(get_provider("openai", "m", mode="fake"), FakeProvider)
+    assert isinstance(get_provider("openai", "m", mode="replay", cache=ResponseCache(tmp_path)),
+                      ReplayProvider)
+    cached = get_provider("openai", "m", mode="cache", client=object(), cache=ResponseCache(tmp_path))
+    assert isinstance(cached, CachedProvider)
+    assert isinstance(cached.inner, LiveProvider)
+    assert cached.use_cache is True
+    assert get_provider("openai", "m", mode="live", client=object()).use_cache is False
+
+
+def test_live_provider_requires_api_key(monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    with pytest.raises(ValueError):
+        LiveProvider("openai", "m")
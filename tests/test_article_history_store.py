@@ -0,0 +1,69 @@
+"""
+scripts/article_history_store.py のテスト。
+一時ディレクトリのみで動作。
+"""
+import json
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "scripts"))
+
+from article_history_store import ArticleHistoryStore
+
+
+def _prompt(system, user):
+    return json.dumps({"system": system, "user": user}, ensure_ascii=False, indent=2)
+
+
+def test_append_and_latest_returns_newest_first(tmp_path):
+    store = ArticleHistoryStore(tmp_path / "article_history")
+    store.append("2026/08/01", _prompt("S", "U1"), "記事1")
+    store.append("2026/08/02", _prompt("S", "U2"), "記事2")
+    store.append("2026/08/03", "プレーンなプロンプト", "記事3")
+
+    latest = ArticleHistoryStore(tmp_path / "article_history").latest(2)
+    assert [e["date"] for e in latest] == ["2026/08/03", "2026/08/02"]
+    assert latest[0] == {"date": "2026/08/03", "prompt": "プレーンなプロンプト", "article": "記事3"}
+    assert latest[1]["prompt"] == _prompt("S", "U2")
+
+
+def test_system_prompt_is_deduplicated(tmp_path):
+    store = ArticleHistoryStore(tmp_path / "article_history")
+    system = "長いシステムプロンプト" * 200
+    for day in range(1, 4):
+        store.append(f"2026/08/0{day}", _prompt(system, f"U{day}"), f"記事{day}")
+
+    blob_lines = store.blobs_file.read_text(encoding="utf-8").splitlines()
+    # system 1件 + user 3件
+    assert len(blob_lines) == 4
+
+
+def test_append_does_not_rewrite_existing_lines(tmp_path):
+    store = ArticleHistoryStore(tmp_path / "article_history")
+    store.append("2026/08/01", _prompt("S", "U1"), "記事1")
+    before = store.articles_file.read_bytes()
+    store.append("2026/08/02", _prompt("S", "U2"), "記事2")
+    assert store.articles_file.read_bytes().startswith(before)
+
+
+def test_legacy_json_is_imported_and_exported_identically(tmp_path):
+    legacy = [
+        {"date": "2026/08/02", "prompt": _prompt("S", "U2"), "article": "記事2"},
+        {"date": "2026/08/01", "prompt": _prompt("S", "U1"), "article": "記事1"},
+    ]
+    legacy_file = tmp_path / "article_history.json"
+    legacy_file.write_text(json.dumps(legacy, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    store = ArticleHistoryStore(tmp_path / "article_history")
+    assert store.latest(1)[0]["article"] == "記事2"
+
+    exported = tmp_path / "exported.json"
+    store.export_json(exported)
+    assert exported.read_bytes() == legacy_file.read_bytes()
+
+
+def test_latest_on_empty_store(tmp_path):
+    store = ArticleHistoryStore(tmp_path / "article_history")
+    assert store.latest(2) == []
+    assert len(store) == 0
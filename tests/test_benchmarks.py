@@ -0,0 +1,71 @@
+"""benchmarks/bench_pipeline.py のテスト。小さな合成データで realtime / commit を1回ずつ実行する。"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "scripts"))
+sys.path.insert(0, str(PROJECT_ROOT / "benchmarks"))
+
+import bench_data  # noqa: E402
+import bench_pipeline  # noqa: E402
+from fake_services import FakeServices  # noqa: E402
+from time_utils import now_jst  # noqa: E402
+
+
+def test_parse_size():
+    assert bench_pipeline.parse_size("current") == {"name": "current"}
+    assert bench_pipeline.parse_size("100x10x30") == {"name": "100x10x30", "teams": 100, "legs": 10, "days": 30}
+    for spec in ("100x10", "0x3x3", "3x3x1", "abc"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            bench_pipeline.parse_size(spec)
+
+
+def test_bench_size_runs_synthetic_pipeline(tmp_path):
+    size = bench_pipeline.parse_size("3x3x3")
+    with FakeServices(now_jst, thread_posts=5) as services:
+        results = bench_pipeline.bench_size(size, ["realtime", "commit"], 1, services, log_dir=tmp_path)
+
+    by_mode = {entry["mode"]: entry for entry in results}
+    assert set(by_mode) == {"realtime", "commit"}
+    log = (tmp_path / "bench_3x3x3.log").read_text(encoding="utf-8")
+    for entry in results:
+        assert entry["summary"]["exitCodes"] == [0], log
+        assert entry["summary"]["wallSeconds"] > 0
+        assert entry["summary"]["peakRssKiB"] > 0
+
+    realtime = by_mode["realtime"]
+    # 当日走る3チーム分の最高気温と、スレッド・通知の送信
+    assert realtime["requests"]["yahoo"] >= 3
+    assert realtime["requests"]["board"] == 1
+    assert realtime["requests"]["push"] >= 1
+    assert "main.ranking" in realtime["summary"]["phases"]
+    assert "step.push_outbox" in realtime["summary"]["phases"]
+    assert "main.commit" in by_mode["commit"]["summary"]["phases"]
+
+
+def test_commit_with_finished_shadow_team(tmp_path):
+    """区間記録連合が最終区間を走り終えていても generate_report.py --commit が落ちない（UnboundLocalError の回帰）"""
+    with FakeServices(now_jst) as services:
+        bench_data.build_synthetic_workdir(tmp_path, now_jst(), services.base_url, 3, 3, 3)
+        state_file = tmp_path / "data" / "ekiden_state.json"
+        states = json.loads(state_file.read_text(encoding="utf-8"))
+        boundaries = json.loads((tmp_path / "config" / "ekiden_data.json").read_text(encoding="utf-8"))["leg_boundaries"]
+        shadow = next(s for s in states if s["id"] == 99)
+        shadow.update(totalDistance=float(boundaries[-1]), currentLeg=len(boundaries) + 1)
+        state_file.write_text(json.dumps(states, ensure_ascii=False), encoding="utf-8")
+
+        proc = subprocess.run(
+            [sys.executable, str(PROJECT_ROOT / "scripts" / "generate_report.py"), "--commit"],
+            cwd=tmp_path, env=bench_pipeline._env(tmp_path, services.base_url),
+            capture_output=True, text=True, timeout=120,
+        )
+
+    assert proc.returncode == 0, proc.stdout + proc.stderr
+    shadow_after = next(s for s in json.loads(state_file.read_text(encoding="utf-8")) if s["id"] == 99)
+    assert shadow_after["totalDistance"] == boundaries[-1]
+    assert shadow_after["currentLeg"] == len(boundaries) + 1
@@ -0,0 +1,185 @@
+"""
+scripts/board_client.py のテスト。
+ネットワークなし、fetch_html を差し替えて検証する。
+"""
+import sys
+from pathlib import Path
+
+import pytest
+import requests
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "scripts"))
+
+import board_client
+
+THREAD_HTML = """
+<html><body>
+<div class="post" id="1" data-id="1">
+  <span class="postusername"><b>名無し</b></span>
+  <span class="date">2026/08/05(水) 08:00:00.00</span>
+  <div class="post-content">一般の書き込み</div>
+</div>
+<div class="post" id="2" data-id="2">
+  <span class="postusername"><b>監督</b> ◆abc123</span>
+  <span class="date">2026/08/05(水) 09:30:00.12</span>
+  <div class="post-content">【選手交代】<br>大学名: テスト大学<br>交代: A→B</div>
+</div>
+<div class="post" id="3" data-id="3">
+  <div class="post-content">名前欄なし</div>
+</div>
+</body></html>
+"""
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.delenv("EKIDEN_POSTS_HTML", raising=False)
+    monkeypatch.setattr(board_client, "CACHE_DIR", tmp_path / "board_cache")
+    return tmp_path / "board_cache"
+
+
+def test_parse_thread_posts_fields():
+    posts = board_client.parse_thread_posts(THREAD_HTML)
+    assert [p["id"] for p in posts] == ["1", "2", "3"]
+    assert "◆abc123" in posts[1]["name"]
+    assert posts[1]["date"].startswith("2026/08/05")
+    assert posts[2]["name"] is None
+    assert board_client.post_text(posts[1]) == "【選手交代】\n大学名: テスト大学\n交代: A→B"
+    assert board_client.post_text(posts[1], " ") == "【選手交代】 大学名: テスト大学 交代: A→B"
+
+
+def test_thread_is_fetched_once_within_ttl(cache_dir, monkeypatch):
+    calls = []
+
+    def fake_fetch(url, timeout=20):
+        calls.append(url)
+        return THREAD_HTML
+
+    monkeypatch.setattr(board_client, "fetch_html", fake_fetch)
+    first, err1 = board_client.get_thread_posts("https://example.test/thread/", ttl=60)
+    second, err2 = board_client.get_thread_posts("https://example.test/thread/", ttl=60)
+
+    assert len(calls) == 1
+    assert first == second
+    assert err1 is None and err2 is None
+    assert board_client.read_cache("https://example.test/thread/")["posts"] == first
+
+
+def test_expired_cache_is_refetched(cache_dir, monkeypatch):
+    calls = []
+
+    def fake_fetch(url, timeout=20):
+        calls.append(url)
+        return THREAD_HTML
+
+    monkeypatch.setattr(board_client, "fetch_html", fake_fetch)
+    board_client.get_thread_posts("https://example.test/thread/", ttl=0)
+    board_client.get_thread_posts("https://example.test/thread/", ttl=0)
+    assert len(calls) == 2
+
+
+def test_fetch_failure_serves_stale_cache(cache_dir, monkeypatch):
+    board_client.write_cache("https://example.test/thread/",
+                             board_client.parse_thread_posts(THREAD_HTML), 0)
+
+    def failing_fetch(url, timeout=20):
+        raise requests.ConnectionError("down")
+
+    monkeypatch.setattr(board_client, "fetch_html", failing_fetch)
+    posts, err = board_client.get_thread_posts("https://example.test/thread/", ttl=60)
+    assert len(posts) == 3
+    assert "down" in err
+
+
+def test_fetch_failure_without_cache_returns_empty(cache_dir, monkeypatch):
+    def failing_fetch(url, timeout=20):
+        raise requests.ConnectionError("down")
+
+    monkeypatch.setattr(board_client, "fetch_html", failing_fetch)
+    posts, err = board_client.get_thread_posts("https://example.test/thread/")
+    assert posts == []
+    assert err
+
+
+def test_posts_html_fixture_skips_network(tmp_path, monkeypatch):
+    html_file = tmp_path / "thread.html"
+    html_file.write_text(THREAD_HTML, encoding="utf-8")
+    monkeypatch.setenv("EKIDEN_POSTS_HTML", str(html_file))
+    monkeypatch.setattr(board_client, "CACHE_DIR", tmp_path / "board_cache")
+
+    def must_not_fetch(url, timeout=20):
+        raise AssertionError("network must not be used")
+
+    monkeypatch.setattr(board_client, "fetch_html", must_not_fetch)
+    posts, err = board_client.get_thread_posts("https://example.test/thread/")
+    assert len(posts) == 3
+    assert err is None
+    assert not (tmp_path / "board_cache").exists()
+
+
+def _post_div(n):
+    return (f'<div class="post" id="{n}" data-id="{n}">'
+            f'<span class="postusername"><b>名無し</b></span>'
+            f'<span class="date">2026/08/05(水) 10:00:00.00</span>'
+            f'<div class="post-content">レス{n}</div></div>')
+
+
+def test_parse_thread_posts_skips_seen_posts():
+    posts = board_client.parse_thread_posts(THREAD_HTML, after_id=1)
+    assert [p["id"] for p in posts] == ["2", "3"]
+    assert board_client.parse_thread_posts(THREAD_HTML, after_id=3) == []
+
+
+def test_stale_cache_fetches_only_new_posts(cache_dir, monkeypatch):
+    calls = []
+    pages = {
+        "https://example.test/thread/": THREAD_HTML,
+        # 5ch の範囲指定ページ（>>1 抑止の n 付き）。既読レスが混じっても重複しない
+        "https://example.test/thread/4-n": _post_div(3) + _post_div(4) + _post_div(5),
+    }
+
+    def fake_fetch(url, timeout=20):
+        calls.append(url)
+        return pages[url]
+
+    monkeypatch.setattr(board_client, "fetch_html", fake_fetch)
+    board_client.get_thread_posts("https://example.test/thread/", ttl=0)
+    posts, err = board_client.get_thread_posts("https://example.test/thread/", ttl=0)
+
+    assert calls == ["https://example.test/thread/", "https://example.test/thread/4-n"]
+    assert err is None
+    assert [p["id"] for p in posts] == ["1", "2", "3", "4", "5"]
+    assert board_client.read_cache("https://example.test/thread/")["last_post_id"] == 5
+
+
+def test_force_refetches_whole_thread(cache_dir, monkeypatch):
+    calls = []
+
+    def fake_fetch(url, timeout=20):
+        calls.append(url)
+        return THREAD_HTML
+
+    monkeypatch.setattr(board_client, "fetch_html", fake_fetch)
+    board_client.get_thread_posts("https://example.test/thread/", ttl=0)
+    posts, _ = board_client.get_thread_posts("https://example.test/thread/", force=True)
+    assert calls == ["https://example.test/thread/"] * 2
+    assert len(posts) == 3
+
+
+def test_shitaraba_range_and_skip():
+    url = "https://jbbs.shitaraba.net/bbs/read.cgi/study/13070/1627306695/"
+    assert board_client.range_url(url, 11) == \
+        "https://jbbs.shitaraba.net/bbs/read.cgi/study/13070/1627306695/11-"
+    html = ('<dl><dt id="comment_10"><a>10</a></dt><dd>古い</dd>'
+            '<dt id="comment_11"><a>11</a></dt><dd>新しい</dd></dl>')
+    rest = board_client.skip_seen_posts(html, 10, kind="shitaraba")
+    assert rest.startswith('<dt id="comment_11"')
+    assert board_client.max_post_id(html, kind="shitaraba") == 11
+
+
+def test_cursors_round_trip(cache_dir):
+    url = "https://jbbs.shitaraba.net/bbs/read.cgi/study/13070/1627306695/"
+    assert board_client.read_cursor(url) is None
+    board_client.write_cursors({url: 42})
+    assert board_client.read_cursor(url) == 42
@@ -0,0 +1,77 @@
+"""scripts/config_cache.py のテスト。"""
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "scripts"))
+
+import config_cache
+
+
+def _write(path, data):
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+
+def test_cache_is_created_and_reused(tmp_path, monkeypatch):
+    source = tmp_path / "amedas_stations.json"
+    _write(source, [{"code": "11001", "name": "宗谷岬"}])
+
+    assert config_cache.load_json(source) == [{"code": "11001", "name": "宗谷岬"}]
+    assert config_cache.cache_path_for(source).exists()
+
+    # 2回目は JSON を解析しない
+    def must_not_parse(*args, **kwargs):
+        raise AssertionError("JSON を解析し直しました")
+
+    monkeypatch.setattr(config_cache.json, "loads", must_not_parse)
+    first = config_cache.load_json(source)
+    first.append("書き換え")
+    assert config_cache.load_json(source) == [{"code": "11001", "name": "宗谷岬"}]
+
+
+def test_cache_is_rebuilt_when_source_changes(tmp_path):
+    source = tmp_path / "outline.json"
+    _write(source, {"edition": 15})
+    assert config_cache.load_json(source) == {"edition": 15}
+
+    stat = source.stat()
+    _write(source, {"edition": 16})
+    # サイズも mtime も同じでも内容のハッシュで変更を検出する
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert config_cache.load_json(source) == {"edition": 16}
+
+
+def test_touched_source_with_same_content_keeps_cache(tmp_path, monkeypatch):
+    source = tmp_path / "course_path.json"
+    _write(source, [{"lat": 35.0, "lon": 135.0}])
+    config_cache.load_json(source)
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+
+    monkeypatch.setattr(config_cache.json, "loads", lambda *a, **k: pytest.fail("JSON を解析し直しました"))
+    assert config_cache.load_json(source) == [{"lat": 35.0, "lon": 135.0}]
+
+
+def test_broken_cache_and_errors(tmp_path, monkeypatch):
+    source = tmp_path / "ekiden_data.json"
+    _write(source, {"teams": []})
+    cache_path = config_cache.cache_path_for(source)
+    cache_path.parent.mkdir()
+    cache_path.write_bytes(b"broken")
+    assert config_cache.load_json(source) == {"teams": []}
+
+    with pytest.raises(FileNotFoundError):
+        config_cache.load_json(tmp_path / "missing.json")
+    (tmp_path / "bad.json").write_text("{", encoding="utf-8")
+    with pytest.raises(json.JSONDecodeError):
+        config_cache.load_json(tmp_path / "bad.json")
+
+    monkeypatch.setenv("EKIDEN_CONFIG_CACHE", "0")
+    other = tmp_path / "shadow_team.json"
+    _write(other, {"id": 99})
+    assert config_cache.load_json(other) == {"id": 99}
+    assert not config_cache.cache_path_for(other).exists()
@@ -0,0 +1,62 @@
+"""scripts/course_geometry.py のテスト。"""
+import json
+import math
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "scripts"))
+
+import course_geometry  # noqa: E402
+
+COURSE_PATH = json.loads((PROJECT_ROOT / "config" / "course_path.json").read_text(encoding="utf-8"))
+RELAY_POINTS = json.loads((PROJECT_ROOT / "config" / "relay_points.json").read_text(encoding="utf-8"))
+
+
+def test_polyline_round_trip():
+    points = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+    # Google のドキュメントの例（精度 1e-5）
+    assert course_geometry.encode_polyline(points, precision=5) == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+    assert course_geometry.decode_polyline("_p~iF~ps|U_ulLnnqC_mqNvxq`@", precision=5) == points
+
+    full = [(p["lat"], p["lon"]) for p in COURSE_PATH]
+    assert course_geometry.decode_polyline(course_geometry.encode_polyline(full)) == full
+
+
+def _distance_to_segment_m(p, a, b):
+    lat0 = (a[0] + b[0]) / 2
+    px, py = course_geometry._project(*p, lat0)
+    ax, ay = course_geometry._project(*a, lat0)
+    bx, by = course_geometry._project(*b, lat0)
+    dx, dy = bx - ax, by - ay
+    length2 = dx * dx + dy * dy
+    t = 0.0 if length2 == 0 else max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length2))
+    return math.hypot(px - ax - t * dx, py - ay - t * dy)
+
+
+def test_simplify_stays_within_tolerance():
+    points = [(p["lat"], p["lon"]) for p in COURSE_PATH[:400]]
+    kept = course_geometry.simplify_indices(points, 100)
+    assert kept[0] == 0 and kept[-1] == len(points) - 1
+    assert len(kept) < len(points)
+    for a, b in zip(kept, kept[1:]):
+        for i in range(a + 1, b):
+            assert _distance_to_segment_m(points[i], points[a], points[b]) <= 100
+
+
+def test_build_course_lod_keeps_relay_vertices():
+    lod = course_geometry.build_course_lod(COURSE_PATH, RELAY_POINTS)
+    levels = lod["levels"]
+    assert [level["toleranceM"] for level in levels] == [t for t, _ in course_geometry.LOD_LEVELS]
+    counts = [level["pointCount"] for level in levels]
+    assert counts == sorted(counts) and counts[-1] == len(COURSE_PATH)
+
+    anchors = course_geometry.anchor_indices([(p["lat"], p["lon"]) for p in COURSE_PATH], RELAY_POINTS)
+    anchor_points = [(COURSE_PATH[i]["lat"], COURSE_PATH[i]["lon"]) for i in anchors]
+    for level in levels:
+        points = course_geometry.decode_polyline(level["polyline"])
+        assert len(points) == level["pointCount"]
+        assert len(level["legOffsets"]) == len(RELAY_POINTS) + 1
+        # 各区間の先頭はスタート・中継所の頂点、末尾はゴール
+        assert [points[i] for i in level["legOffsets"]] == anchor_points[:-1]
+        assert points[-1] == anchor_points[-1]
@@ -0,0 +1,124 @@
+"""scripts/edition_archive.py のテスト。
+
+- 大会ディレクトリの取り込みと、大会をまたぐ問い合わせ（選手の履歴・区間の平均一覧）
+- reset_for_new_season.py が data/ を消す前に終了した大会を取り込む
+- generate_player_profiles.py がアーカイブだけにある過去大会も読む
+"""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "scripts"))
+
+import edition_archive  # noqa: E402
+import generate_player_profiles  # noqa: E402
+import reset_for_new_season  # noqa: E402
+
+
+def _write_edition(directory, edition, runners):
+    directory.mkdir(parents=True, exist_ok=True)
+    results = {
+        name: {"teamId": team_id, "totalDistance": round(sum(distances), 1),
+               "records": [{"day": day, "leg": leg, "distance": d} for day, (leg, d) in enumerate(distances_with_leg, 1)]}
+        for name, team_id, distances_with_leg in runners
+        for distances in [[d for _, d in distances_with_leg]]
+    }
+    (directory / "individual_results.json").write_text(json.dumps(results, ensure_ascii=False), encoding="utf-8")
+    (directory / "ekiden_state.json").write_text(json.dumps([
+        {"id": 1, "name": "A大学", "totalDistance": 200.0, "overallRank": 1, "finishDay": 5},
+        {"id": 2, "name": "B大学", "totalDistance": 150.0, "overallRank": 2, "finishDay": None},
+    ], ensure_ascii=False), encoding="utf-8")
+    (directory / "outline.json").write_text(json.dumps({"title": f"第{edition}回", "metadata": {"edition": edition}},
+                                                       ensure_ascii=False), encoding="utf-8")
+    return results
+
+
+@pytest.fixture
+def archive_path(tmp_path):
+    path = tmp_path / "editions.sqlite3"
+    _write_edition(tmp_path / "14", 14, [("梁川", 1, [(1, 38.0), (1, 37.0)]), ("佐野", 2, [(1, 36.0), (3, 35.0)])])
+    _write_edition(tmp_path / "15", 15, [("梁川", 2, [(3, 39.0), (3, 37.0)]), ("佐野", 1, [(3, 38.0), (3, 38.0)])])
+    assert edition_archive.pack_edition(14, tmp_path / "14", path)["runners"] == 2
+    edition_archive.pack_edition(15, tmp_path / "15", path)
+    return path
+
+
+def test_cross_edition_queries(archive_path, tmp_path):
+    with edition_archive.EditionArchive(archive_path) as archive:
+        assert archive.editions() == [14, 15]
+
+        history = archive.runner_history("梁川")
+        assert [(h["edition"], h["team_name"], h["total_distance"]) for h in history] == [(14, "A大学", 75.0), (15, "B大学", 76.0)]
+        assert history[1]["legs"] == [{"leg": 3, "days": 2, "total_distance": 76.0, "average_distance": 38.0, "leg_rank": 1}]
+        assert [r["distance"] for r in history[0]["records"]] == [38.0, 37.0]
+
+        # 15回の3区は梁川・佐野ともに平均38.0 → 同率1位
+        leg3 = archive.leg_averages(3)
+        assert [(r["edition"], r["runner_name"], r["average_distance"], r["leg_rank"]) for r in leg3] == [
+            (15, "佐野", 38.0, 1), (15, "梁川", 38.0, 1), (14, "佐野", 35.0, 1)]
+        assert [r["runner_name"] for r in archive.leg_averages(3, edition=14)] == ["佐野"]
+        assert [r["team_id"] for r in archive.team_results(15)] == [1, 2]
+        assert archive.daily_records(15, leg=3, day=1)[0]["runner_name"] == "梁川"
+
+        raw = (tmp_path / "15" / "individual_results.json").read_bytes()
+        assert archive.document_bytes(15, "individual_results.json") == raw
+        assert archive.document(15, "no_such.json") is None
+
+
+def test_repack_replaces_edition(archive_path, tmp_path):
+    _write_edition(tmp_path / "15b", 15, [("美濃", 1, [(2, 30.0)])])
+    edition_archive.pack_edition(15, tmp_path / "15b", archive_path)
+    with edition_archive.EditionArchive(archive_path) as archive:
+        assert [h["edition"] for h in archive.runner_history("梁川")] == [14]
+        assert [h["edition"] for h in archive.runner_history("美濃")] == [15]
+
+
+def test_pack_requires_individual_results(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        edition_archive.pack_edition(15, tmp_path / "missing", tmp_path / "editions.sqlite3")
+
+
+def test_reset_archives_finished_edition(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(edition_archive, "ARCHIVE_FILE", tmp_path / "history_data" / "editions.sqlite3")
+    _write_edition(tmp_path / "data", 16, [("梁川", 1, [(1, 40.0)])])
+    (tmp_path / "data" / "outline.json").unlink()  # data/ には無く、config/ の outline.json を取り込む
+    (tmp_path / "config").mkdir()
+    (tmp_path / "config" / "outline.json").write_text(json.dumps({"metadata": {"edition": 16}}), encoding="utf-8")
+
+    assert reset_for_new_season.archive_finished_edition()
+    with edition_archive.EditionArchive(edition_archive.ARCHIVE_FILE) as archive:
+        assert archive.editions() == [16]
+        assert archive.document(16, "outline.json") == {"metadata": {"edition": 16}}
+
+
+def test_reset_reports_broken_archive_and_source(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    archive_file = tmp_path / "history_data" / "editions.sqlite3"
+    monkeypatch.setattr(edition_archive, "ARCHIVE_FILE", archive_file)
+    _write_edition(tmp_path / "data", 16, [("梁川", 1, [(1, 40.0)])])
+    (tmp_path / "config").mkdir()
+    (tmp_path / "config" / "outline.json").write_text(json.dumps({"metadata": {"edition": 16}}), encoding="utf-8")
+
+    # 壊れたアーカイブ（sqlite3.DatabaseError）は例外にせず失敗として返す
+    archive_file.parent.mkdir()
+    archive_file.write_bytes(b"not a sqlite database" * 100)
+    assert not reset_for_new_season.archive_finished_edition()
+
+    # UTF-8 でない元データ（UnicodeDecodeError）も同様
+    archive_file.unlink()
+    (tmp_path / "data" / "individual_results.json").write_bytes(b"\xff\xfe{}")
+    assert not reset_for_new_season.archive_finished_edition()
+
+
+def test_player_profiles_read_archived_editions(archive_path, tmp_path, monkeypatch):
+    workdir = tmp_path / "work"
+    workdir.mkdir()
+    monkeypatch.chdir(workdir)
+    monkeypatch.setattr(generate_player_profiles, "EDITION_ARCHIVE_FILE", archive_path)
+    performances = generate_player_profiles.load_edition_performances(use_cache=False)
+    assert list(performances) == ["14", "15"]
+    assert performances["15"]["梁川"]["summary"]["legs_run"] == [3]
@@ -560,7 +560,7 @@ def test_fetch_includes_previous_morning_with_empty_existing(tmp_path, monkeypat
             {'source_url': 'https://x.test/1', 'source_kind': '5ch', 'post_id': '2',
              'timestamp': datetime(2026, 8, 5, 19, 30), 'tripcode': '◆test',
              'content_html': '<p>当日のコメント</p>', 'posted_name': 'テスト監督'},
-        ], None
+        ], None, None
 
     monkeypatch.setattr(fmc, 'fetch_source', fake_fetch)
     fmc.fetch_and_process_comments()
@@ -653,7 +653,7 @@ def test_all_source_failure_keeps_existing_file(tmp_path, monkeypatch):
     monkeypatch.setattr(fmc, 'OUTPUT_FILE', output)
     monkeypatch.setattr(fmc, 'get_manager_tripcodes', lambda: {'◆test': 'テスト監督'})
     monkeypatch.setattr(fmc, 'get_comment_sources', lambda: [{'url': 'https://x.test/1', 'kind': '5ch'}])
-    monkeypatch.setattr(fmc, 'fetch_source', lambda url, kind: ([], '取得失敗'))
+    monkeypatch.setattr(fmc, 'fetch_source', lambda url, kind: ([], '取得失敗', None))
 
     fmc.fetch_and_process_comments()
 
@@ -663,6 +663,114 @@ def test_all_source_failure_keeps_existing_file(tmp_path, monkeypatch):
     assert data[0]['post_id'] == '1'
 
 
+# ============================================================
+# テスト: 並行取得と期限
+# ============================================================
+
+def test_slow_source_times_out_and_others_are_merged(tmp_path, monkeypatch):
+    """1ソースが期限を超えても、他ソースの結果で保存し取得状況を記録する。"""
+    import threading
+    import fetch_manager_comments as fmc
+    from time_utils import JST
+    monkeypatch.setattr(fmc, 'now_jst', lambda: datetime(2026, 8, 5, 20, 0, tzinfo=JST))
+    output = tmp_path / 'manager_comments.json'
+    monkeypatch.setattr(fmc, 'OUTPUT_FILE', output)
+    monkeypatch.setattr(fmc, 'SOURCE_TIMEOUT_SECONDS', 0.2)
+    monkeypatch.setattr(fmc, 'get_manager_tripcodes', lambda: {'◆test': 'テスト監督'})
+    monkeypatch.setattr(fmc, 'get_comment_sources', lambda: [
+        {'url': 'https://slow.test/1', 'kind': 'shitaraba'},
+        {'url': 'https://x.test/1', 'kind': '5ch'},
+    ])
+    release = threading.Event()
+
+    def fake_fetch(url, kind):
+        if 'slow' in url:
+            release.wait(5)
+            return [], None, None
+        return [{'source_url': url, 'source_kind': '5ch', 'post_id': '1',
+                 'timestamp': datetime(2026, 8, 5, 19, 30), 'tripcode': '◆test',
+                 'content_html': '<p>当日のコメント</p>', 'posted_name': 'テスト監督'}], None, None
+
+    monkeypatch.setattr(fmc, 'fetch_source', fake_fetch)
+    try:
+        fmc.fetch_and_process_comments()
+    finally:
+        release.set()
+
+    data = json.loads(output.read_text(encoding='utf-8'))
+    assert [c['post_id'] for c in data] == ['1']
+
+    status = json.loads((tmp_path / fmc.FETCH_STATUS_FILE_NAME).read_text(encoding='utf-8'))
+    by_url = {s['url']: s for s in status['sources']}
+    assert by_url['https://slow.test/1']['status'] == 'timeout'
+    assert by_url['https://x.test/1']['status'] == 'ok'
+    assert by_url['https://x.test/1']['posts'] == 1
+    assert by_url['https://x.test/1']['elapsedSeconds'] is not None
+
+
+def test_fetch_all_sources_keeps_source_order(monkeypatch):
+    """並行取得でも結果はソース順に連結される（ソース内の後勝ち dedup を保つ）。"""
+    import time as time_mod
+    import fetch_manager_comments as fmc
+
+    def fake_fetch(url, kind):
+        if url.endswith('/a'):
+            time_mod.sleep(0.05)
+        return [{'post_id': url}], None, None
+
+    monkeypatch.setattr(fmc, 'fetch_source', fake_fetch)
+    all_raw, errors, statuses, cursors = fmc.fetch_all_sources(
+        [{'url': 'https://x.test/a', 'kind': '5ch'}, {'url': 'https://x.test/b', 'kind': '5ch'}],
+        source_timeout=5)
+    assert [c['post_id'] for c in all_raw] == ['https://x.test/a', 'https://x.test/b']
+    assert errors == []
+    assert [s['status'] for s in statuses] == ['ok', 'ok']
+    assert cursors == {}
+
+
+def test_timed_out_source_does_not_advance_cursor(tmp_path, monkeypatch):
+    """期限後に終わったしたらばの既読位置は保存しない（捨てたコメントを次回読み飛ばさない）。"""
+    import threading
+    import fetch_manager_comments as fmc
+    from time_utils import JST
+    monkeypatch.setattr(fmc, 'now_jst', lambda: datetime(2026, 8, 5, 20, 0, tzinfo=JST))
+    monkeypatch.setattr(fmc, 'OUTPUT_FILE', tmp_path / 'manager_comments.json')
+    monkeypatch.setattr(fmc, 'SOURCE_TIMEOUT_SECONDS', 0.2)
+    monkeypatch.setattr(fmc, 'get_manager_tripcodes', lambda: {'◆test': 'テスト監督'})
+    monkeypatch.setattr(fmc, 'get_comment_sources', lambda: [
+        {'url': 'https://slow.test/1', 'kind': 'shitaraba'},
+        {'url': 'https://fast.test/1', 'kind': 'shitaraba'},
+    ])
+    written = []
+    monkeypatch.setattr(fmc.board_client, 'write_cursors', lambda updates: written.append(dict(updates)))
+    release = threading.Event()
+    slow_done = threading.Event()
+
+    def fake_fetch(url, kind):
+        comment = {'source_url': url, 'source_kind': kind, 'post_id': '5',
+                   'timestamp': datetime(2026, 8, 5, 19, 30), 'tripcode': '◆test',
+                   'content_html': f'<p>{url}</p>', 'posted_name': 'テスト監督'}
+        if 'slow' in url:
+            release.wait(5)
+            slow_done.set()
+            return [comment], None, 50
+        return [comment], None, 5
+
+    def finish_slow_source(statuses):
+        # 期限切れの判定後、既読位置を保存する前に遅いソースを完了させる
+        release.set()
+        assert slow_done.wait(5)
+
+    monkeypatch.setattr(fmc, 'fetch_source', fake_fetch)
+    monkeypatch.setattr(fmc, 'write_fetch_status', finish_slow_source)
+    try:
+        fmc.fetch_and_process_comments()
+    finally:
+        release.set()
+
+    assert written == [{'https://fast.test/1': 5}]
+
+
 # ============================================================
 # テストランナー
 # ============================================================
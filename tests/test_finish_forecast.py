@@ -0,0 +1,120 @@
+"""scripts/finish_forecast.py のテスト。
+
+- 区間交代・ゴール日・順位付けが generate_report.py の確定処理と同じ規則になる
+- 乱数シードを指定すると結果が再現でき、各チームの順位・ゴール日の確率の合計は 1 になる
+- 気温の履歴はアーカイブ（区間番号付きの走者名）から daily_temperatures.json に無い日だけ補う
+"""
+import json
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "scripts"))
+
+import finish_forecast
+
+
+def _ekiden(*teams):
+    return {
+        "leg_boundaries": [100, 200],
+        "teams": [{"id": team_id, "name": name, "runners": runners} for team_id, name, runners in teams],
+    }
+
+
+def _state(team_id, total=0.0, leg=1, finish_day=None):
+    return {"id": team_id, "totalDistance": total, "currentLeg": leg, "finishDay": finish_day}
+
+
+def test_fixed_temperatures_follow_commit_rules():
+    ekiden = _ekiden(
+        (1, "A大学", ["a1", {"name": "a2", "station_code": "1"}]),
+        (2, "B大学", ["b1", "b2"]),
+        (3, "C大学", ["c1", "c2"]),
+    )
+    history = {"a1": [400], "a2": [400], "b1": [500], "b2": [500], "c1": [2500], "c2": [2500]}
+    state = [_state(1), _state(2), _state(3)]
+
+    result = finish_forecast.forecast(ekiden, state, history, race_day=0, simulations=50, seed=1)
+    teams = {t["id"]: t for t in result["teams"]}
+
+    # A: 40km/日で 3日目に第1区(100km)を越え、5日目に 200km でゴール
+    assert teams[1]["finishDayProbabilities"] == {"5": 1.0}
+    assert teams[2]["finishDayProbabilities"] == {"4": 1.0}
+    # C: 1日目に 250km でも進む区間は1つだけなので、ゴールは2日目
+    assert teams[3]["finishDayProbabilities"] == {"2": 1.0}
+    assert [t["id"] for t in result["teams"]] == [3, 2, 1]
+    assert teams[3]["winProbability"] == 1.0
+    assert teams[1]["rankProbabilities"] == [0.0, 0.0, 1.0]
+    assert teams[1]["unfinishedProbability"] == 0.0
+
+
+def test_ties_and_finished_teams():
+    ekiden = _ekiden((1, "A大学", ["a1", "a2"]), (2, "B大学", ["b1", "b2"]), (3, "C大学", ["c1", "c2"]))
+    history = {"a1": [300], "a2": [300], "b1": [300], "b2": [300], "c1": [300], "c2": [300]}
+    # C は確定済み（3日目ゴール, 205.0km）。A・B は同じ位置から同じ気温なので同着
+    state = [_state(1, 150.0, 2), _state(2, 150.0, 2), _state(3, 205.0, 3, finish_day=3)]
+
+    result = finish_forecast.forecast(ekiden, state, history, race_day=3, simulations=20, seed=1)
+    teams = {t["id"]: t for t in result["teams"]}
+
+    assert teams[3]["finishDay"] == 3
+    assert teams[3]["finishDayProbabilities"] == {"3": 1.0}
+    assert teams[3]["winProbability"] == 1.0
+    assert teams[1]["finishDayProbabilities"] == {"5": 1.0}
+    assert teams[1]["expectedRank"] == teams[2]["expectedRank"] == 2.0
+
+
+def test_unfinished_teams_rank_by_distance_after_max_day():
+    ekiden = _ekiden((1, "A大学", ["a1", "a2"]), (2, "B大学", ["b1", "b2"]))
+    history = {"a1": [100], "a2": [100], "b1": [200], "b2": [200]}
+
+    result = finish_forecast.forecast(ekiden, [_state(1), _state(2)], history, race_day=0,
+                                      simulations=10, seed=1, max_day=3)
+    teams = {t["id"]: t for t in result["teams"]}
+
+    assert teams[1]["unfinishedProbability"] == teams[2]["unfinishedProbability"] == 1.0
+    assert teams[1]["expectedFinishDay"] is None
+    assert teams[2]["winProbability"] == 1.0
+
+
+def test_seeded_forecast_is_reproducible_and_normalized():
+    runners = [f"r{i}" for i in range(2)]
+    ekiden = _ekiden(*[(team_id, f"大学{team_id}", [f"{team_id}{r}" for r in runners]) for team_id in range(1, 13)])
+    history = {f"{team_id}{r}": [300 + team_id * 5, 320, 340, 360 - team_id]
+               for team_id in range(1, 13) for r in runners}
+    state = [_state(team_id) for team_id in range(1, 13)]
+
+    first = finish_forecast.forecast(ekiden, state, history, race_day=0, simulations=300, seed=7)
+    second = finish_forecast.forecast(ekiden, state, history, race_day=0, simulations=300, seed=7)
+    assert first["teams"] == second["teams"]
+
+    # 同着（同じゴール日・同じ距離）は同順位なので、優勝・シード権の確率の合計は 1・10 以上になる
+    assert sum(t["winProbability"] for t in first["teams"]) >= 1 - 0.01
+    assert sum(t["seedProbability"] for t in first["teams"]) >= 10 - 0.05
+    for team in first["teams"]:
+        assert abs(sum(team["rankProbabilities"]) - 1) < 0.01
+        assert abs(sum(team["finishDayProbabilities"].values()) + team["unfinishedProbability"] - 1) < 0.01
+
+
+def test_temperature_history_uses_archive_only_for_missing_days(tmp_path):
+    daily = {"2026-07-23": {"美濃": 35.1, "名古屋": 0}}
+    lines = [
+        {"timestamp": "2026-07-23T16:00:00+09:00", "runner_name": "1美濃", "distance": 40.0},
+        {"timestamp": "2026-07-24T12:00:00+09:00", "runner_name": "1美濃", "distance": 30.0},
+        {"timestamp": "2026-07-24T16:00:00+09:00", "runner_name": "1美濃", "distance": 33.4},
+        {"timestamp": "2026-07-24T16:00:00+09:00", "runner_name": "10岐阜", "distance": 36.0},
+    ]
+    (tmp_path / "realtime_log_2026-07-24.jsonl").write_text(
+        "\n".join(json.dumps(line, ensure_ascii=False) for line in lines) + "\n", encoding="utf-8")
+
+    history = finish_forecast.load_temperature_history(daily, tmp_path)
+
+    assert sorted(history["美濃"]) == [334, 351]
+    assert history["岐阜"] == [360]
+    assert "名古屋" not in history
+
+
+def test_last_committed_day():
+    daily = {"2026-07-20": {}, "2026-07-23": {}, "2026-07-25": {}}
+    assert finish_forecast.last_committed_day(daily, "2026-07-23") == 3
+    assert finish_forecast.last_committed_day({"2025-08-01": {}}, "2026-07-23") == 0
@@ -0,0 +1,72 @@
+"""scripts/generate_player_profiles.py の大会ごとの集計のテスト。
+
+- 区間順位・日別順位・サマリーの区間順位（同記録は同順位）
+- 前回のキャッシュを使った再集計が、全選手の再計算と同じ結果になる
+- 入力が変わらない過去大会はキャッシュを使う
+"""
+import copy
+import json
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "scripts"))
+
+import generate_player_profiles as gpp  # noqa: E402
+
+RESULTS = {
+    "選手A": {"totalDistance": 75.0, "records": [{"day": 1, "leg": 1, "distance": 40.0}, {"day": 2, "leg": 1, "distance": 35.0}]},
+    "選手B": {"totalDistance": 75.0, "records": [{"day": 1, "leg": 1, "distance": 35.0}, {"day": 2, "leg": 1, "distance": 40.0}]},
+    "選手C": {"totalDistance": 76.0, "records": [{"day": 1, "leg": 2, "distance": 38.0}, {"day": 3, "leg": 1, "distance": 38.0}]},
+    "選手D": {"totalDistance": 30.0, "records": [{"day": 3, "leg": 2, "distance": 30.0}]},
+    "未出走": {"totalDistance": 0, "records": []},
+}
+
+
+def _raw(results):
+    return json.dumps(results, ensure_ascii=False).encode("utf-8")
+
+
+def test_edition_ranks_with_ties():
+    performance = gpp.compute_edition_performance(_raw(RESULTS))["performance"]
+    assert set(performance) == {"選手A", "選手B", "選手C", "選手D"}
+
+    a_records = performance["選手A"]["records"]
+    assert [(r["legRank"], r["dailyRank"]) for r in a_records] == [(1, 1), (4, 2)]
+    b_records = performance["選手B"]["records"]
+    assert [(r["legRank"], r["dailyRank"]) for r in b_records] == [(4, 2), (1, 1)]
+
+    # 1区の平均: A=B=37.5, C=38.0 → C が1位、A・B は同率2位
+    assert performance["選手A"]["summary"] == {
+        "total_distance": 75.0, "average_distance": 37.5, "best_leg_rank": 2, "legs_run": [1]}
+    assert performance["選手C"]["summary"]["best_leg_rank"] == 1
+    assert performance["選手C"]["summary"]["legs_run"] == [1, 2]
+    assert performance["選手D"]["summary"]["best_leg_rank"] == 2
+
+
+def test_incremental_recompute_matches_full():
+    previous = gpp.compute_edition_performance(_raw(RESULTS))
+    changed = copy.deepcopy(RESULTS)
+    changed["選手D"]["records"][0]["distance"] = 39.0  # 2区の順位だけが変わる
+
+    incremental = gpp.compute_edition_performance(_raw(changed), previous)
+    full = gpp.compute_edition_performance(_raw(changed))
+    assert incremental["performance"] == full["performance"]
+    # 2区に記録がある C・D だけを計算し直す
+    assert incremental["recomputed"] == 2
+    assert full["performance"]["選手C"]["summary"]["best_leg_rank"] == 1
+    assert full["performance"]["選手D"]["summary"]["best_leg_rank"] == 1
+
+
+def test_load_edition_performances_uses_cache(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(gpp, "PERFORMANCE_CACHE_DIR", tmp_path / "cache")
+    (tmp_path / "15").mkdir()
+    (tmp_path / "15" / "individual_results.json").write_bytes(_raw(RESULTS))
+
+    first = gpp.load_edition_performances()
+    assert "第15回: 4/4人を集計" in capsys.readouterr().out
+    second = gpp.load_edition_performances()
+    assert "集計" not in capsys.readouterr().out
+    assert first == second
+    assert list(first) == ["15"]
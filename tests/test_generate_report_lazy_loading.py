@@ -0,0 +1,76 @@
+"""scripts/generate_report.py の遅延読み込みのテスト。
+
+- import 時に requests / bs4 / geopy / dotenv を読み込まない（cron 1回ごとの起動時間の回帰防止）
+- load_all_data() は大会設定だけを読み、観測所一覧・歴史データは初回アクセス時に読む
+"""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "scripts"))
+
+import generate_report
+
+HEAVY_MODULES = ("requests", "bs4", "geopy", "dotenv")
+
+
+def test_import_does_not_load_heavy_modules(tmp_path):
+    code = (
+        "import json, sys\n"
+        f"sys.path.insert(0, {str(PROJECT_ROOT / 'scripts')!r})\n"
+        "import generate_report\n"
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=tmp_path,
+                            capture_output=True, text=True, check=True)
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []
+
+
+def _write(path, data):
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def data_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(generate_report, "ekiden_data", {})
+    monkeypatch.setattr(generate_report, "all_teams_data", [])
+    monkeypatch.setattr(generate_report, "current_runner_team_map", {})
+    monkeypatch.setattr(generate_report, "EKIDEN_DATA_FILE", _write(tmp_path / "ekiden_data.json", {
+        "leg_boundaries": [100],
+        "teams": [{"id": 1, "name": "テスト大学", "runners": [{"name": "選手A", "station_code": "11001"}]}],
+    }))
+    monkeypatch.setattr(generate_report, "SHADOW_TEAM_FILE", tmp_path / "missing_shadow.json")
+    monkeypatch.setattr(generate_report, "AMEDAS_STATIONS_FILE", _write(tmp_path / "amedas_stations.json", [
+        {"code": "11001", "name": "宗谷岬", "pref_code": "11"},
+    ]))
+    monkeypatch.setattr(generate_report, "PAST_RESULTS_FILE", tmp_path / "missing_past_results.json")
+    monkeypatch.setattr(generate_report, "INTRAMURAL_RANKINGS_FILE", tmp_path / "missing_intramural.json")
+    yield tmp_path
+    generate_report._loaded_datasets.clear()
+
+
+def test_load_all_data_defers_stations_and_history(data_files):
+    # 歴史データが無くても load_all_data() 自体は成功する
+    generate_report.load_all_data()
+    assert generate_report.ekiden_data["leg_boundaries"] == [100]
+    assert generate_report._loaded_datasets == {}
+
+    assert generate_report.get_station_by_code("11001")["name"] == "宗谷岬"
+    assert generate_report.find_station_by_name("宗谷岬")["code"] == "11001"
+    assert generate_report.stations_by_code.keys() == {"11001"}
+    assert set(generate_report._loaded_datasets) == {"stations_data", "station_index"}
+
+
+def test_missing_datasets_fail_only_when_accessed(data_files):
+    generate_report.load_all_data()
+    # 任意ファイルは空扱い、必須ファイルはアクセスした時点でエラー終了
+    assert generate_report.intramural_rankings == {}
+    with pytest.raises(SystemExit):
+        generate_report.past_results
+    with pytest.raises(AttributeError):
+        generate_report.no_such_dataset
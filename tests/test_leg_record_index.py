@@ -0,0 +1,130 @@
+"""scripts/leg_record_index.py のテスト。
+
+- check() の判定が歴代10傑・区間賞の総当たりと一致する
+- 保存済みの索引が歴史データより古ければ作り直す
+- generate_report の速報コメント・generate_daily_summary の記録更新メモが索引を使う
+"""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "scripts"))
+
+import generate_daily_summary as gds  # noqa: E402
+import generate_report  # noqa: E402
+import leg_record_index  # noqa: E402
+
+HISTORY_DIR = PROJECT_ROOT / "history_data"
+LEG_BEST_RECORDS = json.loads((HISTORY_DIR / "leg_best_records.json").read_text(encoding="utf-8"))
+LEG_AWARD_HISTORY = json.loads((HISTORY_DIR / "leg_award_history.json").read_text(encoding="utf-8"))
+
+
+def _brute_force(leg, average):
+    top10 = next(r["top10"] for r in LEG_BEST_RECORDS["leg_records"] if r["leg"] == leg)
+    records = [e["record"] for e in top10]
+    awards = [a["record"] for e in LEG_AWARD_HISTORY for a in e["awards"] if a["leg"] == leg]
+    last_award = next(a["record"] for a in max(LEG_AWARD_HISTORY, key=lambda e: e["edition"])["awards"] if a["leg"] == leg)
+    rank = sum(1 for r in records if r > average) + 1
+    return {
+        "rank": rank if rank <= 10 else None,
+        "entersTop": rank <= 10,
+        "beatsRecord": average > max(records),
+        "beatsLastAward": average > last_award,
+        "awardsBeaten": sum(1 for a in awards if a < average),
+    }
+
+
+def test_check_matches_brute_force():
+    index = leg_record_index.LegRecordIndex(leg_record_index.build_index(LEG_BEST_RECORDS, LEG_AWARD_HISTORY))
+    for leg_record in LEG_BEST_RECORDS["leg_records"]:
+        leg = leg_record["leg"]
+        values = {e["record"] for e in leg_record["top10"]}
+        values |= {a["record"] for e in LEG_AWARD_HISTORY for a in e["awards"] if a["leg"] == leg}
+        candidates = sorted(values | {v + d for v in values for d in (-0.001, 0.001)} | {0.0, 50.0})
+        for average in candidates:
+            assert index.check(leg, average) == _brute_force(leg, average), (leg, average)
+    assert index.check(99, 40.0) is None
+    assert index.record_holder("1")["record"] == max(e["record"] for e in LEG_BEST_RECORDS["leg_records"][0]["top10"])
+
+
+def test_load_index_rebuilds_stale_file(tmp_path, capsys):
+    best_file = tmp_path / "leg_best_records.json"
+    award_file = tmp_path / "leg_award_history.json"
+    index_file = tmp_path / "leg_record_index.json"
+    best = {"leg_records": [{"leg": 1, "top10": [{"team_name": "A大学", "runner_name": "甲", "record": 30.0, "edition": 1}]}]}
+    awards = [{"edition": 1, "awards": [{"leg": 1, "team_name": "A大学", "runner_name": "甲", "record": 30.0}]}]
+    best_file.write_text(json.dumps(best), encoding="utf-8")
+    award_file.write_text(json.dumps(awards), encoding="utf-8")
+    index_file.write_text(json.dumps(leg_record_index.build_index(best, awards)), encoding="utf-8")
+    assert leg_record_index.load_index(index_file, best_file, award_file).check(1, 31.0)["beatsRecord"]
+
+    # 大会後に歴史データだけ更新された → 保存済みの索引ではなく新しいデータで判定する
+    best["leg_records"][0]["top10"].insert(0, {"team_name": "B大学", "runner_name": "乙", "record": 32.0, "edition": 2})
+    best_file.write_text(json.dumps(best), encoding="utf-8")
+    index = leg_record_index.load_index(index_file, best_file, award_file)
+    assert not index.check(1, 31.0)["beatsRecord"]
+    assert index.check(1, 31.0)["rank"] == 2
+    assert "作り直します" in capsys.readouterr().out
+
+
+@pytest.fixture
+def report_index(monkeypatch):
+    index = leg_record_index.LegRecordIndex(leg_record_index.build_index(LEG_BEST_RECORDS, LEG_AWARD_HISTORY))
+    monkeypatch.setitem(generate_report._loaded_datasets, "leg_record_index", index)
+    generate_report.leg_record_alerts.clear()
+    yield index
+    generate_report.leg_record_alerts.clear()
+
+
+def test_leg_record_alert_only_when_crossing(report_index):
+    record = report_index.record_holder(1)["record"]
+    assert generate_report.collect_leg_record_alert(1, "走者A", "A大学", 30.0, 20.0) is None
+    assert generate_report.collect_leg_record_alert(1, "走者A", "A大学", 0.0, record + 0.1)["kind"] == "record"
+    # 既に記録ペースだった走者は再通知しない
+    assert generate_report.collect_leg_record_alert(1, "走者A", "A大学", record + 0.1, record + 0.2) is None
+    assert generate_report.collect_leg_record_alert(2, "走者B", "B大学", 30.0, 38.0)["kind"] == "top"
+
+    comment = generate_report._generate_leg_record_comment([], {})
+    assert comment.startswith("【区間記録】1区のA大学・走者A選手")
+    generate_report.leg_record_alerts[:] = [a for a in generate_report.leg_record_alerts if a["kind"] == "top"]
+    assert generate_report._generate_leg_record_comment([], {}).startswith("【歴代10傑】2区のB大学・走者B選手")
+
+
+def test_leg_record_alert_not_repeated_on_next_day(report_index):
+    record = report_index.record_holder(1)["record"]
+    summary = {}
+    # 1日目: 記録ペースに入って通知
+    assert generate_report.collect_leg_record_alert(1, "走者A", "A大学", 0.0, record + 0.5, summary)["kind"] == "record"
+    assert summary["recordAlerts"] == ["record", "top"]
+    # 2日目の朝: 日数が増えて平均が一旦下がり、午後に再び記録ペースへ戻っても通知しない
+    assert generate_report.collect_leg_record_alert(1, "走者A", "A大学", record + 0.5, record - 3.0, summary) is None
+    assert generate_report.collect_leg_record_alert(1, "走者A", "A大学", record - 3.0, record + 0.2, summary) is None
+    assert len(generate_report.leg_record_alerts) == 1
+
+    # 10傑入りだけ通知済みなら、後で区間記録を上回ったときは通知する
+    summary_b = {"recordAlerts": ["top"]}
+    assert generate_report.collect_leg_record_alert(2, "走者B", "B大学", 30.0, 38.0, summary_b) is None
+    assert generate_report.collect_leg_record_alert(2, "走者B", "B大学", 0.0, 99.0, summary_b)["kind"] == "record"
+
+
+def test_daily_summary_record_break_notes(report_index):
+    gen = gds.DailySummaryGenerator.__new__(gds.DailySummaryGenerator)
+    gen._leg_record_index = report_index
+    record = report_index.record_holder(1)["record"]
+    final = {"status": "final", "finalDay": 5}
+    gen.all_data = {
+        "ekiden_data": {"teams": [{"id": 1, "name": "A大学"}]},
+        "individual_results": {
+            "走者A": {"teamId": 1, "legSummaries": {"1": {**final, "averageDistance": record + 0.5}}},
+            "走者B": {"teamId": 1, "legSummaries": {"2": {**final, "averageDistance": 38.0}}},
+            "走者C": {"teamId": 1, "legSummaries": {"3": {**final, "averageDistance": 20.0}}},
+            "走者D": {"teamId": 1, "legSummaries": {"1": {"status": "provisional", "finalDay": None, "averageDistance": 50.0}}},
+        },
+    }
+    notes = gen._build_record_break_notes(5)
+    assert len(notes) == 2
+    assert notes[0].startswith("- 歴代区間記録更新: 第1区でA大学の走者A")
+    assert notes[1].startswith("- 歴代区間10傑入り: 第2区でA大学の走者B")
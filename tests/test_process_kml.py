@@ -0,0 +1,94 @@
+"""scripts/process_kml.py のテスト。
+
+KML のストリーミング読み込み・区間の向き判定と結合・course_path.json の書式
+（json.dump(indent=2) とバイト単位で一致すること）を確認する。
+"""
+import json
+import sys
+from array import array
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "scripts"))
+
+import process_kml  # noqa: E402
+
+START = (35.0, 139.0)
+RELAY = (35.0, 139.1)
+GOAL = (35.1, 139.1)
+LEG1 = [START, (35.0, 139.05), RELAY]
+LEG2 = [RELAY, (35.05, 139.1), GOAL]
+
+
+def _point(name, lat, lon):
+    return f"<Placemark><name>{name}</name><Point><coordinates>{lon},{lat},0</coordinates></Point></Placemark>"
+
+
+def _line(name, points):
+    coords = "\n".join(f"{lon},{lat},0" for lat, lon in points)
+    return f"<Placemark><name>{name}</name><LineString><coordinates>\n{coords}\n</coordinates></LineString></Placemark>"
+
+
+@pytest.fixture
+def kml_env(tmp_path, monkeypatch):
+    monkeypatch.setattr(process_kml, "KML_FILE", tmp_path / "ekiden_map.kml")
+    monkeypatch.setattr(process_kml, "EKIDEN_DATA_FILE", tmp_path / "ekiden_data.json")
+    monkeypatch.setattr(process_kml, "COURSE_PATH_OUTPUT_FILE", tmp_path / "course_path.json")
+    monkeypatch.setattr(process_kml, "RELAY_POINTS_OUTPUT_FILE", tmp_path / "relay_points.json")
+    monkeypatch.setattr(process_kml, "COURSE_LOD_OUTPUT_FILE", tmp_path / "course_path_lod.json")
+    monkeypatch.setattr(process_kml, "DATA_DIR", tmp_path / "data")
+    (tmp_path / "ekiden_data.json").write_text(json.dumps({"leg_boundaries": [9.1, 20.2]}), encoding="utf-8")
+
+    def write_kml(placemarks):
+        process_kml.KML_FILE.write_text(
+            '<?xml version="1.0" encoding="UTF-8"?><kml xmlns="http://www.opengis.net/kml/2.2">'
+            "<Document><Folder>" + "".join(placemarks) + "</Folder></Document></kml>",
+            encoding="utf-8",
+        )
+    return write_kml
+
+
+def test_parse_coordinates_with_and_without_altitude():
+    lats, lons = process_kml.parse_coordinates("\n 139.1,35.2,0\n139.3,35.4,12.5 ")
+    assert (list(lats), list(lons)) == ([35.2, 35.4], [139.1, 139.3])
+    lats, lons = process_kml.parse_coordinates("139.1,35.2 139.3,35.4,0")
+    assert (list(lats), list(lons)) == ([35.2, 35.4], [139.1, 139.3])
+    assert process_kml.parse_coordinates(None) == process_kml.parse_coordinates("  ")
+
+
+def test_process_kml_orients_and_joins_legs(kml_env):
+    kml_env([
+        _point("ゴール", *GOAL),
+        _point("第一中継所", *RELAY),
+        _point("スタート", *START),
+        _line("第２区", LEG2[::-1]),  # 逆向きに描かれた区間
+        _line("第1区", LEG1),
+        _line("第1区（旧）", [(0.0, 0.0), (1.0, 1.0)]),  # 同じ区間の2本目は無視
+    ])
+    process_kml.process_kml_data()
+
+    expected = [{"lat": lat, "lon": lon} for lat, lon in LEG1 + LEG2[1:]]
+    course_text = process_kml.COURSE_PATH_OUTPUT_FILE.read_text(encoding="utf-8")
+    assert course_text == json.dumps(expected, indent=2, ensure_ascii=False)
+
+    relay_points = json.loads(process_kml.RELAY_POINTS_OUTPUT_FILE.read_text(encoding="utf-8"))
+    assert relay_points == [{"leg": 1, "name": "第一中継所", "target_distance_km": 9.1,
+                             "latitude": RELAY[0], "longitude": RELAY[1]}]
+    lod = json.loads(process_kml.COURSE_LOD_OUTPUT_FILE.read_text(encoding="utf-8"))
+    assert lod["sourcePointCount"] == len(expected)
+
+
+def test_process_kml_stops_when_legs_and_points_mismatch(kml_env):
+    kml_env([_point("スタート", *START), _point("第一中継所", *RELAY), _point("ゴール", *GOAL), _line("第1区", LEG1)])
+    process_kml.process_kml_data()
+    assert process_kml.RELAY_POINTS_OUTPUT_FILE.exists()
+    assert not process_kml.COURSE_PATH_OUTPUT_FILE.exists()
+
+
+def test_write_course_path_matches_json_dump(kml_env):
+    for points in ([], [(35.689441, 139.760987), (1e-07, -0.5), (35.0, 139.0)]):
+        process_kml.write_course_path(array("d", [p[0] for p in points]), array("d", [p[1] for p in points]))
+        expected = json.dumps([{"lat": lat, "lon": lon} for lat, lon in points], indent=2, ensure_ascii=False)
+        assert process_kml.COURSE_PATH_OUTPUT_FILE.read_text(encoding="utf-8") == expected
@@ -479,6 +479,66 @@ def test_review_log_not_duplicated_on_rerun(env):
     assert len(audits) == 1
 
 
+def _precheck(env, posts_html):
+    html_file = env["logs_dir"].parent / "thread.html"
+    html_file.write_text(posts_html, encoding="utf-8")
+    os.environ["EKIDEN_POSTS_HTML"] = str(html_file)
+    importlib.reload(ps)
+    try:
+        return ps.needs_processing()
+    finally:
+        del os.environ["EKIDEN_POSTS_HTML"]
+        importlib.reload(ps)
+
+
+def test_precheck_skips_unchanged_thread(env):
+    """review 済みの投稿しかなく入力が前回処理時と同じなら、事前チェックで処理不要と判定する。"""
+    posts = [
+        ("200", "■全日本学連選抜監督（夏の日の1994)◆oIdAWXadP6",
+         """【選手交代】
+大学名: 学連選抜
+区間: ４区
+交代: 秩父→我孫子"""),
+    ]
+    assert _precheck(env, _make_html(posts)) is True
+    _run(env, _make_html(posts))
+    assert _precheck(env, _make_html(posts)) is False
+
+    # 新しい交代投稿が来たら処理する
+    posts.append(("201", "■全日本学連選抜監督（夏の日の1994)◆oIdAWXadP6",
+                  """【選手交代】
+大学名: 学連選抜
+区間: ５区
+交代: 我孫子→笠利"""))
+    assert _precheck(env, _make_html(posts)) is True
+
+
+def test_precheck_reruns_when_current_leg_changes(env):
+    """過去区間 review の投稿は、currentLeg が変われば再処理の対象になる。"""
+    posts = _make_html([
+        ("200", "■全日本学連選抜監督（夏の日の1994)◆oIdAWXadP6",
+         """【選手交代】
+大学名: 学連選抜
+区間: ４区
+交代: 秩父→加賀中津原"""),
+    ])
+    _run(env, posts)
+    assert _precheck(env, posts) is False
+
+    state = json.loads(Path(env["state_file"]).read_text(encoding="utf-8"))
+    for s in state:
+        if s["id"] == 8:
+            s["currentLeg"] = 3
+    Path(env["state_file"]).write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+    assert _precheck(env, posts) is True
+
+
+def test_precheck_without_substitution_posts(env):
+    """【選手交代】を含む未処理投稿が無ければ処理不要。"""
+    posts = _make_html([("300", "名無し", "今日も暑い")])
+    assert _precheck(env, posts) is False
+
+
 def test_review_then_applied_keeps_review(env):
     """過去区間で review 記録 → currentLeg が進み再実行 → applied として成功、
     既存 review は残ったまま processed にも進む。"""
@@ -513,6 +573,29 @@ def test_review_then_applied_keeps_review(env):
     assert any(a["post_id"] == "200" and a["status"] == "applied" for a in audits)
 
 
+def test_jsonl_log_reads_existing_once_and_batches(env, monkeypatch):
+    """JsonlLog は既存ログを1回だけ読み、追記は flush でまとめて書く（形式は1行1エントリのまま）。"""
+    path = env["logs_dir"] / "substitution_review.jsonl"
+    env["logs_dir"].mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"post_id": "1", "block_index": 0, "status": "review",
+                                "reason": "past_leg"}, ensure_ascii=False) + "\n", encoding="utf-8")
+    reads = []
+    original_read = ps.read_jsonl
+    monkeypatch.setattr(ps, "read_jsonl", lambda p: reads.append(p) or original_read(p))
+
+    log = ps.JsonlLog(path)
+    assert log.add({"post_id": "1", "block_index": 0, "status": "review", "reason": "past_leg"}) is False
+    for i in range(3):
+        assert log.add({"post_id": "2", "block_index": i, "status": "review", "reason": "x"}) is True
+    assert log.add({"post_id": "2", "block_index": 0, "status": "review", "reason": "x"}) is False
+    assert len(reads) == 1
+    assert len(_read_logs(env, "substitution_review.jsonl")) == 1  # flush 前は未書き込み
+
+    log.flush()
+    entries = _read_logs(env, "substitution_review.jsonl")
+    assert [(e["post_id"], e["block_index"]) for e in entries] == [("1", 0), ("2", 0), ("2", 1), ("2", 2)]
+
+
 def test_multiple_blocks_review_keys_separated(env):
     """同一投稿内の複数ブロックは block_index でキーが分離される。"""
     posts = _make_html([
@@ -676,18 +759,99 @@ def test_with_lock_blocking_waits(tmp_path):
     assert "ran-after" in out
 
 
+def test_with_lock_wait_times_out(tmp_path):
+    import fcntl
+    import subprocess
+    import time
+    lockfile = tmp_path / "t.lock"
+    f = open(lockfile, 'a+')
+    fcntl.flock(f, fcntl.LOCK_EX)
+    try:
+        started = time.monotonic()
+        r = subprocess.run(
+            [sys.executable, _with_lock_script(), str(lockfile), "--wait", "0.5", "--",
+             sys.executable, "-c", "print('SHOULD NOT RUN')"],
+            capture_output=True, text=True, timeout=10)
+        assert r.returncode == wl.LOCK_BUSY_EXIT
+        assert "SHOULD NOT RUN" not in r.stdout
+        assert time.monotonic() - started >= 0.5
+    finally:
+        fcntl.flock(f, fcntl.LOCK_UN)
+        f.close()
+
+
+def test_with_lock_shared_locks_run_concurrently(tmp_path):
+    """共有ロック同士は並行実行でき、排他ロックとは待ち合う。"""
+    import fcntl
+    import subprocess
+    lockfile = tmp_path / "t.lock"
+    f = open(lockfile, 'a+')
+    fcntl.flock(f, fcntl.LOCK_SH)
+    try:
+        r = subprocess.run(
+            [sys.executable, _with_lock_script(), str(lockfile), "--shared", "--try", "--",
+             sys.executable, "-c", "print('reader')"],
+            capture_output=True, text=True, timeout=10)
+        assert r.returncode == 0
+        assert "reader" in r.stdout
+        r = subprocess.run(
+            [sys.executable, _with_lock_script(), str(lockfile), "--try", "--",
+             sys.executable, "-c", "print('SHOULD NOT RUN')"],
+            capture_output=True, text=True, timeout=10)
+        assert r.returncode == wl.LOCK_BUSY_EXIT
+    finally:
+        fcntl.flock(f, fcntl.LOCK_UN)
+        f.close()
+
+
+def test_with_lock_coalesce_runs_once_after_holder(tmp_path):
+    """--coalesce: 保持者の後に1回だけ実行し、2つ目の待機者は待たずに exit 75。"""
+    import fcntl
+    import subprocess
+    import time
+    lockfile = tmp_path / "t.lock"
+    f = open(lockfile, 'a+')
+    fcntl.flock(f, fcntl.LOCK_EX)
+    cmd = [sys.executable, _with_lock_script(), str(lockfile), "--coalesce", "--",
+           sys.executable, "-c", "print('queued')"]
+    first = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    try:
+        # 1つ目が待機枠を確保するまで待つ
+        for _ in range(50):
+            time.sleep(0.1)
+            try:
+                g = open(f"{lockfile}.pending", 'a+')
+                fcntl.flock(g, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                fcntl.flock(g, fcntl.LOCK_UN)
+                g.close()
+            except BlockingIOError:
+                g.close()
+                break
+        second = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
+        assert second.returncode == wl.LOCK_BUSY_EXIT
+        assert "queued" not in second.stdout
+    finally:
+        fcntl.flock(f, fcntl.LOCK_UN)
+        f.close()
+    out, _ = first.communicate(timeout=10)
+    assert first.returncode == 0
+    assert "queued" in out
+
+
 def test_update_realtime_skips_when_locked(tmp_path, monkeypatch):
-    """update_realtime.sh はロック中（交代処理中）に --try で取得できずスキップする。"""
+    """update_realtime.sh はロック中（交代処理中）に待機上限まで取得できなければスキップする。"""
     import subprocess
     lockfile = PROJECT_ROOT / "logs" / "substitution.lock"
     lockfile.parent.mkdir(parents=True, exist_ok=True)
     import fcntl
     f = open(lockfile, 'a+')
     fcntl.flock(f, fcntl.LOCK_EX)
+    env = dict(os.environ)
+    env["EKIDEN_REALTIME_LOCK_WAIT"] = "1"
     try:
         r = subprocess.run(
             ["bash", str(PROJECT_ROOT / "update_realtime.sh")],
-            capture_output=True, text=True, timeout=60, cwd=str(PROJECT_ROOT))
+            capture_output=True, text=True, timeout=60, cwd=str(PROJECT_ROOT), env=env)
         assert r.returncode == 0
         assert "スキップ" in r.stdout, f'ロック中はスキップされる: {r.stdout[-500:]}'
         # 速報生成が実行されていない（generate_report が走っていない）
@@ -0,0 +1,130 @@
+"""
+scripts/push_outbox.py のテスト。
+Push API への実送信なし、post 関数を差し替えて一時ディレクトリで検証する。
+"""
+import sys
+from pathlib import Path
+
+import requests
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "scripts"))
+
+import push_outbox
+
+
+class _Response:
+    def json(self):
+        return {"message": "queued"}
+
+
+def _recording_post(calls, fail=False):
+    def post(title, body):
+        calls.append((title, body))
+        if fail:
+            raise requests.ConnectionError("push api down")
+        return _Response()
+    return post
+
+
+def test_enqueue_coalesces_same_title(tmp_path):
+    push_outbox.enqueue("【首位交代】", "A大学が首位", outbox_dir=tmp_path, now=100)
+    push_outbox.enqueue("【首位交代】", "B大学が首位", outbox_dir=tmp_path, now=110)
+    push_outbox.enqueue("【酷暑】", "40℃超え", outbox_dir=tmp_path, now=120)
+
+    messages = [m for _, m in push_outbox.pending_messages(tmp_path)]
+    assert [(m["title"], m["body"]) for m in messages] == [
+        ("【首位交代】", "B大学が首位"), ("【酷暑】", "40℃超え")]
+
+
+def test_deliver_sends_in_order_and_clears_queue(tmp_path):
+    push_outbox.enqueue("T1", "本文1", outbox_dir=tmp_path, now=100)
+    push_outbox.enqueue("T2", "本文2", outbox_dir=tmp_path, now=101)
+    calls = []
+    stats = push_outbox.deliver(outbox_dir=tmp_path, now=102, post=_recording_post(calls))
+    assert calls == [("T1", "本文1"), ("T2", "本文2")]
+    assert stats["sent"] == 2
+    assert push_outbox.pending_messages(tmp_path) == []
+
+
+def test_identical_message_sent_recently_is_deduped(tmp_path):
+    calls = []
+    push_outbox.enqueue("T", "同じ本文", outbox_dir=tmp_path, now=100)
+    push_outbox.deliver(outbox_dir=tmp_path, now=100, post=_recording_post(calls))
+    push_outbox.enqueue("T", "同じ本文", outbox_dir=tmp_path, now=200)
+    stats = push_outbox.deliver(outbox_dir=tmp_path, now=200, post=_recording_post(calls))
+    assert len(calls) == 1
+    assert stats["deduped"] == 1
+
+    # 重複除去の期間を過ぎれば再送する
+    push_outbox.enqueue("T", "同じ本文", outbox_dir=tmp_path, now=100 + push_outbox.DEDUP_WINDOW_SECONDS + 1)
+    push_outbox.deliver(outbox_dir=tmp_path, now=100 + push_outbox.DEDUP_WINDOW_SECONDS + 1,
+                        post=_recording_post(calls))
+    assert len(calls) == 2
+
+
+def test_failed_send_is_retried_with_backoff_then_given_up(tmp_path):
+    calls = []
+    push_outbox.enqueue("T", "本文", outbox_dir=tmp_path, now=0)
+    failing = _recording_post(calls, fail=True)
+
+    stats = push_outbox.deliver(outbox_dir=tmp_path, now=0, post=failing)
+    assert stats["retried"] == 1
+    # バックオフ中は送らない
+    push_outbox.deliver(outbox_dir=tmp_path, now=push_outbox.RETRY_BASE_SECONDS - 1, post=failing)
+    assert len(calls) == 1
+
+    now = 0
+    for attempt in range(1, push_outbox.MAX_ATTEMPTS):
+        now += push_outbox.RETRY_BASE_SECONDS * (2 ** (attempt - 1))
+        push_outbox.deliver(outbox_dir=tmp_path, now=now, post=failing)
+    assert len(calls) == push_outbox.MAX_ATTEMPTS
+    assert push_outbox.pending_messages(tmp_path) == []
+    assert len(list((tmp_path / "failed").glob("*.json"))) == 1
+
+
+def test_stale_message_is_not_sent(tmp_path):
+    calls = []
+    push_outbox.enqueue("T", "古い速報", outbox_dir=tmp_path, now=0)
+    stats = push_outbox.deliver(outbox_dir=tmp_path, now=push_outbox.MAX_AGE_SECONDS + 1,
+                                post=_recording_post(calls))
+    assert calls == []
+    assert stats["failed"] == 1
+
+
+def test_body_replaced_while_sending_is_kept_for_next_run(tmp_path):
+    push_outbox.enqueue("【首位交代】", "A大学が首位", outbox_dir=tmp_path, now=100)
+    calls = []
+
+    def post(title, body):
+        # 送信中に別プロセス（generate_report.py）が同じタイトルの本文を置き換える
+        calls.append((title, body))
+        if len(calls) == 1:
+            push_outbox.enqueue(title, "B大学が首位", outbox_dir=tmp_path, now=105)
+        return _Response()
+
+    stats = push_outbox.deliver(outbox_dir=tmp_path, now=110, post=post)
+    assert stats["sent"] == 1
+    assert [m["body"] for _, m in push_outbox.pending_messages(tmp_path)] == ["B大学が首位"]
+
+    push_outbox.deliver(outbox_dir=tmp_path, now=120, post=post)
+    assert calls == [("【首位交代】", "A大学が首位"), ("【首位交代】", "B大学が首位")]
+    assert push_outbox.pending_messages(tmp_path) == []
+
+
+def test_concurrent_enqueue_coalesces_into_one_message(tmp_path):
+    import threading
+
+    barrier = threading.Barrier(8)
+
+    def worker(i):
+        barrier.wait()
+        push_outbox.enqueue("【首位交代】", f"本文{i}", outbox_dir=tmp_path, now=100 + i)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(push_outbox.pending_messages(tmp_path)) == 1
@@ -0,0 +1,268 @@
+"""
+push_server.py / push_dispatcher.py のテスト。
+実際の Web Push 送信・Supabase 接続なし。購読情報は一時 SQLite。
+"""
+import json
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from push_dispatcher import PushDispatcher, SQLiteSubscriptionStore, SubscriptionCache
+from push_state import SQLiteStateStore
+
+
+class _GoneError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.response = type("R", (), {"status_code": status_code})()
+
+
+def _store_with(tmp_path, endpoints):
+    store = SQLiteSubscriptionStore(tmp_path / "subs.db")
+    for e in endpoints:
+        store.upsert({"endpoint": e, "p256dh": "p", "auth": "a"})
+    return store
+
+
+def test_sqlite_store_upsert_and_delete(tmp_path):
+    store = _store_with(tmp_path, ["https://push.test/1", "https://push.test/2"])
+    store.upsert({"endpoint": "https://push.test/1", "p256dh": "p2", "auth": "a2"})
+    rows = sorted(store.all(), key=lambda r: r["endpoint"])
+    assert [r["endpoint"] for r in rows] == ["https://push.test/1", "https://push.test/2"]
+    assert rows[0]["p256dh"] == "p2"
+    store.delete(["https://push.test/1"])
+    assert [r["endpoint"] for r in store.all()] == ["https://push.test/2"]
+
+
+def test_dispatcher_prunes_gone_subscriptions_and_reports_stats(tmp_path):
+    endpoints = [f"https://push.test/{i}" for i in range(6)]
+    store = _store_with(tmp_path, endpoints)
+
+    def fake_send(sub, data, timeout):
+        if sub["endpoint"].endswith("/1"):
+            raise _GoneError(410)
+        if sub["endpoint"].endswith("/2"):
+            raise _GoneError(404)
+        if sub["endpoint"].endswith("/3"):
+            raise _GoneError(500)
+
+    dispatcher = PushDispatcher(store, fake_send, max_workers=4)
+    job = dispatcher.wait(dispatcher.submit({"notification": {"title": "t"}}), timeout=10)
+
+    assert job["status"] == "done"
+    assert (job["total"], job["sent"], job["failed"], job["pruned"]) == (6, 3, 3, 2)
+    assert job["latencyMs"]["p95"] is not None
+    remaining = {r["endpoint"] for r in store.all()}
+    # 404/410 は削除、500 は一時的な失敗として残す
+    assert remaining == set(endpoints) - {"https://push.test/1", "https://push.test/2"}
+
+
+def test_dispatcher_sends_concurrently(tmp_path):
+    store = _store_with(tmp_path, [f"https://push.test/{i}" for i in range(4)])
+    barrier = threading.Barrier(4, timeout=5)
+
+    def fake_send(sub, data, timeout):
+        barrier.wait()  # 4件が同時に送信中でなければタイムアウトする
+
+    dispatcher = PushDispatcher(store, fake_send, max_workers=4)
+    job = dispatcher.wait(dispatcher.submit({}), timeout=10)
+    assert job["sent"] == 4
+
+
+def test_send_notification_returns_job_id(tmp_path, monkeypatch):
+    import push_server
+
+    store = _store_with(tmp_path, ["https://push.test/1"])
+    sent = []
+    dispatcher = PushDispatcher(store, lambda sub, data, timeout: sent.append(data), max_workers=2)
+    monkeypatch.setattr(push_server, "dispatcher", dispatcher)
+    monkeypatch.setattr(push_server, "state_store", SQLiteStateStore(tmp_path / "state.db"))
+    monkeypatch.setattr(push_server, "VAPID_PRIVATE_KEY", "dummy")
+    monkeypatch.setenv("API_SECRET_KEY", "secret")
+
+    client = push_server.app.test_client()
+    r = client.post("/api/send-notification", json={"title": "速報", "body": "本文"},
+                    headers={"X-API-Secret": "secret"})
+    assert r.status_code == 202
+    job_id = r.get_json()["jobId"]
+    assert job_id in r.get_json()["message"]
+
+    dispatcher.wait(job_id, timeout=10)
+    r = client.get(f"/api/notification-jobs/{job_id}", headers={"X-API-Secret": "secret"})
+    assert r.status_code == 200
+    assert r.get_json()["sent"] == 1
+    assert json.loads(sent[0])["notification"]["title"] == "速報"
+
+    assert client.get("/api/notification-jobs/unknown",
+                      headers={"X-API-Secret": "secret"}).status_code == 404
+    assert client.get(f"/api/notification-jobs/{job_id}").status_code == 401
+
+
+class _CountingStore:
+    """SQLite ストアへの全件読み込み回数を数える"""
+
+    supports_changed_since = True
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.full_loads = 0
+
+    def all(self):
+        self.full_loads += 1
+        return self.inner.all()
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+
+def test_subscription_cache_hits_and_incremental_refresh(tmp_path):
+    inner = _store_with(tmp_path, ["https://push.test/1"])
+    counting = _CountingStore(inner)
+    cache = SubscriptionCache(counting)
+
+    assert len(cache.all()) == 1
+    assert len(cache.all()) == 1
+    assert counting.full_loads == 1
+
+    # 他プロセスからの追加はウォーターマーク以降の差分として取り込まれる
+    inner.upsert({"endpoint": "https://push.test/2", "p256dh": "p", "auth": "a"})
+    assert {r["endpoint"] for r in cache.all()} == {"https://push.test/1", "https://push.test/2"}
+    assert counting.full_loads == 1
+
+    # save-subscription / 失効削除はキャッシュにも反映される
+    cache.upsert({"endpoint": "https://push.test/3", "p256dh": "p", "auth": "a"})
+    cache.delete(["https://push.test/1"])
+    assert {r["endpoint"] for r in cache.all()} == {"https://push.test/2", "https://push.test/3"}
+    assert counting.full_loads == 1
+
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 3
+    assert stats["hitRate"] == 0.75
+    assert stats["size"] == 2
+
+
+def test_subscription_cache_size_bound(tmp_path):
+    counting = _CountingStore(_store_with(tmp_path, [f"https://push.test/{i}" for i in range(3)]))
+    cache = SubscriptionCache(counting, max_entries=2)
+    assert len(cache.all()) == 3
+    assert len(cache.all()) == 3
+    # 上限超えはキャッシュせず毎回ストアを読む
+    assert counting.full_loads == 2
+    assert cache.stats()["size"] == 0
+
+
+class _SnapshotOnlyStore(_CountingStore):
+    """更新日時の列が無い Supabase テーブル相当（changed_since を使わない）"""
+
+    supports_changed_since = False
+
+
+def test_subscription_cache_without_changed_since_refreshes_quickly(tmp_path):
+    import time
+
+    inner = _store_with(tmp_path, ["https://push.test/1"])
+    snapshot = _SnapshotOnlyStore(inner)
+    cache = SubscriptionCache(snapshot, full_refresh_seconds=3600, snapshot_refresh_seconds=0.05)
+    assert cache.full_refresh_seconds == 0.05
+    assert len(cache.all()) == 1
+
+    # 別ワーカーが受け付けた購読は、短い全件読み直しの間隔が過ぎれば送信対象に入る
+    inner.upsert({"endpoint": "https://push.test/2", "p256dh": "p", "auth": "a"})
+    time.sleep(0.06)
+    assert {r["endpoint"] for r in cache.all()} == {"https://push.test/1", "https://push.test/2"}
+    assert snapshot.full_loads == 2
+
+    # 差分取得できるストアは長い全件読み直しの間隔のまま
+    assert SubscriptionCache(_CountingStore(inner), full_refresh_seconds=3600,
+                             snapshot_refresh_seconds=0.05).full_refresh_seconds == 3600
+
+
+def test_vapid_headers_signed_once_per_push_service(monkeypatch):
+    import push_server
+
+    signed = []
+
+    class _FakeVapid:
+        def sign(self, claims):
+            signed.append(claims["aud"])
+            return {"Authorization": f"vapid {claims['aud']}"}
+
+    class _FakePusher:
+        def __init__(self, sub):
+            self.sub = sub
+
+        def send(self, data, headers, ttl=0, timeout=None):
+            return type("R", (), {"status_code": 201, "reason": "Created"})()
+
+    monkeypatch.setattr(push_server, "WebPusher", _FakePusher)
+    sender = push_server.VapidSender(None, {"sub": "mailto:test@example.com"})
+    sender.vapid = _FakeVapid()
+
+    send = sender.begin_notification()
+    for i in range(5):
+        send({"endpoint": f"https://fcm.googleapis.com/fcm/send/{i}", "keys": {}}, "{}", 5)
+    send({"endpoint": "https://updates.push.services.mozilla.com/wpush/v2/x", "keys": {}}, "{}", 5)
+
+    assert signed == ["https://fcm.googleapis.com", "https://updates.push.services.mozilla.com"]
+
+
+def test_badge_counter_is_shared_between_workers(tmp_path, monkeypatch):
+    """別プロセス（別ワーカー）相当の接続からも同じカウンタを加算・リセットできる"""
+    import push_server
+
+    store = _store_with(tmp_path, ["https://push.test/1"])
+    sent = []
+    dispatcher = PushDispatcher(store, lambda sub, data, timeout: sent.append(data), max_workers=2)
+    monkeypatch.setattr(push_server, "dispatcher", dispatcher)
+    monkeypatch.setattr(push_server, "state_store", SQLiteStateStore(tmp_path / "state.db"))
+    monkeypatch.setattr(push_server, "VAPID_PRIVATE_KEY", "dummy")
+    monkeypatch.setenv("API_SECRET_KEY", "secret")
+    other_worker = SQLiteStateStore(tmp_path / "state.db")
+
+    client = push_server.app.test_client()
+    for _ in range(2):
+        job_id = client.post("/api/send-notification", json={"title": "t"},
+                             headers={"X-API-Secret": "secret"}).get_json()["jobId"]
+        dispatcher.wait(job_id, timeout=10)
+    assert [json.loads(d)["badge_count"] for d in sent] == [1, 2]
+    assert other_worker.increment("badge_count") == 3
+
+    assert client.post("/api/reset-badge").status_code == 200
+    assert other_worker.get_counter("badge_count") == 0
+
+
+def test_sqlite_state_store_increment_is_atomic(tmp_path):
+    path = tmp_path / "state.db"
+    stores = [SQLiteStateStore(path) for _ in range(4)]
+
+    def bump(store):
+        for _ in range(25):
+            store.increment("badge_count")
+
+    threads = [threading.Thread(target=bump, args=(s,)) for s in stores]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert SQLiteStateStore(path).get_counter("badge_count") == 100
+
+
+def test_job_status_is_visible_from_other_worker(tmp_path):
+    store = _store_with(tmp_path, ["https://push.test/1"])
+    dispatcher = PushDispatcher(store, lambda sub, data, timeout: None,
+                                job_store=SQLiteStateStore(tmp_path / "state.db"))
+    job_id = dispatcher.submit({})
+    dispatcher.wait(job_id, timeout=10)
+
+    other = PushDispatcher(store, lambda sub, data, timeout: None,
+                           job_store=SQLiteStateStore(tmp_path / "state.db"))
+    job = other.get_job(job_id)
+    assert job["status"] == "done"
+    assert job["sent"] == 1
+    assert other.get_job("unknown") is None
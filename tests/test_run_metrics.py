@@ -0,0 +1,103 @@
+"""
+scripts/run_metrics.py のテスト。
+一時ディレクトリのみで動作。
+"""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "scripts"))
+
+import run_metrics
+
+
+@pytest.fixture
+def metrics_paths(tmp_path, monkeypatch):
+    monkeypatch.delenv("EKIDEN_METRICS", raising=False)
+    monkeypatch.setattr(run_metrics, "METRICS_FILE", tmp_path / "metrics.jsonl")
+    monkeypatch.setattr(run_metrics, "PROM_DIR", tmp_path / "metrics")
+    monkeypatch.setattr(run_metrics, "_run", None)
+    return tmp_path
+
+
+def test_disabled_run_records_nothing(metrics_paths):
+    calls = []
+
+    @run_metrics.timed("work")
+    def work():
+        calls.append(1)
+        return "ok"
+
+    with run_metrics.span("phase"):
+        assert work() == "ok"
+    run_metrics.phase("main.load")
+    assert run_metrics.flush() is None
+    assert calls == [1]
+    assert not (metrics_paths / "metrics.jsonl").exists()
+
+
+def test_spans_phases_and_decorators_are_written(metrics_paths):
+    @run_metrics.timed("yahoo_fetch")
+    def fetch():
+        return 1
+
+    run_metrics.enable("generate_report")
+    run_metrics.set_label("mode", "realtime")
+    run_metrics.phase("main.load")
+    run_metrics.phase("main.team_results")
+    fetch()
+    fetch()
+    with run_metrics.span("board"):
+        pass
+    record = run_metrics.flush(exit_code=0)
+
+    assert record["phases"]["yahoo_fetch"]["count"] == 2
+    assert set(record["phases"]) == {"main.load", "main.team_results", "yahoo_fetch", "board"}
+    lines = (metrics_paths / "metrics.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])["labels"] == {"mode": "realtime"}
+
+    prom = (metrics_paths / "metrics" / "generate_report.prom").read_text(encoding="utf-8")
+    assert 'ekiden_run_phase_seconds{run="generate_report",phase="board"}' in prom
+    assert 'ekiden_run_exit_code{run="generate_report"} 0' in prom
+
+
+def test_hourly_ranking_notification_counts_one_push(metrics_paths, monkeypatch):
+    """毎時の順位通知は内側の send_push_notification の1回だけが push に計上される"""
+    import generate_report
+    sent = []
+    monkeypatch.setattr(generate_report.push_outbox, "push_api_settings", lambda: ("https://push.test", "secret"))
+    monkeypatch.setattr(generate_report.push_outbox, "enqueue", lambda title, body: sent.append(title))
+    monkeypatch.setattr(sys, "argv", ["generate_report.py", "--test-notification"])
+
+    run_metrics.enable("generate_report")
+    generate_report.send_hourly_ranking_notification([
+        {"id": 1, "name": "A大学", "runner": "走者A", "overallRank": 1, "currentLegNumber": 1,
+         "todayDistance": 30.0, "totalDistance": 100.0, "finishDay": None},
+    ])
+    record = run_metrics.flush(exit_code=0)
+
+    assert len(sent) == 1
+    assert record["phases"]["push"]["count"] == 1
+
+
+def test_summarize_percentiles_per_phase(metrics_paths):
+    with open(metrics_paths / "metrics.jsonl", "w", encoding="utf-8") as f:
+        for i in range(1, 21):
+            f.write(json.dumps({
+                "run": "generate_report", "startedAt": f"2026-08-05T10:{i:02d}:00+09:00",
+                "totalSeconds": float(i), "phases": {"board": {"seconds": i / 10, "count": 1}},
+            }) + "\n")
+        f.write(json.dumps({"run": "generate_report", "startedAt": "2026-08-06T10:00:00+09:00",
+                            "totalSeconds": 99.0, "phases": {}}) + "\n")
+        f.write("壊れた行\n")
+
+    summary = run_metrics.summarize("2026-08-05", "generate_report")
+    assert summary["total"]["runs"] == 20
+    assert summary["total"]["p50"] == 11.0
+    assert summary["total"]["p95"] == 20.0
+    assert summary["board"]["max"] == 2.0
+    assert run_metrics.summarize("2026-08-05", "other") == {}
@@ -0,0 +1,64 @@
+"""
+scripts/script_profiler.py のテスト。
+一時ディレクトリのみで動作。
+"""
+import pstats
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "scripts"))
+
+import script_profiler
+
+
+def _busy():
+    return sum(i * i for i in range(20000))
+
+
+def test_profile_options_are_removed_from_argv():
+    options, rest = script_profiler.parse_profile_args(
+        ["--realtime", "--profile=out.pstats", "--profile-top=5", "--profile-memory"])
+    assert rest == ["--realtime"]
+    assert options["path"] == "out.pstats"
+    assert options["top"] == 5
+    assert options["memory"] is True
+
+    assert script_profiler.parse_profile_args(["--commit"]) == (None, ["--commit"])
+
+
+def test_profile_writes_pstats_and_summary(tmp_path, monkeypatch):
+    out = tmp_path / "run.pstats"
+    monkeypatch.setattr(sys, "argv", ["generate_report.py", "--realtime", f"--profile={out}", "--profile-memory"])
+
+    with script_profiler.from_argv("generate_report"):
+        assert sys.argv[1:] == ["--realtime"]
+        _busy()
+
+    assert pstats.Stats(str(out)).total_calls > 0
+    summary = out.with_suffix(".txt").read_text(encoding="utf-8")
+    assert "_busy" in summary
+    assert "tracemalloc peak" in summary
+
+
+def test_profile_is_saved_when_script_exits(tmp_path, monkeypatch):
+    monkeypatch.setattr(script_profiler, "PROFILE_DIR", tmp_path)
+    monkeypatch.setattr(sys, "argv", ["validate_race_state.py", "--profile"])
+
+    with pytest.raises(SystemExit):
+        with script_profiler.from_argv("validate_race_state"):
+            _busy()
+            sys.exit(2)
+
+    assert len(list(tmp_path.glob("validate_race_state_*.pstats"))) == 1
+    assert len(list(tmp_path.glob("validate_race_state_*.txt"))) == 1
+
+
+def test_without_profile_option_nothing_is_written(tmp_path, monkeypatch):
+    monkeypatch.setattr(script_profiler, "PROFILE_DIR", tmp_path)
+    monkeypatch.setattr(sys, "argv", ["rebuild_history.py"])
+    with script_profiler.from_argv("rebuild_history") as options:
+        assert options is None
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,48 @@
+"""scripts/station_index.py のテスト。総当たりの結果と一致することを確認する。"""
+import json
+import random
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "scripts"))
+
+from station_index import StationIndex, haversine_km  # noqa: E402
+
+STATIONS = json.loads((PROJECT_ROOT / "config" / "amedas_stations.json").read_text(encoding="utf-8"))
+
+
+def _brute(lat, lon):
+    return sorted((haversine_km(lat, lon, s["latitude"], s["longitude"]), s["code"]) for s in STATIONS)
+
+
+def test_lookup_by_name_and_code_matches_linear_scan():
+    index = StationIndex(STATIONS)
+    for name in ("宗谷岬", "朝日", "名古屋"):
+        assert index.by_name(name) is next(s for s in STATIONS if s["name"] == name)
+    assert index.by_code("11001")["name"] == "宗谷岬"
+    assert index.by_code("00000") is None
+    assert index.by_name("存在しない") is None
+
+
+def test_nearest_and_within_match_brute_force():
+    index = StationIndex(STATIONS)
+    rng = random.Random(42)
+    # 陸上（観測所付近）と沖合（総当たりへの切り替え）の両方
+    points = [(s["latitude"] + rng.uniform(-0.3, 0.3), s["longitude"] + rng.uniform(-0.3, 0.3))
+              for s in rng.sample(STATIONS, 40)]
+    points += [(rng.uniform(20, 50), rng.uniform(120, 160)) for _ in range(20)]
+
+    for (lat, lon), nearest, within in zip(points, index.nearest_many(points, k=4),
+                                           index.within_many(points, 25.0)):
+        expected = _brute(lat, lon)
+        assert [round(d, 9) for d, _ in nearest] == [round(d, 9) for d, _ in expected[:4]]
+        assert [round(d, 9) for d, _ in within] == [round(d, 9) for d, _ in expected if d <= 25.0]
+
+
+def test_empty_and_degenerate_queries():
+    assert StationIndex([]).nearest(35.0, 135.0) == []
+    index = StationIndex(STATIONS[:3])
+    assert len(index.nearest(35.0, 135.0, k=10)) == 3
+    assert index.nearest(35.0, 135.0, k=0) == []
+    assert index.within(35.0, 135.0, -1) == []
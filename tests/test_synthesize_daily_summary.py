@@ -185,6 +185,93 @@ def test_format_race_facts_with_none_rank():
     assert isinstance(result, str) and len(result) > 0
 
 
+# --- テスト12: 記事案は並行生成される ---
+def test_generate_drafts_runs_concurrently():
+    """2プロバイダーの記事案が直列の合計ではなく最遅の呼び出し時間で揃う"""
+    import time
+    import synthesize_daily_summary as sds
+
+    def slow_call(prompt_text, provider, model="", dry_run=False, timeout=None):
+        time.sleep(0.3)
+        return f"{provider}: {prompt_text}"
+
+    original = sds._call_ai
+    sds._call_ai = slow_call
+    try:
+        started = time.monotonic()
+        drafts = sds.generate_drafts({"gemini": "G", "openai": "O"},
+                                     timeouts={"gemini": 5, "openai": 5})
+        elapsed = time.monotonic() - started
+    finally:
+        sds._call_ai = original
+
+    assert drafts == {"gemini": "gemini: G", "openai": "openai: O"}
+    assert elapsed < 0.55
+
+
+# --- テスト13: タイムアウトしたプロバイダーは None で返る ---
+def test_generate_drafts_timeout_falls_back():
+    import time
+    import synthesize_daily_summary as sds
+
+    def call(prompt_text, provider, model="", dry_run=False, timeout=None):
+        if provider == "gemini":
+            time.sleep(1.0)
+        return f"{provider} 記事"
+
+    original = sds._call_ai
+    sds._call_ai = call
+    try:
+        drafts = sds.generate_drafts({"gemini": "G", "openai": "O"},
+                                     timeouts={"gemini": 0.1, "openai": 5})
+    finally:
+        sds._call_ai = original
+
+    assert drafts["gemini"] is None
+    assert drafts["openai"] == "openai 記事"
+
+
+# --- テスト14: 同一 provider/model/mode のクライアントは再利用される ---
+def test_get_ai_reuses_provider():
+    import synthesize_daily_summary as sds
+
+    first = sds._get_ai("openai", "gpt-test", "fake", "")
+    second = sds._get_ai("openai", "gpt-test", "fake", "")
+    assert first is second
+
+
+
+# --- テスト15: 統合記事は検証を通ったときだけキャッシュへ保存される ---
+def test_synthesis_response_cached_only_when_accepted():
+    import tempfile
+    import synthesize_daily_summary as sds
+    from ai_providers import CachedProvider, FakeProvider, ResponseCache, cache_key
+
+    cache = ResponseCache(tempfile.mkdtemp())
+    ai = CachedProvider(FakeProvider("openai", "gpt-test"), cache=cache)
+    key = ("openai", "gpt-test", "cache")
+    saved_env = os.environ.get("AI_RESPONSE_MODE")
+    saved_api_key = sds.OPENAI_API_KEY
+    os.environ["AI_RESPONSE_MODE"] = "cache"
+    sds.OPENAI_API_KEY = "test-key"
+    sds._AI_PROVIDERS[key] = ai
+    try:
+        assert sds._call_ai("統合", "openai", model="gpt-test", commit=False)
+        sds._settle_ai("openai", "gpt-test", accepted=False)
+        assert cache.get(cache_key("openai", "gpt-test", None, "統合")) is None
+
+        sds._call_ai("統合", "openai", model="gpt-test", commit=False)
+        sds._settle_ai("openai", "gpt-test", accepted=True)
+        assert cache.get(cache_key("openai", "gpt-test", None, "統合")) is not None
+    finally:
+        sds._AI_PROVIDERS.pop(key, None)
+        sds.OPENAI_API_KEY = saved_api_key
+        if saved_env is None:
+            os.environ.pop("AI_RESPONSE_MODE", None)
+        else:
+            os.environ["AI_RESPONSE_MODE"] = saved_env
+
+
 if __name__ == "__main__":
     tests = [
         ("dry_run_parse", test_dry_run_parse),
@@ -198,6 +285,10 @@ if __name__ == "__main__":
         ("format_race_facts_empty", test_format_race_facts_empty),
         ("template_placeholders", test_template_placeholders),
         ("format_race_facts_with_none_rank", test_format_race_facts_with_none_rank),
+        ("generate_drafts_runs_concurrently", test_generate_drafts_runs_concurrently),
+        ("generate_drafts_timeout_falls_back", test_generate_drafts_timeout_falls_back),
+        ("get_ai_reuses_provider", test_get_ai_reuses_provider),
+        ("synthesis_response_cached_only_when_accepted", test_synthesis_response_cached_only_when_accepted),
     ]
     passed = 0
     failed = 0
@@ -35,9 +35,11 @@ export PYTHON_CMD
 
 # 2. 速報生成から commit/push 完了までを、単一ロック保持下で実行する
 #    update_substitutions.sh と同じ logs/substitution.lock を使い相互排他を成立させる。
-#    --try モード: ロックを取得できた場合のみ実行。取得できない（交代処理中）場合は
-#    スキップして次回 cron に委ねる。
-if python3 scripts/with_lock.py "$LOCK_FILE" --try -- bash -c '
+#    --coalesce: 交代処理などがロックを保持中なら、その完了後に1回だけ実行する
+#    （既に待機中の回があればそちらに任せる）。--wait で待つ上限を区切り、
+#    次の cron 周期（5分）と重ならないようにする。上限を超えた場合のみスキップ。
+REALTIME_LOCK_WAIT="${EKIDEN_REALTIME_LOCK_WAIT:-240}"
+if python3 scripts/with_lock.py "$LOCK_FILE" --wait "$REALTIME_LOCK_WAIT" --coalesce -- bash -c '
     set -euo pipefail
 
     # 2. 速報JSONを生成
@@ -139,10 +141,15 @@ else
     status=$?
 fi
 
+# 3. 通知キュー（logs/push_outbox/）の送信はロック外で行う。
+#    Push API の応答待ちが速報生成・git push を止めないようにするため。
+"$PYTHON_CMD" scripts/push_outbox.py || echo "警告: 通知キューの送信に失敗しました。次回に再送します。"
+
 if [[ "$status" -eq 0 ]]; then
     :
 elif [[ "$status" -eq 75 ]]; then
     echo "選手交代処理の実行中（ロック取得不可）のため、この回の速報更新はスキップします。"
+    echo "  (${REALTIME_LOCK_WAIT}秒待っても解放されないか、既に待機中の回があります)"
     exit 0
 else
     echo "エラー: リアルタイム速報の生成またはGit処理に失敗しました (終了コード: $status)。" >&2
@@ -5,6 +5,8 @@ set -euo pipefail
 
 # このスクリプトは、5chスレッドを監視し、監督による選手交代の宣言を処理するためのものです。
 # 単一ロックオーケストレーション:
+#   0. ロック前の事前チェック（process_substitutions.py --precheck）。処理不要なら
+#      ロックを取らずに終了し、update_realtime.sh の速報更新をスキップさせない
 #   1. fcntlロックを取得（update_realtime.sh との競合を回避）
 #   2. process_substitutions.py で交代を検証・適用（成功時のみ config 更新）
 #   3. generate_report.py --realtime で速報JSONを再生成（交代を反映）
@@ -37,7 +39,17 @@ mkdir -p "$(dirname "$LOG_FILE")"
     source venv/bin/activate
     echo "Python仮想環境を有効化しました。"
 
-    # 2. 単一ロックでオーケストレーション
+    # 2. ロック前の事前チェック
+    #    未処理の【選手交代】投稿が無い／前回処理時から入力が変わっていなければ exit 3。
+    #    それ以外の失敗はロック下の本処理に任せる。
+    precheck_status=0
+    python scripts/process_substitutions.py --precheck || precheck_status=$?
+    if [[ "$precheck_status" -eq 3 ]]; then
+        echo "新しい交代投稿はありません。ロックを取らずに終了します。"
+        exit 0
+    fi
+
+    # 3. 単一ロックでオーケストレーション
     #    process_substitutions → realtime再生成 → commit/push をロック下で実行
     echo "単一ロックを取得します ($LOCK_FILE)..."
     python scripts/with_lock.py "$LOCK_FILE" -- bash -c '
@@ -104,6 +116,9 @@ mkdir -p "$(dirname "$LOG_FILE")"
     '
     echo "単一ロックを解放しました。"
 
+    # 4. 通知キューの送信（ロック外）
+    python scripts/push_outbox.py || echo "警告: 通知キューの送信に失敗しました。次回に再送します。"
+
     echo "処理が正常に完了しました。"
     echo ""
 